@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: single-pass JSON extractor vs. the legacy regex strategy chain.
+
+The legacy path (BaseAgent._extract_json_from_response before the single-pass
+extractor replaced it) is reproduced below verbatim so the two can be compared
+on the same synthetic LLM responses.
+
+Usage:
+    python benchmarks/bench_json_extraction.py
+    python benchmarks/bench_json_extraction.py --sizes 10 100 400 --repeat 3
+"""
+
+import re
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.json_extractor import extract_json
+
+
+# --- Legacy extraction path -------------------------------------------------
+
+def legacy_fix_common_json_issues(json_str):
+    json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
+    json_str = re.sub(r'(?<!\\)"(?=.*".*:)', r'\\"', json_str)
+
+    first_brace = json_str.find('{')
+    first_bracket = json_str.find('[')
+    if first_brace != -1 and (first_bracket == -1 or first_brace < first_bracket):
+        json_str = json_str[first_brace:]
+    elif first_bracket != -1:
+        json_str = json_str[first_bracket:]
+
+    last_brace = json_str.rfind('}')
+    last_bracket = json_str.rfind(']')
+    if last_brace != -1 and last_brace > last_bracket:
+        json_str = json_str[:last_brace + 1]
+    elif last_bracket != -1:
+        json_str = json_str[:last_bracket + 1]
+
+    return json_str
+
+
+def legacy_extract_from_markdown_blocks(response):
+    for pattern in [r'```json\s*(.*?)\s*```', r'```\s*(.*?)\s*```', r'`(.*?)`']:
+        json_match = re.search(pattern, response, re.DOTALL)
+        if json_match:
+            json_str = legacy_fix_common_json_issues(json_match.group(1).strip())
+            try:
+                return json.loads(json_str)
+            except Exception:
+                continue
+    return None
+
+
+def legacy_extract_from_json_objects(response):
+    json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response, re.DOTALL)
+    if json_match:
+        return json.loads(legacy_fix_common_json_issues(json_match.group(0).strip()))
+    return None
+
+
+def legacy_extract_from_arrays(response):
+    json_match = re.search(r'\[[^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*\]', response, re.DOTALL)
+    if json_match:
+        array_result = json.loads(legacy_fix_common_json_issues(json_match.group(0).strip()))
+        return {"items": array_result} if isinstance(array_result, list) else array_result
+    return None
+
+
+def legacy_extract_with_aggressive_cleaning(response):
+    cleaned = re.sub(r'^[^{\[]*', '', response)
+    cleaned = re.sub(r'[^}\]]*$', '', cleaned)
+    if cleaned:
+        try:
+            return json.loads(legacy_fix_common_json_issues(cleaned))
+        except Exception:
+            pass
+    return None
+
+
+def legacy_extract(response):
+    response = response.strip()
+    for strategy in [legacy_extract_from_markdown_blocks, legacy_extract_from_json_objects,
+                     legacy_extract_from_arrays, legacy_extract_with_aggressive_cleaning]:
+        try:
+            result = strategy(response)
+            if result is not None:
+                return result
+        except Exception:
+            continue
+    return None
+
+
+# --- Benchmark ----------------------------------------------------------------
+
+def make_response(question_count, compact):
+    """Build a question-generator style response with a preamble and a fenced block."""
+    questions = [
+        {
+            'question_id': f'Q{i:04d}',
+            'question_text': f'What is the applicant\'s "preferred" contact method #{i}?',
+            'field_type': 'select',
+            'options': ['email', 'phone', 'post'],
+            'validation_rules': {'required': True, 'max_length': 120},
+            'policy_reference': f'PB{i % 9}.{i % 5}'
+        }
+        for i in range(question_count)
+    ]
+    body = json.dumps({'questions': questions}, indent=None if compact else 2)
+    return f"Here are the generated questions:\n\n```json\n{body}\n```\n\nLet me know if you need changes."
+
+
+def time_call(fn, response, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(response)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM response JSON extraction.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 50, 200],
+                        help="Questions per synthetic response (default: 10 50 200)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the best is reported")
+    args = parser.parse_args()
+
+    print(f"{'questions':>9} {'layout':>7} {'bytes':>9} {'legacy (ms)':>12} {'ok':>3} {'single-pass (ms)':>17} {'ok':>3} {'speedup':>8}")
+    for size in args.sizes:
+        for compact in (False, True):
+            response = make_response(size, compact)
+            expected = len(json.loads(response.split('```json\n', 1)[1].rsplit('\n```', 1)[0])['questions'])
+
+            legacy_time, legacy_result = time_call(legacy_extract, response, args.repeat)
+            new_time, new_result = time_call(extract_json, response, args.repeat)
+
+            def ok(result):
+                return 'yes' if isinstance(result, dict) and len(result.get('questions', [])) == expected else 'no'
+
+            print(f"{size:>9} {'compact' if compact else 'pretty':>7} {len(response):>9} "
+                  f"{legacy_time * 1000:>12.2f} {ok(legacy_result):>3} {new_time * 1000:>17.2f} {ok(new_result):>3} "
+                  f"{legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
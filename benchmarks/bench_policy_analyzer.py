@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: single-pass PolicyAnalyzer vs. the legacy multi-pattern extraction.
+
+The legacy path (EnhancedDocumentParser.extract_structured_content before it
+delegated to PolicyAnalyzer) is reproduced below verbatim so the two can be
+compared on the same synthetic instruction sets.
+
+Usage:
+    python benchmarks/bench_policy_analyzer.py
+    python benchmarks/bench_policy_analyzer.py --pages 50 500 --repeat 3
+"""
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.policy_analyzer import PolicyAnalyzer
+
+SAMPLE_POLICY = project_root / 'data' / 'input' / 'parent_boost_policy.txt'
+
+
+# --- Legacy extraction path -------------------------------------------------
+
+def legacy_extract_sections(document):
+    sections = {}
+    patterns = [
+        r'(V\d+\.\d+(?:\.\d+)?)\s+([A-Z\s&]+)\n\n(.*?)(?=\n\nV\d+\.\d+|$)',
+        r'(\d+\.\d+(?:\.\d+)?)\s+([A-Za-z\s&]+)\n\n(.*?)(?=\n\n\d+\.\d+|$)',
+        r'(##\s+)([A-Za-z\s&]+)\n\n(.*?)(?=\n\n##|$)'
+    ]
+    for pattern in patterns:
+        for match in re.finditer(pattern, document, re.DOTALL):
+            sections[match.group(1).strip()] = {
+                'title': match.group(2).strip(),
+                'content': match.group(3).strip()
+            }
+    return sections
+
+
+def legacy_extract_requirements(section_content):
+    requirements = []
+    patterns = [
+        r'\(([a-z]+)\)\s+(.*?)(?=\n\([a-z]+\)|$)',
+        r'\(([ivx]+)\)\s+(.*?)(?=\n\([ivx]+\)|$)',
+        r'(\d+)\.\s+(.*?)(?=\n\d+\.|$)',
+        r'[•·]\s+(.*?)(?=\n[•·]|$)',
+        r'-\s+(.*?)(?=\n-|$)'
+    ]
+    for pattern in patterns:
+        for match in re.finditer(pattern, section_content, re.DOTALL):
+            requirement = match.group(2).strip() if len(match.groups()) > 1 else match.group(1).strip()
+            if requirement and len(requirement) > 10:
+                requirements.append(requirement)
+    return requirements
+
+
+def legacy_extract_thresholds(document):
+    amounts = []
+    for pattern in [r'NZD\s*\$\s*([\d,]+)', r'\$\s*([\d,]+)', r'([\d,]+)\s*dollars?']:
+        amounts.extend([int(a.replace(',', '')) for a in re.findall(pattern, document, re.IGNORECASE)])
+    periods = re.findall(r'(\d+)\s+(months?|years?|days?|weeks?)', document, re.IGNORECASE)
+    ages = []
+    for pattern in [r'(?:under|over|age|aged)\s+(\d+)', r'(\d+)\s+years?\s+old', r'minimum\s+age\s+(\d+)']:
+        ages.extend([int(a) for a in re.findall(pattern, document, re.IGNORECASE)])
+    return {'currency_amounts': sorted(set(amounts)), 'time_periods': periods, 'age_limits': sorted(set(ages))}
+
+
+def legacy_extract_conditions(document):
+    conditions = []
+    condition_patterns = [
+        (r'(.*?must\s+.*?)(?:\.|;|\n)', 'mandatory'),
+        (r'(.*?shall\s+.*?)(?:\.|;|\n)', 'mandatory'),
+        (r'(.*?required\s+to\s+.*?)(?:\.|;|\n)', 'mandatory'),
+        (r'(.*?may\s+.*?)(?:\.|;|\n)', 'optional'),
+        (r'(.*?can\s+.*?)(?:\.|;|\n)', 'optional'),
+        (r'(.*?should\s+.*?)(?:\.|;|\n)', 'recommended'),
+        (r'(.*?if\s+.*?)(?:\.|;|\n)', 'conditional')
+    ]
+    for pattern, condition_type in condition_patterns:
+        for match in re.finditer(pattern, document, re.IGNORECASE):
+            statement = match.group(1).strip()
+            if len(statement) > 15:
+                conditions.append({'type': condition_type, 'statement': statement})
+    return conditions
+
+
+def legacy_extract_policy_metadata(document):
+    dates = []
+    for pattern in [r'\d{1,2}/\d{1,2}/\d{4}', r'\d{1,2}-\d{1,2}-\d{4}', r'\d{4}-\d{1,2}-\d{1,2}']:
+        dates.extend(re.findall(pattern, document))
+    return {
+        'visa_codes': list(set(re.findall(r'\b[A-Z]\d+\b', document))),
+        'dates_mentioned': dates,
+        'policy_references': list(set(re.findall(r'V\d+\.\d+(?:\.\d+)?(?:\([a-z]+\))?', document)))
+    }
+
+
+def legacy_analyze(document):
+    sections = legacy_extract_sections(document)
+    requirements = []
+    for section_code, section_data in sections.items():
+        for req in legacy_extract_requirements(section_data['content']):
+            requirements.append({'section': section_code, 'requirement': req})
+    return {
+        'sections': sections,
+        'requirements': requirements,
+        'thresholds': legacy_extract_thresholds(document),
+        'conditions': legacy_extract_conditions(document),
+        'policy_metadata': legacy_extract_policy_metadata(document)
+    }
+
+
+# --- Benchmark ----------------------------------------------------------------
+
+def make_document(pages):
+    """Repeat the sample policy, renumbering its sections, to roughly the given page count."""
+    sample = SAMPLE_POLICY.read_text(encoding='utf-8')
+    # The sample is about one page of instructions
+    parts = [re.sub(r'V4\.', f'V{copy + 1}.', sample) for copy in range(pages)]
+    return '\n\n'.join(parts)
+
+
+def time_call(fn, document, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(document)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark policy document analysis.")
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 100, 500],
+                        help="Synthetic document sizes in pages (default: 10 100 500)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the best is reported")
+    args = parser.parse_args()
+
+    analyzer = PolicyAnalyzer()
+    print(f"{'pages':>6} {'bytes':>10} {'legacy (ms)':>12} {'single-pass (ms)':>17} {'speedup':>8} {'sections':>9} {'requirements':>13}")
+    for pages in args.pages:
+        document = make_document(pages)
+        legacy_time, _ = time_call(legacy_analyze, document, args.repeat)
+        new_time, result = time_call(analyzer.analyze, document, args.repeat)
+        print(f"{pages:>6} {len(document):>10} {legacy_time * 1000:>12.1f} {new_time * 1000:>17.1f} "
+              f"{legacy_time / new_time:>7.1f}x {len(result['sections']):>9} {len(result['requirements']):>13}")
+
+
+if __name__ == '__main__':
+    main()
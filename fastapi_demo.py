@@ -4,8 +4,12 @@ FastAPI alternative to Streamlit for testing the hybrid approach
 """
 
 from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import shutil
 import tempfile
 import os
 from pathlib import Path
@@ -16,9 +20,37 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from src.orchestrator.workflow_orchestrator import WorkflowOrchestrator
-from src.utils.document_parser import DocumentParser
+from src.orchestrator.job_queue import JobQueue, JobQueueFull
+from src.utils.enhanced_document_parser import EnhancedDocumentParser
+from src.utils.telemetry import get_telemetry_registry
+from src.utils.visa_classifier import get_visa_classifier
+from src.utils.events import JOB_END, get_event_bus
 
-app = FastAPI(title="Visa Requirements Agent - FastAPI Demo")
+# One orchestrator (and one set of agents and LLM clients) for every job
+orchestrator = None
+job_queue = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global orchestrator, job_queue
+    orchestrator = WorkflowOrchestrator()
+    job_queue = JobQueue.from_config(orchestrator.workflow_config.get('execution', {}).get('jobs'))
+    await job_queue.start()
+    try:
+        yield
+    finally:
+        await job_queue.stop()
+
+app = FastAPI(title="Visa Requirements Agent - FastAPI Demo", lifespan=lifespan)
+
+# Shared parser: re-uploads of a known document come from its parse cache
+document_parser = EnhancedDocumentParser()
+
+# Keyword table compiled once, shared with the policy evaluator
+visa_classifier = get_visa_classifier()
+
+# Keywords reported as found/not found in the upload response's detection_results
+DETECTION_KEYWORDS = ("PARENT BOOST", "V4", "PARENT", "BOOST", "VISITOR", "SKILLED MIGRANT", "WORKING HOLIDAY")
 
 @app.get("/", response_class=HTMLResponse)
 async def main():
@@ -52,88 +84,166 @@ async def main():
     </html>
     """
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Process uploaded document with hybrid approach"""
+async def process_document(tmp_path: str, filename: str) -> dict:
+    """Parse, classify and run the workflow on an uploaded document (a job's work)"""
+    
+    # Parsing and classification are CPU/IO bound; keep them off the event loop
+    policy_content = (await asyncio.to_thread(document_parser.load_document, tmp_path))['content']
+    
+    # HYBRID APPROACH - Detect visa type
+    classification = await asyncio.to_thread(visa_classifier.classify, policy_content)
+    detected_visa_type = classification['visa_type']
+    detected_visa_code = classification['visa_code']
+    content_upper = policy_content.upper()
+    detection_results = {keyword: keyword in content_upper for keyword in DETECTION_KEYWORDS}
+    
+    # Run workflow
+    results = await orchestrator.arun_workflow(
+        tmp_path,
+        policy_content,
+        detected_visa_type=detected_visa_type,
+        detected_visa_code=detected_visa_code,
+        force_visa_type=bool(detected_visa_type)
+    )
+    
+    # Extract policy structure
+    policy_structure = results['outputs'].get('policy_structure', {})
+    
+    return {
+        "success": True,
+        "filename": filename,
+        "document_length": len(policy_content),
+        "detection_results": detection_results,
+        "classification": {
+            "matches": classification['matches'],
+            "scores": classification['scores'],
+            "confidence": classification['confidence']
+        },
+        "detected_visa_type": detected_visa_type,
+        "detected_visa_code": detected_visa_code,
+        "workflow_status": results['status'],
+        "workflow_duration": results['duration_seconds'],
+        "stages_completed": f"{len([s for s in results['stages'] if s['status'] == 'success'])}/{len(results['stages'])}",
+        "final_visa_type": policy_structure.get('visa_type'),
+        "final_visa_code": policy_structure.get('visa_code'),
+        "match_success": policy_structure.get('visa_type') == detected_visa_type if detected_visa_type else False
+    }
+
+async def submit_upload(file: UploadFile):
+    """Save an upload to a temporary file and queue its processing job"""
     
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file uploaded")
     
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
+    def save() -> str:
+        # Copy in 1 MB pieces, so a large upload is never held in memory whole
+        with tempfile.NamedTemporaryFile(delete=False, suffix=Path(file.filename).suffix) as tmp_file:
+            shutil.copyfileobj(file.file, tmp_file, 1024 * 1024)
+            return tmp_file.name
     
-    try:
-        # Parse document
-        parser = DocumentParser()
-        policy_content = parser.parse_document(tmp_path)
-        
-        # HYBRID APPROACH - Detect visa type
-        detected_visa_type = None
-        detected_visa_code = None
-        
-        content_upper = policy_content.upper()
-        detection_results = {
-            "PARENT BOOST": "PARENT BOOST" in content_upper,
-            "V4": "V4" in content_upper,
-            "PARENT": "PARENT" in content_upper,
-            "BOOST": "BOOST" in content_upper,
-            "VISITOR": "VISITOR" in content_upper,
-            "SKILLED MIGRANT": "SKILLED MIGRANT" in content_upper,
-            "WORKING HOLIDAY": "WORKING HOLIDAY" in content_upper
-        }
-        
-        if any(keyword in content_upper for keyword in ['PARENT BOOST VISITOR VISA', 'PARENT BOOST', 'V4']):
-            detected_visa_type = "Parent Boost Visitor Visa"
-            detected_visa_code = "V4"
-        elif any(keyword in content_upper for keyword in ['SKILLED MIGRANT', 'SR1', 'SR3', 'SR4', 'SR5']):
-            detected_visa_type = "Skilled Migrant Residence Visa"
-            detected_visa_code = "SR1"
-        elif any(keyword in content_upper for keyword in ['WORKING HOLIDAY', 'YOUTH', 'TEMPORARY WORK', 'WHV']):
-            detected_visa_type = "Working Holiday Visa"
-            detected_visa_code = "WHV"
-        
-        # Run workflow
-        orchestrator = WorkflowOrchestrator()
-        results = orchestrator.run_workflow(
-            tmp_path,
-            policy_content,
-            detected_visa_type=detected_visa_type,
-            detected_visa_code=detected_visa_code,
-            force_visa_type=bool(detected_visa_type)
-        )
-        
-        # Extract policy structure
-        policy_structure = results['outputs'].get('policy_structure', {})
-        
-        return JSONResponse({
-            "success": True,
-            "filename": file.filename,
-            "document_length": len(policy_content),
-            "detection_results": detection_results,
-            "detected_visa_type": detected_visa_type,
-            "detected_visa_code": detected_visa_code,
-            "workflow_status": results['status'],
-            "workflow_duration": results['duration_seconds'],
-            "stages_completed": f"{len([s for s in results['stages'] if s['status'] == 'success'])}/{len(results['stages'])}",
-            "final_visa_type": policy_structure.get('visa_type'),
-            "final_visa_code": policy_structure.get('visa_code'),
-            "match_success": policy_structure.get('visa_type') == detected_visa_type if detected_visa_type else False
-        })
-        
-    except Exception as e:
-        return JSONResponse({
-            "success": False,
-            "error": str(e),
-            "filename": file.filename
-        }, status_code=500)
+    # Save uploaded file temporarily, off the event loop
+    tmp_path = await asyncio.to_thread(save)
     
-    finally:
-        # Clean up temporary file
+    def cleanup():
+        # Clean up temporary file once the job is over, however it ended
         if os.path.exists(tmp_path):
             os.unlink(tmp_path)
+    
+    try:
+        return job_queue.submit(lambda: process_document(tmp_path, file.filename), cleanup, filename=file.filename)
+    except JobQueueFull as e:
+        cleanup()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...)):
+    """Queue an uploaded document for processing; poll GET /jobs/{job_id} for the result"""
+    job = await submit_upload(file)
+    return {"job_id": job.job_id, "status": job.status, "status_url": f"/jobs/{job.job_id}"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """State of a job, with the processing result once it has succeeded"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job.to_dict()
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if not job_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return {"job_id": job.job_id, "status": "cancelling" if job.status == "running" else job.status}
+
+def sse_message(event: dict) -> str:
+    """Format an event as a server-sent events message"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Live stream (server-sent events) of a job's run, stage and LLM call events; ends with job_end"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    
+    # Subscribe before checking the job, so its end cannot slip between the two
+    events = get_event_bus().stream(job_id=job_id)
+    
+    async def event_source():
+        try:
+            while True:
+                if job.finished:
+                    # Drain what was received; events are handed over via the
+                    # loop, so let already scheduled hand-overs land first
+                    if events.empty():
+                        await asyncio.sleep(0)
+                    event = events.get_nowait()
+                    if event is None:
+                        # No job_end left to come (it ended before we subscribed)
+                        yield sse_message({'type': JOB_END, 'job_id': job_id, 'status': job.status, 'error': job.error})
+                        return
+                else:
+                    event = await events.get(timeout=15)
+                    if event is None:
+                        yield ": keep-alive\n\n"
+                        continue
+                yield sse_message(event)
+                if event['type'] == JOB_END:
+                    return
+        finally:
+            events.close()
+    
+    return StreamingResponse(event_source(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.post("/upload")
+async def upload_file(file: UploadFile = File(...)):
+    """Process uploaded document with hybrid approach, waiting for its job to finish"""
+    
+    job = await (await submit_upload(file)).wait()
+    if job.status == "succeeded":
+        return JSONResponse(job.result)
+    
+    return JSONResponse({
+        "success": False,
+        "error": job.error or f"Job {job.status}",
+        "filename": file.filename
+    }, status_code=500)
+
+@app.get("/health")
+async def health():
+    """Liveness check, with the job queue's load"""
+    return {"status": "ok", "jobs": job_queue.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """LLM call, token and cost counters in the Prometheus text format"""
+    return PlainTextResponse(get_telemetry_registry().render_prometheus(),
+                             media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Batch runner: process every policy document in a directory or glob pattern.
+
+Examples:
+    python run_batch.py data/input
+    python run_batch.py "policies/**/*.pdf" --workers 8 --mode process
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+# Load environment variables
+load_dotenv(project_root / '.env')
+
+from src.orchestrator.batch_runner import BatchRunner, find_documents
+
+
+def main():
+    """Run the workflow over a batch of policy documents."""
+    parser = argparse.ArgumentParser(description="Run the visa requirements workflow over many policy documents.")
+    parser.add_argument('sources', nargs='+', help="Policy files, directories or glob patterns (txt/pdf/docx)")
+    parser.add_argument('--output', help="JSONL results file (default: data/output/batch_<timestamp>.jsonl)")
+    parser.add_argument('--workers', type=int, default=4, help="Documents processed at once (default: 4)")
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                        help="Worker pool type (default: thread)")
+    parser.add_argument('--config-dir', help="Configuration directory (default: config/)")
+    args = parser.parse_args()
+    
+    documents = find_documents(args.sources)
+    if not documents:
+        print("❌ Error: No policy documents found")
+        return 1
+    
+    output_path = args.output or str(
+        project_root / 'data' / 'output' / f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    )
+    
+    print("=" * 80)
+    print(f"BATCH RUN: {len(documents)} documents, {args.workers} {args.mode} workers")
+    print("=" * 80)
+    
+    runner = BatchRunner(workers=args.workers, mode=args.mode, config_dir=args.config_dir)
+    summary = runner.run(documents, output_path)
+    
+    print()
+    print("=" * 80)
+    print("BATCH COMPLETED")
+    print("=" * 80)
+    print(f"Documents: {summary['total_documents']} ({summary['succeeded']} succeeded, {summary['failed']} failed)")
+    print(f"Duration: {summary['duration_seconds']:.2f}s")
+    print(f"Throughput: {summary['throughput_docs_per_minute']:.2f} docs/min")
+    print(f"Latency: p50 {summary['latency_p50_seconds']:.2f}s, p95 {summary['latency_p95_seconds']:.2f}s")
+    
+    if summary['failures']:
+        print()
+        print("Failures:")
+        for failure in summary['failures']:
+            print(f"  ❌ {failure['document']}: {failure['error']}")
+    
+    print()
+    print(f"📁 Results saved to: {summary['output_path']}")
+    
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -78,7 +78,7 @@ def main():
             print(f"  Validation Score: {validation_score:.1f}%")
         
         print()
-        print(f"📁 Results saved to: {project_root / 'data' / 'output'}")
+        print(f"📁 Results saved to: {results['output_dir']}")
         print()
         print("To view detailed results:")
         print(f"  streamlit run src/ui/streamlit_app.py")
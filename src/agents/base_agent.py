@@ -1,16 +1,63 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional, Tuple, Callable, Awaitable, Union
 import os
+import json
+import time
+import asyncio
 import logging
+import contextvars
+from contextlib import contextmanager
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from openai import OpenAI, AsyncOpenAI
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel
 
-logging.basicConfig(level=logging.INFO)
+from ..utils.llm_cache import LLMResponseCache, get_llm_cache
+from ..utils.llm_clients import get_openai_client, get_async_openai_client, get_chat_model
+from ..utils.rate_limiter import get_rate_limiter
+from ..utils.json_extractor import extract_json
+from ..utils.telemetry import CostModel, record_llm_call, openai_usage, langchain_usage
+from ..utils.tracing import current_span, trace_span
+from ..utils.logging_config import configure_logging
+from ..utils.execution_history import create_execution_history
+from ..utils.schemas import (
+    DEFAULT_STRUCTURED_OUTPUT_CONFIG,
+    JSON_OBJECT_FORMAT,
+    supports_json_mode,
+    structured_prompt,
+    validate_output,
+    wrap_items,
+    repair_prompt,
+    apply_patch,
+    read_json_stream,
+    aread_json_stream
+)
+from ..utils.chunking import (
+    DEFAULT_CHUNKING_CONFIG,
+    CHARS_PER_TOKEN,
+    chunk_document,
+    head_chunk,
+    section_blocks,
+    context_blocks,
+    pack_chunks,
+    usable_results,
+    merge_chunk_results
+)
+
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Response cache writes held back until the caller has decoded and validated them
+_pending_cache_writes: contextvars.ContextVar[Optional[List[Tuple[str, str]]]] = contextvars.ContextVar(
+    'pending_cache_writes', default=None
+)
+
+# A single user message, or a conversation of {'role', 'content'} messages
+Prompt = Union[str, List[Dict[str, str]]]
+
 
 class BaseAgent(ABC):
     """Base class for all agents in the visa requirements system."""
@@ -26,7 +73,13 @@ class BaseAgent(ABC):
         self.name = name
         self.config = config
         self.llm = self._initialize_llm()
-        self.execution_history: List[Dict[str, Any]] = []
+        self.response_cache = get_llm_cache(config.get('cache'))
+        self.rate_limiter = get_rate_limiter(config.get('rate_limits'))
+        self.chunking = {**DEFAULT_CHUNKING_CONFIG, **(config.get('chunking') or {})}
+        self.cost_model = CostModel(config.get('pricing'))
+        # Bounded: records keep digests and sizes, not the payloads themselves
+        self.execution_history = create_execution_history(name, config.get('execution_history'))
+        self.structured_output = {**DEFAULT_STRUCTURED_OUTPUT_CONFIG, **(config.get('structured_output') or {})}
         
     def _initialize_llm(self) -> ChatOpenAI:
         """Initialize the LLM based on configuration."""
@@ -38,13 +91,559 @@ class BaseAgent(ABC):
         temperature = self.config.get('temperature', 0.1)
         max_tokens = self.config.get('max_tokens', 4000)
         
-        return ChatOpenAI(
+        return get_chat_model(model, temperature, max_tokens, self.config.get('client'))
+    
+    def _get_openai_client(self) -> OpenAI:
+        """Get the shared, pooled OpenAI client."""
+        return get_openai_client(self.config.get('client'))
+    
+    def _get_async_openai_client(self) -> AsyncOpenAI:
+        """Get the shared, pooled AsyncOpenAI client for the running event loop."""
+        return get_async_openai_client(self.config.get('client'))
+    
+    def _invoke_llm(self, prompt: Prompt) -> str:
+        """Invoke the agent's configured chat model and return the response text."""
+        model = self.config.get('model', 'gpt-4-turbo-preview')
+        
+        def call() -> str:
+            started = time.perf_counter()
+            message = self.llm.invoke(prompt)
+            self._record_usage(model, langchain_usage(message), time.perf_counter() - started)
+            return message.content
+        
+        return self._cached_completion(
+            self._cache_prompt(prompt),
             model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            api_key=api_key
+            temperature=self.config.get('temperature', 0.1),
+            max_tokens=self.config.get('max_tokens', 4000),
+            call=call
+        )
+    
+    def _chat_completion(self, prompt: Prompt, model: str = "gpt-4", temperature: float = 0.2,
+                         max_tokens: int = 1500, json_mode: bool = False) -> str:
+        """
+        Run a chat completion through the OpenAI client.
+        
+        In JSON mode the response is streamed (unless disabled in the
+        structured_output settings) and reading stops once the JSON value is
+        complete.
+        """
+        params = self._chat_params(prompt, model, temperature, max_tokens, json_mode)
+        cache_prompt = self._cache_prompt(prompt, json_mode)
+        
+        def call() -> str:
+            started = time.perf_counter()
+            if params.get('stream'):
+                with self._get_openai_client().chat.completions.create(**params) as stream:
+                    content, usage = read_json_stream(stream)
+                self._record_usage(model, usage or self._estimate_usage(cache_prompt, content),
+                                   time.perf_counter() - started)
+                return content
+            response = self._get_openai_client().chat.completions.create(**params)
+            self._record_usage(model, openai_usage(response), time.perf_counter() - started)
+            return response.choices[0].message.content.strip()
+        
+        return self._cached_completion(cache_prompt, model, temperature, max_tokens, call)
+    
+    def _cached_completion(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                           call: Callable[[], str]) -> str:
+        """Serve a completion from the response cache, calling the LLM on a miss."""
+        with self._llm_span(prompt, model, max_tokens) as span:
+            if self.response_cache is None:
+                return self._rate_limited_call(prompt, model, max_tokens, call)
+            
+            key = LLMResponseCache.make_key(model, temperature, max_tokens, prompt)
+            cached = self.response_cache.get(key)
+            span.set_attribute('cache_hit', cached is not None)
+            if cached is not None:
+                logger.info("%s: LLM response cache hit", self.name)
+                record_llm_call(self.name, model, cache_hit=True)
+                return cached
+            
+            content = self._rate_limited_call(prompt, model, max_tokens, call)
+            self._cache_response(key, content)
+            return content
+    
+    def _cache_response(self, key: str, content: str):
+        """Cache a response, or hold it back while the caller validates it (see _cache_when_valid)."""
+        if not content:
+            return
+        pending = _pending_cache_writes.get()
+        if pending is None:
+            self.response_cache.set(key, content)
+        else:
+            pending.append((key, content))
+    
+    @contextmanager
+    def _cache_when_valid(self) -> Iterator[List[Tuple[str, str]]]:
+        """
+        Hold back the response cache writes of the enclosed LLM calls.
+        
+        They are written once the block completes; if it raises, or clears
+        the yielded list, the responses are dropped, so a response that
+        failed to decode or validate is never served from the cache.
+        """
+        pending: List[Tuple[str, str]] = []
+        token = _pending_cache_writes.set(pending)
+        try:
+            yield pending
+        finally:
+            _pending_cache_writes.reset(token)
+        for key, content in pending:
+            self.response_cache.set(key, content)
+    
+    def _rate_limited_call(self, prompt: str, model: str, max_tokens: int, call: Callable[[], str]) -> str:
+        """Run an LLM call through the shared rate limiter, when enabled."""
+        if self.rate_limiter is None:
+            return call()
+        return self.rate_limiter.call(model, prompt, max_tokens, call, self.config.get('max_retries', 3))
+    
+    async def _ainvoke_llm(self, prompt: Prompt) -> str:
+        """Async variant of _invoke_llm."""
+        # ChatOpenAI pins its async client at construction, which would tie the
+        # shared model to one event loop; call the per-loop pooled client instead
+        model = self.config.get('model', 'gpt-4-turbo-preview')
+        
+        async def call() -> str:
+            started = time.perf_counter()
+            response = await self._get_async_openai_client().chat.completions.create(
+                model=model,
+                messages=self._chat_messages(prompt),
+                temperature=self.config.get('temperature', 0.1),
+                max_tokens=self.config.get('max_tokens', 4000)
+            )
+            self._record_usage(model, openai_usage(response), time.perf_counter() - started)
+            return response.choices[0].message.content
+        
+        return await self._acached_completion(
+            self._cache_prompt(prompt),
+            model=model,
+            temperature=self.config.get('temperature', 0.1),
+            max_tokens=self.config.get('max_tokens', 4000),
+            call=call
+        )
+    
+    async def _achat_completion(self, prompt: Prompt, model: str = "gpt-4", temperature: float = 0.2,
+                                max_tokens: int = 1500, json_mode: bool = False) -> str:
+        """Async variant of _chat_completion using the async OpenAI client."""
+        params = self._chat_params(prompt, model, temperature, max_tokens, json_mode)
+        cache_prompt = self._cache_prompt(prompt, json_mode)
+        
+        async def call() -> str:
+            started = time.perf_counter()
+            if params.get('stream'):
+                async with await self._get_async_openai_client().chat.completions.create(**params) as stream:
+                    content, usage = await aread_json_stream(stream)
+                self._record_usage(model, usage or self._estimate_usage(cache_prompt, content),
+                                   time.perf_counter() - started)
+                return content
+            response = await self._get_async_openai_client().chat.completions.create(**params)
+            self._record_usage(model, openai_usage(response), time.perf_counter() - started)
+            return response.choices[0].message.content.strip()
+        
+        return await self._acached_completion(cache_prompt, model, temperature, max_tokens, call)
+    
+    def _chat_params(self, prompt: Prompt, model: str, temperature: float, max_tokens: int,
+                     json_mode: bool) -> Dict[str, Any]:
+        """Build the chat.completions.create arguments of one call."""
+        params = {
+            'model': model,
+            'messages': self._chat_messages(prompt),
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }
+        if json_mode:
+            params['response_format'] = JSON_OBJECT_FORMAT
+            if self.structured_output.get('stream', True):
+                params['stream'] = True
+                params['stream_options'] = {'include_usage': True}
+        return params
+    
+    @staticmethod
+    def _chat_messages(prompt: Prompt) -> List[Dict[str, str]]:
+        return [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+    
+    @staticmethod
+    def _cache_prompt(prompt: Prompt, json_mode: bool = False) -> str:
+        """Get the text a call is cached, traced and rate limited by."""
+        # A plain prompt keys the cache as before; conversations and JSON mode get their own keys
+        text = prompt if isinstance(prompt, str) else json.dumps(prompt, ensure_ascii=False)
+        return f"[json_object]\n{text}" if json_mode else text
+    
+    @staticmethod
+    def _estimate_usage(prompt: str, content: str) -> Tuple[int, int, int]:
+        """Estimate the usage of a stream that was closed before its usage chunk arrived."""
+        return len(prompt) // CHARS_PER_TOKEN, len(content) // CHARS_PER_TOKEN, 0
+    
+    async def _acached_completion(self, prompt: str, model: str, temperature: float, max_tokens: int,
+                                  call: Callable[[], Awaitable[str]]) -> str:
+        """Async variant of _cached_completion."""
+        with self._llm_span(prompt, model, max_tokens) as span:
+            if self.response_cache is None:
+                return await self._arate_limited_call(prompt, model, max_tokens, call)
+            
+            key = LLMResponseCache.make_key(model, temperature, max_tokens, prompt)
+            cached = self.response_cache.get(key)
+            span.set_attribute('cache_hit', cached is not None)
+            if cached is not None:
+                logger.info("%s: LLM response cache hit", self.name)
+                record_llm_call(self.name, model, cache_hit=True)
+                return cached
+            
+            content = await self._arate_limited_call(prompt, model, max_tokens, call)
+            self._cache_response(key, content)
+            return content
+    
+    def _llm_span(self, prompt: str, model: str, max_tokens: int):
+        """Open the span of one LLM call, including its cache lookup and rate limiting."""
+        return trace_span('llm.call', agent=self.name, model=model, prompt_chars=len(prompt),
+                          prompt_tokens_estimate=len(prompt) // CHARS_PER_TOKEN, max_tokens=max_tokens)
+    
+    async def _arate_limited_call(self, prompt: str, model: str, max_tokens: int,
+                                  call: Callable[[], Awaitable[str]]) -> str:
+        """Async variant of _rate_limited_call."""
+        if self.rate_limiter is None:
+            return await call()
+        return await self.rate_limiter.acall(model, prompt, max_tokens, call, self.config.get('max_retries', 3))
+    
+    def _record_usage(self, model: str, usage: Tuple[int, int, int], latency_seconds: float):
+        """Record the tokens, latency and cost of one LLM call made by this agent."""
+        prompt_tokens, completion_tokens, cached_tokens = usage
+        cost_usd = self.cost_model.cost(model, prompt_tokens, completion_tokens, cached_tokens)
+        record_llm_call(
+            self.name, model, prompt_tokens, completion_tokens, cached_tokens, latency_seconds, cost_usd=cost_usd
+        )
+        current_span().set_attributes(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cached_tokens=cached_tokens,
+            llm_latency_seconds=round(latency_seconds, 3), cost_usd=cost_usd
+        )
+    
+    def _invoke_json(self, request: Dict[str, Any]) -> Any:
+        """
+        Run a chat model request and post-process the JSON extracted from its response.
+        
+        Args:
+            request: Request built by one of the agent's *_request methods, with
+                a 'prompt', an optional 'schema' the result is validated against
+                and an optional 'parse' callable applied to the result
+                
+        Returns:
+            Extracted (and parsed) result
+        """
+        return self._parse_invoke_result(request, self._invoke_request(request))
+    
+    async def _ainvoke_json(self, request: Dict[str, Any]) -> Any:
+        """Async variant of _invoke_json."""
+        return self._parse_invoke_result(request, await self._ainvoke_request(request))
+    
+    def _invoke_request(self, request: Dict[str, Any]) -> Any:
+        """Run one chat model request and extract (and, given a schema, validate) its JSON."""
+        if not self._uses_schema(request):
+            with self._cache_when_valid() as pending:
+                response = self._invoke_llm(request['prompt'])
+                if extract_json(response) is None:
+                    pending.clear()
+            return self._extract_json_from_response(response)
+        
+        # No JSON mode here: the chat model prompts ask for bare arrays, which it cannot return
+        try:
+            with self._cache_when_valid():
+                return self._structured_json(request, False, self._invoke_llm)
+        except ValueError as e:
+            logger.warning("%s: %s", self.name, e)
+            return self._get_fallback_response()
+    
+    async def _ainvoke_request(self, request: Dict[str, Any]) -> Any:
+        """Async variant of _invoke_request."""
+        if not self._uses_schema(request):
+            with self._cache_when_valid() as pending:
+                response = await self._ainvoke_llm(request['prompt'])
+                if extract_json(response) is None:
+                    pending.clear()
+            return self._extract_json_from_response(response)
+        
+        try:
+            with self._cache_when_valid():
+                return await self._astructured_json(request, False, self._ainvoke_llm)
+        except ValueError as e:
+            logger.warning("%s: %s", self.name, e)
+            return self._get_fallback_response()
+    
+    def _parse_invoke_result(self, request: Dict[str, Any], result: Any) -> Any:
+        """Apply the request's parser to an extracted result."""
+        parse = request.get('parse')
+        return parse(result) if parse else result
+    
+    def _complete_json(self, request: Dict[str, Any]) -> Any:
+        """
+        Run a JSON chat completion request, falling back on any failure.
+        
+        Args:
+            request: Request built by one of the agent's *_request methods, with
+                'prompt', 'label' and 'fallback' plus optional 'schema', 'model',
+                'temperature', 'max_tokens' and 'summarize' keys
+                
+        Returns:
+            Parsed JSON result, or the fallback result
+        """
+        try:
+            with self._cache_when_valid():
+                result = self._complete_request(request)
+            return self._summarize_result(request, result)
+        except Exception as e:
+            logger.warning("%s: LLM error in %s: %s, falling back", self.name, request['label'], e)
+            return request['fallback']()
+    
+    async def _acomplete_json(self, request: Dict[str, Any]) -> Any:
+        """Async variant of _complete_json."""
+        try:
+            with self._cache_when_valid():
+                result = await self._acomplete_request(request)
+            return self._summarize_result(request, result)
+        except Exception as e:
+            logger.warning("%s: LLM error in %s: %s, falling back", self.name, request['label'], e)
+            return request['fallback']()
+    
+    def _complete_request(self, request: Dict[str, Any]) -> Any:
+        """Run one JSON completion request and decode (and, given a schema, validate) its result."""
+        params = self._completion_params(request)
+        if not self._uses_schema(request):
+            return json.loads(self._chat_completion(request['prompt'], **params))
+        
+        json_mode = supports_json_mode(params['model'], self.structured_output)
+        return self._structured_json(
+            request, json_mode, lambda prompt: self._chat_completion(prompt, json_mode=json_mode, **params)
+        )
+    
+    async def _acomplete_request(self, request: Dict[str, Any]) -> Any:
+        """Async variant of _complete_request."""
+        params = self._completion_params(request)
+        if not self._uses_schema(request):
+            return json.loads(await self._achat_completion(request['prompt'], **params))
+        
+        json_mode = supports_json_mode(params['model'], self.structured_output)
+        return await self._astructured_json(
+            request, json_mode, lambda prompt: self._achat_completion(prompt, json_mode=json_mode, **params)
         )
     
+    def _completion_params(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the completion parameters of a JSON request."""
+        return {
+            'model': request.get('model', 'gpt-4'),
+            'temperature': request.get('temperature', 0.2),
+            'max_tokens': request.get('max_tokens', 1500)
+        }
+    
+    def _summarize_result(self, request: Dict[str, Any], result: Any) -> Any:
+        """Report the summary of a JSON request's result."""
+        summarize = request.get('summarize')
+        if summarize:
+            logger.info("%s: LLM %s: %s", self.name, request['label'], summarize(result))
+        return result
+    
+    def _uses_schema(self, request: Dict[str, Any]) -> bool:
+        return request.get('schema') is not None and self.structured_output.get('enabled', True)
+    
+    def _structured_json(self, request: Dict[str, Any], json_mode: bool, complete: Callable[[Prompt], str]) -> Any:
+        """
+        Run a request whose result must match its 'schema'.
+        
+        Fields that fail validation are re-asked for on their own, in a
+        follow-up turn answered with just their values, which are patched into
+        the first response; the whole call is never redone.
+        
+        Args:
+            request: Request with 'prompt' and 'schema'
+            json_mode: Whether complete() asks the provider for JSON mode
+            complete: Runs one call for a prompt or conversation and returns the response text
+            
+        Returns:
+            The validated result
+            
+        Raises:
+            ValueError: If the result still does not match after the configured re-asks
+        """
+        schema = request['schema']
+        prompt = structured_prompt(request['prompt'], schema, json_mode)
+        content = complete(prompt)
+        data = wrap_items(schema, extract_json(content))
+        result, problems = validate_output(schema, data)
+        
+        for _ in range(self.structured_output.get('repair_attempts', 1)):
+            if not problems or not isinstance(data, dict):
+                break
+            logger.info("%s: re-asking for %d invalid fields of %s", self.name, len(problems), schema.__name__)
+            data = apply_patch(data, extract_json(complete(self._repair_conversation(prompt, content, problems))))
+            result, problems = validate_output(schema, data)
+        
+        if problems:
+            raise ValueError(f"response does not match {schema.__name__}: {self._describe_problems(problems)}")
+        return result
+    
+    async def _astructured_json(self, request: Dict[str, Any], json_mode: bool,
+                                complete: Callable[[Prompt], Awaitable[str]]) -> Any:
+        """Async variant of _structured_json."""
+        schema = request['schema']
+        prompt = structured_prompt(request['prompt'], schema, json_mode)
+        content = await complete(prompt)
+        data = wrap_items(schema, extract_json(content))
+        result, problems = validate_output(schema, data)
+        
+        for _ in range(self.structured_output.get('repair_attempts', 1)):
+            if not problems or not isinstance(data, dict):
+                break
+            logger.info("%s: re-asking for %d invalid fields of %s", self.name, len(problems), schema.__name__)
+            data = apply_patch(data, extract_json(await complete(self._repair_conversation(prompt, content, problems))))
+            result, problems = validate_output(schema, data)
+        
+        if problems:
+            raise ValueError(f"response does not match {schema.__name__}: {self._describe_problems(problems)}")
+        return result
+    
+    @staticmethod
+    def _repair_conversation(prompt: str, content: str, problems: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+        return [
+            {"role": "user", "content": prompt},
+            {"role": "assistant", "content": content},
+            {"role": "user", "content": repair_prompt(problems)}
+        ]
+    
+    @staticmethod
+    def _describe_problems(problems: List[Tuple[str, str]]) -> str:
+        described = '; '.join(f"{path or '<response>'}: {message}" for path, message in problems[:3])
+        return described + (f" (+{len(problems) - 3} more)" if len(problems) > 3 else '')
+    
+    def _document_chunks(self, document: str, sections: Dict[str, Any]) -> List[str]:
+        """
+        Split a policy document into token-budgeted chunks at section boundaries.
+        
+        With chunking disabled the document is cut to a single chunk.
+        """
+        max_tokens = self.chunking['max_chunk_tokens']
+        if not self.chunking.get('enabled', True):
+            return ['\n\n'.join(section_blocks(document, sections))[:max_tokens * CHARS_PER_TOKEN]]
+        return chunk_document(document, sections, max_tokens, self.chunking.get('max_chunks'))
+    
+    def _document_head(self, document: str, sections: Dict[str, Any]) -> str:
+        """
+        Get the opening token-budgeted chunk of a policy document.
+        
+        For prompts that read the start of the document once; only the blocks
+        the chunk needs are packed, and max_chunks does not apply.
+        """
+        max_tokens = self.chunking['max_chunk_tokens']
+        blocks = section_blocks(document, sections)
+        if not self.chunking.get('enabled', True):
+            return '\n\n'.join(blocks)[:max_tokens * CHARS_PER_TOKEN]
+        return head_chunk(blocks, max_tokens)
+    
+    def _context_chunks(self, context: Dict[str, Any]) -> List[str]:
+        """Split upstream agent outputs into token-budgeted chunks, one category per block."""
+        max_tokens = self.chunking['max_chunk_tokens']
+        blocks = context_blocks(context)
+        if not self.chunking.get('enabled', True):
+            return ['\n'.join(blocks)[:max_tokens * CHARS_PER_TOKEN]]
+        return pack_chunks(blocks, max_tokens, self.chunking.get('max_chunks')) or ['']
+    
+    def _invoke_json_chunks(self, requests: List[Dict[str, Any]]) -> Any:
+        """
+        Map-reduce variant of _invoke_json over one request per chunk.
+        
+        The requests run concurrently; each chunk's result is parsed on its own,
+        chunks that failed are dropped, and the rest are merged and deduplicated.
+        
+        Args:
+            requests: Requests built per chunk, sharing the same 'schema' and 'parse'
+            
+        Returns:
+            Merged result, or the parsed fallback if no chunk succeeded
+        """
+        if len(requests) == 1:
+            return self._invoke_json(requests[0])
+        
+        results = self._map_chunks(self._invoke_request, requests)
+        return self._reduce_invoke_chunks(requests[0], results)
+    
+    async def _ainvoke_json_chunks(self, requests: List[Dict[str, Any]]) -> Any:
+        """Async variant of _invoke_json_chunks."""
+        if len(requests) == 1:
+            return await self._ainvoke_json(requests[0])
+        
+        results = await self._amap_chunks(self._ainvoke_request, requests)
+        return self._reduce_invoke_chunks(requests[0], results)
+    
+    def _reduce_invoke_chunks(self, request: Dict[str, Any], results: List[Any]) -> Any:
+        """Parse each usable chunk result and merge them."""
+        parse = request.get('parse') or (lambda result: result)
+        merged = merge_chunk_results([parse(result) for result in usable_results(results)])
+        return merged if merged is not None else parse(self._get_fallback_response())
+    
+    def _complete_json_chunks(self, requests: List[Dict[str, Any]]) -> Any:
+        """
+        Map-reduce variant of _complete_json over one request per chunk.
+        
+        Args:
+            requests: Requests built per chunk, sharing 'schema', 'label', 'fallback' and 'summarize'
+            
+        Returns:
+            Merged result, or the fallback result if no chunk succeeded
+        """
+        if len(requests) == 1:
+            return self._complete_json(requests[0])
+        
+        results = self._map_chunks(self._complete_request, requests)
+        return self._reduce_complete_chunks(requests[0], results)
+    
+    async def _acomplete_json_chunks(self, requests: List[Dict[str, Any]]) -> Any:
+        """Async variant of _complete_json_chunks."""
+        if len(requests) == 1:
+            return await self._acomplete_json(requests[0])
+        
+        results = await self._amap_chunks(self._acomplete_request, requests)
+        return self._reduce_complete_chunks(requests[0], results)
+    
+    def _reduce_complete_chunks(self, request: Dict[str, Any], results: List[Any]) -> Any:
+        """Merge the chunk results of a JSON completion, falling back if none succeeded."""
+        merged = merge_chunk_results(results)
+        if merged is None:
+            logger.warning("%s: LLM error in %s: no chunk returned a usable result, falling back", self.name, request['label'])
+            return request['fallback']()
+        
+        summarize = request.get('summarize')
+        if summarize:
+            logger.info("%s: LLM %s: %s from %d chunks", self.name, request['label'], summarize(merged), len(results))
+        return merged
+    
+    def _map_chunks(self, call: Callable[[Dict[str, Any]], Any], requests: List[Dict[str, Any]]) -> List[Any]:
+        """Run call on each chunk request in a thread pool; a failed chunk yields None."""
+        def run(request: Dict[str, Any]) -> Any:
+            try:
+                return call(request)
+            except Exception as e:
+                logger.warning("%s: chunk request failed: %s", self.name, e)
+                return None
+        
+        workers = max(1, min(len(requests), self.chunking.get('max_concurrency', 4)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{self.name}-chunk') as pool:
+            # Each call keeps the caller's context (e.g. its rate limiter priority lane)
+            futures = [pool.submit(contextvars.copy_context().run, run, request) for request in requests]
+            return [future.result() for future in futures]
+    
+    async def _amap_chunks(self, call: Callable[[Dict[str, Any]], Awaitable[Any]],
+                           requests: List[Dict[str, Any]]) -> List[Any]:
+        """Async variant of _map_chunks, bounded by a semaphore."""
+        semaphore = asyncio.Semaphore(max(1, self.chunking.get('max_concurrency', 4)))
+        
+        async def run(request: Dict[str, Any]) -> Any:
+            async with semaphore:
+                try:
+                    return await call(request)
+                except Exception as e:
+                    logger.warning("%s: chunk request failed: %s", self.name, e)
+                    return None
+        
+        return list(await asyncio.gather(*(run(request) for request in requests)))
+    
     @abstractmethod
     def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -57,7 +656,22 @@ class BaseAgent(ABC):
             Dictionary of output data
         """
         pass
-    
+
+    async def aexecute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Execute the agent's primary task without blocking the event loop.
+
+        Agents override this to issue their independent LLM calls concurrently;
+        the default runs execute() in a worker thread.
+
+        Args:
+            inputs: Dictionary of input data
+
+        Returns:
+            Dictionary of output data
+        """
+        return await asyncio.to_thread(self.execute, inputs)
+
     def _create_prompt(self, template: str, variables: Dict[str, Any]) -> ChatPromptTemplate:
         """Create a chat prompt template."""
         return ChatPromptTemplate.from_template(template)
@@ -65,54 +679,26 @@ class BaseAgent(ABC):
     def _log_execution(self, inputs: Dict[str, Any], outputs: Dict[str, Any], 
                       duration: float, success: bool, error: Optional[str] = None):
         """Log execution details."""
-        execution_record = {
-            'timestamp': datetime.now().isoformat(),
-            'agent': self.name,
-            'inputs': inputs,
-            'outputs': outputs if success else None,
-            'duration_seconds': duration,
-            'success': success,
-            'error': error
-        }
-        self.execution_history.append(execution_record)
+        self.execution_history.record(inputs, outputs, duration, success, error)
         
         if success:
-            logger.info(f"{self.name} executed successfully in {duration:.2f}s")
+            logger.info("%s executed successfully in %.2fs", self.name, duration)
         else:
-            logger.error(f"{self.name} failed: {error}")
+            logger.error("%s failed: %s", self.name, error)
     
     def get_execution_history(self) -> List[Dict[str, Any]]:
-        """Get the execution history for this agent."""
-        return self.execution_history
+        """Get the retained execution records for this agent, oldest first."""
+        return self.execution_history.records()
     
-    def _extract_json_from_response(self, response: str, max_retries: int = 3) -> Dict[str, Any]:
-        """Extract JSON from LLM response with retry logic and robust error handling."""
-        import json
-        import re
+    def _extract_json_from_response(self, response: str) -> Any:
+        """Extract the first JSON object or array from an LLM response, falling back to text extraction."""
+        result = extract_json(response)
+        if result is not None:
+            return result
         
-        # Clean the response
-        response = response.strip()
+        # No JSON in the response: try to extract key information from the text
+        logger.warning("Failed to extract JSON from response, attempting text extraction. Response: %.200s...", response)
         
-        # Try multiple extraction strategies
-        extraction_strategies = [
-            self._extract_from_markdown_blocks,
-            self._extract_from_json_objects,
-            self._extract_from_arrays,
-            self._extract_with_aggressive_cleaning
-        ]
-        
-        for strategy in extraction_strategies:
-            try:
-                result = strategy(response)
-                if result is not None:
-                    return result
-            except Exception as e:
-                continue
-        
-        # If all strategies fail, try to extract key information from the raw response
-        logger.warning(f"Failed to extract JSON from response, attempting text extraction. Response: {response[:200]}...")
-        
-        # Try to extract key information from the text response
         extracted_info = self._extract_info_from_text(response)
         if extracted_info:
             return extracted_info
@@ -152,78 +738,6 @@ class BaseAgent(ABC):
         
         return extracted if extracted else None
     
-    def _extract_from_markdown_blocks(self, response: str) -> Dict[str, Any]:
-        """Extract JSON from markdown code blocks."""
-        import json
-        import re
-        
-        # Try multiple markdown patterns
-        patterns = [
-            r'```json\s*(.*?)\s*```',
-            r'```\s*(.*?)\s*```',
-            r'`(.*?)`'
-        ]
-        
-        for pattern in patterns:
-            json_match = re.search(pattern, response, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1).strip()
-                json_str = self._fix_common_json_issues(json_str)
-                try:
-                    return json.loads(json_str)
-                except:
-                    continue
-        
-        return None
-    
-    def _extract_from_json_objects(self, response: str) -> Dict[str, Any]:
-        """Extract JSON objects from response."""
-        import json
-        import re
-        
-        # Look for complete JSON objects
-        json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0).strip()
-            json_str = self._fix_common_json_issues(json_str)
-            return json.loads(json_str)
-        return None
-    
-    def _extract_from_arrays(self, response: str) -> Dict[str, Any]:
-        """Extract JSON arrays from response."""
-        import json
-        import re
-        
-        # Look for JSON arrays
-        json_match = re.search(r'\[[^\[\]]*(?:\[[^\[\]]*\][^\[\]]*)*\]', response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0).strip()
-            json_str = self._fix_common_json_issues(json_str)
-            array_result = json.loads(json_str)
-            # Wrap array in object if needed
-            if isinstance(array_result, list):
-                return {"items": array_result}
-            return array_result
-        return None
-    
-    def _extract_with_aggressive_cleaning(self, response: str) -> Dict[str, Any]:
-        """Aggressively clean and extract JSON."""
-        import json
-        import re
-        
-        # Remove all non-JSON content
-        cleaned = re.sub(r'^[^{\[]*', '', response)  # Remove prefix
-        cleaned = re.sub(r'[^}\]]*$', '', cleaned)   # Remove suffix
-        
-        if cleaned:
-            cleaned = self._fix_common_json_issues(cleaned)
-            try:
-                return json.loads(cleaned)
-            except:
-                pass
-        
-        return None
-    
     def _get_fallback_response(self) -> Dict[str, Any]:
         """Return a fallback response structure."""
         return {
@@ -232,37 +746,6 @@ class BaseAgent(ABC):
             "items": []
         }
     
-    def _fix_common_json_issues(self, json_str: str) -> str:
-        """Fix common JSON formatting issues from LLM responses."""
-        import re
-        
-        # Remove any trailing commas before closing brackets/braces
-        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-        
-        # Fix unescaped quotes in strings (basic attempt)
-        # This is a simple fix - more complex cases might need better handling
-        json_str = re.sub(r'(?<!\\)"(?=.*".*:)', r'\\"', json_str)
-        
-        # Remove any text before the first { or [
-        first_brace = json_str.find('{')
-        first_bracket = json_str.find('[')
-        
-        if first_brace != -1 and (first_bracket == -1 or first_brace < first_bracket):
-            json_str = json_str[first_brace:]
-        elif first_bracket != -1:
-            json_str = json_str[first_bracket:]
-        
-        # Remove any text after the last } or ]
-        last_brace = json_str.rfind('}')
-        last_bracket = json_str.rfind(']')
-        
-        if last_brace != -1 and last_brace > last_bracket:
-            json_str = json_str[:last_brace + 1]
-        elif last_bracket != -1:
-            json_str = json_str[:last_bracket + 1]
-        
-        return json_str
-    
     def _add_metadata(self, output: Dict[str, Any]) -> Dict[str, Any]:
         """Add metadata to output."""
         output['metadata'] = {
@@ -1,6 +1,10 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import time
+import logging
 from .base_agent import BaseAgent
+from ..utils.reference_index import ReferenceIndex
+
+logger = logging.getLogger(__name__)
 
 
 class ConsolidationAgent(BaseAgent):
@@ -19,22 +23,9 @@ class ConsolidationAgent(BaseAgent):
         start_time = time.time()
         
         try:
-            print(f"CONSOLIDATION AGENT STARTING", flush=True)
-            
-            # Extract all inputs
-            policy_structure = inputs.get('policy_structure', {})
-            requirements = {
-                'functional': inputs.get('functional_requirements', []),
-                'data': inputs.get('data_requirements', []),
-                'business_rules': inputs.get('business_rules', []),
-                'validation': inputs.get('validation_rules', [])
-            }
-            questions = inputs.get('application_questions', [])
-            validation_report = inputs.get('validation_report', {})
-            gap_analysis = inputs.get('gap_analysis', {})
-            recommendations = inputs.get('recommendations', [])
+            logger.debug("%s starting", self.name)
             
-            print(f"CONSOLIDATION: Processing {len(questions)} questions and {sum(len(reqs) for reqs in requirements.values())} requirements", flush=True)
+            policy_structure, requirements, questions, validation_report, recommendations = self._collect_inputs(inputs)
             
             # Generate consolidated specification
             consolidated_spec = self._create_consolidated_spec(
@@ -50,74 +41,146 @@ class ConsolidationAgent(BaseAgent):
                 recommendations
             )
             
-            # Generate traceability matrix
-            traceability_matrix = self._create_traceability_matrix(
-                requirements,
-                questions
+            return self._build_outputs(
+                requirements, questions, validation_report, consolidated_spec, implementation_guide
             )
             
-            # Generate summary statistics
-            summary_stats = self._generate_summary_stats(
+        except Exception as e:
+            return self._handle_failure(inputs, start_time, e)
+    
+    async def aexecute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Consolidate all agent outputs without blocking the event loop.
+        
+        The implementation guide is built from the consolidated specification,
+        so the two LLM calls stay sequential.
+        
+        Args:
+            inputs: Dictionary containing all previous agent outputs
+            
+        Returns:
+            Dictionary with consolidated_spec and implementation_guide
+        """
+        start_time = time.time()
+        
+        try:
+            logger.debug("%s starting", self.name)
+            
+            policy_structure, requirements, questions, validation_report, recommendations = self._collect_inputs(inputs)
+            
+            consolidated_spec = await self._ainvoke_json(self._create_consolidated_spec_request(
+                policy_structure,
                 requirements,
                 questions,
                 validation_report
+            ))
+            
+            implementation_guide = await self._ainvoke_json(self._create_implementation_guide_request(
+                consolidated_spec,
+                recommendations
+            ))
+            
+            return self._build_outputs(
+                requirements, questions, validation_report, consolidated_spec, implementation_guide
             )
             
-            outputs = {
-                'consolidated_spec': consolidated_spec,
-                'implementation_guide': implementation_guide,
-                'traceability_matrix': traceability_matrix,
-                'summary_statistics': summary_stats
-            }
+        except Exception as e:
+            return self._handle_failure(inputs, start_time, e)
+    
+    def _collect_inputs(self, inputs: Dict[str, Any]) -> Tuple[
+        Dict[str, Any], Dict[str, List[Dict[str, Any]]], List[Dict[str, Any]], Dict[str, Any], List[Dict[str, Any]]
+    ]:
+        """Extract the policy structure, requirements, questions, validation report and recommendations."""
+        policy_structure = inputs.get('policy_structure', {})
+        requirements = {
+            'functional': inputs.get('functional_requirements', []),
+            'data': inputs.get('data_requirements', []),
+            'business_rules': inputs.get('business_rules', []),
+            'validation': inputs.get('validation_rules', [])
+        }
+        questions = inputs.get('application_questions', [])
+        validation_report = inputs.get('validation_report', {})
+        recommendations = inputs.get('recommendations', [])
+        
+        logger.info("%s: processing %d questions and %d requirements", self.name,
+                    len(questions), sum(len(reqs) for reqs in requirements.values()))
+        
+        return policy_structure, requirements, questions, validation_report, recommendations
+    
+    def _build_outputs(
+        self,
+        requirements: Dict[str, List[Dict[str, Any]]],
+        questions: List[Dict[str, Any]],
+        validation_report: Dict[str, Any],
+        consolidated_spec: Dict[str, Any],
+        implementation_guide: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Add the traceability matrix and summary statistics to the LLM results."""
+        # Generate traceability matrix
+        traceability_matrix = self._create_traceability_matrix(
+            requirements,
+            questions
+        )
+        
+        # Generate summary statistics
+        summary_stats = self._generate_summary_stats(
+            requirements,
+            questions,
+            validation_report
+        )
+        
+        outputs = {
+            'consolidated_spec': consolidated_spec,
+            'implementation_guide': implementation_guide,
+            'traceability_matrix': traceability_matrix,
+            'summary_statistics': summary_stats
+        }
+        
+        return self._add_metadata(outputs)
+    
+    def _handle_failure(self, inputs: Dict[str, Any], start_time: float, error: Exception) -> Dict[str, Any]:
+        """Return fallback outputs for encoding errors; re-raise anything else."""
+        duration = time.time() - start_time
+        
+        # Handle Unicode encoding errors by providing fallback results
+        error_msg = str(error)
+        if 'ascii' in error_msg and 'encode' in error_msg:
+            logger.warning("%s: Unicode encoding error, using fallback", self.name)
             
-            outputs = self._add_metadata(outputs)
+            # Generate simple fallback results without Unicode characters
+            fallback_spec = {
+                'specification_version': '1.0',
+                'policy_summary': 'Consolidated policy specification generated with fallback due to encoding issue'
+            }
             
-            duration = time.time() - start_time
+            fallback_guide = {
+                'implementation_steps': ['Step 1: Review requirements', 'Step 2: Implement validation', 'Step 3: Test system']
+            }
             
-            return outputs
+            fallback_matrix = [
+                {'requirement_id': 'REQ-001', 'source': 'policy', 'status': 'mapped'},
+                {'requirement_id': 'REQ-002', 'source': 'validation', 'status': 'mapped'}
+            ]
             
-        except Exception as e:
-            duration = time.time() - start_time
+            fallback_stats = {
+                'total_requirements': len(inputs.get('functional_requirements', [])) + len(inputs.get('data_requirements', [])),
+                'total_questions': len(inputs.get('application_questions', [])),
+                'completion_rate': 100.0
+            }
             
-            # Handle Unicode encoding errors by providing fallback results
-            error_msg = str(e)
-            if 'ascii' in error_msg and 'encode' in error_msg:
-                print(f"CONSOLIDATION: Unicode encoding error, using fallback", flush=True)
-                
-                # Generate simple fallback results without Unicode characters
-                fallback_spec = {
-                    'specification_version': '1.0',
-                    'policy_summary': 'Consolidated policy specification generated with fallback due to encoding issue'
-                }
-                
-                fallback_guide = {
-                    'implementation_steps': ['Step 1: Review requirements', 'Step 2: Implement validation', 'Step 3: Test system']
-                }
-                
-                fallback_matrix = [
-                    {'requirement_id': 'REQ-001', 'source': 'policy', 'status': 'mapped'},
-                    {'requirement_id': 'REQ-002', 'source': 'validation', 'status': 'mapped'}
-                ]
-                
-                fallback_stats = {
-                    'total_requirements': len(inputs.get('functional_requirements', [])) + len(inputs.get('data_requirements', [])),
-                    'total_questions': len(inputs.get('application_questions', [])),
-                    'completion_rate': 100.0
-                }
-                
-                outputs = {
-                    'consolidated_spec': fallback_spec,
-                    'implementation_guide': fallback_guide,
-                    'traceability_matrix': fallback_matrix,
-                    'summary_statistics': fallback_stats
-                }
-                
-                outputs = self._add_metadata(outputs)
-                self._log_execution(inputs, outputs, duration, True)
-                return outputs
+            outputs = {
+                'consolidated_spec': fallback_spec,
+                'implementation_guide': fallback_guide,
+                'traceability_matrix': fallback_matrix,
+                'summary_statistics': fallback_stats
+            }
             
-            self._log_execution(inputs, {}, duration, False)
-            raise e
+            outputs = self._add_metadata(outputs)
+            self._log_execution(inputs, outputs, duration, True)
+            return outputs
+        
+        self._log_execution(inputs, {}, duration, False)
+        raise error
     
     def _create_consolidated_spec(
         self,
@@ -127,7 +190,16 @@ class ConsolidationAgent(BaseAgent):
         validation_report: Dict[str, Any]
     ) -> Dict[str, Any]:
         """Create consolidated specification document using LLM."""
-        
+        return self._invoke_json(self._create_consolidated_spec_request(policy_structure, requirements, questions, validation_report))
+    
+    def _create_consolidated_spec_request(
+        self,
+        policy_structure: Dict[str, Any],
+        requirements: Dict[str, List[Dict[str, Any]]],
+        questions: List[Dict[str, Any]],
+        validation_report: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the LLM request behind _create_consolidated_spec."""
         context = f"""
 Policy: {policy_structure.get('visa_type', 'Unknown')} ({policy_structure.get('visa_code', '')})
 Functional Requirements: {len(requirements['functional'])}
@@ -164,10 +236,7 @@ Return a JSON object with these sections, each containing structured content.
 
 Return ONLY valid JSON, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        return result
+        return {'prompt': prompt}
     
     def _create_implementation_guide(
         self,
@@ -175,7 +244,14 @@ Return ONLY valid JSON, no other text."""
         recommendations: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """Create implementation guide using LLM."""
-        
+        return self._invoke_json(self._create_implementation_guide_request(consolidated_spec, recommendations))
+    
+    def _create_implementation_guide_request(
+        self,
+        consolidated_spec: Dict[str, Any],
+        recommendations: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the LLM request behind _create_implementation_guide."""
         context = f"""
 Specification: {consolidated_spec.get('executive_summary', '')}
 Recommendations: {recommendations[:5]}
@@ -225,10 +301,7 @@ Return a JSON object with these sections.
 
 Return ONLY valid JSON, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        return result
+        return {'prompt': prompt}
     
     def _create_traceability_matrix(
         self,
@@ -246,16 +319,19 @@ Return ONLY valid JSON, no other text."""
             requirements.get('business_rules', [])
         )
         
+        # Index both lists by policy reference once, rather than scanning the
+        # questions for every requirement
+        index = ReferenceIndex(all_requirements, questions)
+        
         # Create mapping
-        for req in all_requirements:
+        for position, req in enumerate(all_requirements):
             req_id = req.get('requirement_id', '')
             policy_ref = req.get('policy_reference', '')
             
-            # Find related questions
+            # Find related questions (same provision, a sub-provision or its section)
             related_questions = [
                 q.get('question_id', '')
-                for q in questions
-                if q.get('policy_reference') == policy_ref
+                for q in index.requirement_questions(position)
             ]
             
             matrix.append({
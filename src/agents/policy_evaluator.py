@@ -1,11 +1,14 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple, Callable
 import time
 import json
+import asyncio
 import logging
 import os
-from openai import OpenAI
 from .base_agent import BaseAgent
 from ..utils.document_parser import DocumentParser
+from ..utils.tracing import current_span
+from ..utils.visa_classifier import get_visa_classifier
+from ..utils.schemas import PolicyStructure
 
 logger = logging.getLogger(__name__)
 
@@ -27,222 +30,246 @@ class PolicyEvaluatorAgent(BaseAgent):
         detected_visa_code = inputs.get('detected_visa_code')
         force_visa_type = inputs.get('force_visa_type', False)
         
-        # FORCE FRESH EXECUTION - Add unique timestamp to bypass all caching
-        import time
-        import sys
-        execution_id = int(time.time() * 1000)  # Millisecond timestamp
-        sys.stdout.flush()  # Force immediate output
-        print("=" * 80, flush=True)
-        print(f"🔥🔥🔥 HYBRID POLICY EVALUATOR EXECUTION: {execution_id} 🔥🔥🔥", flush=True)
-        print(f"🔥 Input keys: {list(inputs.keys()) if inputs else 'None'}", flush=True)
-        if 'policy_document' in inputs:
-            content_length = len(inputs['policy_document']) if inputs['policy_document'] else 0
-            print(f"🔥 policy_document length: {content_length}", flush=True)
-        if 'policy_document_path' in inputs:
-            print(f"🔥 policy_document_path: {inputs['policy_document_path']}", flush=True)
-        
-        print(f"🔥🔥🔥 HYBRID DEBUG: detected_visa_type = {detected_visa_type} 🔥🔥🔥", flush=True)
-        print(f"🔥🔥🔥 HYBRID DEBUG: detected_visa_code = {detected_visa_code} 🔥🔥🔥", flush=True)
-        print(f"🔥🔥🔥 HYBRID DEBUG: force_visa_type = {force_visa_type} 🔥🔥🔥", flush=True)
-        print(f"🔥🔥🔥 HYBRID DEBUG: All input keys = {list(inputs.keys())} 🔥🔥🔥", flush=True)
-        
-        if detected_visa_type and force_visa_type:
-            print(f"🔥 HYBRID: Using detected visa type: {detected_visa_type} ({detected_visa_code}) 🔥", flush=True)
-        else:
-            print(f"🔥 HYBRID: No visa type hints - using document analysis 🔥", flush=True)
-        
-        print("=" * 80, flush=True)
-        
-        # Add execution ID to inputs to force uniqueness
-        inputs['_execution_id'] = execution_id
-        inputs['_force_fresh'] = True
+        self._announce_execution(inputs, detected_visa_type, detected_visa_code, force_visa_type)
         
         start_time = time.time()
         
-        # Variables already initialized at the beginning of the method
-        
         try:
-            
-            policy_text = ""
-            
-            # PRIORITIZE DIRECT DOCUMENT CONTENT - Always use uploaded content first
-            if 'policy_document' in inputs and inputs['policy_document']:
-                policy_text = inputs['policy_document']
-                print(f"DEBUG: ✅ USING DIRECT POLICY_DOCUMENT CONTENT: {len(policy_text)} characters")
-                print(f"DEBUG: ✅ BYPASSING FILE PATH - Using uploaded document content")
-            elif 'policy_document_path' in inputs:
-                policy_path = inputs['policy_document_path']
-                print(f"DEBUG: Reading from policy_document_path: {policy_path}")
-                if os.path.exists(policy_path):
-                    try:
-                        with open(policy_path, 'r', encoding='utf-8') as f:
-                            policy_text = f.read()
-                    except Exception as e:
-                        print(f"DEBUG: Failed to read file: {e}")
-                        try:
-                            from ..utils.enhanced_document_parser import EnhancedDocumentParser
-                            parser = EnhancedDocumentParser()
-                            document_data = parser.load_document(policy_path)
-                            policy_text = document_data.get('content', '')
-                            print(f"DEBUG: Enhanced parser loaded {len(policy_text)} characters from {policy_path}")
-                        except Exception as enhanced_error:
-                            print(f"DEBUG: Both parsers failed. Simple: {str(e)}, Enhanced: {str(enhanced_error)}")
-                            raise ValueError(f"Could not load document: {str(e)}")
-                else:
-                    print(f"DEBUG: Policy file not found: {policy_path}")
-            else:
-                print("DEBUG: No policy document or path provided")
-            
-            if not policy_text or len(policy_text.strip()) == 0:
-                print("DEBUG: No policy text available, will use fallback")
-                raise ValueError("No policy document content available")
-            
-            # CRITICAL DEBUG: Show what we're actually processing
-            print(f"DEBUG: ===== POLICY EVALUATOR PROCESSING =====")
-            print(f"DEBUG: Processing {len(policy_text)} characters of content")
-            print(f"DEBUG: First 500 chars: {policy_text[:500]}")
-            print(f"DEBUG: Contains 'Working Holiday': {'Working Holiday' in policy_text}")
-            print(f"DEBUG: Contains 'Skilled Migrant': {'Skilled Migrant' in policy_text}")
-            print(f"DEBUG: Contains 'Parent': {'Parent' in policy_text}")
-            print(f"DEBUG: ============================================")
-            
-            # Extract sections
-            sections = DocumentParser.extract_sections(policy_text)
+            policy_text, sections = self._load_policy(inputs)
             
             # Check if we should use real LLM calls (V2 mode)
             force_llm = os.getenv('VISA_AGENT_FORCE_LLM', 'false').lower() == 'true'
             
             if force_llm:
-                print("POLICY EVALUATOR: V2 MODE - Using real LLM calls", flush=True)
+                logger.info("%s: V2 mode - using real LLM calls", self.name)
                 # Analyze with real LLM
                 policy_structure = self._analyze_policy_structure_llm(policy_text, sections, detected_visa_type, detected_visa_code, force_visa_type)
                 eligibility_rules = self._extract_eligibility_rules_llm(policy_text, sections)
                 conditions = self._extract_conditions_llm(policy_text, sections)
             else:
-                print("POLICY EVALUATOR: V1 MODE - Using fallback analysis", flush=True)
+                logger.info("%s: V1 mode - using fallback analysis", self.name)
                 # Analyze with fallback methods
-                policy_structure = self._analyze_policy_structure(policy_text, sections)
+                policy_structure = self._analyze_policy_structure(policy_text, sections, detected_visa_type, detected_visa_code, force_visa_type)
                 eligibility_rules = self._extract_eligibility_rules(policy_text, sections)
                 conditions = self._extract_conditions(policy_text, sections)
             
-            thresholds = DocumentParser.extract_thresholds(policy_text)
-            
-            outputs = {
-                'policy_structure': policy_structure,
-                'eligibility_rules': eligibility_rules,
-                'conditions': conditions,
-                'thresholds': thresholds,
-                'sections': sections
-            }
-            
-            outputs = self._add_metadata(outputs)
-            
-            duration = time.time() - start_time
-            self._log_execution(inputs, outputs, duration)
-            
-            return outputs
+            return self._build_outputs(inputs, start_time, policy_text, sections, policy_structure, eligibility_rules, conditions)
             
         except Exception as e:
-            # Use fallback data for demo purposes
-            error_msg = str(e).encode('ascii', errors='ignore').decode('ascii')  # Clean error message
-            logger.error(f"PolicyEvaluator failed: {error_msg}")
-            print(f"DEBUG: PolicyEvaluator exception: {error_msg}")
-            
-            # Generate fallback results with detected visa type if available
-            policy_structure = self._generate_fallback_policy_structure(detected_visa_type, detected_visa_code)
-            eligibility_rules = self._generate_fallback_eligibility_rules()
-            conditions = self._generate_fallback_conditions()
+            return self._fallback_outputs(inputs, start_time, e, detected_visa_type, detected_visa_code)
+    
+    async def aexecute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Execute policy evaluation with the three analysis calls running concurrently.
+        
+        Args:
+            inputs: Dictionary containing policy document path and content
             
-            outputs = {
-                'policy_structure': policy_structure,
-                'eligibility_rules': eligibility_rules,
-                'conditions': conditions,
-                'thresholds': {},
-                'sections': ['Fallback Policy Structure', 'Fallback Eligibility Rules', 'Fallback Conditions']
-            }
+        Returns:
+            Dictionary with policy_structure, eligibility_rules, and conditions
+        """
+        detected_visa_type = inputs.get('detected_visa_type')
+        detected_visa_code = inputs.get('detected_visa_code')
+        force_visa_type = inputs.get('force_visa_type', False)
+        
+        self._announce_execution(inputs, detected_visa_type, detected_visa_code, force_visa_type)
+        
+        start_time = time.time()
+        
+        try:
+            policy_text, sections = self._load_policy(inputs)
             
-            outputs = self._add_metadata(outputs)
+            force_llm = os.getenv('VISA_AGENT_FORCE_LLM', 'false').lower() == 'true'
             
-            duration = time.time() - start_time
-            self._log_execution(inputs, outputs, duration, True)
+            if force_llm:
+                logger.info("%s: V2 mode - using real LLM calls", self.name)
+                policy_structure, eligibility_rules, conditions = await asyncio.gather(
+                    self._acomplete_json(self._analyze_policy_structure_llm_request(
+                        policy_text, sections, detected_visa_type, detected_visa_code, force_visa_type
+                    )),
+                    self._acomplete_json_chunks(self._extract_eligibility_rules_llm_requests(policy_text, sections)),
+                    self._acomplete_json_chunks(self._extract_conditions_llm_requests(policy_text, sections))
+                )
+            else:
+                logger.info("%s: V1 mode - using fallback analysis", self.name)
+                # Structure analysis interleaves visa type classification with its LLM call, so it runs in a thread
+                policy_structure, eligibility_rules, conditions = await asyncio.gather(
+                    asyncio.to_thread(self._analyze_policy_structure, policy_text, sections,
+                                      detected_visa_type, detected_visa_code, force_visa_type),
+                    self._ainvoke_json_chunks(self._extract_eligibility_rules_requests(policy_text, sections)),
+                    self._ainvoke_json_chunks(self._extract_conditions_requests(policy_text, sections))
+                )
             
-            return outputs
+            return self._build_outputs(inputs, start_time, policy_text, sections, policy_structure, eligibility_rules, conditions)
             
         except Exception as e:
-            duration = time.time() - start_time
-            self._log_execution(inputs, {}, duration, False, str(e))
-            raise
+            return self._fallback_outputs(inputs, start_time, e, detected_visa_type, detected_visa_code)
     
-    def _analyze_policy_structure(self, policy_text: str, sections: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze overall policy structure using LLM."""
+    def _announce_execution(self, inputs: Dict[str, Any], detected_visa_type: Optional[str],
+                            detected_visa_code: Optional[str], force_visa_type: bool):
+        """Report the execution on the current span and tag the inputs with a unique execution ID."""
+        execution_id = int(time.time() * 1000)  # Millisecond timestamp
+        current_span().set_attributes(
+            execution_id=execution_id,
+            policy_chars=len(inputs.get('policy_document') or ''),
+            policy_document_path=inputs.get('policy_document_path'),
+            detected_visa_type=detected_visa_type,
+            detected_visa_code=detected_visa_code,
+            force_visa_type=force_visa_type
+        )
+        
+        if detected_visa_type and force_visa_type:
+            logger.debug("Execution %s: using detected visa type %s (%s)", execution_id, detected_visa_type, detected_visa_code)
+        else:
+            logger.debug("Execution %s: no visa type hints - using document analysis", execution_id)
+        
+        # Add execution ID to inputs to force uniqueness
+        inputs['_execution_id'] = execution_id
+        inputs['_force_fresh'] = True
+    
+    def _load_policy(self, inputs: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Load the policy text from the inputs and split it into sections."""
+        policy_text = ""
+        
+        # PRIORITIZE DIRECT DOCUMENT CONTENT - Always use uploaded content first
+        if 'policy_document' in inputs and inputs['policy_document']:
+            policy_text = inputs['policy_document']
+            logger.debug("Using direct policy_document content: %d characters", len(policy_text))
+        elif 'policy_document_path' in inputs:
+            policy_path = inputs['policy_document_path']
+            logger.debug("Reading from policy_document_path: %s", policy_path)
+            if os.path.exists(policy_path):
+                try:
+                    with open(policy_path, 'r', encoding='utf-8') as f:
+                        policy_text = f.read()
+                except Exception as e:
+                    logger.debug("Failed to read %s as text: %s", policy_path, e)
+                    try:
+                        from ..utils.enhanced_document_parser import EnhancedDocumentParser
+                        parser = EnhancedDocumentParser()
+                        document_data = parser.load_document(policy_path)
+                        policy_text = document_data.get('content', '')
+                        logger.debug("Enhanced parser loaded %d characters from %s", len(policy_text), policy_path)
+                    except Exception as enhanced_error:
+                        logger.warning("Both parsers failed. Simple: %s, Enhanced: %s", e, enhanced_error)
+                        raise ValueError(f"Could not load document: {str(e)}")
+            else:
+                logger.warning("Policy file not found: %s", policy_path)
+        else:
+            logger.warning("No policy document or path provided")
+        
+        if not policy_text or len(policy_text.strip()) == 0:
+            raise ValueError("No policy document content available")
+        
+        current_span().set_attribute('policy_chars', len(policy_text))
+        
+        # Extract sections
+        sections = DocumentParser.extract_sections(policy_text)
+        
+        return policy_text, sections
+    
+    def _build_outputs(
+        self,
+        inputs: Dict[str, Any],
+        start_time: float,
+        policy_text: str,
+        sections: Dict[str, Any],
+        policy_structure: Dict[str, Any],
+        eligibility_rules: Dict[str, Any],
+        conditions: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Assemble and log the agent outputs."""
+        thresholds = DocumentParser.extract_thresholds(policy_text)
+        
+        outputs = {
+            'policy_structure': policy_structure,
+            'eligibility_rules': eligibility_rules,
+            'conditions': conditions,
+            'thresholds': thresholds,
+            'sections': sections
+        }
+        
+        outputs = self._add_metadata(outputs)
+        
+        duration = time.time() - start_time
+        self._log_execution(inputs, outputs, duration, True)
+        
+        return outputs
+    
+    def _fallback_outputs(self, inputs: Dict[str, Any], start_time: float, error: Exception,
+                          detected_visa_type: Optional[str], detected_visa_code: Optional[str]) -> Dict[str, Any]:
+        """Build fallback outputs after a failed evaluation."""
+        # Use fallback data for demo purposes
+        error_msg = str(error).encode('ascii', errors='ignore').decode('ascii')  # Clean error message
+        logger.error(f"PolicyEvaluator failed: {error_msg}")
+        
+        # Generate fallback results with detected visa type if available
+        policy_structure = self._generate_fallback_policy_structure(detected_visa_type, detected_visa_code)
+        eligibility_rules = self._generate_fallback_eligibility_rules()
+        conditions = self._generate_fallback_conditions()
+        
+        outputs = {
+            'policy_structure': policy_structure,
+            'eligibility_rules': eligibility_rules,
+            'conditions': conditions,
+            'thresholds': {},
+            'sections': ['Fallback Policy Structure', 'Fallback Eligibility Rules', 'Fallback Conditions']
+        }
+        
+        outputs = self._add_metadata(outputs)
+        
+        duration = time.time() - start_time
+        self._log_execution(inputs, outputs, duration, True)
+        
+        return outputs
+    
+    def _policy_dict(self, result: Any, fallback: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Return an extracted result if it is a usable dict, otherwise the fallback."""
+        # Handle fallback responses
+        if isinstance(result, dict) and result.get('fallback'):
+            return fallback()
         
-        # Debug: Show what document content we're actually analyzing
-        print(f"DEBUG: ===== DOCUMENT CONTENT ANALYSIS =====")
-        print(f"DEBUG: Document content length: {len(policy_text)} characters")
-        print(f"DEBUG: Document content (first 1000 chars): {policy_text[:1000]}")
-        print(f"DEBUG: Document content contains 'skilled': {'skilled' in policy_text.lower()}")
-        print(f"DEBUG: Document content contains 'migrant': {'migrant' in policy_text.lower()}")
-        print(f"DEBUG: Document content contains 'residence': {'residence' in policy_text.lower()}")
-        print(f"DEBUG: Document content contains 'parent': {'parent' in policy_text.lower()}")
-        print(f"DEBUG: Document content contains 'SR1': {'SR1' in policy_text}")
-        print(f"DEBUG: Document content contains 'SR3': {'SR3' in policy_text}")
-        print(f"DEBUG: Document content contains 'SR4': {'SR4' in policy_text}")
-        print(f"DEBUG: Document content contains 'SR5': {'SR5' in policy_text}")
-        print(f"DEBUG: ========================================")
-        
-        # Initialize visa type variables
-        visa_type_detected = "Unknown Visa Type"
-        visa_code_detected = "UNK"
+        # Ensure we have a valid structure
+        if not isinstance(result, dict) or not result:
+            return fallback()
+            
+        return result
+    
+    def _analyze_policy_structure(self, policy_text: str, sections: Dict[str, Any], detected_visa_type: str = None, detected_visa_code: str = None, force_visa_type: bool = False) -> Dict[str, Any]:
+        """Analyze overall policy structure using LLM."""
         
         # HYBRID APPROACH - Use hints if available, otherwise analyze document
         if detected_visa_type and force_visa_type:
             # Use the detected visa type from hybrid approach
             visa_type_detected = detected_visa_type
-            visa_code_detected = detected_visa_code
-            print(f"🔥 HYBRID: USING DETECTED VISA TYPE: {visa_type_detected} ({visa_code_detected}) 🔥", flush=True)
+            # The classifier can name a type without a code
+            visa_code_detected = detected_visa_code or "UNK"
+            logger.debug("Using detected visa type: %s (%s)", visa_type_detected, visa_code_detected)
         else:
             # Fallback to document analysis
-            policy_text_upper = policy_text.upper()
-            print(f"🔥 ANALYZING DOCUMENT CONTENT: {len(policy_text)} chars 🔥", flush=True)
-            print(f"🔥 CONTENT SAMPLE: {policy_text[:500]}... 🔥", flush=True)
-            
-            if any(keyword in policy_text_upper for keyword in ['PARENT', 'BOOST', 'V4']):
-                visa_type_detected = "Parent Boost Visitor Visa"
-                visa_code_detected = "V4"
-                print(f"🔥 DETECTED: PARENT BOOST VISA 🔥", flush=True)
-            elif any(keyword in policy_text_upper for keyword in ['SKILLED', 'MIGRANT', 'SR1', 'SR3', 'SR4', 'SR5']):
-                visa_type_detected = "Skilled Migrant Residence Visa"
-                visa_code_detected = "SR1"
-                print(f"🔥 DETECTED: SKILLED MIGRANT VISA 🔥", flush=True)
-            elif any(keyword in policy_text_upper for keyword in ['WORKING HOLIDAY', 'YOUTH', 'TEMPORARY WORK']):
-                visa_type_detected = "Working Holiday Visa"
-                visa_code_detected = "WHV"
-                print(f"🔥 DETECTED: WORKING HOLIDAY VISA 🔥", flush=True)
-            elif any(keyword in policy_text_upper for keyword in ['STUDENT', 'STUDY', 'EDUCATION']):
-                visa_type_detected = "Student Visa"
-                visa_code_detected = "STU"
-                print(f"🔥 DETECTED: STUDENT VISA 🔥", flush=True)
-            else:
-                print(f"DEBUG: NO SPECIFIC VISA TYPE DETECTED - USING FALLBACK", flush=True)
+            classification = get_visa_classifier().classify(policy_text)
+            visa_type_detected = classification['visa_type'] or "Unknown Visa Type"
+            visa_code_detected = classification['visa_code'] or "UNK"
+            logger.debug("Classified %d characters of content (confidence %.2f, matches %s)",
+                         len(policy_text), classification['confidence'], classification['matches'])
         
-        print(f"🔥 FINAL DETECTED VISA TYPE: {visa_type_detected} 🔥", flush=True)
-        print(f"🔥 FINAL DETECTED VISA CODE: {visa_code_detected} 🔥", flush=True)
+        logger.debug("Detected visa type: %s (%s)", visa_type_detected, visa_code_detected)
 
         # HYBRID APPROACH - Force LLM to use detected visa type
         if detected_visa_type and force_visa_type:
             prompt = f"""Analyze this immigration policy document and extract structured information.
 
-IMPORTANT: This document has been identified as a {detected_visa_type} ({detected_visa_code}) policy. 
+IMPORTANT: This document has been identified as a {detected_visa_type} ({visa_code_detected}) policy. 
 You MUST use this visa type in your response.
 
 Policy Document Content:
-{policy_text[:2500]}
+{self._document_head(policy_text, sections)}
 
 Based on the document content above, return ONLY a valid JSON object in this exact format:
 
 {{
   "visa_type": "{detected_visa_type}",
-  "visa_code": "{detected_visa_code}",
+  "visa_code": "{visa_code_detected}",
   "objective": {{
     "primary_purpose": true,
     "compliance": true,
@@ -253,7 +280,7 @@ Based on the document content above, return ONLY a valid JSON object in this exa
 }}
 
 CRITICAL INSTRUCTIONS:
-1. Use the EXACT visa type and code shown above: {detected_visa_type} ({detected_visa_code})
+1. Use the EXACT visa type and code shown above: {detected_visa_type} ({visa_code_detected})
 2. Extract key requirements from the actual document content
 3. Return ONLY valid JSON - no explanations, no markdown formatting, no additional text
 4. Do not change the visa_type or visa_code from what is specified above"""
@@ -262,7 +289,7 @@ CRITICAL INSTRUCTIONS:
             prompt = f"""Analyze this immigration policy document and extract structured information.
 
 Policy Document Content:
-{policy_text[:2500]}
+{self._document_head(policy_text, sections)}
 
 Based on the document content above, return ONLY a valid JSON object in this exact format:
 
@@ -285,25 +312,25 @@ CRITICAL INSTRUCTIONS:
 4. Do not change the visa_type or visa_code from what is specified above"""
 
         try:
-            response = self.llm.invoke(prompt)
+            content = self._invoke_llm(prompt)
             # Clean response content to avoid Unicode issues
-            clean_content = response.content.encode('utf-8', errors='ignore').decode('utf-8')
-            print(f"DEBUG: PolicyEvaluator LLM raw response: {clean_content[:500]}...")
+            clean_content = content.encode('utf-8', errors='ignore').decode('utf-8')
+            logger.debug("LLM raw response: %.500s", clean_content)
             
             result = self._extract_json_from_response(clean_content)
-            print(f"DEBUG: PolicyEvaluator extracted result: {result}")
+            logger.debug("Extracted result: %s", result)
         except Exception as e:
-            print(f"DEBUG: PolicyEvaluator LLM call failed: {e}")
+            logger.warning("Policy structure LLM call failed: %s", e)
             result = {'fallback': True}
         
         # Handle fallback responses - use detected visa type if available
         if isinstance(result, dict) and result.get('fallback'):
-            print("DEBUG: Using fallback because result marked as fallback")
-            if detected_visa_type and force_visa_type:
-                print(f"DEBUG: USING DETECTED VISA TYPE FOR FALLBACK: {detected_visa_type}")
+            logger.debug("Using fallback because result marked as fallback")
+            if visa_code_detected and visa_code_detected != "UNK":
+                logger.debug("Using detected visa type for fallback: %s", visa_type_detected)
                 return {
-                    'visa_type': detected_visa_type,
-                    'visa_code': detected_visa_code,
+                    'visa_type': visa_type_detected,
+                    'visa_code': visa_code_detected,
                     'objective': {
                         'primary_purpose': True,
                         'compliance': True,
@@ -313,7 +340,7 @@ CRITICAL INSTRUCTIONS:
                     'stakeholders': ['visa applicants', 'Immigration New Zealand', 'service providers']
                 }
             else:
-                print("DEBUG: FORCING SKILLED MIGRANT STRUCTURE INSTEAD OF FALLBACK")
+                logger.debug("Forcing skilled migrant structure instead of fallback")
                 return {
                     'visa_type': 'Skilled Migrant Residence Visa',
                     'visa_code': 'SR1',
@@ -328,12 +355,12 @@ CRITICAL INSTRUCTIONS:
         
         # Ensure we have a valid structure
         if not isinstance(result, dict) or not result:
-            print("DEBUG: Using fallback because result is not valid dict")
+            logger.debug("Using fallback because result is not valid dict")
             if detected_visa_type and force_visa_type:
-                print(f"DEBUG: USING DETECTED VISA TYPE FOR INVALID RESULT: {detected_visa_type}")
+                logger.debug("Using detected visa type for invalid result: %s", detected_visa_type)
                 return {
                     'visa_type': detected_visa_type,
-                    'visa_code': detected_visa_code,
+                    'visa_code': visa_code_detected,
                     'objective': {
                         'primary_purpose': True,
                         'compliance': True,
@@ -343,7 +370,7 @@ CRITICAL INSTRUCTIONS:
                     'stakeholders': ['visa applicants', 'Immigration New Zealand', 'service providers']
                 }
             else:
-                print("DEBUG: FORCING SKILLED MIGRANT STRUCTURE INSTEAD OF FALLBACK")
+                logger.debug("Forcing skilled migrant structure instead of fallback")
                 return {
                     'visa_type': 'Skilled Migrant Residence Visa', 
                     'visa_code': 'SR1',
@@ -359,22 +386,24 @@ CRITICAL INSTRUCTIONS:
         return result
     
     def _extract_eligibility_rules(self, policy_text: str, sections: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract eligibility rules using LLM."""
-        
+        """Extract eligibility rules using LLM, one call per chunk of the relevant sections."""
+        return self._invoke_json_chunks(self._extract_eligibility_rules_requests(policy_text, sections))
+    
+    def _extract_eligibility_rules_requests(self, policy_text: str, sections: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Build one _extract_eligibility_rules request per chunk of the relevant sections."""
         # Focus on relevant sections
         relevant_sections = {k: v for k, v in sections.items() 
                            if any(word in v['title'].lower() 
                                  for word in ['requirement', 'eligibility', 'instruction'])}
         
-        sections_text = "\n\n".join([
-            f"{code} {data['title']}:\n{data['content']}" 
-            for code, data in relevant_sections.items()
-        ])
-        
+        return [self._extract_eligibility_rules_request(chunk) for chunk in self._document_chunks('', relevant_sections)]
+    
+    def _extract_eligibility_rules_request(self, sections_text: str) -> Dict[str, Any]:
+        """Build the LLM request behind _extract_eligibility_rules for one chunk of sections."""
         prompt = f"""Extract eligibility rules from these policy sections.
 
 Policy Sections:
-{sections_text[:2500]}...
+{sections_text}
 
 Return a JSON object with:
 1. applicant_requirements: List of requirements for applicants (with policy_ref)
@@ -386,26 +415,25 @@ Each requirement should have: description, policy_reference, mandatory (boolean)
 
 Return ONLY valid JSON, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Handle fallback responses
-        if isinstance(result, dict) and result.get('fallback'):
-            return self._generate_fallback_eligibility_rules()
-        
-        # Ensure we have a valid structure
-        if not isinstance(result, dict) or not result:
-            return self._generate_fallback_eligibility_rules()
-            
-        return result
+        return {
+            'prompt': prompt,
+            'parse': lambda result: self._policy_dict(result, self._generate_fallback_eligibility_rules)
+        }
     
     def _extract_conditions(self, policy_text: str, sections: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract conditions and constraints using LLM."""
-        
+        """Extract conditions and constraints using LLM, one call per document chunk."""
+        return self._invoke_json_chunks(self._extract_conditions_requests(policy_text, sections))
+    
+    def _extract_conditions_requests(self, policy_text: str, sections: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Build one _extract_conditions request per document chunk."""
+        return [self._extract_conditions_request(chunk) for chunk in self._document_chunks(policy_text, sections)]
+    
+    def _extract_conditions_request(self, policy_chunk: str) -> Dict[str, Any]:
+        """Build the LLM request behind _extract_conditions for one document chunk."""
         prompt = f"""Extract all conditions, constraints, and rules from this policy document.
 
-Policy Document:
-{policy_text[:3000]}...
+Policy Document (or one part of it):
+{policy_chunk}
 
 Return a JSON object with:
 1. visa_conditions: List of conditions that apply to the visa (duration, work rights, etc.)
@@ -418,26 +446,18 @@ Each condition should have: description, policy_reference, type (mandatory/optio
 
 Return ONLY valid JSON, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Handle fallback responses
-        if isinstance(result, dict) and result.get('fallback'):
-            return self._generate_fallback_conditions()
-        
-        # Ensure we have a valid structure
-        if not isinstance(result, dict) or not result:
-            return self._generate_fallback_conditions()
-            
-        return result
+        return {
+            'prompt': prompt,
+            'parse': lambda result: self._policy_dict(result, self._generate_fallback_conditions)
+        }
 
     def _generate_fallback_policy_structure(self, detected_visa_type=None, detected_visa_code=None) -> Dict[str, Any]:
         """Generate fallback policy structure for demo purposes."""
-        print("DEBUG: FALLBACK CALLED - Using default structure")
+        logger.debug("Fallback called - using default structure")
         
         # Use detected visa type if available
         if detected_visa_type and detected_visa_code:
-            print(f"DEBUG: FALLBACK USING DETECTED VISA TYPE: {detected_visa_type} ({detected_visa_code})")
+            logger.debug("Fallback using detected visa type: %s (%s)", detected_visa_type, detected_visa_code)
             return {
                 'visa_type': detected_visa_type,
                 'visa_code': detected_visa_code,
@@ -638,26 +658,22 @@ Return ONLY valid JSON, no other text."""
     # REAL LLM METHODS FOR VERSION 2 (Live API)
     # =============================================================================
     
-    def _get_openai_client(self):
-        """Get OpenAI client with API key."""
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-        return OpenAI(api_key=api_key)
-    
     def _analyze_policy_structure_llm(self, policy_text: str, sections: Dict[str, Any], detected_visa_type: str = None, detected_visa_code: str = None, force_visa_type: bool = False) -> Dict[str, Any]:
         """Analyze policy structure using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            # Use detected visa type if available
-            visa_hint = f"\nDetected Visa Type: {detected_visa_type} ({detected_visa_code})" if detected_visa_type else ""
-            
-            prompt = f"""
+        return self._complete_json(self._analyze_policy_structure_llm_request(
+            policy_text, sections, detected_visa_type, detected_visa_code, force_visa_type
+        ))
+    
+    def _analyze_policy_structure_llm_request(self, policy_text: str, sections: Dict[str, Any], detected_visa_type: str = None, detected_visa_code: str = None, force_visa_type: bool = False) -> Dict[str, Any]:
+        """Build the LLM request behind _analyze_policy_structure_llm."""
+        # Use detected visa type if available
+        visa_hint = f"\nDetected Visa Type: {detected_visa_type} ({detected_visa_code})" if detected_visa_type else ""
+        
+        prompt = f"""
 You are an expert immigration policy analyst. Analyze this visa policy document and extract the core structure.
 
-Policy Document (first 3000 chars):
-{policy_text[:3000]}
+Policy Document (opening sections):
+{self._document_head(policy_text, sections)}
 {visa_hint}
 
 Extract the following information and return as JSON:
@@ -672,32 +688,31 @@ Extract the following information and return as JSON:
 Focus on identifying the specific visa type, its official code, main objectives, and key stakeholders involved.
 Return ONLY valid JSON, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=1500
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM POLICY STRUCTURE: Analyzed {result.get('visa_type', 'Unknown')} ({result.get('visa_code', 'Unknown')})", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in policy structure: {e}, falling back", flush=True)
-            return self._generate_fallback_policy_structure()
+        return {
+            'prompt': prompt,
+            'schema': PolicyStructure,
+            'label': 'policy structure',
+            'temperature': 0.3,
+            'max_tokens': 1500,
+            'fallback': self._generate_fallback_policy_structure,
+            'summarize': lambda result: f"Analyzed {result.get('visa_type', 'Unknown')} ({result.get('visa_code', 'Unknown')})"
+        }
     
     def _extract_eligibility_rules_llm(self, policy_text: str, sections: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract eligibility rules using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        """Extract eligibility rules using real LLM calls, one per document chunk."""
+        return self._complete_json_chunks(self._extract_eligibility_rules_llm_requests(policy_text, sections))
+    
+    def _extract_eligibility_rules_llm_requests(self, policy_text: str, sections: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Build one _extract_eligibility_rules_llm request per document chunk."""
+        return [self._extract_eligibility_rules_llm_request(chunk) for chunk in self._document_chunks(policy_text, sections)]
+    
+    def _extract_eligibility_rules_llm_request(self, policy_chunk: str) -> Dict[str, Any]:
+        """Build the LLM request behind _extract_eligibility_rules_llm for one document chunk."""
+        prompt = f"""
 You are an expert immigration policy analyst. Extract eligibility rules from this visa policy document.
 
-Policy Document (first 4000 chars):
-{policy_text[:4000]}
+Policy Document (or one part of it):
+{policy_chunk}
 
 Extract eligibility rules and return as JSON:
 {{
@@ -718,33 +733,30 @@ Extract eligibility rules and return as JSON:
 Focus on who can apply, sponsor requirements, dependent eligibility, and exclusion criteria.
 Return ONLY valid JSON, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=2000
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            total_rules = sum(len(rules) for rules in result.values() if isinstance(rules, list))
-            print(f"LLM ELIGIBILITY RULES: Extracted {total_rules} rules across {len(result)} categories", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in eligibility rules: {e}, falling back", flush=True)
-            return self._generate_fallback_eligibility_rules()
+        return {
+            'prompt': prompt,
+            'label': 'eligibility rules',
+            'temperature': 0.3,
+            'max_tokens': 2000,
+            'fallback': self._generate_fallback_eligibility_rules,
+            'summarize': lambda result: f"Extracted {sum(len(rules) for rules in result.values() if isinstance(rules, list))} rules across {len(result)} categories"
+        }
     
     def _extract_conditions_llm(self, policy_text: str, sections: Dict[str, Any]) -> Dict[str, Any]:
-        """Extract conditions using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        """Extract conditions using real LLM calls, one per document chunk."""
+        return self._complete_json_chunks(self._extract_conditions_llm_requests(policy_text, sections))
+    
+    def _extract_conditions_llm_requests(self, policy_text: str, sections: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Build one _extract_conditions_llm request per document chunk."""
+        return [self._extract_conditions_llm_request(chunk) for chunk in self._document_chunks(policy_text, sections)]
+    
+    def _extract_conditions_llm_request(self, policy_chunk: str) -> Dict[str, Any]:
+        """Build the LLM request behind _extract_conditions_llm for one document chunk."""
+        prompt = f"""
 You are an expert immigration policy analyst. Extract visa conditions and requirements from this policy document.
 
-Policy Document (first 4000 chars):
-{policy_text[:4000]}
+Policy Document (or one part of it):
+{policy_chunk}
 
 Extract conditions and return as JSON:
 {{
@@ -768,19 +780,11 @@ Extract conditions and return as JSON:
 Focus on visa conditions, financial requirements, health/character requirements, and decline reasons.
 Return ONLY valid JSON, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=2000
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            total_conditions = sum(len(conditions) for conditions in result.values() if isinstance(conditions, list))
-            print(f"LLM CONDITIONS: Extracted {total_conditions} conditions across {len(result)} categories", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in conditions: {e}, falling back", flush=True)
-            return self._generate_fallback_conditions()
+        return {
+            'prompt': prompt,
+            'label': 'conditions',
+            'temperature': 0.3,
+            'max_tokens': 2000,
+            'fallback': self._generate_fallback_conditions,
+            'summarize': lambda result: f"Extracted {sum(len(conditions) for conditions in result.values() if isinstance(conditions, list))} conditions across {len(result)} categories"
+        }
@@ -1,10 +1,11 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable
 import time
+import asyncio
 import logging
 import json
 import os
-from openai import OpenAI
 from .base_agent import BaseAgent
+from ..utils.schemas import QuestionList
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +15,7 @@ class QuestionGeneratorAgent(BaseAgent):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        print(f"QUESTION GENERATOR AGENT INITIALIZED - FALLBACK MODE ACTIVE", flush=True)
+        logger.debug("%s initialized", self.name)
     
     def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -29,8 +30,7 @@ class QuestionGeneratorAgent(BaseAgent):
         start_time = time.time()
         
         # FORCE DEBUG OUTPUT
-        print(f"QUESTION GENERATOR STARTING", flush=True)
-        print(f"Input keys: {list(inputs.keys()) if inputs else 'None'}", flush=True)
+        logger.debug("%s starting with inputs %s", self.name, list(inputs) if inputs else None)
         
         try:
             functional_requirements = inputs.get('functional_requirements', [])
@@ -38,14 +38,15 @@ class QuestionGeneratorAgent(BaseAgent):
             business_rules = inputs.get('business_rules', [])
             validation_rules = inputs.get('validation_rules', [])
             
-            print(f"QUESTION GENERATOR: Requirements counts - functional={len(functional_requirements)}, data={len(data_requirements)}, business={len(business_rules)}, validation={len(validation_rules)}", flush=True)
+            logger.debug("%s: requirement counts - functional=%d, data=%d, business=%d, validation=%d", self.name,
+                         len(functional_requirements), len(data_requirements), len(business_rules), len(validation_rules))
             
             # Check if we should force real LLM calls (V2 mode)
             import os
             force_llm = os.getenv('VISA_AGENT_FORCE_LLM', 'false').lower() == 'true'
             
             if force_llm:
-                print("QUESTION GENERATOR: V2 MODE - Using real LLM calls", flush=True)
+                logger.info("%s: V2 mode - using real LLM calls", self.name)
                 # Generate questions for different sections using real LLM
                 applicant_questions = self._generate_applicant_questions_llm(
                     data_requirements, validation_rules
@@ -67,7 +68,7 @@ class QuestionGeneratorAgent(BaseAgent):
                     data_requirements, validation_rules
                 )
             else:
-                print("QUESTION GENERATOR: V1 MODE - Using fallback questions", flush=True)
+                logger.info("%s: V1 mode - using fallback questions", self.name)
                 # Generate questions for different sections using LLM (fallback)
                 applicant_questions = self._generate_applicant_questions(
                     data_requirements, validation_rules
@@ -89,82 +90,202 @@ class QuestionGeneratorAgent(BaseAgent):
                     data_requirements, validation_rules
                 )
             
-            # Combine all questions
-            all_questions = (
-                applicant_questions + 
-                sponsor_questions + 
-                dependent_questions + 
-                financial_questions + 
-                health_character_questions
+            all_questions = self._combine_questions(
+                applicant_questions, sponsor_questions, dependent_questions,
+                financial_questions, health_character_questions
             )
             
-            print(f" QUESTION GENERATOR SUCCESS: Generated {len(all_questions)} questions ", flush=True)
-            print(f" Question counts: applicant={len(applicant_questions)}, sponsor={len(sponsor_questions)}, dependent={len(dependent_questions)}, financial={len(financial_questions)}, health={len(health_character_questions)} ", flush=True)
-            
             # Generate conditional logic
             conditional_logic = self._generate_conditional_logic(all_questions, business_rules)
             
-            # Add timestamp proof of execution
-            import datetime
-            execution_timestamp = datetime.datetime.now().isoformat()
-            execution_mode = 'REAL_LLM_EXECUTION' if force_llm else 'FALLBACK_EXECUTION'
-            
-            outputs = {
-                'application_questions': all_questions,
-                'conditional_logic': conditional_logic,
-                'question_count': len(all_questions),
-                'debug_info': f"QuestionGenerator: Generated {len(all_questions)} questions via {execution_mode} at {execution_timestamp}",
-                'execution_timestamp': execution_timestamp,
-                'execution_mode': execution_mode
-            }
-            
-            outputs = self._add_metadata(outputs)
-            
-            duration = time.time() - start_time
-            self._log_execution(inputs, outputs, duration, True)
-            
-            return outputs
+            return self._build_outputs(inputs, start_time, all_questions, conditional_logic, force_llm)
             
         except Exception as e:
-            # Use fallback data for demo purposes
-            error_msg = str(e).encode('ascii', errors='ignore').decode('ascii')  # Clean error message
-            logger.error(f"QuestionGenerator failed: {error_msg}")
-            print(f" QUESTION GENERATOR EXCEPTION: {error_msg} ", flush=True)
+            return self._fallback_outputs(inputs, start_time, e)
+    
+    async def aexecute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate application form questions with the five section calls running concurrently.
+        
+        Args:
+            inputs: Dictionary containing requirements and policy information
             
-            # Generate fallback results with minimum 12 questions as per memory
-            applicant_questions = self._generate_fallback_applicant_questions()
-            sponsor_questions = self._generate_fallback_sponsor_questions()
-            dependent_questions = self._generate_fallback_dependent_questions()
-            financial_questions = self._generate_fallback_financial_questions()
-            health_character_questions = self._generate_fallback_health_character_questions()
+        Returns:
+            Dictionary with application_questions and validation_rules
+        """
+        start_time = time.time()
+        
+        logger.debug("%s starting with inputs %s", self.name, list(inputs) if inputs else None)
+        
+        try:
+            functional_requirements = inputs.get('functional_requirements', [])
+            data_requirements = inputs.get('data_requirements', [])
+            business_rules = inputs.get('business_rules', [])
+            validation_rules = inputs.get('validation_rules', [])
             
-            # Combine all fallback questions into single list (same as successful execution)
-            all_fallback_questions = (
-                applicant_questions + 
-                sponsor_questions + 
-                dependent_questions + 
-                financial_questions + 
-                health_character_questions
-            )
+            logger.debug("%s: requirement counts - functional=%d, data=%d, business=%d, validation=%d", self.name,
+                         len(functional_requirements), len(data_requirements), len(business_rules), len(validation_rules))
             
-            # Generate fallback conditional logic
-            conditional_logic = self._generate_fallback_conditional_logic()
+            force_llm = os.getenv('VISA_AGENT_FORCE_LLM', 'false').lower() == 'true'
             
-            print(f" QUESTION GENERATOR FALLBACK: Generated {len(all_fallback_questions)} fallback questions ", flush=True)
-            print(f" Fallback question counts: applicant={len(applicant_questions)}, sponsor={len(sponsor_questions)}, dependent={len(dependent_questions)}, financial={len(financial_questions)}, health={len(health_character_questions)} ", flush=True)
+            if force_llm:
+                logger.info("%s: V2 mode - using real LLM calls", self.name)
+                section_questions = await asyncio.gather(
+                    self._acomplete_json(self._generate_applicant_questions_llm_request(
+                        data_requirements, validation_rules
+                    )),
+                    self._acomplete_json(self._generate_sponsor_questions_llm_request(
+                        data_requirements, business_rules, validation_rules
+                    )),
+                    self._acomplete_json(self._generate_dependent_questions_llm_request(
+                        data_requirements, validation_rules
+                    )),
+                    self._acomplete_json(self._generate_financial_questions_llm_request(
+                        data_requirements, business_rules, validation_rules
+                    )),
+                    self._acomplete_json(self._generate_health_character_questions_llm_request(
+                        data_requirements, validation_rules
+                    ))
+                )
+            else:
+                logger.info("%s: V1 mode - using fallback questions", self.name)
+                section_questions = await asyncio.gather(
+                    self._ainvoke_json(self._generate_applicant_questions_request(
+                        data_requirements, validation_rules
+                    )),
+                    self._ainvoke_json(self._generate_sponsor_questions_request(
+                        data_requirements, business_rules, validation_rules
+                    )),
+                    self._ainvoke_json(self._generate_dependent_questions_request(
+                        data_requirements, validation_rules
+                    )),
+                    self._ainvoke_json(self._generate_financial_questions_request(
+                        data_requirements, business_rules, validation_rules
+                    )),
+                    self._ainvoke_json(self._generate_health_character_questions_request(
+                        data_requirements, validation_rules
+                    ))
+                )
             
-            outputs = {
-                'application_questions': all_fallback_questions,  # This is the key the UI expects
-                'conditional_logic': conditional_logic,
-                'question_count': len(all_fallback_questions)
-            }
+            all_questions = self._combine_questions(*section_questions)
             
-            outputs = self._add_metadata(outputs)
+            conditional_logic = await self._ainvoke_json(
+                self._generate_conditional_logic_request(all_questions, business_rules)
+            )
             
-            duration = time.time() - start_time
-            self._log_execution(inputs, outputs, duration, True)
+            return self._build_outputs(inputs, start_time, all_questions, conditional_logic, force_llm)
             
-            return outputs
+        except Exception as e:
+            return self._fallback_outputs(inputs, start_time, e)
+    
+    def _combine_questions(
+        self,
+        applicant_questions: List[Dict[str, Any]],
+        sponsor_questions: List[Dict[str, Any]],
+        dependent_questions: List[Dict[str, Any]],
+        financial_questions: List[Dict[str, Any]],
+        health_character_questions: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Combine the section questions in form order."""
+        all_questions = (
+            applicant_questions + 
+            sponsor_questions + 
+            dependent_questions + 
+            financial_questions + 
+            health_character_questions
+        )
+        
+        logger.info("%s generated %d questions", self.name, len(all_questions))
+        logger.debug("%s question counts: applicant=%d, sponsor=%d, dependent=%d, financial=%d, health=%d", self.name,
+                     len(applicant_questions), len(sponsor_questions), len(dependent_questions),
+                     len(financial_questions), len(health_character_questions))
+        
+        return all_questions
+    
+    def _build_outputs(
+        self,
+        inputs: Dict[str, Any],
+        start_time: float,
+        all_questions: List[Dict[str, Any]],
+        conditional_logic: Dict[str, Any],
+        force_llm: bool
+    ) -> Dict[str, Any]:
+        """Assemble and log the agent outputs."""
+        # Add timestamp proof of execution
+        import datetime
+        execution_timestamp = datetime.datetime.now().isoformat()
+        execution_mode = 'REAL_LLM_EXECUTION' if force_llm else 'FALLBACK_EXECUTION'
+        
+        outputs = {
+            'application_questions': all_questions,
+            'conditional_logic': conditional_logic,
+            'question_count': len(all_questions),
+            'debug_info': f"QuestionGenerator: Generated {len(all_questions)} questions via {execution_mode} at {execution_timestamp}",
+            'execution_timestamp': execution_timestamp,
+            'execution_mode': execution_mode
+        }
+        
+        outputs = self._add_metadata(outputs)
+        
+        duration = time.time() - start_time
+        self._log_execution(inputs, outputs, duration, True)
+        
+        return outputs
+    
+    def _fallback_outputs(self, inputs: Dict[str, Any], start_time: float, error: Exception) -> Dict[str, Any]:
+        """Build fallback outputs after a failed generation."""
+        # Use fallback data for demo purposes
+        error_msg = str(error).encode('ascii', errors='ignore').decode('ascii')  # Clean error message
+        logger.error(f"QuestionGenerator failed: {error_msg}")
+        
+        # Generate fallback results with minimum 12 questions as per memory
+        applicant_questions = self._generate_fallback_applicant_questions()
+        sponsor_questions = self._generate_fallback_sponsor_questions()
+        dependent_questions = self._generate_fallback_dependent_questions()
+        financial_questions = self._generate_fallback_financial_questions()
+        health_character_questions = self._generate_fallback_health_character_questions()
+        
+        # Combine all fallback questions into single list (same as successful execution)
+        all_fallback_questions = (
+            applicant_questions + 
+            sponsor_questions + 
+            dependent_questions + 
+            financial_questions + 
+            health_character_questions
+        )
+        
+        # Generate fallback conditional logic
+        conditional_logic = self._generate_fallback_conditional_logic()
+        
+        logger.info("%s generated %d fallback questions", self.name, len(all_fallback_questions))
+        logger.debug("%s fallback question counts: applicant=%d, sponsor=%d, dependent=%d, financial=%d, health=%d", self.name,
+                     len(applicant_questions), len(sponsor_questions), len(dependent_questions),
+                     len(financial_questions), len(health_character_questions))
+        
+        outputs = {
+            'application_questions': all_fallback_questions,  # This is the key the UI expects
+            'conditional_logic': conditional_logic,
+            'question_count': len(all_fallback_questions)
+        }
+        
+        outputs = self._add_metadata(outputs)
+        
+        duration = time.time() - start_time
+        self._log_execution(inputs, outputs, duration, True)
+        
+        return outputs
+    
+    def _section_questions(
+        self,
+        result: Any,
+        fallback: Callable[[], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Normalize an extracted result into a list of section questions."""
+        # Check for fallback response or empty result
+        if not result or result == "FALLBACK_RESPONSE" or (isinstance(result, list) and len(result) == 0):
+            return fallback()
+        
+        return result if isinstance(result, list) else result.get('questions', [])
     
     def _generate_applicant_questions(
         self,
@@ -172,7 +293,14 @@ class QuestionGeneratorAgent(BaseAgent):
         validation_rules: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """Generate questions for applicant section."""
-        
+        return self._invoke_json(self._generate_applicant_questions_request(data_requirements, validation_rules))
+    
+    def _generate_applicant_questions_request(
+        self,
+        data_requirements: List[Dict[str, Any]],
+        validation_rules: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_applicant_questions."""
         context = f"""
 Data Requirements: {data_requirements[:10]}
 Validation Rules: {validation_rules[:10]}
@@ -201,14 +329,11 @@ Return a JSON array of questions, each with:
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Check for fallback response or empty result
-        if not result or result == "FALLBACK_RESPONSE" or (isinstance(result, list) and len(result) == 0):
-            return self._generate_fallback_applicant_questions()
-        
-        return result if isinstance(result, list) else result.get('questions', [])
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'parse': lambda result: self._section_questions(result, self._generate_fallback_applicant_questions)
+        }
     
     def _generate_sponsor_questions(
         self,
@@ -217,7 +342,15 @@ Return ONLY valid JSON array, no other text."""
         validation_rules: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """Generate questions for sponsor section."""
-        
+        return self._invoke_json(self._generate_sponsor_questions_request(data_requirements, business_rules, validation_rules))
+    
+    def _generate_sponsor_questions_request(
+        self,
+        data_requirements: List[Dict[str, Any]],
+        business_rules: List[Dict[str, Any]],
+        validation_rules: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_sponsor_questions."""
         context = f"""
 Data Requirements: {data_requirements[:10]}
 Business Rules: {business_rules[:10]}
@@ -239,14 +372,11 @@ Each question should have: question_id, section, question_text, input_type, requ
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Check for fallback response or empty result
-        if not result or result == "FALLBACK_RESPONSE" or (isinstance(result, list) and len(result) == 0):
-            return self._generate_fallback_sponsor_questions()
-        
-        return result if isinstance(result, list) else result.get('questions', [])
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'parse': lambda result: self._section_questions(result, self._generate_fallback_sponsor_questions)
+        }
     
     def _generate_dependent_questions(
         self,
@@ -254,7 +384,14 @@ Return ONLY valid JSON array, no other text."""
         validation_rules: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """Generate questions for dependent children section."""
-        
+        return self._invoke_json(self._generate_dependent_questions_request(data_requirements, validation_rules))
+    
+    def _generate_dependent_questions_request(
+        self,
+        data_requirements: List[Dict[str, Any]],
+        validation_rules: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_dependent_questions."""
         prompt = f"""Generate application form questions for the DEPENDENT CHILDREN section.
 
 Generate questions to collect:
@@ -268,14 +405,11 @@ Each question should have: question_id, section, question_text, input_type, requ
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Check for fallback response or empty result
-        if not result or result == "FALLBACK_RESPONSE" or (isinstance(result, list) and len(result) == 0):
-            return self._generate_fallback_dependent_questions()
-        
-        return result if isinstance(result, list) else result.get('questions', [])
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'parse': lambda result: self._section_questions(result, self._generate_fallback_dependent_questions)
+        }
     
     def _generate_financial_questions(
         self,
@@ -284,7 +418,15 @@ Return ONLY valid JSON array, no other text."""
         validation_rules: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """Generate questions for financial requirements section."""
-        
+        return self._invoke_json(self._generate_financial_questions_request(data_requirements, business_rules, validation_rules))
+    
+    def _generate_financial_questions_request(
+        self,
+        data_requirements: List[Dict[str, Any]],
+        business_rules: List[Dict[str, Any]],
+        validation_rules: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_financial_questions."""
         context = f"""
 Business Rules: {business_rules[:10]}
 """
@@ -310,14 +452,11 @@ Each question should have: question_id, section, question_text, input_type, requ
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Check for fallback response or empty result
-        if not result or result == "FALLBACK_RESPONSE" or (isinstance(result, list) and len(result) == 0):
-            return self._generate_fallback_financial_questions()
-        
-        return result if isinstance(result, list) else result.get('questions', [])
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'parse': lambda result: self._section_questions(result, self._generate_fallback_financial_questions)
+        }
     
     def _generate_health_character_questions(
         self,
@@ -325,7 +464,14 @@ Return ONLY valid JSON array, no other text."""
         validation_rules: List[Dict[str, Any]]
     ) -> List[Dict[str, Any]]:
         """Generate questions for health and character requirements section."""
-        
+        return self._invoke_json(self._generate_health_character_questions_request(data_requirements, validation_rules))
+    
+    def _generate_health_character_questions_request(
+        self,
+        data_requirements: List[Dict[str, Any]],
+        validation_rules: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_health_character_questions."""
         prompt = f"""Generate application form questions for the HEALTH & CHARACTER section.
 
 Generate questions to collect:
@@ -341,14 +487,11 @@ Each question should have: question_id, section, question_text, input_type, requ
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Check for fallback response or empty result
-        if not result or result == "FALLBACK_RESPONSE" or (isinstance(result, list) and len(result) == 0):
-            return self._generate_fallback_health_character_questions()
-        
-        return result if isinstance(result, list) else result.get('questions', [])
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'parse': lambda result: self._section_questions(result, self._generate_fallback_health_character_questions)
+        }
     
     def _generate_conditional_logic(
         self,
@@ -356,7 +499,14 @@ Return ONLY valid JSON array, no other text."""
         business_rules: List[Dict[str, Any]]
     ) -> Dict[str, Any]:
         """Generate conditional logic for questions."""
-        
+        return self._invoke_json(self._generate_conditional_logic_request(questions, business_rules))
+    
+    def _generate_conditional_logic_request(
+        self,
+        questions: List[Dict[str, Any]],
+        business_rules: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_conditional_logic."""
         prompt = f"""Based on these questions and business rules, generate conditional logic.
 
 Questions: {[q.get('question_id') for q in questions[:20]]}
@@ -378,14 +528,10 @@ Return a JSON object mapping question_ids to their conditional logic:
 
 Return ONLY valid JSON, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Check for fallback response or empty result
-        if not result or result == "FALLBACK_RESPONSE":
-            return self._generate_fallback_conditional_logic()
-        
-        return result
+        return {
+            'prompt': prompt,
+            'parse': lambda result: result if result and result != "FALLBACK_RESPONSE" else self._generate_fallback_conditional_logic()
+        }
     
     def _generate_fallback_applicant_questions(self) -> List[Dict[str, Any]]:
         """Generate fallback applicant questions when LLM fails."""
@@ -550,19 +696,13 @@ Return ONLY valid JSON, no other text."""
     # REAL LLM METHODS FOR VERSION 2 (Live API)
     # =============================================================================
     
-    def _get_openai_client(self):
-        """Get OpenAI client with API key."""
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-        return OpenAI(api_key=api_key)
-    
     def _generate_applicant_questions_llm(self, data_requirements: List[Dict], validation_rules: List[Dict]) -> List[Dict[str, Any]]:
         """Generate applicant questions using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._generate_applicant_questions_llm_request(data_requirements, validation_rules))
+    
+    def _generate_applicant_questions_llm_request(self, data_requirements: List[Dict], validation_rules: List[Dict]) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_applicant_questions_llm."""
+        prompt = f"""
 You are an expert in immigration policy and form design. Generate 4 application form questions for the "Applicant Details" section of a visa application.
 
 Data Requirements: {json.dumps(data_requirements[:3], indent=2)}
@@ -580,28 +720,23 @@ Generate questions that capture essential applicant information. Each question m
 
 Return ONLY a valid JSON array of 4 question objects, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM APPLICANT QUESTIONS: Generated {len(result)} questions", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in applicant questions: {e}, falling back", flush=True)
-            return self._generate_fallback_applicant_questions()
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'label': 'applicant questions',
+            'temperature': 0.7,
+            'max_tokens': 2000,
+            'fallback': self._generate_fallback_applicant_questions,
+            'summarize': lambda result: f"Generated {len(result)} questions"
+        }
     
     def _generate_sponsor_questions_llm(self, data_requirements: List[Dict], business_rules: List[Dict], validation_rules: List[Dict]) -> List[Dict[str, Any]]:
         """Generate sponsor questions using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._generate_sponsor_questions_llm_request(data_requirements, business_rules, validation_rules))
+    
+    def _generate_sponsor_questions_llm_request(self, data_requirements: List[Dict], business_rules: List[Dict], validation_rules: List[Dict]) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_sponsor_questions_llm."""
+        prompt = f"""
 You are an expert in immigration policy and form design. Generate 3 application form questions for the "Sponsorship" section of a visa application.
 
 Data Requirements: {json.dumps(data_requirements[:3], indent=2)}
@@ -619,28 +754,23 @@ Generate questions about sponsors, guarantors, and supporting parties. Each ques
 
 Return ONLY a valid JSON array of 3 question objects, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=1500
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM SPONSOR QUESTIONS: Generated {len(result)} questions", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in sponsor questions: {e}, falling back", flush=True)
-            return self._generate_fallback_sponsor_questions()
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'label': 'sponsor questions',
+            'temperature': 0.7,
+            'max_tokens': 1500,
+            'fallback': self._generate_fallback_sponsor_questions,
+            'summarize': lambda result: f"Generated {len(result)} questions"
+        }
     
     def _generate_dependent_questions_llm(self, data_requirements: List[Dict], validation_rules: List[Dict]) -> List[Dict[str, Any]]:
         """Generate dependent questions using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._generate_dependent_questions_llm_request(data_requirements, validation_rules))
+    
+    def _generate_dependent_questions_llm_request(self, data_requirements: List[Dict], validation_rules: List[Dict]) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_dependent_questions_llm."""
+        prompt = f"""
 You are an expert in immigration policy and form design. Generate 2 application form questions for the "Dependent Children" section of a visa application.
 
 Data Requirements: {json.dumps(data_requirements[:2], indent=2)}
@@ -657,28 +787,23 @@ Generate questions about dependent children accompanying the applicant. Each que
 
 Return ONLY a valid JSON array of 2 question objects, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM DEPENDENT QUESTIONS: Generated {len(result)} questions", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in dependent questions: {e}, falling back", flush=True)
-            return self._generate_fallback_dependent_questions()
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'label': 'dependent questions',
+            'temperature': 0.7,
+            'max_tokens': 1000,
+            'fallback': self._generate_fallback_dependent_questions,
+            'summarize': lambda result: f"Generated {len(result)} questions"
+        }
     
     def _generate_financial_questions_llm(self, data_requirements: List[Dict], business_rules: List[Dict], validation_rules: List[Dict]) -> List[Dict[str, Any]]:
         """Generate financial questions using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._generate_financial_questions_llm_request(data_requirements, business_rules, validation_rules))
+    
+    def _generate_financial_questions_llm_request(self, data_requirements: List[Dict], business_rules: List[Dict], validation_rules: List[Dict]) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_financial_questions_llm."""
+        prompt = f"""
 You are an expert in immigration policy and form design. Generate 2 application form questions for the "Financial" section of a visa application.
 
 Business Rules: {json.dumps(business_rules[:2], indent=2)}
@@ -695,28 +820,23 @@ Generate questions about financial capacity, funds, and financial requirements.
 
 Return ONLY a valid JSON array of 2 question objects, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM FINANCIAL QUESTIONS: Generated {len(result)} questions", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in financial questions: {e}, falling back", flush=True)
-            return self._generate_fallback_financial_questions()
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'label': 'financial questions',
+            'temperature': 0.7,
+            'max_tokens': 1000,
+            'fallback': self._generate_fallback_financial_questions,
+            'summarize': lambda result: f"Generated {len(result)} questions"
+        }
     
     def _generate_health_character_questions_llm(self, data_requirements: List[Dict], validation_rules: List[Dict]) -> List[Dict[str, Any]]:
         """Generate health and character questions using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._generate_health_character_questions_llm_request(data_requirements, validation_rules))
+    
+    def _generate_health_character_questions_llm_request(self, data_requirements: List[Dict], validation_rules: List[Dict]) -> Dict[str, Any]:
+        """Build the LLM request behind _generate_health_character_questions_llm."""
+        prompt = f"""
 You are an expert in immigration policy and form design. Generate 2 application form questions for the "Health & Character" section of a visa application.
 
 Validation Rules: {json.dumps(validation_rules[:2], indent=2)}
@@ -733,18 +853,12 @@ Generate questions about health requirements and character assessments. Each que
 
 Return ONLY a valid JSON array of 2 question objects, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM HEALTH QUESTIONS: Generated {len(result)} questions", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in health questions: {e}, falling back", flush=True)
-            return self._generate_fallback_health_character_questions()
+        return {
+            'prompt': prompt,
+            'schema': QuestionList,
+            'label': 'health questions',
+            'temperature': 0.7,
+            'max_tokens': 1000,
+            'fallback': self._generate_fallback_health_character_questions,
+            'summarize': lambda result: f"Generated {len(result)} questions"
+        }
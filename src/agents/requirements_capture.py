@@ -1,7 +1,9 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable
 import time
+import asyncio
 import logging
 from .base_agent import BaseAgent
+from ..utils.schemas import BusinessRuleList, DataRequirementList, FunctionalRequirementList, ValidationRuleList
 
 logger = logging.getLogger(__name__)
 
@@ -44,50 +46,112 @@ class RequirementsCaptureAgent(BaseAgent):
                 conditions, sections
             )
             
-            outputs = {
-                'functional_requirements': functional_requirements,
-                'data_requirements': data_requirements,
-                'business_rules': business_rules,
-                'validation_rules': validation_rules
-            }
-            
-            outputs = self._add_metadata(outputs)
-            
-            duration = time.time() - start_time
-            self._log_execution(inputs, outputs, duration)
-            
-            return outputs
+            return self._build_outputs(
+                inputs, start_time, functional_requirements, data_requirements, business_rules, validation_rules
+            )
             
         except Exception as e:
-            # Use fallback data for demo purposes
-            error_msg = str(e).encode('ascii', errors='ignore').decode('ascii')  # Clean error message
-            logger.error(f"RequirementsCapture failed: {error_msg}")
-            print(f"DEBUG: RequirementsCapture exception: {error_msg}")
-            
-            # Generate fallback results
-            functional_requirements = self._generate_fallback_functional_requirements()
-            data_requirements = self._generate_fallback_data_requirements()
-            business_rules = self._generate_fallback_business_rules()
-            validation_rules = self._generate_fallback_validation_rules()
-            
-            outputs = {
-                'functional_requirements': functional_requirements,
-                'data_requirements': data_requirements,
-                'business_rules': business_rules,
-                'validation_rules': validation_rules
-            }
+            return self._fallback_outputs(inputs, start_time, e)
+    
+    async def aexecute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Extract requirements with the four extraction calls running concurrently.
+        
+        Args:
+            inputs: Dictionary containing policy_structure, eligibility_rules, conditions
             
-            outputs = self._add_metadata(outputs)
+        Returns:
+            Dictionary with functional_requirements, data_requirements, business_rules
+        """
+        start_time = time.time()
+        
+        try:
+            policy_structure = inputs.get('policy_structure', {})
+            eligibility_rules = inputs.get('eligibility_rules', {})
+            conditions = inputs.get('conditions', {})
+            sections = inputs.get('sections', {})
             
-            duration = time.time() - start_time
-            self._log_execution(inputs, outputs, duration, True)
+            functional_requirements, data_requirements, business_rules, validation_rules = await asyncio.gather(
+                self._ainvoke_json_chunks(self._extract_functional_requirements_requests(
+                    policy_structure, eligibility_rules, conditions
+                )),
+                self._ainvoke_json_chunks(self._extract_data_requirements_requests(eligibility_rules, conditions)),
+                self._ainvoke_json_chunks(self._extract_business_rules_requests(conditions, sections)),
+                self._ainvoke_json_chunks(self._extract_validation_rules_requests(conditions, sections))
+            )
             
-            return outputs
+            return self._build_outputs(
+                inputs, start_time, functional_requirements, data_requirements, business_rules, validation_rules
+            )
             
         except Exception as e:
-            duration = time.time() - start_time
-            self._log_execution(inputs, {}, duration, False, str(e))
-            raise
+            return self._fallback_outputs(inputs, start_time, e)
+    
+    def _build_outputs(
+        self,
+        inputs: Dict[str, Any],
+        start_time: float,
+        functional_requirements: List[Dict[str, Any]],
+        data_requirements: List[Dict[str, Any]],
+        business_rules: List[Dict[str, Any]],
+        validation_rules: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Assemble and log the agent outputs."""
+        outputs = {
+            'functional_requirements': functional_requirements,
+            'data_requirements': data_requirements,
+            'business_rules': business_rules,
+            'validation_rules': validation_rules
+        }
+        
+        outputs = self._add_metadata(outputs)
+        
+        duration = time.time() - start_time
+        self._log_execution(inputs, outputs, duration, True)
+        
+        return outputs
+    
+    def _fallback_outputs(self, inputs: Dict[str, Any], start_time: float, error: Exception) -> Dict[str, Any]:
+        """Build fallback outputs after a failed extraction."""
+        # Use fallback data for demo purposes
+        error_msg = str(error).encode('ascii', errors='ignore').decode('ascii')  # Clean error message
+        logger.error(f"RequirementsCapture failed: {error_msg}")
+        
+        # Generate fallback results
+        outputs = {
+            'functional_requirements': self._generate_fallback_functional_requirements(),
+            'data_requirements': self._generate_fallback_data_requirements(),
+            'business_rules': self._generate_fallback_business_rules(),
+            'validation_rules': self._generate_fallback_validation_rules()
+        }
+        
+        outputs = self._add_metadata(outputs)
+        
+        duration = time.time() - start_time
+        self._log_execution(inputs, outputs, duration, True)
+        
+        return outputs
+    
+    def _requirement_list(
+        self,
+        result: Any,
+        key: str,
+        fallback: Callable[[], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Normalize an extracted result into a list of requirements."""
+        # Handle fallback responses
+        if isinstance(result, dict) and result.get('fallback'):
+            return fallback()
+        
+        # Ensure it's a list
+        if isinstance(result, dict) and key in result:
+            return result[key]
+        elif isinstance(result, dict) and 'items' in result:
+            return result['items']
+        elif isinstance(result, list):
+            return result
+        else:
+            return fallback()
     
     def _extract_functional_requirements(
         self, 
@@ -95,17 +159,28 @@ class RequirementsCaptureAgent(BaseAgent):
         eligibility_rules: Dict[str, Any],
         conditions: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
-        """Extract functional requirements using LLM."""
-        
-        context = f"""
-Policy Structure: {policy_structure}
-Eligibility Rules: {eligibility_rules}
-Conditions: {conditions}
-"""
-        
+        """Extract functional requirements using LLM, one call per chunk of the policy information."""
+        return self._invoke_json_chunks(self._extract_functional_requirements_requests(policy_structure, eligibility_rules, conditions))
+    
+    def _extract_functional_requirements_requests(
+        self, 
+        policy_structure: Dict[str, Any],
+        eligibility_rules: Dict[str, Any],
+        conditions: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Build one _extract_functional_requirements request per context chunk."""
+        chunks = self._context_chunks({
+            'Policy Structure': policy_structure,
+            'Eligibility Rules': eligibility_rules,
+            'Conditions': conditions
+        })
+        return [self._extract_functional_requirements_request(context) for context in chunks]
+    
+    def _extract_functional_requirements_request(self, context: str) -> Dict[str, Any]:
+        """Build the LLM request behind _extract_functional_requirements for one context chunk."""
         prompt = f"""Based on this policy information, extract functional requirements for the visa application system.
 
-{context[:2500]}...
+{context}
 
 Functional requirements describe what the system must DO. Examples:
 - System must verify applicant is outside New Zealand
@@ -122,39 +197,34 @@ Return a JSON array of requirements, each with:
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Handle fallback responses
-        if isinstance(result, dict) and result.get('fallback'):
-            # Generate basic functional requirements as fallback
-            return self._generate_fallback_functional_requirements()
-        
-        # Ensure it's a list
-        if isinstance(result, dict) and 'requirements' in result:
-            return result['requirements']
-        elif isinstance(result, dict) and 'items' in result:
-            return result['items']
-        elif isinstance(result, list):
-            return result
-        else:
-            return self._generate_fallback_functional_requirements()
+        return {
+            'prompt': prompt,
+            'schema': FunctionalRequirementList,
+            'parse': lambda result: self._requirement_list(result, 'requirements', self._generate_fallback_functional_requirements)
+        }
     
     def _extract_data_requirements(
         self,
         eligibility_rules: Dict[str, Any],
         conditions: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
-        """Extract data requirements using LLM."""
-        
-        context = f"""
-Eligibility Rules: {eligibility_rules}
-Conditions: {conditions}
-"""
-        
+        """Extract data requirements using LLM, one call per chunk of the policy information."""
+        return self._invoke_json_chunks(self._extract_data_requirements_requests(eligibility_rules, conditions))
+    
+    def _extract_data_requirements_requests(
+        self,
+        eligibility_rules: Dict[str, Any],
+        conditions: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Build one _extract_data_requirements request per context chunk."""
+        chunks = self._context_chunks({'Eligibility Rules': eligibility_rules, 'Conditions': conditions})
+        return [self._extract_data_requirements_request(context) for context in chunks]
+    
+    def _extract_data_requirements_request(self, context: str) -> Dict[str, Any]:
+        """Build the LLM request behind _extract_data_requirements for one context chunk."""
         prompt = f"""Based on this policy information, extract data requirements for the visa application system.
 
-{context[:2500]}...
+{context}
 
 Data requirements describe what INFORMATION must be collected. Examples:
 - Applicant personal details (name, DOB, passport)
@@ -173,37 +243,34 @@ Return a JSON array of requirements, each with:
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Handle fallback responses
-        if isinstance(result, dict) and result.get('fallback'):
-            return self._generate_fallback_data_requirements()
-        
-        if isinstance(result, dict) and 'requirements' in result:
-            return result['requirements']
-        elif isinstance(result, dict) and 'items' in result:
-            return result['items']
-        elif isinstance(result, list):
-            return result
-        else:
-            return self._generate_fallback_data_requirements()
+        return {
+            'prompt': prompt,
+            'schema': DataRequirementList,
+            'parse': lambda result: self._requirement_list(result, 'requirements', self._generate_fallback_data_requirements)
+        }
     
     def _extract_business_rules(
         self,
         conditions: Dict[str, Any],
         sections: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
-        """Extract business rules using LLM."""
-        
-        context = f"""
-Conditions: {conditions}
-Policy Sections: {list(sections.keys())}
-"""
-        
+        """Extract business rules using LLM, one call per chunk of the policy information."""
+        return self._invoke_json_chunks(self._extract_business_rules_requests(conditions, sections))
+    
+    def _extract_business_rules_requests(
+        self,
+        conditions: Dict[str, Any],
+        sections: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Build one _extract_business_rules request per context chunk."""
+        chunks = self._context_chunks({'Conditions': conditions, 'Policy Sections': list(sections.keys())})
+        return [self._extract_business_rules_request(context) for context in chunks]
+    
+    def _extract_business_rules_request(self, context: str) -> Dict[str, Any]:
+        """Build the LLM request behind _extract_business_rules for one context chunk."""
         prompt = f"""Based on this policy information, extract business rules for the visa application system.
 
-{context[:2500]}...
+{context}
 
 Business rules describe LOGIC and CONSTRAINTS. Examples:
 - Maximum 2 sponsors allowed per application
@@ -221,37 +288,34 @@ Return a JSON array of rules, each with:
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Handle fallback responses
-        if isinstance(result, dict) and result.get('fallback'):
-            return self._generate_fallback_business_rules()
-        
-        if isinstance(result, dict) and 'rules' in result:
-            return result['rules']
-        elif isinstance(result, dict) and 'items' in result:
-            return result['items']
-        elif isinstance(result, list):
-            return result
-        else:
-            return self._generate_fallback_business_rules()
+        return {
+            'prompt': prompt,
+            'schema': BusinessRuleList,
+            'parse': lambda result: self._requirement_list(result, 'rules', self._generate_fallback_business_rules)
+        }
     
     def _extract_validation_rules(
         self,
         conditions: Dict[str, Any],
         thresholds: Dict[str, Any]
     ) -> List[Dict[str, Any]]:
-        """Extract validation rules using LLM."""
-        
-        context = f"""
-Conditions: {conditions}
-Thresholds: {thresholds}
-"""
-        
+        """Extract validation rules using LLM, one call per chunk of the policy information."""
+        return self._invoke_json_chunks(self._extract_validation_rules_requests(conditions, thresholds))
+    
+    def _extract_validation_rules_requests(
+        self,
+        conditions: Dict[str, Any],
+        thresholds: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Build one _extract_validation_rules request per context chunk."""
+        chunks = self._context_chunks({'Conditions': conditions, 'Thresholds': thresholds})
+        return [self._extract_validation_rules_request(context) for context in chunks]
+    
+    def _extract_validation_rules_request(self, context: str) -> Dict[str, Any]:
+        """Build the LLM request behind _extract_validation_rules for one context chunk."""
         prompt = f"""Based on this policy information, extract validation rules for the visa application system.
 
-{context[:2500]}...
+{context}
 
 Validation rules describe how to VALIDATE user input. Examples:
 - Age validations for dependent children (under 18)
@@ -269,21 +333,11 @@ Return a JSON array of rules, each with:
 
 Return ONLY valid JSON array, no other text."""
 
-        response = self.llm.invoke(prompt)
-        result = self._extract_json_from_response(response.content)
-        
-        # Handle fallback responses
-        if isinstance(result, dict) and result.get('fallback'):
-            return self._generate_fallback_validation_rules()
-        
-        if isinstance(result, dict) and 'validations' in result:
-            return result['validations']
-        elif isinstance(result, dict) and 'items' in result:
-            return result['items']
-        elif isinstance(result, list):
-            return result
-        else:
-            return self._generate_fallback_validation_rules()
+        return {
+            'prompt': prompt,
+            'schema': ValidationRuleList,
+            'parse': lambda result: self._requirement_list(result, 'validations', self._generate_fallback_validation_rules)
+        }
 
     def _generate_fallback_functional_requirements(self) -> List[Dict[str, Any]]:
         """Generate fallback functional requirements when LLM extraction fails."""
@@ -1,11 +1,14 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import time
+import asyncio
 import logging
 import json
 import os
-from openai import OpenAI
 from .base_agent import BaseAgent
 from ..utils.validator import Validator
+from ..utils import batch_validator
+from ..utils.reference_index import ReferenceIndex
+from ..utils.schemas import ConsistencyReport, CoverageReport, GapReport, QuestionValidationReport, RequirementValidationReport
 
 logger = logging.getLogger(__name__)
 
@@ -26,35 +29,16 @@ class ValidationAgent(BaseAgent):
         start_time = time.time()
         
         # FORCE DEBUG OUTPUT
-        print(f" VALIDATION AGENT STARTING ", flush=True)
-        print(f" Input keys: {list(inputs.keys()) if inputs else 'None'}", flush=True)
+        logger.debug("%s starting with inputs %s", self.name, list(inputs) if inputs else None)
         
         try:
-            # Extract inputs
-            policy_structure = inputs.get('policy_structure', {})
-            sections = inputs.get('sections', {})
-            requirements = inputs.get('functional_requirements', []) + \
-                          inputs.get('data_requirements', []) + \
-                          inputs.get('business_rules', [])
-            questions = inputs.get('application_questions', [])
-            
-            print(f" VALIDATION AGENT: Input counts - requirements={len(requirements)}, questions={len(questions)}, sections={len(sections) if sections else 0} ", flush=True)
-            
-            # Check for empty inputs and use fallbacks if needed
-            if not requirements:
-                print(f" VALIDATION AGENT: No requirements found, using fallback ", flush=True)
-                requirements = self._generate_fallback_requirements()
-            if not questions:
-                print(f" VALIDATION AGENT: No questions found, using fallback ", flush=True)
-                questions = self._generate_fallback_questions()
-            
-            print(f" VALIDATION AGENT: Final counts after fallback - requirements={len(requirements)}, questions={len(questions)} ", flush=True)
+            policy_structure, sections, requirements, questions = self._collect_inputs(inputs)
             
             # Check if we should use real LLM calls (V2 mode)
             force_llm = os.getenv('VISA_AGENT_FORCE_LLM', 'false').lower() == 'true'
             
             if force_llm:
-                print("VALIDATION AGENT: V2 MODE - Using real LLM validation", flush=True)
+                logger.info("%s: V2 mode - using real LLM validation", self.name)
                 # Perform validations with real LLM
                 requirement_validation = self._validate_requirements_llm(requirements)
                 question_validation = self._validate_questions_llm(questions)
@@ -62,128 +46,206 @@ class ValidationAgent(BaseAgent):
                 consistency_check = self._check_consistency_llm(requirements, questions, policy_structure)
                 gap_analysis = self._identify_gaps_llm(requirements, questions, sections)
             else:
-                print("VALIDATION AGENT: V1 MODE - Using fallback validation", flush=True)
+                logger.info("%s: V1 mode - using fallback validation", self.name)
                 # Perform validations with fallback methods
                 requirement_validation = self._validate_requirements(requirements)
                 question_validation = self._validate_questions(questions)
-                coverage_analysis = self._analyze_coverage(requirements, questions, sections)
+                # One policy reference index shared by the coverage and gap checks
+                index = ReferenceIndex(requirements, questions)
+                coverage_analysis = self._analyze_coverage(requirements, questions, sections, index)
                 consistency_check = self._check_consistency(requirements, questions, policy_structure)
-                gap_analysis = self._identify_gaps(requirements, questions, sections)
+                gap_analysis = self._identify_gaps(requirements, questions, sections, index)
             
-            # Generate recommendations
-            recommendations = self._generate_recommendations(
+            return self._build_outputs(
+                inputs, start_time, requirement_validation, question_validation,
+                coverage_analysis, consistency_check, gap_analysis
             )
             
-            # Add debug info about validation failures
-            debug_info = f"ValidationAgent: {requirement_validation['valid_requirements']}/{requirement_validation['total_requirements']} requirements valid, {question_validation['valid_questions']}/{question_validation['total_questions']} questions valid"
-            
-            outputs = {
-                'validation_report': {
-                    'requirement_validation': requirement_validation,
-                    'question_validation': question_validation,
-                    'consistency_check': consistency_check,
-                    'coverage_analysis': coverage_analysis,
-                    'overall_score': overall_score
-                },
-                'gap_analysis': gap_analysis,
-                'recommendations': recommendations,
-                'debug_info': debug_info
-            }
-            outputs = self._add_metadata(outputs)
-            
-            duration = time.time() - start_time
-            self._log_execution(inputs, outputs, duration, True)
-            
-            return outputs
-            
         except Exception as e:
-            # Use fallback data for demo purposes with 75% minimum score as per memory
-            error_msg = str(e).encode('ascii', errors='ignore').decode('ascii')  # Clean error message
-            logger.error(f"ValidationAgent failed: {error_msg}")
-            print(f"DEBUG: ValidationAgent exception: {error_msg}")
+            return self._fallback_outputs(inputs, start_time, e)
+    
+    async def aexecute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate requirements and questions with the five LLM checks running concurrently.
+        
+        Only V2 mode calls the LLM; V1 validation is local and runs in a worker thread.
+        
+        Args:
+            inputs: Dictionary containing all previous agent outputs
             
-            # Generate fallback validation results with 75% score as per memory
-            outputs = {
-                'validation_score': 0.75,  # 75% minimum fallback score
-                'requirements_validation': {
-                    'total_requirements': 20,
-                    'validated_requirements': 15,
-                    'validation_rate': 0.75
-                },
-                'questions_validation': {
-                    'total_questions': 12,
-                    'validated_questions': 9,
-                    'validation_rate': 0.75
-                },
-                'coverage_analysis': {
-                    'policy_sections_covered': 4,
-                    'total_policy_sections': 5,
-                    'coverage_rate': 0.80
-                },
-                'gap_analysis': {
-                    'missing_requirements': ['Additional documentation may be required'],
-                    'recommendations': ['Review policy completeness', 'Validate question coverage']
-                },
-                'overall_quality': 'Good'  # 75% = Good Quality tier
-            }
+        Returns:
+            Dictionary with validation_report and gap_analysis
+        """
+        if os.getenv('VISA_AGENT_FORCE_LLM', 'false').lower() != 'true':
+            return await asyncio.to_thread(self.execute, inputs)
+        
+        start_time = time.time()
+        
+        logger.debug("%s starting with inputs %s", self.name, list(inputs) if inputs else None)
+        
+        try:
+            policy_structure, sections, requirements, questions = self._collect_inputs(inputs)
             
-            outputs = self._add_metadata(outputs)
+            logger.info("%s: V2 mode - using real LLM validation", self.name)
+            requirement_validation, question_validation, coverage_analysis, consistency_check, gap_analysis = await asyncio.gather(
+                self._acomplete_json(self._validate_requirements_llm_request(requirements)),
+                self._acomplete_json(self._validate_questions_llm_request(questions)),
+                self._acomplete_json(self._analyze_coverage_llm_request(requirements, questions, sections)),
+                self._acomplete_json(self._check_consistency_llm_request(requirements, questions, policy_structure)),
+                self._acomplete_json(self._identify_gaps_llm_request(requirements, questions, sections))
+            )
             
-            duration = time.time() - start_time
-            self._log_execution(inputs, outputs, duration, True)
+            return self._build_outputs(
+                inputs, start_time, requirement_validation, question_validation,
+                coverage_analysis, consistency_check, gap_analysis
+            )
             
-            return outputs
+        except Exception as e:
+            return self._fallback_outputs(inputs, start_time, e)
+    
+    def _collect_inputs(self, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Extract policy structure, sections, requirements and questions, using fallbacks when empty."""
+        # Extract inputs
+        policy_structure = inputs.get('policy_structure', {})
+        sections = inputs.get('sections', {})
+        requirements = inputs.get('functional_requirements', []) + \
+                      inputs.get('data_requirements', []) + \
+                      inputs.get('business_rules', [])
+        questions = inputs.get('application_questions', [])
+        
+        logger.debug("%s input counts - requirements=%d, questions=%d, sections=%d", self.name,
+                     len(requirements), len(questions), len(sections) if sections else 0)
+        
+        # Check for empty inputs and use fallbacks if needed
+        if not requirements:
+            logger.info("%s: no requirements found, using fallback", self.name)
+            requirements = self._generate_fallback_requirements()
+        if not questions:
+            logger.info("%s: no questions found, using fallback", self.name)
+            questions = self._generate_fallback_questions()
+        
+        logger.debug("%s counts after fallback - requirements=%d, questions=%d", self.name, len(requirements), len(questions))
+        
+        return policy_structure, sections, requirements, questions
+    
+    def _build_outputs(
+        self,
+        inputs: Dict[str, Any],
+        start_time: float,
+        requirement_validation: Dict[str, Any],
+        question_validation: Dict[str, Any],
+        coverage_analysis: Dict[str, Any],
+        consistency_check: Dict[str, Any],
+        gap_analysis: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Assemble the validation report and log the agent outputs."""
+        # Generate recommendations
+        recommendations = self._generate_recommendations(
+            requirement_validation, question_validation, coverage_analysis, gap_analysis
+        )
+        overall_score = self._calculate_overall_score(requirement_validation, question_validation, coverage_analysis)
+        
+        # Add debug info about validation failures
+        debug_info = f"ValidationAgent: {requirement_validation['valid_requirements']}/{requirement_validation['total_requirements']} requirements valid, {question_validation['valid_questions']}/{question_validation['total_questions']} questions valid"
+        
+        outputs = {
+            'validation_report': {
+                'requirement_validation': requirement_validation,
+                'question_validation': question_validation,
+                'consistency_check': consistency_check,
+                'coverage_analysis': coverage_analysis,
+                'overall_score': overall_score
+            },
+            'gap_analysis': gap_analysis,
+            'recommendations': recommendations,
+            'debug_info': debug_info
+        }
+        outputs = self._add_metadata(outputs)
+        
+        duration = time.time() - start_time
+        self._log_execution(inputs, outputs, duration, True)
+        
+        return outputs
+    
+    def _fallback_outputs(self, inputs: Dict[str, Any], start_time: float, error: Exception) -> Dict[str, Any]:
+        """Build fallback outputs after a failed validation."""
+        # Use fallback data for demo purposes with 75% minimum score as per memory
+        error_msg = str(error).encode('ascii', errors='ignore').decode('ascii')  # Clean error message
+        logger.error(f"ValidationAgent failed: {error_msg}")
+        
+        # Generate fallback validation results with 75% score as per memory
+        outputs = {
+            'validation_score': 0.75,  # 75% minimum fallback score
+            'requirements_validation': {
+                'total_requirements': 20,
+                'validated_requirements': 15,
+                'validation_rate': 0.75
+            },
+            'questions_validation': {
+                'total_questions': 12,
+                'validated_questions': 9,
+                'validation_rate': 0.75
+            },
+            'coverage_analysis': {
+                'policy_sections_covered': 4,
+                'total_policy_sections': 5,
+                'coverage_rate': 0.80
+            },
+            'gap_analysis': {
+                'missing_requirements': ['Additional documentation may be required'],
+                'recommendations': ['Review policy completeness', 'Validate question coverage']
+            },
+            'overall_quality': 'Good'  # 75% = Good Quality tier
+        }
+        
+        outputs = self._add_metadata(outputs)
+        
+        duration = time.time() - start_time
+        self._log_execution(inputs, outputs, duration, True)
+        
+        return outputs
     
     def _validate_requirements(self, requirements: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Validate individual requirements."""
-        valid_count = 0
-        invalid_count = 0
-        errors = []
+        result = batch_validator.validate_requirements(requirements)
+        invalid = result.invalid_positions()
+        if len(invalid):
+            logger.debug("%s: %d of %d requirements failed validation", self.name, len(invalid), len(result))
         
-        for req in requirements:
-            is_valid, req_errors = Validator.validate_requirement(req)
-            if is_valid:
-                valid_count += 1
-            else:
-                invalid_count += 1
-                # Debug: Show what's failing
-                print(f"VALIDATION: Requirement failed validation: {req.get('requirement_id', req.get('id', 'unknown'))}", flush=True)
-                print(f"VALIDATION: Requirement keys: {list(req.keys())}", flush=True)
-                print(f"VALIDATION: Errors: {req_errors}", flush=True)
-                errors.append({
-                    'requirement_id': req.get('requirement_id', req.get('id', 'unknown')),
-                    'errors': req_errors
-                })
+        errors = []
+        for position in invalid:
+            req = requirements[position]
+            errors.append({
+                'requirement_id': req.get('requirement_id', req.get('id', 'unknown')),
+                'errors': result.errors(position)
+            })
         
+        valid_count = result.valid_count
         return {
             'total_requirements': len(requirements),
             'valid_requirements': valid_count,
-            'invalid_requirements': invalid_count,
+            'invalid_requirements': len(invalid),
             'validation_rate': (valid_count / len(requirements) * 100) if requirements else 0,
             'errors': errors
         }
     
     def _validate_questions(self, questions: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Validate individual questions."""
-        valid_count = 0
-        invalid_count = 0
-        errors = []
+        result = batch_validator.validate_questions(questions)
+        invalid = result.invalid_positions()
         
-        for q in questions:
-            is_valid, q_errors = Validator.validate_question(q)
-            if is_valid:
-                valid_count += 1
-            else:
-                invalid_count += 1
-                errors.append({
-                    'question_id': q.get('question_id', 'unknown'),
-                    'errors': q_errors
-                })
+        errors = []
+        for position in invalid:
+            errors.append({
+                'question_id': questions[position].get('question_id', 'unknown'),
+                'errors': result.errors(position)
+            })
         
+        valid_count = result.valid_count
         return {
             'total_questions': len(questions),
             'valid_questions': valid_count,
-            'invalid_questions': invalid_count,
+            'invalid_questions': len(invalid),
             'validation_rate': (valid_count / len(questions) * 100) if questions else 0,
             'errors': errors
         }
@@ -192,7 +254,8 @@ class ValidationAgent(BaseAgent):
         self,
         requirements: List[Dict[str, Any]],
         questions: List[Dict[str, Any]],
-        sections: Dict[str, Any]
+        sections: Dict[str, Any],
+        index: Optional[ReferenceIndex] = None
     ) -> Dict[str, Any]:
         """Analyze coverage of policy sections."""
         
@@ -220,7 +283,7 @@ class ValidationAgent(BaseAgent):
         requirement_coverage = Validator.check_requirement_coverage(requirements, policy_sections)
         
         # Check question-requirement mapping
-        question_mapping = Validator.check_question_requirement_mapping(questions, requirements)
+        question_mapping = Validator.check_question_requirement_mapping(questions, requirements, index)
         
         return {
             'requirement_coverage': requirement_coverage,
@@ -279,11 +342,14 @@ class ValidationAgent(BaseAgent):
         self,
         requirements: List[Dict[str, Any]],
         questions: List[Dict[str, Any]],
-        sections: Dict[str, Any]
+        sections: Dict[str, Any],
+        index: Optional[ReferenceIndex] = None
     ) -> Dict[str, Any]:
         """Identify gaps in coverage."""
         
         gaps = []
+        if index is None:
+            index = ReferenceIndex(requirements, questions)
         
         # Check for missing requirement types
         req_types = {req.get('type') for req in requirements}
@@ -309,6 +375,20 @@ class ValidationAgent(BaseAgent):
                 'severity': 'high'
             })
         
+        # Check for referenced requirements no question relates to
+        unasked = [
+            req.get('requirement_id', 'unknown')
+            for position, req in enumerate(requirements)
+            if req.get('policy_reference') and not index.requirement_questions(position)
+        ]
+        if unasked:
+            gaps.append({
+                'type': 'requirements_without_questions',
+                'description': f"{len(unasked)} requirements have no question for their policy reference",
+                'requirement_ids': unasked,
+                'severity': 'low'
+            })
+        
         return {
             'total_gaps': len(gaps),
             'gaps': gaps,
@@ -351,19 +431,21 @@ class ValidationAgent(BaseAgent):
             })
         
         # Coverage recommendations
-        req_coverage = coverage_analysis['requirement_coverage']['coverage_percentage']
+        req_coverage = self._coverage_percentage(coverage_analysis)
         if req_coverage < 80:
+            uncovered = coverage_analysis.get('requirement_coverage', {}).get('uncovered_sections', [])
             recommendations.append({
                 'type': 'coverage',
                 'priority': 'medium',
                 'description': 'Increase policy coverage',
-                'action': f"Add requirements for {len(coverage_analysis['requirement_coverage']['uncovered_sections'])} uncovered sections",
+                'action': f"Add requirements for {len(uncovered)} uncovered sections" if uncovered
+                          else "Add requirements for the uncovered policy sections",
                 'impact': 'Ensures comprehensive policy implementation'
             })
         
-        # Gap analysis recommendations
-        if gap_analysis['total_gaps'] > 0:
-            high_gaps = gap_analysis['severity_breakdown']['high']
+        # Gap analysis recommendations (the LLM gap report has no severities)
+        if gap_analysis.get('total_gaps', 0) > 0:
+            high_gaps = gap_analysis.get('severity_breakdown', {}).get('high', 0)
             if high_gaps > 0:
                 recommendations.append({
                     'type': 'gaps',
@@ -384,7 +466,7 @@ class ValidationAgent(BaseAgent):
         """Calculate overall validation score (0-100)."""
         req_score = requirement_validation['validation_rate']
         q_score = question_validation['validation_rate']
-        cov_score = coverage_analysis['requirement_coverage']['coverage_percentage']
+        cov_score = self._coverage_percentage(coverage_analysis)
         
         # Weighted average - but ensure minimum score if we have fallback data
         overall = (req_score * 0.3 + q_score * 0.3 + cov_score * 0.4)
@@ -395,6 +477,14 @@ class ValidationAgent(BaseAgent):
         
         return round(overall, 2)
     
+    @staticmethod
+    def _coverage_percentage(coverage_analysis: Dict[str, Any]) -> float:
+        """Get the requirement coverage of a local or an LLM (CoverageReport) coverage analysis."""
+        requirement_coverage = coverage_analysis.get('requirement_coverage')
+        if requirement_coverage is not None:
+            return requirement_coverage['coverage_percentage']
+        return coverage_analysis.get('coverage_percentage', 0)
+    
     def _generate_fallback_requirements(self) -> List[Dict[str, Any]]:
         """Generate fallback requirements when none are provided."""
         return [
@@ -473,19 +563,13 @@ class ValidationAgent(BaseAgent):
     # REAL LLM METHODS FOR VERSION 2 (Live API)
     # =============================================================================
     
-    def _get_openai_client(self):
-        """Get OpenAI client with API key."""
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-        return OpenAI(api_key=api_key)
-    
     def _validate_requirements_llm(self, requirements: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Validate requirements using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._validate_requirements_llm_request(requirements))
+    
+    def _validate_requirements_llm_request(self, requirements: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the LLM request behind _validate_requirements_llm."""
+        prompt = f"""
 You are an expert immigration policy validator. Analyze these requirements for completeness, clarity, and policy compliance.
 
 Requirements to validate:
@@ -512,28 +596,23 @@ Return validation results as JSON:
 
 Return ONLY valid JSON, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=1500
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM REQUIREMENTS VALIDATION: {result['valid_requirements']}/{result['total_requirements']} valid ({result['validation_rate']:.1f}%)", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in requirements validation: {e}, falling back", flush=True)
-            return self._validate_requirements(requirements)
+        return {
+            'prompt': prompt,
+            'schema': RequirementValidationReport,
+            'label': 'requirements validation',
+            'temperature': 0.2,
+            'max_tokens': 1500,
+            'fallback': lambda: self._validate_requirements(requirements),
+            'summarize': lambda result: f"{result['valid_requirements']}/{result['total_requirements']} valid ({result['validation_rate']:.1f}%)"
+        }
     
     def _validate_questions_llm(self, questions: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Validate questions using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._validate_questions_llm_request(questions))
+    
+    def _validate_questions_llm_request(self, questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the LLM request behind _validate_questions_llm."""
+        prompt = f"""
 You are an expert form design validator. Analyze these application form questions for usability, completeness, and effectiveness.
 
 Questions to validate:
@@ -560,28 +639,23 @@ Return validation results as JSON:
 
 Return ONLY valid JSON, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=1500
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM QUESTIONS VALIDATION: {result['valid_questions']}/{result['total_questions']} valid ({result['validation_rate']:.1f}%)", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in questions validation: {e}, falling back", flush=True)
-            return self._validate_questions(questions)
+        return {
+            'prompt': prompt,
+            'schema': QuestionValidationReport,
+            'label': 'questions validation',
+            'temperature': 0.2,
+            'max_tokens': 1500,
+            'fallback': lambda: self._validate_questions(questions),
+            'summarize': lambda result: f"{result['valid_questions']}/{result['total_questions']} valid ({result['validation_rate']:.1f}%)"
+        }
     
     def _analyze_coverage_llm(self, requirements: List[Dict], questions: List[Dict], sections: List[Dict]) -> Dict[str, Any]:
         """Analyze coverage using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._analyze_coverage_llm_request(requirements, questions, sections))
+    
+    def _analyze_coverage_llm_request(self, requirements: List[Dict], questions: List[Dict], sections: List[Dict]) -> Dict[str, Any]:
+        """Build the LLM request behind _analyze_coverage_llm."""
+        prompt = f"""
 You are an expert policy analyst. Analyze how well these application questions cover the policy requirements.
 
 Requirements ({len(requirements)} total):
@@ -607,28 +681,23 @@ Analyze coverage and return as JSON:
 
 Return ONLY valid JSON, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=1500
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM COVERAGE ANALYSIS: {result['coverage_percentage']:.1f}% coverage, {len(result.get('gaps', []))} gaps identified", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in coverage analysis: {e}, falling back", flush=True)
-            return self._analyze_coverage(requirements, questions, sections)
+        return {
+            'prompt': prompt,
+            'schema': CoverageReport,
+            'label': 'coverage analysis',
+            'temperature': 0.2,
+            'max_tokens': 1500,
+            'fallback': lambda: self._analyze_coverage(requirements, questions, sections),
+            'summarize': lambda result: f"{result['coverage_percentage']:.1f}% coverage, {len(result.get('gaps', []))} gaps identified"
+        }
     
     def _check_consistency_llm(self, requirements: List[Dict], questions: List[Dict], policy_structure: Dict) -> Dict[str, Any]:
         """Check consistency using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._check_consistency_llm_request(requirements, questions, policy_structure))
+    
+    def _check_consistency_llm_request(self, requirements: List[Dict], questions: List[Dict], policy_structure: Dict) -> Dict[str, Any]:
+        """Build the LLM request behind _check_consistency_llm."""
+        prompt = f"""
 You are an expert policy consistency checker. Analyze consistency between policy structure, requirements, and questions.
 
 Policy Structure:
@@ -653,28 +722,23 @@ Check for consistency and return as JSON:
 
 Return ONLY valid JSON, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=1500
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            print(f"LLM CONSISTENCY CHECK: {result['consistency_score']:.1f}% consistent, {len(result.get('inconsistencies', []))} issues found", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in consistency check: {e}, falling back", flush=True)
-            return self._check_consistency(requirements, questions, policy_structure)
+        return {
+            'prompt': prompt,
+            'schema': ConsistencyReport,
+            'label': 'consistency check',
+            'temperature': 0.2,
+            'max_tokens': 1500,
+            'fallback': lambda: self._check_consistency(requirements, questions, policy_structure),
+            'summarize': lambda result: f"{result['consistency_score']:.1f}% consistent, {len(result.get('inconsistencies', []))} issues found"
+        }
     
     def _identify_gaps_llm(self, requirements: List[Dict], questions: List[Dict], sections: List[Dict]) -> Dict[str, Any]:
         """Identify gaps using real LLM calls."""
-        try:
-            client = self._get_openai_client()
-            
-            prompt = f"""
+        return self._complete_json(self._identify_gaps_llm_request(requirements, questions, sections))
+    
+    def _identify_gaps_llm_request(self, requirements: List[Dict], questions: List[Dict], sections: List[Dict]) -> Dict[str, Any]:
+        """Build the LLM request behind _identify_gaps_llm."""
+        prompt = f"""
 You are an expert gap analysis specialist. Identify missing elements between requirements and questions.
 
 Requirements:
@@ -699,19 +763,12 @@ Identify gaps and return as JSON:
 
 Return ONLY valid JSON, no other text.
 """
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2,
-                max_tokens=1500
-            )
-            
-            result = json.loads(response.choices[0].message.content.strip())
-            total_gaps = len(result.get('missing_questions', [])) + len(result.get('missing_requirements', []))
-            print(f"LLM GAP ANALYSIS: {total_gaps} gaps identified, {result['overall_completeness']:.1f}% complete", flush=True)
-            return result
-            
-        except Exception as e:
-            print(f"LLM ERROR in gap analysis: {e}, falling back", flush=True)
-            return self._identify_gaps(requirements, questions, sections)
+        return {
+            'prompt': prompt,
+            'schema': GapReport,
+            'label': 'gap analysis',
+            'temperature': 0.2,
+            'max_tokens': 1500,
+            'fallback': lambda: self._identify_gaps(requirements, questions, sections),
+            'summarize': lambda result: f"{len(result.get('missing_questions', [])) + len(result.get('missing_requirements', []))} gaps identified, {result['overall_completeness']:.1f}% complete"
+        }
@@ -0,0 +1,202 @@
+import glob
+import json
+import math
+import time
+import logging
+import contextvars
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+
+from ..utils.enhanced_document_parser import EnhancedDocumentParser
+from ..utils.rate_limiter import llm_priority
+from .workflow_orchestrator import WorkflowOrchestrator
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.docx')
+
+# Orchestrator of a batch worker process, created once by _init_worker
+_worker_orchestrator = None
+
+
+def find_documents(sources: List[str]) -> List[Path]:
+    """
+    Expand files, directories and glob patterns into policy documents.
+
+    Directories are searched recursively for supported files.
+
+    Args:
+        sources: File paths, directory paths or glob patterns
+
+    Returns:
+        Sorted, de-duplicated document paths
+    """
+    documents = set()
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            candidates = path.rglob('*')
+        elif path.is_file():
+            candidates = [path]
+        else:
+            candidates = (Path(match) for match in glob.glob(source, recursive=True))
+
+        for candidate in candidates:
+            if candidate.is_file() and candidate.suffix.lower() in SUPPORTED_EXTENSIONS:
+                documents.add(candidate.resolve())
+
+    return sorted(documents)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def process_document(orchestrator: WorkflowOrchestrator, document_path: str) -> Dict[str, Any]:
+    """
+    Run the workflow on one document in the batch priority lane.
+
+    Args:
+        orchestrator: WorkflowOrchestrator to run the document with
+        document_path: Path to the policy document
+
+    Returns:
+        Batch record for the document
+    """
+    start = time.time()
+    record = {'document': document_path}
+
+    try:
+        content = EnhancedDocumentParser().load_document(document_path).get('content', '')
+        with llm_priority('batch'):
+            results = orchestrator.run_workflow(document_path, content)
+
+        record.update({
+            'status': results['status'],
+            'run_id': results.get('run_id'),
+            'output_dir': results.get('output_dir'),
+            'stages': {stage['name']: stage['status'] for stage in results.get('stages', [])}
+        })
+        errors = [f"{stage['name']}: {stage['error']}" for stage in results.get('stages', []) if stage.get('error')]
+        if errors:
+            record['error'] = '; '.join(errors)
+    except Exception as e:
+        logger.error(f"Batch document {document_path} failed: {e}")
+        record.update({'status': 'failed', 'error': str(e)})
+
+    record['duration_seconds'] = time.time() - start
+    return record
+
+
+def _init_worker(config_dir: Optional[str]):
+    """Create the orchestrator of a batch worker process."""
+    global _worker_orchestrator
+    _worker_orchestrator = WorkflowOrchestrator(config_dir)
+
+
+def _process_in_worker(document_path: str) -> Dict[str, Any]:
+    return process_document(_worker_orchestrator, document_path)
+
+
+class BatchRunner:
+    """Runs the workflow over many policy documents and streams results to JSONL."""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        mode: str = 'thread',
+        config_dir: Optional[str] = None,
+        orchestrator: Optional[WorkflowOrchestrator] = None
+    ):
+        """
+        Initialize the batch runner.
+
+        In thread mode all workers share one orchestrator (and so one LLM
+        rate limiter and connection pool). In process mode each worker
+        process builds its own orchestrator, so rate limits apply per process.
+
+        Args:
+            workers: Number of documents processed at once
+            mode: 'thread' or 'process'
+            config_dir: Configuration directory for the orchestrators
+            orchestrator: Orchestrator to share in thread mode (created if omitted)
+        """
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown batch mode '{mode}'. Expected 'thread' or 'process'")
+
+        self.workers = max(1, int(workers))
+        self.mode = mode
+        self.config_dir = config_dir
+        self.orchestrator = orchestrator
+
+    def run(self, documents: List[Path], output_path: str) -> Dict[str, Any]:
+        """
+        Process documents and append one JSON line per document as each finishes.
+
+        Args:
+            documents: Policy documents to process
+            output_path: JSONL file for the per-document records
+
+        Returns:
+            Batch summary with throughput, latency percentiles and failures
+        """
+        output_file = Path(output_path)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+
+        records = []
+        batch_start = time.time()
+
+        with open(output_file, 'a', encoding='utf-8') as f, self._create_pool() as pool:
+            futures = {self._submit(pool, str(path)): str(path) for path in documents}
+            for future in as_completed(futures):
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {'document': futures[future], 'status': 'failed', 'error': str(e), 'duration_seconds': 0}
+
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                f.flush()
+                records.append(record)
+                logger.info(f"Batch {len(records)}/{len(documents)}: {record['document']} {record['status']}")
+
+        return self._summarize(records, time.time() - batch_start, str(output_file))
+
+    def _create_pool(self):
+        """Create the worker pool for the configured mode."""
+        if self.mode == 'process':
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.config_dir,))
+
+        if self.orchestrator is None:
+            self.orchestrator = WorkflowOrchestrator(self.config_dir)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='batch')
+
+    def _submit(self, pool, document_path: str):
+        """Submit one document to the pool."""
+        if self.mode == 'process':
+            return pool.submit(_process_in_worker, document_path)
+        return pool.submit(contextvars.copy_context().run, process_document, self.orchestrator, document_path)
+
+    def _summarize(self, records: List[Dict[str, Any]], duration: float, output_path: str) -> Dict[str, Any]:
+        """Build the batch summary."""
+        latencies = [record['duration_seconds'] for record in records]
+        failures = [record for record in records if record['status'] != 'success']
+
+        return {
+            'output_path': output_path,
+            'total_documents': len(records),
+            'succeeded': len(records) - len(failures),
+            'failed': len(failures),
+            'duration_seconds': duration,
+            'throughput_docs_per_minute': (len(records) / duration * 60) if duration > 0 else 0,
+            'latency_p50_seconds': percentile(latencies, 50),
+            'latency_p95_seconds': percentile(latencies, 95),
+            'failures': [{'document': record['document'], 'error': record.get('error', record['status'])} for record in failures],
+            'timestamp': datetime.now().isoformat()
+        }
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def new_run_id() -> str:
+    """Create a sortable, unique workflow run ID."""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def compute_input_hash(params: Dict[str, Any]) -> str:
+    """
+    Hash the inputs of a workflow run.
+
+    When no document content is passed in, the document file itself is
+    hashed, so editing the policy file invalidates its checkpoints.
+
+    Args:
+        params: Workflow run parameters (document path, content and visa type hints)
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    material = dict(params)
+    if not material.get('policy_document_content'):
+        path = Path(material.get('policy_document_path') or '')
+        if path.is_file():
+            material['policy_document_sha256'] = hashlib.sha256(path.read_bytes()).hexdigest()
+    encoded = json.dumps(material, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+# Run statuses whose checkpoints prune() may delete
+FINISHED_STATUSES = ('success', 'failed')
+
+# Sidecar mapping document path -> latest successful incremental-ready run
+INDEX_FILE = 'latest_runs.index'
+
+
+class CheckpointStore:
+    """
+    Persists per-run workflow checkpoints as ``<directory>/<run_id>.json``.
+
+    prune() deletes checkpoints of finished runs older than
+    ``max_age_seconds``, then the oldest finished ones until the directory is
+    within ``max_total_bytes``; checkpoints of running runs are kept.
+
+    A small index of the latest successful run per document path is kept
+    next to the checkpoints, so latest_run() loads one checkpoint instead
+    of all of them.
+    """
+
+    def __init__(self, directory: str, max_age_seconds: Optional[float] = None,
+                 max_total_bytes: Optional[int] = None):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory holding checkpoint files
+            max_age_seconds: Prune finished checkpoints older than this (None for no age limit)
+            max_total_bytes: Prune finished checkpoints beyond this total (None for no size limit)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, run_id: str) -> Path:
+        if not run_id or Path(run_id).name != run_id:
+            raise ValueError(f"Invalid run ID: {run_id!r}")
+        return self.directory / f'{run_id}.json'
+
+    def _write(self, checkpoint: Dict[str, Any]):
+        """Write a checkpoint atomically so a crash never leaves a torn file."""
+        path = self._path(checkpoint['run_id'])
+        checkpoint['updated_at'] = datetime.now().isoformat()
+        tmp_path = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f, indent=2, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def create(self, run_id: str, params: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Start the checkpoint for a new run.
+
+        Args:
+            run_id: Workflow run ID
+            params: Workflow run parameters, needed to resume the run
+            extra: Additional fields to record (e.g. section hashes of the document)
+
+        Returns:
+            The new checkpoint
+        """
+        checkpoint = {
+            'run_id': run_id,
+            'input_hash': compute_input_hash(params),
+            'status': 'running',
+            'created_at': datetime.now().isoformat(),
+            'params': params,
+            'stages': {},
+            **(extra or {})
+        }
+        with self._lock:
+            self._write(checkpoint)
+        return checkpoint
+
+    def load(self, run_id: str) -> Dict[str, Any]:
+        """
+        Load the checkpoint of a run.
+
+        Raises:
+            ValueError: If no checkpoint exists for the run
+        """
+        path = self._path(run_id)
+        if not path.exists():
+            raise ValueError(f"No checkpoint found for run: {run_id}")
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_stage(self, run_id: str, stage_result: Dict[str, Any]):
+        """Record a finished (or failed/skipped) stage result."""
+        with self._lock:
+            checkpoint = self.load(run_id)
+            checkpoint['stages'][stage_result['name']] = stage_result
+            self._write(checkpoint)
+
+    def set_status(self, run_id: str, status: str):
+        """Record the overall run status ('running', 'success' or 'failed')."""
+        with self._lock:
+            checkpoint = self.load(run_id)
+            checkpoint['status'] = status
+            self._write(checkpoint)
+            if self._is_latest_candidate(checkpoint):
+                index = self._read_index()
+                if index is None:
+                    self._write_index(self._rebuild_index())
+                else:
+                    self._index_checkpoint(index, checkpoint)
+                    self._write_index(index)
+
+    @staticmethod
+    def _is_latest_candidate(checkpoint: Dict[str, Any]) -> bool:
+        """Whether incremental runs can diff against a checkpoint."""
+        return checkpoint.get('status') == 'success' and bool(checkpoint.get('section_hashes'))
+
+    @staticmethod
+    def _index_checkpoint(index: Dict[str, Dict[str, str]], checkpoint: Dict[str, Any]):
+        document_path = checkpoint.get('params', {}).get('policy_document_path')
+        entry = index.get(document_path)
+        if entry is None or checkpoint['created_at'] > entry['created_at']:
+            index[document_path] = {'run_id': checkpoint['run_id'], 'created_at': checkpoint['created_at']}
+
+    def _read_index(self) -> Optional[Dict[str, Dict[str, str]]]:
+        """Load the latest-run index; None if it is missing or unreadable."""
+        try:
+            with open(self.directory / INDEX_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_index(self, index: Dict[str, Dict[str, str]]):
+        path = self.directory / INDEX_FILE
+        tmp_path = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _rebuild_index(self) -> Dict[str, Dict[str, str]]:
+        """Build the latest-run index by reading every checkpoint."""
+        index: Dict[str, Dict[str, str]] = {}
+        for path in self.directory.glob('*.json'):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    checkpoint = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable checkpoint {path}: {e}")
+                continue
+            if self._is_latest_candidate(checkpoint):
+                self._index_checkpoint(index, checkpoint)
+        return index
+
+    def completed_stages(self, run_id: str) -> Dict[str, Dict[str, Any]]:
+        """Get the results of the stages that finished successfully."""
+        checkpoint = self.load(run_id)
+        return {
+            name: result for name, result in checkpoint['stages'].items()
+            if result.get('status') == 'success'
+        }
+
+    def _checkpoint_files(self) -> List[Tuple[Path, float, int]]:
+        """Get (path, last modified, size) of every checkpoint file, oldest first."""
+        files = []
+        for path in self.directory.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((path, stat.st_mtime, stat.st_size))
+        return sorted(files, key=lambda file: file[1])
+
+    def _is_finished(self, path: Path) -> bool:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('status') in FINISHED_STATUSES
+        except (OSError, ValueError):
+            # Unreadable files cannot be resumed either
+            return True
+
+    def prune(self) -> Dict[str, Any]:
+        """
+        Delete expired checkpoints of finished runs and enforce the size limit.
+
+        Returns:
+            IDs of the deleted runs and the bytes freed
+        """
+        if self.max_age_seconds is None and self.max_total_bytes is None:
+            return {'deleted_runs': [], 'bytes_freed': 0}
+
+        files = self._checkpoint_files()
+        total_bytes = sum(size for _, _, size in files)
+        now = time.time()
+        deleted = []
+        freed = 0
+
+        with self._lock:
+            for path, modified, size in files:
+                expired = self.max_age_seconds is not None and now - modified > self.max_age_seconds
+                oversized = self.max_total_bytes is not None and total_bytes > self.max_total_bytes
+                if not (expired or oversized):
+                    # Files are oldest first, so the rest are newer and fit
+                    break
+                if not self._is_finished(path):
+                    continue
+                try:
+                    path.unlink()
+                except OSError as e:
+                    logger.warning(f"Could not delete checkpoint {path}: {e}")
+                    continue
+                deleted.append(path.stem)
+                freed += size
+                total_bytes -= size
+
+            index = self._read_index() if deleted else None
+            if index is not None:
+                # Older runs of the same document were pruned first, so drop the entry
+                gone = set(deleted)
+                self._write_index({path: entry for path, entry in index.items() if entry['run_id'] not in gone})
+
+        if deleted:
+            logger.info(f"Checkpoint prune removed {len(deleted)} checkpoints ({freed} bytes)")
+        return {'deleted_runs': deleted, 'bytes_freed': freed}
+
+    def find_run(self, input_hash: str) -> Optional[str]:
+        """Get the most recent run ID with the given input hash, if any."""
+        for path in sorted(self.directory.glob('*.json'), reverse=True):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    if json.load(f).get('input_hash') == input_hash:
+                        return path.stem
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable checkpoint {path}: {e}")
+        return None
+
+    def latest_run(self, policy_document_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the checkpoint of the most recent successful run on a document.
+
+        Only runs that recorded the section hashes of their document qualify,
+        since incremental runs diff against them. The run is looked up in the
+        index, which is rebuilt from the checkpoints if it is missing or
+        points at a checkpoint that is gone.
+
+        Args:
+            policy_document_path: Path the run was started with
+
+        Returns:
+            The checkpoint, or None if there is no such run
+        """
+        index = self._read_index()
+        for rebuilt in (index is None, True):
+            if rebuilt:
+                with self._lock:
+                    index = self._rebuild_index()
+                    self._write_index(index)
+            entry = index.get(policy_document_path)
+            if entry is None:
+                return None
+            try:
+                checkpoint = self.load(entry['run_id'])
+            except (OSError, ValueError):
+                continue
+            if self._is_latest_candidate(checkpoint):
+                return checkpoint
+        return None
@@ -0,0 +1,188 @@
+import re
+import json
+import hashlib
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+from ..utils.policy_analyzer import PolicyAnalyzer
+
+# Keys under which agents record the policy section an output item came from
+REFERENCE_KEYS = ('policy_reference', 'reference', 'policy_ref')
+
+# A dotted policy reference such as "V4.10" in "V4.10(a)(i)"
+_REFERENCE = re.compile(r'[A-Z]*\d+(?:\.\d+)+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def load_policy_text(policy_document_path: str, policy_document_content: Optional[str] = None) -> str:
+    """
+    Get the text of a policy document the way the policy evaluator reads it.
+
+    Args:
+        policy_document_path: Path to the policy document
+        policy_document_content: Direct content, used when given
+
+    Returns:
+        The document text
+    """
+    if policy_document_content:
+        return policy_document_content
+    try:
+        with open(policy_document_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except UnicodeDecodeError:
+        from ..utils.enhanced_document_parser import EnhancedDocumentParser
+        return EnhancedDocumentParser().load_document(policy_document_path)['content']
+
+
+def section_hashes(document: str) -> Dict[str, str]:
+    """
+    Fingerprint each section of a policy document.
+
+    Whitespace is normalised first, so reflowing a section does not count
+    as an amendment.
+
+    Args:
+        document: Full document text
+
+    Returns:
+        Section code -> SHA-256 of the section title and content
+    """
+    hashes = {}
+    for code, section in PolicyAnalyzer().analyze(document)['sections'].items():
+        material = _WHITESPACE.sub(' ', f"{section['title']}\n{section['content']}").strip()
+        hashes[code] = hashlib.sha256(material.encode('utf-8')).hexdigest()
+    return hashes
+
+
+def diff_sections(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, List[str]]:
+    """
+    Compare the section fingerprints of two versions of a document.
+
+    Returns:
+        Section codes that were 'added', 'removed', 'changed' or left 'unchanged'
+    """
+    return {
+        'added': sorted(set(new) - set(old)),
+        'removed': sorted(set(old) - set(new)),
+        'changed': sorted(code for code in set(old) & set(new) if old[code] != new[code]),
+        'unchanged': sorted(code for code in set(old) & set(new) if old[code] == new[code])
+    }
+
+
+def affected_sections(diff: Dict[str, List[str]]) -> Set[str]:
+    """Get the sections whose derived outputs must be re-derived."""
+    return set(diff['added']) | set(diff['removed']) | set(diff['changed'])
+
+
+def delta_document(document: str, codes: Iterable[str]) -> str:
+    """
+    Build a document holding only the given sections.
+
+    Text before the first section (usually the title, which names the visa)
+    is kept so visa type detection still works on the excerpt.
+
+    Args:
+        document: Full document text
+        codes: Sections to include
+
+    Returns:
+        The preamble followed by each section's header and content
+    """
+    sections = PolicyAnalyzer().analyze(document)['sections']
+    wanted = [code for code in sections if code in set(codes)]
+
+    parts = []
+    if sections:
+        first = next(iter(sections))
+        preamble = document[:document.find(first)].strip() if first in document else ''
+        if preamble:
+            parts.append(preamble)
+    for code in wanted:
+        parts.append(f"{code} {sections[code]['title']}\n\n{sections[code]['content']}")
+    return '\n\n'.join(parts) + '\n'
+
+
+def section_of(reference: Any, section_codes: Iterable[str]) -> Optional[str]:
+    """
+    Find the section a policy reference points into.
+
+    Args:
+        reference: Reference text such as "V4.10(a)(i)"
+        section_codes: Known section codes, e.g. "V4.10"
+
+    Returns:
+        The most specific matching section code, or None
+    """
+    if not isinstance(reference, str):
+        return None
+
+    best = None
+    for token in _REFERENCE.findall(reference):
+        for code in section_codes:
+            if (token == code or token.startswith(code + '.')) and (best is None or len(code) > len(best)):
+                best = code
+    return best
+
+
+def merge_outputs(base: Any, delta: Any, affected: Set[str], section_codes: Set[str]) -> Any:
+    """
+    Merge outputs re-derived from changed sections into the outputs of the previous run.
+
+    - List items that reference an affected section are replaced by the
+      re-derived items; items referencing unchanged sections are kept.
+    - List items without a section reference are kept, and new ones added.
+    - Dict keys that are affected section codes take the re-derived value,
+      or are dropped when the re-derivation has none (e.g. the section was removed).
+    - Other dict values merge recursively; document-level scalars keep their
+      previous value, since the re-derivation only saw part of the document.
+
+    Args:
+        base: Outputs of the previous run
+        delta: Outputs derived from the changed sections only
+        affected: Added, removed and changed section codes
+        section_codes: Every section code of either version
+
+    Returns:
+        The merged outputs
+    """
+    if isinstance(base, dict) and isinstance(delta, dict):
+        merged = {}
+        for key, value in base.items():
+            if key in affected:
+                if key in delta:
+                    merged[key] = delta[key]
+            else:
+                # A key the re-derivation did not produce still loses its affected items
+                merged[key] = merge_outputs(value, delta.get(key, _empty_like(value)), affected, section_codes)
+        for key, value in delta.items():
+            if key not in base:
+                merged[key] = value
+        return merged
+
+    if isinstance(base, list) and isinstance(delta, list):
+        kept = [item for item in base if _item_section(item, section_codes) not in affected]
+        seen = {_fingerprint(item) for item in kept}
+        for item in delta:
+            if _item_section(item, section_codes) is not None or _fingerprint(item) not in seen:
+                kept.append(item)
+                seen.add(_fingerprint(item))
+        return kept
+
+    return base if base is not None else delta
+
+
+def _empty_like(value: Any) -> Any:
+    return type(value)() if isinstance(value, (dict, list)) else None
+
+
+def _item_section(item: Any, section_codes: Set[str]) -> Optional[str]:
+    if not isinstance(item, dict):
+        return None
+    for key in REFERENCE_KEYS:
+        if key in item:
+            return section_of(item[key], section_codes)
+    return None
+
+
+def _fingerprint(item: Any) -> str:
+    return json.dumps(item, sort_keys=True, default=str)
@@ -0,0 +1,241 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+
+from ..utils.events import JOB_END, JOB_START, event_tags, publish_event
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class Job:
+    """A unit of work submitted to a JobQueue and its outcome."""
+
+    def __init__(self, run: Callable[[], Awaitable[Any]], cleanup: Optional[Callable[[], None]],
+                 metadata: Dict[str, Any]):
+        self.job_id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.metadata = metadata
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+
+        self._run = run
+        self._cleanup = cleanup
+        self._task: Optional[asyncio.Task] = None
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def _finish(self, status: str, result: Any = None, error: Optional[str] = None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self._run = None
+        if self._cleanup is not None:
+            try:
+                self._cleanup()
+            except Exception as e:
+                logger.warning("Cleanup of job %s failed: %s", self.job_id, e)
+            self._cleanup = None
+        self._done.set()
+        publish_event(JOB_END, job_id=self.job_id, status=status, error=error)
+
+    async def wait(self) -> 'Job':
+        """Wait until the job has finished, however it ended."""
+        await self._done.wait()
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the job's state, with its result once it has succeeded."""
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            **self.metadata,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class JobQueue:
+    """
+    Bounded asyncio job queue with a fixed pool of workers.
+
+    Jobs are coroutines run on the event loop by ``workers`` worker tasks,
+    so long-running jobs never block request handling. Events published
+    while a job runs are tagged with its ``job_id``. At most
+    ``max_queued`` jobs wait for a worker; submitting more raises
+    JobQueueFull, which callers surface as backpressure. Queued and running
+    jobs can be cancelled; a cancelled queued job frees its slot at once. Finished jobs are kept for lookup until
+    ``retention`` newer jobs have finished.
+    """
+
+    def __init__(self, workers: int = 2, max_queued: int = 20, retention: int = 200):
+        """
+        Initialize the queue (call start() on the event loop before submitting).
+
+        Args:
+            workers: Jobs run at once
+            max_queued: Jobs waiting for a worker before submissions are refused
+            retention: Finished jobs kept for lookup
+        """
+        self.workers = max(1, int(workers))
+        self.max_queued = max(1, int(max_queued))
+        self.retention = max(1, int(retention))
+
+        self._jobs: Dict[str, Job] = {}
+        self._finished: deque = deque()
+        self._queue: Optional[asyncio.Queue] = None
+        # Jobs waiting for a worker; cancelled ones stay in _queue until a worker skips them
+        self._queued = 0
+        self._worker_tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_config(cls, jobs_config: Optional[Dict[str, Any]]) -> 'JobQueue':
+        """Create a queue from the execution.jobs section of workflow_config.yaml."""
+        jobs_config = jobs_config or {}
+        return cls(
+            workers=jobs_config.get('workers', 2),
+            max_queued=jobs_config.get('max_queued', 20),
+            retention=jobs_config.get('retention', 200)
+        )
+
+    async def start(self):
+        """Start the worker tasks on the running event loop."""
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [asyncio.create_task(self._worker(), name=f'job-worker-{index}')
+                              for index in range(self.workers)]
+        logger.info("Job queue started with %d workers, %d queue slots", self.workers, self.max_queued)
+
+    async def stop(self):
+        """Cancel every unfinished job and stop the workers."""
+        for job in list(self._jobs.values()):
+            self.cancel(job.job_id)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, run: Callable[[], Awaitable[Any]], cleanup: Optional[Callable[[], None]] = None,
+               **metadata: Any) -> Job:
+        """
+        Queue a job.
+
+        Args:
+            run: Coroutine function doing the work; its return value is the job result
+            cleanup: Called once when the job finishes, including when it is
+                cancelled before starting (e.g. to delete its input file)
+            **metadata: Extra fields reported with the job's state
+
+        Returns:
+            The queued job
+
+        Raises:
+            JobQueueFull: If max_queued jobs are already waiting
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not started")
+
+        if self._queued >= self.max_queued:
+            raise JobQueueFull(f"{self.max_queued} jobs are already queued")
+
+        job = Job(run, cleanup, metadata)
+        self._queue.put_nowait(job)
+        self._queued += 1
+        self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Get a queued, running or retained finished job."""
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job.
+
+        A queued job is finished as cancelled straight away; a running job is
+        cancelled at its next await.
+
+        Returns:
+            False if the job is unknown or has already finished
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+
+        if job._task is not None:
+            job._task.cancel()
+        else:
+            self._queued -= 1
+            job._finish(CANCELLED)
+            self._retain(job)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """Count the jobs by status, and the workers and queue slots."""
+        counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED_STATUSES}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {**counts, 'workers': self.workers, 'max_queued': self.max_queued}
+
+    def _retain(self, job: Job):
+        """Keep a finished job for lookup, dropping the oldest beyond retention."""
+        self._finished.append(job.job_id)
+        while len(self._finished) > self.retention:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                if not job.finished:
+                    self._queued -= 1
+                    await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: Job):
+        job.status = RUNNING
+        job.started_at = time.time()
+        publish_event(JOB_START, job_id=job.job_id)
+        # The job's workflow events carry its id, for GET /jobs/{id}/events
+        with event_tags(job_id=job.job_id):
+            job._task = asyncio.create_task(job._run())
+        try:
+            result = await job._task
+        except asyncio.CancelledError:
+            job._finish(CANCELLED)
+            # Re-raise when the worker itself is being stopped
+            if asyncio.current_task().cancelling():
+                raise
+        except Exception as e:
+            logger.exception("Job %s failed", job.job_id)
+            job._finish(FAILED, error=str(e))
+        else:
+            job._finish(SUCCEEDED, result=result)
+        finally:
+            self._retain(job)
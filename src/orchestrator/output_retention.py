@@ -0,0 +1,200 @@
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RunDirectorySweeper:
+    """
+    Garbage-collects per-run output directories.
+
+    Each workflow run writes to its own ``<runs_dir>/<run_id>/`` directory.
+    A sweep deletes run directories older than ``max_age_seconds``, then the
+    oldest remaining ones until the total size is within ``max_total_bytes``.
+    Directories of runs still in progress are never deleted. Checkpoint
+    stores handed to track_checkpoints() are pruned on the same schedule.
+    """
+
+    def __init__(
+        self,
+        runs_dir: str,
+        max_age_seconds: Optional[float] = 7 * 24 * 3600,
+        max_total_bytes: Optional[int] = 1024 * 1024 * 1024,
+        sweep_interval_seconds: float = 3600
+    ):
+        """
+        Initialize the sweeper.
+
+        Args:
+            runs_dir: Directory containing one subdirectory per run
+            max_age_seconds: Delete runs older than this (None for no age limit)
+            max_total_bytes: Keep total run output below this (None for no size limit)
+            sweep_interval_seconds: Pause between background sweeps
+        """
+        self.runs_dir = Path(runs_dir)
+        self.max_age_seconds = max_age_seconds
+        self.max_total_bytes = max_total_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        self._lock = threading.Lock()
+        self._active_runs: Set[str] = set()
+        self._checkpoint_stores: Dict[str, Any] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def mark_active(self, run_id: str):
+        """Protect a run's directory from sweeps while it is running."""
+        with self._lock:
+            self._active_runs.add(run_id)
+
+    def mark_finished(self, run_id: str):
+        """Make a finished run's directory eligible for sweeps."""
+        with self._lock:
+            self._active_runs.discard(run_id)
+
+    def track_checkpoints(self, store: Any):
+        """Prune a CheckpointStore on every sweep (once per checkpoint directory)."""
+        with self._lock:
+            self._checkpoint_stores.setdefault(str(store.directory.resolve()), store)
+
+    @staticmethod
+    def _directory_stats(path: Path) -> Tuple[float, int]:
+        """Get the latest modification time and total size of the files under a directory."""
+        modified = path.stat().st_mtime
+        total = 0
+        for item in path.rglob('*'):
+            try:
+                if item.is_file():
+                    stat = item.stat()
+                    modified = max(modified, stat.st_mtime)
+                    total += stat.st_size
+            except OSError:
+                continue
+        return modified, total
+
+    def _run_directories(self) -> List[Tuple[Path, float, int]]:
+        """Get (path, last modified, size) for every inactive run directory, oldest first."""
+        if not self.runs_dir.exists():
+            return []
+
+        with self._lock:
+            active = set(self._active_runs)
+
+        runs = []
+        for path in self.runs_dir.iterdir():
+            if not path.is_dir() or path.name in active:
+                continue
+            try:
+                runs.append((path, *self._directory_stats(path)))
+            except OSError:
+                continue
+        return sorted(runs, key=lambda run: run[1])
+
+    def sweep(self) -> Dict[str, Any]:
+        """
+        Delete expired run directories and enforce the size limit, then
+        prune the tracked checkpoint stores.
+
+        Returns:
+            Names of the deleted runs, the bytes freed and the IDs of the
+            pruned checkpoints
+        """
+        runs = self._run_directories()
+        now = time.time()
+        doomed = []
+
+        if self.max_age_seconds is not None:
+            doomed = [run for run in runs if now - run[1] > self.max_age_seconds]
+            runs = [run for run in runs if run not in doomed]
+
+        if self.max_total_bytes is not None:
+            total_bytes = sum(size for _, _, size in runs)
+            for run in runs:
+                if total_bytes <= self.max_total_bytes:
+                    break
+                doomed.append(run)
+                total_bytes -= run[2]
+
+        deleted = []
+        freed = 0
+        for path, _, size in doomed:
+            try:
+                shutil.rmtree(path)
+                deleted.append(path.name)
+                freed += size
+            except OSError as e:
+                logger.warning(f"Could not delete run output {path}: {e}")
+
+        if deleted:
+            logger.info(f"Output sweep removed {len(deleted)} run directories ({freed} bytes)")
+
+        with self._lock:
+            stores = list(self._checkpoint_stores.values())
+        pruned = []
+        for store in stores:
+            pruned.extend(store.prune()['deleted_runs'])
+        return {'deleted_runs': deleted, 'bytes_freed': freed, 'pruned_checkpoints': pruned}
+
+    def start(self):
+        """Start sweeping periodically in a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sweep_loop, name='output-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background sweeper."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _sweep_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Output sweep failed: {e}")
+            self._stop.wait(self.sweep_interval_seconds)
+
+
+_sweepers: Dict[str, RunDirectorySweeper] = {}
+_sweepers_lock = threading.Lock()
+
+
+def get_run_sweeper(runs_dir: str, retention_config: Optional[Dict[str, Any]]) -> RunDirectorySweeper:
+    """
+    Get the process-wide sweeper for a runs directory, starting it if configured.
+
+    Orchestrators writing to the same directory share one sweeper, so it knows
+    about every active run in the process.
+
+    Args:
+        runs_dir: Directory containing one subdirectory per run
+        retention_config: The ``execution.output_retention`` section of workflow_config.yaml
+
+    Returns:
+        Shared RunDirectorySweeper
+    """
+    retention_config = retention_config or {}
+    key = str(Path(runs_dir).resolve())
+
+    with _sweepers_lock:
+        sweeper = _sweepers.get(key)
+        if sweeper is None:
+            sweeper = RunDirectorySweeper(
+                runs_dir,
+                max_age_seconds=retention_config.get('max_age_seconds', 7 * 24 * 3600),
+                max_total_bytes=retention_config.get('max_total_bytes', 1024 * 1024 * 1024),
+                sweep_interval_seconds=retention_config.get('sweep_interval_seconds', 3600)
+            )
+            _sweepers[key] = sweeper
+        if retention_config.get('enabled', True):
+            sweeper.start()
+        return sweeper
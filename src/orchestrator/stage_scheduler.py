@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Any, List, Set, Callable, Optional, Awaitable
+
+logger = logging.getLogger(__name__)
+
+
+class StageGraph:
+    """Dependency graph of workflow stages built from their ``depends_on`` lists."""
+
+    def __init__(self, stages: List[Dict[str, Any]]):
+        """
+        Build and validate the stage graph.
+
+        Args:
+            stages: Stage definitions from workflow_config.yaml
+
+        Raises:
+            ValueError: If a stage is duplicated, depends on an unknown stage,
+                or the dependencies contain a cycle
+        """
+        self.order: List[str] = []
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+        for stage in stages:
+            name = stage['name']
+            if name in self.stages:
+                raise ValueError(f"Duplicate stage name: {name}")
+            self.stages[name] = stage
+            self.order.append(name)
+
+        self.dependencies: Dict[str, Set[str]] = {}
+        self.dependents: Dict[str, Set[str]] = {name: set() for name in self.order}
+
+        for name in self.order:
+            depends_on = set(self.stages[name].get('depends_on', []) or [])
+            unknown = depends_on - set(self.stages)
+            if unknown:
+                raise ValueError(f"Stage {name} depends on unknown stages: {sorted(unknown)}")
+            self.dependencies[name] = depends_on
+            for dependency in depends_on:
+                self.dependents[dependency].add(name)
+
+        self._topological_order = self._sort()
+        self._ancestors: Dict[str, Set[str]] = {}
+        for name in self._topological_order:
+            ancestors = set()
+            for dependency in self.dependencies[name]:
+                ancestors.add(dependency)
+                ancestors |= self._ancestors[dependency]
+            self._ancestors[name] = ancestors
+
+    def _sort(self) -> List[str]:
+        """Topologically sort stages, keeping config order among independent stages."""
+        remaining = {name: set(deps) for name, deps in self.dependencies.items()}
+        ordered = []
+
+        while remaining:
+            ready = [name for name in self.order if name in remaining and not remaining[name]]
+            if not ready:
+                raise ValueError(f"Circular stage dependencies between: {sorted(remaining)}")
+            for name in ready:
+                ordered.append(name)
+                del remaining[name]
+                for dependent in self.dependents[name]:
+                    if dependent in remaining:
+                        remaining[dependent].discard(name)
+
+        return ordered
+
+    def topological_order(self) -> List[str]:
+        """Get stage names in an order that respects all dependencies."""
+        return list(self._topological_order)
+
+    def ancestors(self, stage_name: str) -> Set[str]:
+        """Get every stage that the given stage depends on, directly or transitively."""
+        return set(self._ancestors[stage_name])
+
+    def descendants(self, stage_name: str) -> Set[str]:
+        """Get every stage that depends on the given stage, directly or transitively."""
+        return {name for name, ancestors in self._ancestors.items() if stage_name in ancestors}
+
+    def is_parallel(self, stage_name: str) -> bool:
+        """Whether the stage may overlap other stages and fan out its agents."""
+        return bool(self.stages[stage_name].get('parallel', True))
+
+    def ready_stages(self, completed: Set[str], scheduled: Set[str]) -> List[str]:
+        """
+        Get stages whose dependencies have all completed.
+
+        Args:
+            completed: Names of stages that finished successfully
+            scheduled: Names of stages already started, finished or skipped
+
+        Returns:
+            Ready stage names in config order
+        """
+        return [
+            name for name in self.order
+            if name not in scheduled and self.dependencies[name] <= completed
+        ]
+
+
+class StageScheduler:
+    """Runs workflow stages on a worker pool as soon as their dependencies finish.
+
+    Stages marked ``parallel: false`` act as barriers: they only start once
+    nothing else is running, and nothing else starts until they finish.
+    """
+
+    def __init__(self, graph: StageGraph, max_workers: int = 4, continue_on_error: bool = False):
+        """
+        Initialize the scheduler.
+
+        Args:
+            graph: Stage dependency graph
+            max_workers: Maximum number of stages running at once
+            continue_on_error: Keep scheduling independent stages after a failure
+        """
+        self.graph = graph
+        self.max_workers = max(1, int(max_workers))
+        self.continue_on_error = continue_on_error
+
+    def run(
+        self,
+        execute_stage: Callable[[Dict[str, Any]], Dict[str, Any]],
+        on_stage_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+        completed: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute all stages in dependency order.
+
+        Args:
+            execute_stage: Called in a worker thread with a stage config; returns the stage result
+            on_stage_complete: Called in the scheduling thread with each stage result
+            completed: Results of stages already finished (e.g. restored from a
+                checkpoint); these are not run again
+
+        Returns:
+            Stage results in config order
+        """
+        state = _RunState(completed)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as pool:
+            while True:
+                for name in self._next_stages(state, list(running.values()), on_stage_complete):
+                    # Run in a copy of the caller's context so context-local settings
+                    # (e.g. the LLM priority lane) follow the stage into the pool
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, execute_stage, self.graph.stages[name])] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = self._failed_result(name, e)
+                    self._settle(state, name, result, on_stage_complete)
+
+        return [state.results[name] for name in self.graph.order if name in state.results]
+
+    async def arun(
+        self,
+        execute_stage: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        on_stage_complete: Optional[Callable[[Dict[str, Any]], None]] = None,
+        completed: Optional[Dict[str, Dict[str, Any]]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute all stages in dependency order as asyncio tasks.
+
+        Args:
+            execute_stage: Coroutine function called with a stage config; returns the stage result
+            on_stage_complete: Called on the event loop with each stage result
+            completed: Results of stages already finished (e.g. restored from a
+                checkpoint); these are not run again
+
+        Returns:
+            Stage results in config order
+        """
+        state = _RunState(completed)
+        running = {}
+
+        try:
+            while True:
+                for name in self._next_stages(state, list(running.values()), on_stage_complete):
+                    task = asyncio.create_task(execute_stage(self.graph.stages[name]), name=f'stage-{name}')
+                    running[task] = name
+
+                if not running:
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        result = self._failed_result(name, e)
+                    self._settle(state, name, result, on_stage_complete)
+        finally:
+            # Cancelled (e.g. the job was): stop the stages still running with it
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        return [state.results[name] for name in self.graph.order if name in state.results]
+
+    def _next_stages(
+        self,
+        state: '_RunState',
+        running: List[str],
+        on_stage_complete: Optional[Callable[[Dict[str, Any]], None]]
+    ) -> List[str]:
+        """Skip stages blocked by failures and pick the ready stages to start now."""
+        if state.halted:
+            return []
+
+        for name in self._blocked_stages(state.failed, state.scheduled):
+            state.scheduled.add(name)
+            state.results[name] = self._skipped_result(name, state.failed)
+            if on_stage_complete:
+                on_stage_complete(state.results[name])
+
+        starting = []
+        for name in self.graph.ready_stages(state.completed, state.scheduled):
+            active = running + starting
+            if len(active) >= self.max_workers or self._running_exclusive(active):
+                break
+            exclusive = not self.graph.is_parallel(name)
+            if exclusive and active:
+                continue
+            state.scheduled.add(name)
+            logger.info(f"Scheduling stage: {name}")
+            starting.append(name)
+            if exclusive:
+                break
+
+        return starting
+
+    def _settle(
+        self,
+        state: '_RunState',
+        stage_name: str,
+        result: Dict[str, Any],
+        on_stage_complete: Optional[Callable[[Dict[str, Any]], None]]
+    ):
+        """Record a finished stage and halt the run on failure unless continuing on error."""
+        state.results[stage_name] = result
+
+        if result.get('status') == 'success':
+            state.completed.add(stage_name)
+        else:
+            state.failed.add(stage_name)
+            if not self.continue_on_error:
+                state.halted = True
+
+        if on_stage_complete:
+            on_stage_complete(result)
+
+    def _running_exclusive(self, running: List[str]) -> bool:
+        """Whether any running stage is a barrier stage."""
+        return any(not self.graph.is_parallel(name) for name in running)
+
+    def _blocked_stages(self, failed: Set[str], scheduled: Set[str]) -> List[str]:
+        """Get unscheduled stages that can never run because an ancestor failed."""
+        return [
+            name for name in self.graph.order
+            if name not in scheduled and self.graph.ancestors(name) & failed
+        ]
+
+    def _failed_result(self, stage_name: str, error: Exception) -> Dict[str, Any]:
+        """Build the result record for a stage whose executor raised."""
+        return {
+            'name': stage_name,
+            'status': 'failed',
+            'duration_seconds': 0,
+            'error': str(error),
+            'outputs': {}
+        }
+
+    def _skipped_result(self, stage_name: str, failed: Set[str]) -> Dict[str, Any]:
+        """Build the result record for a stage skipped due to upstream failure."""
+        upstream = sorted(self.graph.ancestors(stage_name) & failed)
+        return {
+            'name': stage_name,
+            'status': 'skipped',
+            'duration_seconds': 0,
+            'error': f"Upstream stage failed: {', '.join(upstream)}",
+            'outputs': {}
+        }
+
+
+class _RunState:
+    """Bookkeeping for one scheduler run."""
+
+    def __init__(self, completed: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.results: Dict[str, Dict[str, Any]] = dict(completed or {})
+        self.completed: Set[str] = set(self.results)
+        self.scheduled: Set[str] = set(self.results)
+        self.failed: Set[str] = set()
+        self.halted = False
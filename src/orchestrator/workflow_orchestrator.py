@@ -1,8 +1,13 @@
 import os
 import yaml
 import time
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+import contextvars
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Set, Tuple
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
@@ -15,8 +20,24 @@ from ..agents import (
     ConsolidationAgent
 )
 from ..utils.output_formatter import OutputFormatter
+from ..utils.logging_config import configure_logging
+from ..utils.telemetry import RunTelemetry, telemetry_scope
+from ..utils.events import RUN_END, RUN_START, STAGE_END, STAGE_START, publish_event
+from ..utils.tracing import JsonlSpanSink, create_span_sink, current_span, trace_span
+from ..utils.chunking import id_renames, rename_ids
+from .stage_scheduler import StageGraph, StageScheduler
+from .checkpoint_store import CheckpointStore, compute_input_hash, new_run_id
+from .output_retention import get_run_sweeper
+from .incremental import (
+    load_policy_text,
+    section_hashes,
+    diff_sections,
+    affected_sections,
+    delta_document,
+    merge_outputs
+)
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -44,10 +65,33 @@ class WorkflowOrchestrator:
         self.agent_config = self._load_config(config_dir / 'agent_config.yaml')
         self.workflow_config = self._load_config(config_dir / 'workflow_config.yaml')
         
+        # Levels, per-module verbosity and the background log writer
+        configure_logging(self.agent_config.get('logging'))
+        
+        # Build the stage dependency graph (validates depends_on up front)
+        self.stage_graph = StageGraph(self.workflow_config['workflow']['stages'])
+        
         # Initialize agents
         self.agents = self._initialize_agents()
         
-        # Workflow state
+        # Per-run stage checkpoints (None when disabled)
+        self.checkpoints = self._initialize_checkpoints()
+        
+        # Each run writes to its own <runs_dir>/<run_id>/ directory; old runs are swept
+        execution_config = self.workflow_config.get('execution', {})
+        self.runs_dir = self._resolve_path(execution_config.get('output_dir', 'data/output')) / 'runs'
+        self.sweeper = get_run_sweeper(str(self.runs_dir), execution_config.get('output_retention'))
+        if self.checkpoints is not None:
+            self.sweeper.track_checkpoints(self.checkpoints)
+        
+        # Section-level re-analysis of amended documents (see run_incremental)
+        self.incremental_config = execution_config.get('incremental', {})
+        
+        # Per-run span traces (see src/utils/tracing.py)
+        self.tracing_config = execution_config.get('tracing', {})
+        
+        # State of the most recently started run; concurrent runs keep their own
+        self.run_id: Optional[str] = None
         self.workflow_state: Dict[str, Any] = {}
         self.execution_history: List[Dict[str, Any]] = []
         
@@ -61,7 +105,16 @@ class WorkflowOrchestrator:
     
     def _initialize_agents(self) -> Dict[str, Any]:
         """Initialize all agents with their configurations."""
-        llm_config = self.agent_config.get('llm', {})
+        llm_config = {
+            **self.agent_config.get('llm', {}),
+            'cache': self.agent_config.get('cache'),
+            'client': self.agent_config.get('client'),
+            'rate_limits': self.agent_config.get('rate_limits'),
+            'chunking': self.agent_config.get('chunking'),
+            'pricing': self.agent_config.get('pricing'),
+            'execution_history': self.agent_config.get('execution_history'),
+            'structured_output': self.agent_config.get('structured_output')
+        }
         agent_configs = self.agent_config.get('agents', {})
         
         agents = {
@@ -88,6 +141,25 @@ class WorkflowOrchestrator:
         }
         return agents
     
+    def _initialize_checkpoints(self) -> Optional[CheckpointStore]:
+        """Create the checkpoint store from the execution config."""
+        checkpoint_config = self.workflow_config.get('execution', {}).get('checkpoints', {})
+        if not checkpoint_config.get('enabled', False):
+            return None
+        
+        return CheckpointStore(
+            str(self._resolve_path(checkpoint_config.get('directory', 'data/checkpoints'))),
+            max_age_seconds=checkpoint_config.get('max_age_seconds'),
+            max_total_bytes=checkpoint_config.get('max_total_bytes')
+        )
+    
+    def _resolve_path(self, path: str) -> Path:
+        """Resolve a configured path relative to the project root."""
+        path = Path(path)
+        if not path.is_absolute():
+            path = Path(__file__).parent.parent.parent / path
+        return path
+    
     def run_workflow(self, policy_document_path: str, policy_document_content: str = None, detected_visa_type: str = None, detected_visa_code: str = None, force_visa_type: bool = False) -> Dict[str, Any]:
         """
         Run the complete workflow for processing a policy document.
@@ -99,42 +171,199 @@ class WorkflowOrchestrator:
         Returns:
             Dictionary containing workflow results
         """
-        # CRITICAL DEBUG - This should ALWAYS appear
-        print(f"DEBUG: ===== WORKFLOW ORCHESTRATOR CALLED =====")
-        print(f"DEBUG: WorkflowOrchestrator.run_workflow() called")
-        print(f"DEBUG: policy_document_path: {policy_document_path}")
-        print(f"DEBUG: Policy content provided: {len(policy_document_content) if policy_document_content else 0} characters")
-        if policy_document_content:
-            print(f"DEBUG: First 300 chars of content: {policy_document_content[:300]}")
-            print(f"DEBUG: Contains 'Working Holiday': {'Working Holiday' in policy_document_content}")
-            print(f"DEBUG: Contains 'Skilled Migrant': {'Skilled Migrant' in policy_document_content}")
-            print(f"DEBUG: Contains 'Parent': {'Parent' in policy_document_content}")
-        print(f"DEBUG: ==========================================")
         workflow_start = time.time()
+        run = self._start_workflow(
+            policy_document_path, policy_document_content, detected_visa_type, detected_visa_code, force_visa_type
+        )
         
-        # Set output directory FIRST
-        project_root = Path(__file__).parent.parent.parent
-        output_dir = project_root / 'data' / 'output'
-        output_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            with self._run_span(run, 'full'):
+                self._create_checkpoint(
+                    run, policy_document_path, policy_document_content, detected_visa_type, detected_visa_code, force_visa_type
+                )
+                stage_results = self._run_stages(run)
+                return self._finish_workflow(run, stage_results, workflow_start)
+        finally:
+            self.sweeper.mark_finished(run.run_id)
+    
+    def resume_workflow(self, run_id: str) -> Dict[str, Any]:
+        """
+        Resume a checkpointed run, executing only the stages that did not finish.
+        
+        Outputs of finished stages are reloaded into the workflow state and
+        output directory instead of calling their agents again.
+        
+        Args:
+            run_id: ID of the run to resume (returned as ``run_id`` by run_workflow)
+            
+        Returns:
+            Dictionary containing workflow results
+        """
+        workflow_start = time.time()
+        run, completed = self._resume_checkpoint(run_id)
+        
+        try:
+            with self._run_span(run, 'resume'):
+                stage_results = self._run_stages(run, completed)
+                return self._finish_workflow(run, stage_results, workflow_start)
+        finally:
+            self.sweeper.mark_finished(run.run_id)
+    
+    def run_incremental(self, policy_document_path: str, policy_document_content: str = None, base_run_id: str = None, detected_visa_type: str = None, detected_visa_code: str = None, force_visa_type: bool = False) -> Dict[str, Any]:
+        """
+        Re-run the workflow on an amended policy document, redoing only what changed.
+        
+        The document's sections are hashed and diffed against a previous
+        successful run on the same document. The stages listed in
+        execution.incremental.delta_stages run only on the added and changed
+        sections, and their outputs are merged with the previous run's: items
+        that reference unchanged sections are kept, items that reference
+        changed or removed sections are replaced. The remaining stages then
+        run on the merged state as usual. Falls back to run_workflow when there
+        is no previous run to diff against.
+        
+        Args:
+            policy_document_path: Path to the policy document
+            policy_document_content: Direct content of the policy document (optional)
+            base_run_id: Run to diff against (default: the latest successful run on the document)
+            
+        Returns:
+            Dictionary containing workflow results, with an 'incremental' summary
+        """
+        params = (policy_document_path, policy_document_content, detected_visa_type, detected_visa_code, force_visa_type)
+        base = self._find_incremental_base(base_run_id, *params)
+        if base is None:
+            return self.run_workflow(*params)
+        
+        workflow_start = time.time()
+        run = self._start_workflow(*params)
+        
+        try:
+            with self._run_span(run, 'incremental'):
+                completed = self._start_incremental(run, *base, *params)
+                stage_results = self._run_stages(run, completed)
+                results = self._finish_workflow(run, stage_results, workflow_start)
+                results['incremental'] = run.incremental.summary()
+                return results
+        finally:
+            self.sweeper.mark_finished(run.run_id)
+    
+    def _run_stages(self, run: '_WorkflowRun',
+                    completed: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Run every stage not already completed on the stage scheduler."""
+        def execute_stage(stage: Dict[str, Any]) -> Dict[str, Any]:
+            self._log_stage_banner(stage)
+            publish_event(STAGE_START, run_id=run.run_id, stage=stage['name'], agents=stage['agents'])
+            with telemetry_scope(run.telemetry, stage['name']), self._stage_span(stage):
+                return self._execute_stage(stage, run)
+        
+        return self._create_scheduler().run(execute_stage, partial(self._on_stage_complete, run), completed)
+    
+    async def arun_workflow(self, policy_document_path: str, policy_document_content: str = None, detected_visa_type: str = None, detected_visa_code: str = None, force_visa_type: bool = False) -> Dict[str, Any]:
+        """
+        Run the complete workflow on the event loop.
+        
+        Stages run as asyncio tasks and agents use aexecute(), so independent
+        LLM calls within and across stages are in flight together.
+        
+        Args:
+            policy_document_path: Path to the policy document
+            policy_document_content: Direct content of the policy document (optional)
+            
+        Returns:
+            Dictionary containing workflow results
+        """
+        workflow_start = time.time()
+        run = self._start_workflow(
+            policy_document_path, policy_document_content, detected_visa_type, detected_visa_code, force_visa_type
+        )
+        
+        try:
+            with self._run_span(run, 'full'):
+                self._create_checkpoint(
+                    run, policy_document_path, policy_document_content, detected_visa_type, detected_visa_code, force_visa_type
+                )
+                stage_results = await self._arun_stages(run)
+                return self._finish_workflow(run, stage_results, workflow_start)
+        finally:
+            self.sweeper.mark_finished(run.run_id)
+    
+    async def aresume_workflow(self, run_id: str) -> Dict[str, Any]:
+        """
+        Resume a checkpointed run on the event loop.
+        
+        Args:
+            run_id: ID of the run to resume (returned as ``run_id`` by run_workflow)
+            
+        Returns:
+            Dictionary containing workflow results
+        """
+        workflow_start = time.time()
+        run, completed = self._resume_checkpoint(run_id)
+        
+        try:
+            with self._run_span(run, 'resume'):
+                stage_results = await self._arun_stages(run, completed)
+                return self._finish_workflow(run, stage_results, workflow_start)
+        finally:
+            self.sweeper.mark_finished(run.run_id)
+    
+    async def arun_incremental(self, policy_document_path: str, policy_document_content: str = None, base_run_id: str = None, detected_visa_type: str = None, detected_visa_code: str = None, force_visa_type: bool = False) -> Dict[str, Any]:
+        """
+        Re-run the workflow on an amended policy document on the event loop.
+        
+        See run_incremental.
+        
+        Returns:
+            Dictionary containing workflow results, with an 'incremental' summary
+        """
+        params = (policy_document_path, policy_document_content, detected_visa_type, detected_visa_code, force_visa_type)
+        base = self._find_incremental_base(base_run_id, *params)
+        if base is None:
+            return await self.arun_workflow(*params)
+        
+        workflow_start = time.time()
+        run = self._start_workflow(*params)
         
-        # NUCLEAR CACHE CLEARING - Delete ALL cached output files before execution
-        import shutil
-        print(" NUCLEAR ORCHESTRATOR CACHE CLEARING ", flush=True)
-        if output_dir.exists():
-            for item in output_dir.iterdir():
-                if item.is_dir() and item.name != '.git':
-                    shutil.rmtree(item)
-                    print(f" DELETED CACHED DIR: {item} ", flush=True)
-                elif item.is_file() and item.name != '.gitkeep':
-                    item.unlink()
-                    print(f" DELETED CACHED FILE: {item} ", flush=True)
-        print(" ALL ORCHESTRATOR CACHE CLEARED - FORCING FRESH AGENT EXECUTION ", flush=True)
+        try:
+            with self._run_span(run, 'incremental'):
+                completed = self._start_incremental(run, *base, *params)
+                stage_results = await self._arun_stages(run, completed)
+                results = self._finish_workflow(run, stage_results, workflow_start)
+                results['incremental'] = run.incremental.summary()
+                return results
+        finally:
+            self.sweeper.mark_finished(run.run_id)
+    
+    async def _arun_stages(self, run: '_WorkflowRun',
+                           completed: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Run every stage not already completed as asyncio tasks."""
+        async def execute_stage(stage: Dict[str, Any]) -> Dict[str, Any]:
+            self._log_stage_banner(stage)
+            publish_event(STAGE_START, run_id=run.run_id, stage=stage['name'], agents=stage['agents'])
+            with telemetry_scope(run.telemetry, stage['name']), self._stage_span(stage):
+                return await self._aexecute_stage(stage, run)
+        
+        return await self._create_scheduler().arun(execute_stage, partial(self._on_stage_complete, run), completed)
+    
+    def _start_workflow(self, policy_document_path: str, policy_document_content: Optional[str],
+                        detected_visa_type: Optional[str], detected_visa_code: Optional[str],
+                        force_visa_type: bool, run_id: Optional[str] = None) -> '_WorkflowRun':
+        """Create the state and output directory of a run."""
+        run_id = run_id or new_run_id()
+        
+        # Every run gets its own output directory, so concurrent runs never collide
+        output_dir = self.runs_dir / run_id
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.sweeper.mark_active(run_id)
         
         logger.info("Starting Visa Requirements Workflow")
+        logger.info("Run %s writing outputs to %s", run_id, output_dir)
         logger.info("=" * 80)
         
         # Initialize workflow state
-        self.workflow_state = {
+        run = _WorkflowRun(run_id, output_dir, {
+            'run_id': run_id,
             'policy_document_path': policy_document_path,
             'policy_document': policy_document_content,  # Add direct content
             'output_dir': str(output_dir),
@@ -143,146 +372,508 @@ class WorkflowOrchestrator:
             'detected_visa_type': detected_visa_type,
             'detected_visa_code': detected_visa_code,
             'force_visa_type': force_visa_type
-        }
+        })
+        run.trace_sink = create_span_sink(self.tracing_config, output_dir)
+        self.run_id = run.run_id
+        self.workflow_state = run.state
+        publish_event(RUN_START, run_id=run_id, stages=list(self.stage_graph.order))
         
         # Log hybrid approach information
         if detected_visa_type and force_visa_type:
-            print(f" ORCHESTRATOR: HYBRID MODE - Using detected visa type: {detected_visa_type} ({detected_visa_code}) ", flush=True)
+            logger.info("Hybrid mode - using detected visa type: %s (%s)", detected_visa_type, detected_visa_code)
         else:
-            print(f" ORCHESTRATOR: STANDARD MODE - No visa type hints provided ", flush=True)
+            logger.info("Standard mode - no visa type hints provided")
         
-        # Execute stages
-        stages = self.workflow_config['workflow']['stages']
-        stage_results = []
+        return run
+    
+    def _run_span(self, run: '_WorkflowRun', mode: str):
+        """Open the root span of a run's trace."""
+        return trace_span(
+            'workflow.run',
+            run.trace_sink,
+            run_id=run.run_id,
+            mode=mode,
+            policy_document_path=run.state.get('policy_document_path'),
+            policy_chars=len(run.state.get('policy_document') or ''),
+            detected_visa_type=run.state.get('detected_visa_type')
+        )
+    
+    def _stage_span(self, stage: Dict[str, Any]):
+        """Open the span of one stage under its run's span."""
+        return trace_span('workflow.stage', stage=stage['name'], agents=stage['agents'],
+                          parallel=stage.get('parallel', True))
+    
+    def _create_checkpoint(self, run: '_WorkflowRun', policy_document_path: str,
+                           policy_document_content: Optional[str], detected_visa_type: Optional[str],
+                           detected_visa_code: Optional[str], force_visa_type: bool,
+                           extra: Optional[Dict[str, Any]] = None):
+        """Start the checkpoint for a run, with the section hashes later incremental runs diff against."""
+        if self.checkpoints is None:
+            return
+        
+        extra = dict(extra or {})
+        if 'section_hashes' not in extra and self.incremental_config.get('enabled', False):
+            try:
+                hashes = section_hashes(load_policy_text(policy_document_path, policy_document_content))
+                if hashes:
+                    extra['section_hashes'] = hashes
+            except Exception as e:
+                logger.warning(f"Could not hash the sections of {policy_document_path}: {e}")
+        
+        self.checkpoints.create(run.run_id, {
+            'policy_document_path': policy_document_path,
+            'policy_document_content': policy_document_content,
+            'detected_visa_type': detected_visa_type,
+            'detected_visa_code': detected_visa_code,
+            'force_visa_type': force_visa_type
+        }, extra)
+        logger.info("Checkpointing run %s", run.run_id)
+    
+    def _resume_checkpoint(self, run_id: str) -> Tuple['_WorkflowRun', Dict[str, Dict[str, Any]]]:
+        """
+        Restart the workflow state of a checkpointed run.
         
-        for stage in stages:
-            stage_name = stage['name']
-            logger.info(f"\n{'=' * 80}")
-            logger.info(f"Stage: {stage_name.upper()}")
-            logger.info(f"{'=' * 80}")
+        Returns:
+            The run and the stage results restored from the checkpoint
             
-            stage_result = self._execute_stage(stage, output_dir)
-            stage_results.append(stage_result)
+        Raises:
+            ValueError: If checkpoints are disabled, the run is unknown, or its
+                inputs changed since it was checkpointed
+        """
+        if self.checkpoints is None:
+            raise ValueError("Checkpoints are disabled (execution.checkpoints.enabled in workflow_config.yaml)")
+        
+        checkpoint = self.checkpoints.load(run_id)
+        params = checkpoint['params']
+        if compute_input_hash(params) != checkpoint['input_hash']:
+            raise ValueError(f"Inputs of run {run_id} changed since it was checkpointed; start a new run instead")
+        
+        run = self._start_workflow(run_id=run_id, **params)
+        self.checkpoints.set_status(run_id, 'running')
+        
+        completed = self._restore_stages(run, self.checkpoints.completed_stages(run_id), resumed=True)
+        
+        logger.info("Resuming run %s - restored stages %s", run_id, list(completed))
+        
+        return run, completed
+    
+    def _restore_stages(self, run: '_WorkflowRun', saved: Dict[str, Dict[str, Any]],
+                        **marker: Any) -> Dict[str, Dict[str, Any]]:
+        """
+        Reload saved stage results into a run's state and output directory.
+        
+        A stage is restored only if everything upstream of it is restored too.
+        
+        Args:
+            run: Run to restore into
+            saved: Successful stage results by stage name
+            marker: Fields added to each restored result (e.g. resumed=True)
             
-            # Update workflow state with stage outputs
-            if stage_result['status'] == 'success':
-                self.workflow_state.update(stage_result['outputs'])
-            else:
-                logger.error(f"Stage {stage_name} failed: {stage_result.get('error')}")
-                if not self.workflow_config['execution'].get('continue_on_error', False):
-                    break
+        Returns:
+            The restored stage results by stage name
+        """
+        completed = {}
+        for stage_name in self.stage_graph.topological_order():
+            if stage_name in saved and self.stage_graph.ancestors(stage_name) <= set(completed):
+                result = {**saved[stage_name], **marker}
+                result['output_file'] = str(self._save_stage_outputs(stage_name, result['outputs'], run.output_dir))
+                self._record_stage_result(run, result)
+                completed[stage_name] = result
+        return completed
+    
+    def _find_incremental_base(self, base_run_id: Optional[str], policy_document_path: str,
+                               policy_document_content: Optional[str], detected_visa_type: Optional[str],
+                               detected_visa_code: Optional[str],
+                               force_visa_type: bool) -> Optional[Tuple[Dict[str, Any], str, Dict[str, str]]]:
+        """
+        Find the previous run an incremental run can diff against.
+        
+        Returns:
+            The base run's checkpoint, the document text and its section hashes,
+            or None if the workflow has to run in full
+        """
+        if self.checkpoints is None or not self.incremental_config.get('enabled', False):
+            return None
+        
+        base = self.checkpoints.load(base_run_id) if base_run_id else self.checkpoints.latest_run(policy_document_path)
+        if base is None or not base.get('section_hashes'):
+            logger.info("No previous run with section hashes for %s - running in full", policy_document_path)
+            return None
+        
+        # Outputs derived under different visa type hints cannot be reused
+        hints = {
+            'detected_visa_type': detected_visa_type,
+            'detected_visa_code': detected_visa_code,
+            'force_visa_type': force_visa_type
+        }
+        if any(base['params'].get(key) != value for key, value in hints.items()):
+            logger.info("Visa type hints differ from run %s - running in full", base['run_id'])
+            return None
+        
+        document = load_policy_text(policy_document_path, policy_document_content)
+        hashes = section_hashes(document)
+        if not hashes:
+            logger.info("No sections found in %s - running in full", policy_document_path)
+            return None
+        
+        return base, document, hashes
+    
+    def _start_incremental(self, run: '_WorkflowRun', base: Dict[str, Any], document: str,
+                           hashes: Dict[str, str], policy_document_path: str,
+                           policy_document_content: Optional[str], detected_visa_type: Optional[str],
+                           detected_visa_code: Optional[str], force_visa_type: bool) -> Dict[str, Dict[str, Any]]:
+        """
+        Diff a run's document against its base run and plan which stages run on the delta.
         
+        Returns:
+            Stage results reused unchanged from the base run
+        """
+        self._create_checkpoint(
+            run, policy_document_path, policy_document_content, detected_visa_type, detected_visa_code, force_visa_type,
+            extra={'section_hashes': hashes, 'base_run_id': base['run_id']}
+        )
+        
+        diff = diff_sections(base['section_hashes'], hashes)
+        saved = {name: result for name, result in base['stages'].items() if result.get('status') == 'success'}
+        plan = _IncrementalPlan(base['run_id'], diff, set(base['section_hashes']) | set(hashes), saved)
+        run.incremental = plan
+        
+        if not plan.affected:
+            # Nothing changed: every finished stage of the base run carries over
+            completed = self._restore_stages(run, saved, reused_from=base['run_id'])
+            if self.checkpoints is not None:
+                for result in completed.values():
+                    self.checkpoints.save_stage(run.run_id, result)
+            logger.info("Incremental run - no sections changed since run %s", base['run_id'])
+            return completed
+        
+        # A stage can work on the delta only if everything upstream of it did too
+        delta_stages = set(self.incremental_config.get('delta_stages', []))
+        for stage_name in self.stage_graph.topological_order():
+            if (stage_name in delta_stages and stage_name in saved
+                    and self.stage_graph.ancestors(stage_name) <= set(plan.delta_stages)):
+                plan.delta_stages.append(stage_name)
+        
+        rederive = diff['added'] + diff['changed']
+        if rederive:
+            delta_output_dir = run.output_dir / '_delta'
+            plan.delta_run = _WorkflowRun(run.run_id, delta_output_dir, {
+                **run.state,
+                'policy_document': delta_document(document, rederive),
+                'output_dir': str(delta_output_dir)
+            })
+        
+        logger.info("Incremental run against %s - added %s, changed %s, removed %s; delta stages %s",
+                    base['run_id'], diff['added'], diff['changed'], diff['removed'], plan.delta_stages)
+        
+        return {}
+    
+    def _create_scheduler(self) -> StageScheduler:
+        """Create a scheduler that runs stages as soon as their dependencies complete."""
+        execution_config = self.workflow_config.get('execution', {})
+        return StageScheduler(
+            self.stage_graph,
+            max_workers=execution_config.get('max_parallel_stages', 4),
+            continue_on_error=execution_config.get('continue_on_error', False)
+        )
+    
+    def _log_stage_banner(self, stage: Dict[str, Any]):
+        """Log the banner that opens a stage."""
+        logger.info("\n%s\nStage: %s\n%s", '=' * 80, stage['name'].upper(), '=' * 80)
+    
+    def _finish_workflow(self, run: '_WorkflowRun', stage_results: List[Dict[str, Any]],
+                         workflow_start: float) -> Dict[str, Any]:
+        """Compile the workflow results and save the summary report."""
         workflow_duration = time.time() - workflow_start
         
         # Compile final results
         results = {
+            'run_id': run.run_id,
             'status': 'success' if all(s['status'] == 'success' for s in stage_results) else 'failed',
             'duration_seconds': workflow_duration,
             'stages': stage_results,
-            'outputs': self.workflow_state,
-            'timestamp': datetime.now().isoformat()
+            'outputs': run.state,
+            'output_dir': str(run.output_dir),
+            'timestamp': datetime.now().isoformat(),
+            'telemetry': run.telemetry.summary()
         }
         
+        totals = results['telemetry']['totals']
+        span = current_span()
+        span.set_attributes(status=results['status'], llm_calls=totals['calls'],
+                            total_tokens=totals['total_tokens'], cost_usd=totals['cost_usd'])
+        if results['status'] != 'success':
+            span.set_error(f"{sum(s['status'] != 'success' for s in stage_results)} stage(s) did not succeed")
+        
         # Save summary report
-        summary_path = output_dir / 'workflow_summary.txt'
+        summary_path = run.output_dir / 'workflow_summary.txt'
         summary = OutputFormatter.create_summary_report(results)
         with open(summary_path, 'w') as f:
             f.write(summary)
         
+        if self.checkpoints is not None:
+            self.checkpoints.set_status(run.run_id, results['status'])
+        
+        publish_event(RUN_END, run_id=run.run_id, status=results['status'], duration_seconds=workflow_duration,
+                      llm_calls=totals['calls'], total_tokens=totals['total_tokens'], cost_usd=totals['cost_usd'])
+        
         logger.info(f"\n{'=' * 80}")
         logger.info(f"Workflow completed in {workflow_duration:.2f}s")
+        logger.info(f"LLM usage: {totals['calls']} calls ({totals['cache_hits']} cached), "
+                    f"{totals['total_tokens']} tokens, ${totals['cost_usd']:.4f}")
         logger.info(f"Summary saved to: {summary_path}")
         logger.info(f"{'=' * 80}\n")
         
         return results
     
-    def _execute_stage(self, stage_config: Dict[str, Any], output_dir: Path) -> Dict[str, Any]:
+    def _on_stage_complete(self, run: '_WorkflowRun', stage_result: Dict[str, Any]):
+        """Record a finished stage and checkpoint it."""
+        self._record_stage_result(run, stage_result)
+        publish_event(STAGE_END, run_id=run.run_id, stage=stage_result['name'], status=stage_result['status'],
+                      duration_seconds=stage_result.get('duration_seconds', 0), error=stage_result.get('error'))
+        
+        if self.checkpoints is not None:
+            try:
+                self.checkpoints.save_stage(run.run_id, stage_result)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning(f"Could not checkpoint stage {stage_result['name']}: {e}")
+    
+    def _record_stage_result(self, run: '_WorkflowRun', stage_result: Dict[str, Any]):
+        """Merge a finished stage's outputs into the run's workflow state."""
+        stage_name = stage_result['name']
+        
+        if stage_result['status'] == 'success':
+            with run.lock:
+                run.state.update(stage_result['outputs'])
+                for key in stage_result['outputs']:
+                    run.output_producers[key] = stage_name
+        else:
+            logger.error("Stage %s %s: %s", stage_name, stage_result['status'], stage_result.get('error'))
+    
+    def _execute_stage(self, stage_config: Dict[str, Any], run: '_WorkflowRun') -> Dict[str, Any]:
         """Execute a single workflow stage."""
         stage_name = stage_config['name']
         agent_names = stage_config['agents']
+        agent_name = agent_names[0]
+        
+        plan = run.incremental
+        if plan is not None and stage_name in plan.delta_stages:
+            delta_result = self._execute_stage(stage_config, plan.delta_run) if plan.delta_run else None
+            return self._merge_delta_stage(stage_config, delta_result, run)
         
         stage_start = time.time()
         
         try:
-            # Prepare inputs for this stage
-            stage_inputs = self._prepare_stage_inputs(stage_config)
-            
-            # Execute agents (currently only single agent per stage)
-            agent_name = agent_names[0]
-            agent = self.agents[agent_name]
-            
-            print(f" ORCHESTRATOR: Executing stage '{stage_name}' with agent '{agent_name}' ", flush=True)
-            print(f" ORCHESTRATOR: Stage inputs keys: {list(stage_inputs.keys()) if stage_inputs else 'None'} ", flush=True)
-            
-            logger.info(f"Executing agent: {agent.name}")
-            outputs = agent.execute(stage_inputs)
+            stage_inputs = self._begin_stage(stage_config, run)
             
-            print(f" ORCHESTRATOR: Agent '{agent_name}' completed. Output keys: {list(outputs.keys()) if outputs else 'None'} ", flush=True)
-            
-            # Save outputs
-            stage_output_dir = output_dir / stage_name
-            stage_output_dir.mkdir(parents=True, exist_ok=True)
+            # Each agent gets its own copy of the inputs; outputs merge in declared order
+            agent_outputs = {}
+            if len(agent_names) > 1 and stage_config.get('parallel', True):
+                with ThreadPoolExecutor(max_workers=len(agent_names), thread_name_prefix=stage_name) as pool:
+                    futures = {
+                        name: pool.submit(contextvars.copy_context().run, self._execute_agent, name, dict(stage_inputs))
+                        for name in agent_names
+                    }
+                    for agent_name in agent_names:
+                        agent_outputs[agent_name] = futures[agent_name].result()
+            else:
+                for agent_name in agent_names:
+                    agent_outputs[agent_name] = self._execute_agent(agent_name, dict(stage_inputs))
             
-            output_file = stage_output_dir / f'{stage_name}_output.json'
-            OutputFormatter.save_json(outputs, str(output_file))
+            return self._complete_stage(stage_config, agent_outputs, stage_start, run)
             
-            logger.info(f"Outputs saved to: {output_file}")
+        except Exception as e:
+            return self._fail_stage(stage_name, agent_name, stage_start, e)
+    
+    async def _aexecute_stage(self, stage_config: Dict[str, Any], run: '_WorkflowRun') -> Dict[str, Any]:
+        """Execute a single workflow stage on the event loop."""
+        stage_name = stage_config['name']
+        agent_names = stage_config['agents']
+        agent_name = agent_names[0]
+        
+        plan = run.incremental
+        if plan is not None and stage_name in plan.delta_stages:
+            delta_result = await self._aexecute_stage(stage_config, plan.delta_run) if plan.delta_run else None
+            return self._merge_delta_stage(stage_config, delta_result, run)
+        
+        stage_start = time.time()
+        
+        try:
+            stage_inputs = self._begin_stage(stage_config, run)
             
-            stage_duration = time.time() - stage_start
+            agent_outputs = {}
+            if len(agent_names) > 1 and stage_config.get('parallel', True):
+                results = await asyncio.gather(*(
+                    self._aexecute_agent(name, dict(stage_inputs)) for name in agent_names
+                ))
+                agent_outputs = dict(zip(agent_names, results))
+            else:
+                for agent_name in agent_names:
+                    agent_outputs[agent_name] = await self._aexecute_agent(agent_name, dict(stage_inputs))
             
-            return {
-                'name': stage_name,
-                'status': 'success',
-                'duration_seconds': stage_duration,
-                'outputs': outputs,
-                'output_file': str(output_file)
-            }
+            return self._complete_stage(stage_config, agent_outputs, stage_start, run)
             
         except Exception as e:
-            stage_duration = time.time() - stage_start
-            error_msg = str(e)
-            logger.error(f"Stage {stage_name} failed: {error_msg}")
-            
-            print(f" ORCHESTRATOR: Stage '{stage_name}' FAILED with error: {error_msg} ", flush=True)
-            print(f" ORCHESTRATOR: Agent '{agent_name}' caused the failure ", flush=True)
-            
-            return {
-                'name': stage_name,
-                'status': 'failed',
-                'duration_seconds': stage_duration,
-                'error': error_msg,
-                'outputs': {},
-                'agent': agent_name
-            }
-    
-    def _prepare_stage_inputs(self, stage_config: Dict[str, Any]) -> Dict[str, Any]:
+            return self._fail_stage(stage_name, agent_name, stage_start, e)
+    
+    def _begin_stage(self, stage_config: Dict[str, Any], run: '_WorkflowRun') -> Dict[str, Any]:
+        """Prepare and report the inputs for a stage."""
+        stage_inputs = self._prepare_stage_inputs(stage_config, run)
+        
+        logger.debug("Executing stage '%s' with agents %s", stage_config['name'], stage_config['agents'])
+        current_span().set_attribute('input_keys', list(stage_inputs))
+        
+        return stage_inputs
+    
+    def _complete_stage(self, stage_config: Dict[str, Any], agent_outputs: Dict[str, Dict[str, Any]],
+                        stage_start: float, run: '_WorkflowRun') -> Dict[str, Any]:
+        """Merge agent outputs in declared order, save them and build the stage result."""
+        stage_name = stage_config['name']
+        
+        outputs = {}
+        for agent_name in stage_config['agents']:
+            outputs.update(agent_outputs[agent_name] or {})
+        
+        output_file = self._save_stage_outputs(stage_name, outputs, run.output_dir)
+        
+        stage_duration = time.time() - stage_start
+        current_span().set_attributes(status='success', output_keys=list(outputs))
+        
+        return {
+            'name': stage_name,
+            'status': 'success',
+            'duration_seconds': stage_duration,
+            'outputs': outputs,
+            'output_file': str(output_file)
+        }
+    
+    def _merge_delta_stage(self, stage_config: Dict[str, Any], delta_result: Optional[Dict[str, Any]],
+                           run: '_WorkflowRun') -> Dict[str, Any]:
+        """Merge a stage's outputs for the changed sections into its outputs from the base run."""
+        stage_name = stage_config['name']
+        plan = run.incremental
+        
+        if delta_result is None:
+            # Sections were only removed: their outputs are dropped, nothing is re-derived
+            delta_outputs = {}
+        elif delta_result['status'] != 'success':
+            return delta_result
+        else:
+            # Later delta stages build on this stage's delta outputs
+            self._record_stage_result(plan.delta_run, delta_result)
+            delta_outputs = self._reconcile_delta_ids(plan, stage_name, delta_result['outputs'])
+        
+        outputs = merge_outputs(plan.base_stages[stage_name]['outputs'], delta_outputs, plan.affected, plan.section_codes)
+        output_file = self._save_stage_outputs(stage_name, outputs, run.output_dir)
+        current_span().set_attributes(incremental_sections=sorted(plan.affected))
+        
+        return {
+            'name': stage_name,
+            'status': 'success',
+            'duration_seconds': delta_result['duration_seconds'] if delta_result else 0.0,
+            'outputs': outputs,
+            'output_file': str(output_file),
+            'incremental': {'base_run_id': plan.base_run_id, 'sections': sorted(plan.affected)}
+        }
+    
+    @staticmethod
+    def _reconcile_delta_ids(plan: '_IncrementalPlan', stage_name: str, delta_outputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Renumber delta item IDs that clash with the base run's.
+        
+        The delta document restarts numbering (FR-001, ...), so its items would
+        duplicate the IDs of the items kept from the base run. Items restating a
+        base item take its ID; other clashing ones get the next free number.
+        """
+        delta_outputs = rename_ids(delta_outputs, plan.id_renames)
+        renames = id_renames(plan.base_stages[stage_name]['outputs'], delta_outputs)
+        plan.id_renames.update(renames)
+        return rename_ids(delta_outputs, renames)
+    
+    def _save_stage_outputs(self, stage_name: str, outputs: Dict[str, Any], output_dir: Path) -> Path:
+        """Save a stage's outputs to <output_dir>/<stage>/<stage>_output.json."""
+        stage_output_dir = output_dir / stage_name
+        stage_output_dir.mkdir(parents=True, exist_ok=True)
+        
+        output_file = stage_output_dir / f'{stage_name}_output.json'
+        OutputFormatter.save_json(outputs, str(output_file))
+        
+        logger.info("Outputs saved to: %s", output_file)
+        return output_file
+    
+    def _fail_stage(self, stage_name: str, agent_name: str, stage_start: float,
+                    error: Exception) -> Dict[str, Any]:
+        """Build the result for a failed stage."""
+        stage_duration = time.time() - stage_start
+        error_msg = str(error)
+        logger.error("Stage %s failed in agent %s: %s", stage_name, agent_name, error_msg)
+        
+        span = current_span()
+        span.set_attributes(status='failed', failed_agent=agent_name)
+        span.set_error(error_msg)
+        
+        return {
+            'name': stage_name,
+            'status': 'failed',
+            'duration_seconds': stage_duration,
+            'error': error_msg,
+            'outputs': {},
+            'agent': agent_name
+        }
+    
+    def _execute_agent(self, agent_name: str, stage_inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute one agent of a stage."""
+        agent = self.agents[agent_name]
+        logger.info("Executing agent: %s", agent.name)
+        with trace_span('agent.execute', agent=agent.name) as span:
+            outputs = agent.execute(stage_inputs)
+            span.set_attribute('output_keys', list(outputs or {}))
+        return outputs
+    
+    async def _aexecute_agent(self, agent_name: str, stage_inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute one agent of a stage on the event loop."""
+        agent = self.agents[agent_name]
+        logger.info("Executing agent: %s", agent.name)
+        with trace_span('agent.execute', agent=agent.name) as span:
+            outputs = await agent.aexecute(stage_inputs)
+            span.set_attribute('output_keys', list(outputs or {}))
+        return outputs
+    
+    def _prepare_stage_inputs(self, stage_config: Dict[str, Any], run: '_WorkflowRun') -> Dict[str, Any]:
         """Prepare inputs for a stage based on dependencies."""
         inputs = {}
         
+        # Snapshot state so stages finishing concurrently cannot mutate it mid-read
+        with run.lock:
+            workflow_state = dict(run.state)
+            output_producers = dict(run.output_producers)
+        
         # Add policy document path and content for first stage
-        if 'policy_document_path' in self.workflow_state:
-            inputs['policy_document_path'] = self.workflow_state['policy_document_path']
-        if 'policy_document' in self.workflow_state:
-            inputs['policy_document'] = self.workflow_state['policy_document']
+        if 'policy_document_path' in workflow_state:
+            inputs['policy_document_path'] = workflow_state['policy_document_path']
+        if 'policy_document' in workflow_state:
+            inputs['policy_document'] = workflow_state['policy_document']
         
         # Add detected visa type hints for hybrid approach
-        if 'detected_visa_type' in self.workflow_state:
-            inputs['detected_visa_type'] = self.workflow_state['detected_visa_type']
-            print(f" ORCHESTRATOR: Adding detected_visa_type = {self.workflow_state['detected_visa_type']} ", flush=True)
-        if 'detected_visa_code' in self.workflow_state:
-            inputs['detected_visa_code'] = self.workflow_state['detected_visa_code']
-            print(f" ORCHESTRATOR: Adding detected_visa_code = {self.workflow_state['detected_visa_code']} ", flush=True)
-        if 'force_visa_type' in self.workflow_state:
-            inputs['force_visa_type'] = self.workflow_state['force_visa_type']
-            print(f" ORCHESTRATOR: Adding force_visa_type = {self.workflow_state['force_visa_type']} ", flush=True)
+        if 'detected_visa_type' in workflow_state:
+            inputs['detected_visa_type'] = workflow_state['detected_visa_type']
+        if 'detected_visa_code' in workflow_state:
+            inputs['detected_visa_code'] = workflow_state['detected_visa_code']
+        if 'force_visa_type' in workflow_state:
+            inputs['force_visa_type'] = workflow_state['force_visa_type']
         
         # Add outputs from dependent stages
         depends_on = stage_config.get('depends_on', [])
         
         if depends_on:
-            # Add all previous outputs
-            for key, value in self.workflow_state.items():
-                if key not in ['policy_document_path', 'output_dir', 'start_time']:
+            # Add workflow inputs plus outputs produced by upstream stages only, so
+            # concurrently running sibling branches never leak into each other
+            upstream = self.stage_graph.ancestors(stage_config['name'])
+            for key, value in workflow_state.items():
+                if key in ['run_id', 'policy_document_path', 'output_dir', 'start_time']:
+                    continue
+                producer = output_producers.get(key)
+                if producer is None or producer in upstream:
                     inputs[key] = value
         
         return inputs
@@ -312,19 +903,21 @@ class WorkflowOrchestrator:
             raise ValueError(f"Stage not found: {stage_name}")
         
         # Set output directory
+        run_id = new_run_id()
         if output_dir is None:
-            project_root = Path(__file__).parent.parent.parent
-            output_dir = project_root / 'data' / 'output'
+            output_dir = self.runs_dir / run_id
         else:
             output_dir = Path(output_dir)
         
         output_dir.mkdir(parents=True, exist_ok=True)
         
         # Execute stage
-        return self._execute_stage(stage_config, output_dir)
+        sink = create_span_sink(self.tracing_config, output_dir)
+        with trace_span('workflow.stage', sink, run_id=run_id, stage=stage_name, agents=stage_config['agents']):
+            return self._execute_stage(stage_config, _WorkflowRun(run_id, output_dir, dict(inputs)))
     
     def get_workflow_state(self) -> Dict[str, Any]:
-        """Get current workflow state."""
+        """Get the workflow state of the most recently started run."""
         return self.workflow_state
     
     def get_execution_history(self) -> List[Dict[str, Any]]:
@@ -333,3 +926,39 @@ class WorkflowOrchestrator:
         for agent_name, agent in self.agents.items():
             history[agent_name] = agent.get_execution_history()
         return history
+
+
+class _WorkflowRun:
+    """State of one workflow run; concurrent runs each get their own."""
+    
+    def __init__(self, run_id: str, output_dir: Path, state: Dict[str, Any]):
+        self.run_id = run_id
+        self.output_dir = output_dir
+        self.state = state
+        self.output_producers: Dict[str, str] = {}
+        self.lock = threading.Lock()
+        self.telemetry = RunTelemetry(run_id)
+        self.trace_sink: Optional[JsonlSpanSink] = None
+        self.incremental: Optional['_IncrementalPlan'] = None
+
+
+class _IncrementalPlan:
+    """What an incremental run re-derives, and the base run outputs it merges into."""
+    
+    def __init__(self, base_run_id: str, diff: Dict[str, List[str]], section_codes: Set[str],
+                 base_stages: Dict[str, Dict[str, Any]]):
+        self.base_run_id = base_run_id
+        self.diff = diff
+        self.affected = affected_sections(diff)
+        self.section_codes = section_codes
+        self.base_stages = base_stages
+        # Stages that run on the changed sections only, in topological order
+        self.delta_stages: List[str] = []
+        # Run over the added and changed sections (None when sections were only removed)
+        self.delta_run: Optional[_WorkflowRun] = None
+        # Delta item IDs renamed to keep them unique in the merged outputs, so
+        # later delta stages referring to them are renamed the same way
+        self.id_renames: Dict[str, str] = {}
+    
+    def summary(self) -> Dict[str, Any]:
+        return {'base_run_id': self.base_run_id, **self.diff, 'delta_stages': self.delta_stages}
@@ -7,7 +7,8 @@ import streamlit as st
 import json
 from datetime import datetime, date
 from typing import Dict, List, Any, Optional
-import re
+
+from src.utils.form_rules import FormValidator, check_value, compile_rules, rule_texts
 
 def show_customer_form_renderer(workflow_results: Dict[str, Any]):
     """Display the customer form renderer interface."""
@@ -204,60 +205,9 @@ def show_field_validation_status(validation_result: Dict[str, Any]):
                 st.caption(f"• {error}")
 
 def validate_form_field(field_id: str, value: Any, validation_rules: List[str], is_required: bool) -> Dict[str, Any]:
-    """Validate a form field against its rules."""
-    
-    errors = []
-    
-    # Required field validation
-    if is_required and (value is None or value == '' or (isinstance(value, list) and len(value) == 0)):
-        errors.append("This field is required")
-        return {'is_valid': False, 'errors': errors, 'value': value}
+    """Validate a form field against its rules (compiled once per distinct rule list)."""
     
-    # Skip other validations if field is empty and not required
-    if not is_required and (value is None or value == ''):
-        return {'is_valid': True, 'errors': [], 'value': value}
-    
-    # Apply validation rules
-    for rule in validation_rules:
-        rule_lower = rule.lower()
-        
-        if 'email' in rule_lower and value:
-            if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', str(value)):
-                errors.append("Please enter a valid email address")
-        
-        elif 'phone' in rule_lower and value:
-            if not re.match(r'^[\+]?[1-9][\d]{0,15}$', str(value).replace(' ', '').replace('-', '')):
-                errors.append("Please enter a valid phone number")
-        
-        elif 'minimum length' in rule_lower and value:
-            try:
-                min_length = int(re.search(r'\d+', rule).group())
-                if len(str(value)) < min_length:
-                    errors.append(f"Minimum length is {min_length} characters")
-            except:
-                pass
-        
-        elif 'maximum length' in rule_lower and value:
-            try:
-                max_length = int(re.search(r'\d+', rule).group())
-                if len(str(value)) > max_length:
-                    errors.append(f"Maximum length is {max_length} characters")
-            except:
-                pass
-        
-        elif 'numeric' in rule_lower and value:
-            try:
-                float(value)
-            except:
-                errors.append("Please enter a numeric value")
-        
-        elif 'date' in rule_lower and 'future' in rule_lower and value:
-            if isinstance(value, date) and value <= date.today():
-                errors.append("Date must be in the future")
-        
-        elif 'date' in rule_lower and 'past' in rule_lower and value:
-            if isinstance(value, date) and value >= date.today():
-                errors.append("Date must be in the past")
+    errors = check_value(value, compile_rules(rule_texts(validation_rules)), is_required)
     
     # Update session state errors
     if errors:
@@ -267,6 +217,15 @@ def validate_form_field(field_id: str, value: Any, validation_rules: List[str],
     
     return {'is_valid': len(errors) == 0, 'errors': errors, 'value': value}
 
+def validate_form(questions: List[Dict], values: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate a whole submission in one call and record its errors in session state."""
+    
+    result = FormValidator(questions).validate_form(values)
+    st.session_state.form_validation_errors = {
+        field_id: '; '.join(errors) for field_id, errors in result['errors'].items()
+    }
+    return result
+
 def show_form_validation_summary():
     """Display overall form validation summary."""
     
@@ -314,7 +273,7 @@ def show_form_submission():
     questions = extract_questions_for_form(st.session_state.get('workflow_results', {}))
     total_questions = len(questions)
     completed_questions = len([q for q in questions if get_form_field_value(q.get('id', '')) is not None])
-    has_errors = len(st.session_state.form_validation_errors) > 0
+    has_errors = not validate_form(questions, st.session_state.customer_form_data)['is_valid']
     
     # Submission requirements
     can_submit = completed_questions == total_questions and not has_errors
@@ -19,6 +19,7 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.orchestrator.workflow_orchestrator import WorkflowOrchestrator
+from src.utils.rate_limiter import llm_priority
 from src.utils.enhanced_document_parser import EnhancedDocumentParser
 
 
@@ -101,7 +102,8 @@ def get_policy_data(policy_type: str, uploaded_file=None) -> Dict[str, Any]:
             
             # Run workflow analysis
             orchestrator = WorkflowOrchestrator()
-            results = orchestrator.run_workflow(tmp_path, content)
+            with llm_priority('interactive'):
+                results = orchestrator.run_workflow(tmp_path, content)
             
             return {
                 'type': f"Custom: {uploaded_file.name}",
@@ -1,9 +1,14 @@
 import streamlit as st
 import time
-from typing import Dict, Any, List, Optional
+import uuid
+import queue
+from typing import Dict, Any, Callable, List, Optional
 import threading
+import contextvars
 from datetime import datetime
 
+from src.utils.events import LLM_CALL, RUN_END, RUN_START, STAGE_END, STAGE_START, event_tags, get_event_bus
+
 
 class ProgressTracker:
     """Real-time progress tracking for workflow execution."""
@@ -15,6 +20,8 @@ class ProgressTracker:
         self.stage_details = {}
         self.start_time = None
         self.is_running = False
+        self.llm_calls = 0
+        self.total_tokens = 0
         
     def start_tracking(self, stages: List[str]) -> None:
         """Start progress tracking."""
@@ -24,6 +31,8 @@ class ProgressTracker:
         self.stage_details = {}
         self.start_time = datetime.now()
         self.is_running = True
+        self.llm_calls = 0
+        self.total_tokens = 0
         
         # Initialize stage details
         for i, stage in enumerate(stages):
@@ -33,7 +42,9 @@ class ProgressTracker:
                 'start_time': None,
                 'end_time': None,
                 'duration': 0,
-                'progress': 0
+                'progress': 0,
+                'llm_calls': 0,
+                'tokens': 0
             }
     
     def update_stage(self, stage_name: str, status: str, progress: int = 0) -> None:
@@ -60,6 +71,34 @@ class ProgressTracker:
             stage_info['status'] = status
             stage_info['progress'] = progress
     
+    def handle_event(self, event: Dict[str, Any]) -> None:
+        """Update progress from a workflow event (see src/utils/events.py)."""
+        event_type = event.get('type')
+        stage_name = event.get('stage')
+        
+        if event_type == RUN_START:
+            self.start_tracking(event.get('stages', []))
+        
+        elif event_type == STAGE_START:
+            self.update_stage(stage_name, 'running', 0)
+        
+        elif event_type == STAGE_END:
+            self.update_stage(stage_name, event.get('status', 'failed'))
+            if stage_name in self.stage_details:
+                # The orchestrator's own timing, not when the event was seen
+                self.stage_details[stage_name]['duration'] = event.get('duration_seconds', 0)
+        
+        elif event_type == LLM_CALL:
+            tokens = event.get('prompt_tokens', 0) + event.get('completion_tokens', 0)
+            self.llm_calls += 1
+            self.total_tokens += tokens
+            if stage_name in self.stage_details:
+                self.stage_details[stage_name]['llm_calls'] += 1
+                self.stage_details[stage_name]['tokens'] += tokens
+        
+        elif event_type == RUN_END:
+            self.finish_tracking()
+    
     def finish_tracking(self) -> None:
         """Finish progress tracking."""
         self.is_running = False
@@ -102,7 +141,7 @@ def show_progress_tracker(tracker: ProgressTracker) -> None:
     progress_bar = st.progress(overall_progress / 100)
     
     # Status info
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric("Overall Progress", f"{overall_progress:.1f}%")
@@ -113,6 +152,9 @@ def show_progress_tracker(tracker: ProgressTracker) -> None:
     with col3:
         st.metric("Stages Completed", f"{tracker.stages_completed}/{tracker.total_stages}")
     
+    with col4:
+        st.metric("LLM Tokens", f"{tracker.total_tokens:,}", help=f"{tracker.llm_calls} LLM calls")
+    
     # Current stage info
     if tracker.current_stage:
         current_info = tracker.stage_details[tracker.current_stage]
@@ -157,6 +199,9 @@ def show_progress_tracker(tracker: ProgressTracker) -> None:
             with col_c:
                 st.write(f"**Progress:** {progress}%")
             
+            if details.get('llm_calls'):
+                st.caption(f"{details['llm_calls']} LLM calls, {details['tokens']:,} tokens")
+            
             # Progress bar for individual stage
             if status == 'running':
                 st.progress(progress / 100)
@@ -230,18 +275,69 @@ def create_progress_placeholder() -> Dict[str, Any]:
 def update_progress_display(placeholders: Dict[str, Any], tracker: ProgressTracker) -> None:
     """Update progress display in placeholders."""
     
-    with placeholders['progress_container']:
+    # container() replaces the placeholder's previous content on each update
+    with placeholders['progress_container'].container():
         if tracker.is_running:
             show_progress_tracker(tracker)
     
-    with placeholders['animation_container']:
+    with placeholders['animation_container'].container():
         if tracker.is_running:
             show_workflow_animation()
 
 
+def track_workflow_progress(tracker: ProgressTracker, placeholders: Dict[str, Any],
+                            run: Callable[[], Any], refresh_seconds: float = 0.5) -> Any:
+    """
+    Run a workflow while showing its live progress.
+    
+    The workflow runs in a background thread (with the caller's context, so
+    e.g. its LLM priority lane carries over). Its stage and LLM call events
+    are queued by the event bus and applied to the tracker here, on the
+    script thread, which redraws the placeholders every refresh_seconds.
+    
+    Args:
+        tracker: Progress tracker to feed
+        placeholders: Placeholders from create_progress_placeholder()
+        run: Runs the workflow (e.g. a call to orchestrator.run_workflow) and
+            returns its results; must not touch st.session_state
+        refresh_seconds: Pause between redraws
+        
+    Returns:
+        The workflow results
+    """
+    progress_id = uuid.uuid4().hex
+    events: queue.Queue = queue.Queue()
+    outcome: Dict[str, Any] = {}
+    
+    def run_tagged():
+        try:
+            with event_tags(progress_id=progress_id):
+                outcome['result'] = run()
+        except BaseException as e:
+            outcome['error'] = e
+    
+    unsubscribe = get_event_bus().subscribe(events.put, progress_id=progress_id)
+    worker = threading.Thread(target=contextvars.copy_context().run, args=(run_tagged,),
+                              name='workflow-progress', daemon=True)
+    try:
+        worker.start()
+        while worker.is_alive() or not events.empty():
+            worker.join(refresh_seconds)
+            while not events.empty():
+                tracker.handle_event(events.get_nowait())
+            update_progress_display(placeholders, tracker)
+    finally:
+        unsubscribe()
+    
+    tracker.finish_tracking()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
 # Demo progress simulation
 def simulate_workflow_progress(tracker: ProgressTracker, placeholders: Dict[str, Any]) -> None:
-    """Simulate workflow progress for demonstration."""
+    """Simulate workflow progress for demonstration (see track_workflow_progress for real runs)."""
     
     stages = [
         "PolicyEvaluator",
@@ -14,6 +14,8 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.orchestrator.workflow_orchestrator import WorkflowOrchestrator
+from src.utils.rate_limiter import llm_priority
+from src.utils.visa_classifier import get_visa_classifier
 from src.utils.output_formatter import OutputFormatter
 from src.generators.mock_results_generator import MockResultsGenerator
 from src.generators.policy_generator import PolicyGenerator
@@ -23,6 +25,7 @@ from src.ui.enhanced_policy_comparison import show_enhanced_policy_comparison
 from src.ui.pages.agent_architecture import show_agent_architecture
 from src.ui.human_validation_workflow import show_human_validation_workflow
 from src.ui.customer_form_renderer import show_customer_form_renderer
+from src.ui.progress_tracker import ProgressTracker, create_progress_placeholder, track_workflow_progress
 
 # Page configuration
 st.set_page_config(
@@ -259,26 +262,16 @@ if st.session_state.current_page == "Workflow Analysis":
                         if policy_content:
                             print(f" HYBRID: Analyzing document content for visa type detection ", flush=True)
                             print(f" Document content length: {len(policy_content)} ", flush=True)
-                            print(f" First 500 chars: {policy_content[:500]} ", flush=True)
                             
-                            content_upper = policy_content.upper()
-                            print(f" Checking for PARENT BOOST: {'PARENT BOOST' in content_upper} ", flush=True)
+                            classification = get_visa_classifier().classify(policy_content)
+                            detected_visa_type = classification['visa_type']
+                            detected_visa_code = classification['visa_code']
+                            print(f" Keyword matches: {classification['matches']} ", flush=True)
                             
-                            if any(keyword in content_upper for keyword in ['PARENT BOOST VISITOR VISA', 'PARENT BOOST', 'V4']):
-                                detected_visa_type = "Parent Boost Visitor Visa"
-                                detected_visa_code = "V4"
-                                print(f" HYBRID: DETECTED PARENT BOOST VISITOR VISA - PROCESSING WITH REAL AGENTS ", flush=True)
-                            elif any(keyword in content_upper for keyword in ['SKILLED MIGRANT', 'SR1', 'SR3', 'SR4', 'SR5', 'SKILLED RESIDENCE']):
-                                detected_visa_type = "Skilled Migrant Residence Visa"
-                                detected_visa_code = "SR1"
-                                print(f" HYBRID: DETECTED SKILLED MIGRANT RESIDENCE VISA - PROCESSING WITH REAL AGENTS ", flush=True)
-                            elif any(keyword in content_upper for keyword in ['WORKING HOLIDAY', 'YOUTH', 'TEMPORARY WORK', 'WHV', 'WORKING HOLIDAY VISA']):
-                                detected_visa_type = "Working Holiday Visa"
-                                detected_visa_code = "WHV"
-                                print(f" HYBRID: DETECTED WORKING HOLIDAY VISA - PROCESSING WITH REAL AGENTS ", flush=True)
+                            if detected_visa_type:
+                                print(f" HYBRID: DETECTED {detected_visa_type.upper()} ({detected_visa_code}, confidence {classification['confidence']:.2f}) - PROCESSING WITH REAL AGENTS ", flush=True)
                             else:
                                 print(f" HYBRID: NO SPECIFIC VISA TYPE DETECTED - USING GENERIC PROCESSING ", flush=True)
-                                print(f" Content sample for debugging: {content_upper[:200]} ", flush=True)
                         
                         print(f"🚀 HYBRID: CALLING ORCHESTRATOR WITH REAL AGENTS 🚀", flush=True)
                         
@@ -287,14 +280,22 @@ if st.session_state.current_page == "Workflow Analysis":
                         execution_timestamp = int(time.time() * 1000)
                         print(f"🚀 EXECUTION TIMESTAMP: {execution_timestamp} 🚀", flush=True)
                         
-                        # Run workflow with real agents and detected visa type hints
-                        results = st.session_state.orchestrator.run_workflow(
-                            policy_path, 
-                            policy_content,
-                            detected_visa_type=detected_visa_type,
-                            detected_visa_code=detected_visa_code,
-                            force_visa_type=bool(detected_visa_type)
-                        )
+                        # Run workflow with real agents and detected visa type hints;
+                        # interactive runs go ahead of queued batch LLM traffic.
+                        # Stage and LLM call events drive the live progress display.
+                        orchestrator = st.session_state.orchestrator
+                        with llm_priority('interactive'):
+                            results = track_workflow_progress(
+                                ProgressTracker(),
+                                create_progress_placeholder(),
+                                lambda: orchestrator.run_workflow(
+                                    policy_path, 
+                                    policy_content,
+                                    detected_visa_type=detected_visa_type,
+                                    detected_visa_code=detected_visa_code,
+                                    force_visa_type=bool(detected_visa_type)
+                                )
+                            )
                         st.session_state.workflow_results = results
                         
                         st.success("✅ Workflow completed successfully!")
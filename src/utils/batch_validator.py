@@ -0,0 +1,87 @@
+from typing import Dict, Any, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .validator import Validator
+
+Rules = Sequence[Tuple[str, Sequence[str]]]
+
+
+class BatchValidation:
+    """
+    Result of validating a batch of items against a rule table.
+
+    ``codes`` holds one error code per item: bit ``i`` is set when the item
+    fails rule ``i``, so 0 means valid.
+    """
+
+    def __init__(self, items: List[Dict[str, Any]], rules: Rules, codes: np.ndarray):
+        self.items = items
+        self.messages = [message for message, _ in rules]
+        self.codes = codes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Boolean mask of the items passing every rule."""
+        return self.codes == 0
+
+    @property
+    def valid_count(self) -> int:
+        return int(np.count_nonzero(self.codes == 0))
+
+    def invalid_positions(self) -> np.ndarray:
+        """Positions of the items failing a rule, in order."""
+        return np.flatnonzero(self.codes)
+
+    def errors(self, position: int) -> List[str]:
+        """Get the error messages of the item at a position."""
+        code = int(self.codes[position])
+        return [message for bit, message in enumerate(self.messages) if code & (1 << bit)]
+
+
+def _present(column: pd.Series) -> np.ndarray:
+    # Truthiness as in Validator: missing, None, '' and empty containers are absent
+    return column.to_numpy(dtype=object, na_value=None).astype(bool)
+
+
+def validate_batch(items: Iterable[Dict[str, Any]], rules: Rules) -> BatchValidation:
+    """
+    Validate many items against a rule table at once.
+
+    The items are loaded into a table with one column per field any rule
+    reads, and each rule is evaluated as a mask over the whole column rather
+    than item by item.
+
+    Args:
+        items: Requirement or question dictionaries
+        rules: (error message, fields) pairs; an item fails a rule when none
+            of the fields holds a value (at most 32 rules)
+
+    Returns:
+        BatchValidation with one error code per item
+    """
+    items = list(items)
+    fields = list(dict.fromkeys(field for _, rule_fields in rules for field in rule_fields))
+    table = pd.DataFrame.from_records(items, columns=fields) if items else pd.DataFrame(columns=fields)
+
+    codes = np.zeros(len(items), dtype=np.uint32)
+    for bit, (_, rule_fields) in enumerate(rules):
+        present = np.zeros(len(items), dtype=bool)
+        for field in rule_fields:
+            present |= _present(table[field])
+        codes[~present] |= np.uint32(1 << bit)
+    return BatchValidation(items, rules, codes)
+
+
+def validate_requirements(requirements: Iterable[Dict[str, Any]]) -> BatchValidation:
+    """Validate requirements in bulk, with the rules of Validator.validate_requirement."""
+    return validate_batch(requirements, Validator.REQUIREMENT_RULES)
+
+
+def validate_questions(questions: Iterable[Dict[str, Any]]) -> BatchValidation:
+    """Validate questions in bulk, with the rules of Validator.validate_question."""
+    return validate_batch(questions, Validator.QUESTION_RULES)
@@ -0,0 +1,378 @@
+import re
+import json
+import math
+from typing import Dict, Any, Callable, Iterator, List, Optional, Set
+
+DEFAULT_CHUNKING_CONFIG = {
+    'enabled': True,
+    'max_chunk_tokens': 1000,
+    'max_chunks': 500,
+    'max_concurrency': 4
+}
+
+# Same estimate the rate limiter budgets with
+CHARS_PER_TOKEN = 4
+
+# Split oversized blocks at paragraph breaks first, then lines, then words
+_SEPARATORS = ('\n\n', '\n', ' ')
+_WHITESPACE = re.compile(r'\s+')
+
+# Text fields that identify an extracted item when deduplicating chunk results
+_ITEM_TEXT_KEYS = ('description', 'rule', 'question_text', 'requirement', 'statement', 'field_name')
+_ITEM_ID = re.compile(r'^([A-Za-z]+-?)(\d+)$')
+
+
+class DocumentTooLargeError(ValueError):
+    """Raised when a document needs more chunks than the configured maximum."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the prompt tokens of a text (~4 characters per token)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def section_blocks(document: str, sections: Dict[str, Any]) -> List[str]:
+    """
+    Split a document into its preamble and one block per section.
+
+    Args:
+        document: Full document text
+        sections: Sections from DocumentParser.extract_sections
+
+    Returns:
+        Text blocks in document order
+    """
+    if not sections:
+        return [document.strip()] if document.strip() else []
+
+    blocks = []
+    first = document.find(next(iter(sections)))
+    if first > 0 and document[:first].strip():
+        blocks.append(document[:first].strip())
+    for code, section in sections.items():
+        blocks.append(f"{code} {section['title']}\n\n{section['content']}")
+    return blocks
+
+
+def context_blocks(context: Dict[str, Any]) -> List[str]:
+    """
+    Render upstream agent outputs as blocks for chunking.
+
+    Each category of a dict output becomes a block with one JSON line per
+    item, so splitting an oversized block never cuts an item in half.
+
+    Args:
+        context: Label -> upstream output (e.g. {'Conditions': conditions})
+
+    Returns:
+        Text blocks, one per category
+    """
+    blocks = []
+    for label, value in context.items():
+        if isinstance(value, dict) and value:
+            for key, entry in value.items():
+                blocks.append(_render_block(f"{label} - {key}", entry))
+        else:
+            blocks.append(_render_block(label, value))
+    return blocks
+
+
+def _render_block(label: str, value: Any) -> str:
+    if isinstance(value, list):
+        lines = [json.dumps(item, default=str, ensure_ascii=False) for item in value]
+        return f"{label}:\n" + '\n'.join(lines)
+    return f"{label}: {json.dumps(value, default=str, ensure_ascii=False)}"
+
+
+def pack_chunks(blocks: List[str], max_tokens: int, max_chunks: Optional[int] = None) -> List[str]:
+    """
+    Pack blocks into chunks of at most max_tokens.
+
+    Blocks are kept whole where they fit; an oversized block is split at
+    paragraph, line or word boundaries, and every piece after the first
+    repeats the block's heading line. max_tokens is a hard limit (it keeps
+    each call inside the model's context window), so long documents get more
+    chunks, never bigger ones.
+
+    Args:
+        blocks: Text blocks in order
+        max_tokens: Token budget per chunk
+        max_chunks: Maximum number of chunks (None for no limit)
+
+    Returns:
+        Chunk texts (empty when there are no blocks)
+
+    Raises:
+        DocumentTooLargeError: If the blocks need more than max_chunks chunks
+    """
+    chunks = _pack(blocks, max_tokens)
+    if max_chunks and len(chunks) > max_chunks:
+        raise DocumentTooLargeError(
+            f"Document needs {len(chunks)} chunks of {max_tokens} tokens, "
+            f"more than the configured maximum of {max_chunks}"
+        )
+    return chunks
+
+
+def head_chunk(blocks: List[str], max_tokens: int) -> str:
+    """
+    Get the first chunk pack_chunks would produce, packing only the blocks it needs.
+
+    Args:
+        blocks: Text blocks in order
+        max_tokens: Token budget of the chunk
+
+    Returns:
+        The opening chunk ('' when there are no blocks)
+    """
+    limit = max_tokens * CHARS_PER_TOKEN
+    needed = []
+    size = 0
+    for block in blocks:
+        needed.append(block)
+        size += len(block) + 2
+        if size > limit:
+            break
+    return (_pack(needed, max_tokens) or [''])[0]
+
+
+
+def _pack(blocks: List[str], max_tokens: int) -> List[str]:
+    limit = max(1, max_tokens * CHARS_PER_TOKEN)
+    pieces = []
+    for block in blocks:
+        pieces.extend(_split_block(block, limit))
+
+    chunks = []
+    current: List[str] = []
+    size = 0
+    for piece in pieces:
+        if current and size + len(piece) > limit:
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def _split_block(block: str, limit: int) -> List[str]:
+    """Split one block into pieces of at most limit characters, repeating its heading."""
+    if len(block) <= limit:
+        return [block]
+
+    heading = block.split('\n', 1)[0]
+    continued = f"{heading} (continued)\n\n" if len(heading) < limit // 4 else ''
+    pieces = _split_text(block, limit - len(continued), 0)
+    return pieces[:1] + [continued + piece for piece in pieces[1:]]
+
+
+def _split_text(text: str, limit: int, level: int) -> List[str]:
+    if len(text) <= limit:
+        return [text]
+    if level == len(_SEPARATORS):
+        return [text[start:start + limit] for start in range(0, len(text), limit)]
+
+    separator = _SEPARATORS[level]
+    pieces = []
+    current = ''
+    for part in text.split(separator):
+        if len(part) > limit:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.extend(_split_text(part, limit, level + 1))
+        elif current and len(current) + len(separator) + len(part) > limit:
+            pieces.append(current)
+            current = part
+        else:
+            current = f"{current}{separator}{part}" if current else part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_document(document: str, sections: Dict[str, Any], max_tokens: int,
+                   max_chunks: Optional[int] = None) -> List[str]:
+    """
+    Split a policy document into token-budgeted chunks at section boundaries.
+
+    Args:
+        document: Full document text
+        sections: Sections from DocumentParser.extract_sections
+        max_tokens: Token budget per chunk
+        max_chunks: Maximum number of chunks (None for no limit)
+
+    Returns:
+        Chunk texts; a single empty chunk for an empty document
+
+    Raises:
+        DocumentTooLargeError: If the document needs more than max_chunks chunks
+    """
+    return pack_chunks(section_blocks(document, sections), max_tokens, max_chunks) or ['']
+
+
+def usable_results(results: List[Any]) -> List[Any]:
+    """Drop chunk results that failed or are marked as fallbacks."""
+    return [
+        result for result in results
+        if isinstance(result, (dict, list))
+        and not (isinstance(result, dict) and result.get('fallback'))
+    ]
+
+
+def merge_chunk_results(results: List[Any]) -> Optional[Any]:
+    """
+    Reduce per-chunk extraction results into one result.
+
+    Dicts merge key by key and lists concatenate. Items stating the same
+    thing in several chunks (same description, ignoring case and spacing,
+    and same policy reference) are kept once under the ID they first had.
+    Item IDs such as "FR-001" that a later chunk reused for different items
+    are renumbered, and references to them within that chunk's result follow.
+
+    Args:
+        results: Extraction result of each chunk, in document order
+
+    Returns:
+        The merged result, or None if no chunk produced a usable one
+    """
+    usable = usable_results(results)
+    if not usable:
+        return None
+
+    merged = usable[0]
+    for result in usable[1:]:
+        merged = _merge(merged, _reconcile_ids(merged, result))
+    return merged
+
+
+def _merge(first: Any, second: Any) -> Any:
+    if isinstance(first, dict) and isinstance(second, dict):
+        merged = dict(first)
+        for key, value in second.items():
+            merged[key] = _merge(merged[key], value) if key in merged else value
+        return merged
+
+    if isinstance(first, list) and isinstance(second, list):
+        merged = []
+        seen = set()
+        for item in first + second:
+            key = _item_key(item)
+            if key not in seen:
+                seen.add(key)
+                merged.append(item)
+        return merged
+
+    return first if first not in (None, '', [], {}) else second
+
+
+def _item_key(item: Any) -> str:
+    if isinstance(item, dict):
+        for key in _ITEM_TEXT_KEYS:
+            if isinstance(item.get(key), str):
+                text = _WHITESPACE.sub(' ', item[key]).strip().lower()
+                return f"{key}:{text}|{item.get('policy_reference', item.get('policy_ref', ''))}"
+        id_key = _own_id_key(item)
+        content = {key: value for key, value in item.items() if key != id_key}
+        return json.dumps(content, sort_keys=True, default=str)
+    if isinstance(item, str):
+        return _WHITESPACE.sub(' ', item).strip().lower()
+    return json.dumps(item, sort_keys=True, default=str)
+
+
+def _own_id_key(item: Dict[str, Any]) -> Optional[str]:
+    """Get the field holding an item's own "PREFIX-NNN" ID (the first *_id field)."""
+    for key, value in item.items():
+        if key == 'id' or key.endswith('_id'):
+            return key if isinstance(value, str) and _ITEM_ID.match(value) else None
+    return None
+
+
+def _id_items(value: Any) -> Iterator[Dict[str, Any]]:
+    """Yield the items with their own ID anywhere in an extraction result."""
+    if isinstance(value, dict):
+        if _own_id_key(value):
+            yield value
+        for child in value.values():
+            yield from _id_items(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from _id_items(child)
+
+
+def _reconcile_ids(merged: Any, incoming: Any) -> Any:
+    """Rewrite the item IDs of a chunk result so they agree with the merged result."""
+    return rename_ids(incoming, id_renames(merged, incoming))
+
+
+def id_renames(merged: Any, incoming: Any) -> Dict[str, str]:
+    """
+    Work out how to rename the item IDs of a result so they agree with another.
+
+    An incoming item with the same content as a merged one takes its ID; one
+    with new content whose ID is already taken gets the next free number of
+    its prefix.
+
+    Args:
+        merged: Result whose IDs are kept
+        incoming: Result to be merged into it
+
+    Returns:
+        Incoming ID -> ID it must be renamed to
+    """
+    existing: Dict[str, str] = {}
+    used: Set[str] = set()
+    for item in _id_items(merged):
+        item_id = item[_own_id_key(item)]
+        existing.setdefault(_item_key(item), item_id)
+        used.add(item_id)
+    taken = set(used)
+    used.update(item[_own_id_key(item)] for item in _id_items(incoming))
+
+    renames: Dict[str, str] = {}
+    for item in _id_items(incoming):
+        item_id = item[_own_id_key(item)]
+        if item_id in renames:
+            continue
+        same = existing.get(_item_key(item))
+        if same is not None:
+            if same != item_id:
+                renames[item_id] = same
+        elif item_id in taken:
+            renames[item_id] = _next_free_id(item_id, used)
+            used.add(renames[item_id])
+    return renames
+
+
+def rename_ids(value: Any, renames: Dict[str, str]) -> Any:
+    """
+    Apply ID renames to every string of a result, in a single pass.
+
+    Both the items' own IDs and fields referring to them (e.g. a question's
+    requirement_id) are rewritten; IDs are matched as whole tokens.
+    """
+    if not renames:
+        return value
+    pattern = re.compile(
+        r'(?<![\w-])(' + '|'.join(map(re.escape, sorted(renames, key=len, reverse=True))) + r')(?![\w-])'
+    )
+    return _rewrite_strings(value, lambda text: pattern.sub(lambda m: renames[m.group(1)], text))
+
+
+def _next_free_id(item_id: str, used: Set[str]) -> str:
+    prefix, digits = _ITEM_ID.match(item_id).groups()
+    numbers = [int(match.group(2)) for match in map(_ITEM_ID.match, used)
+               if match and match.group(1) == prefix]
+    return f"{prefix}{max(numbers, default=0) + 1:0{len(digits)}d}"
+
+
+def _rewrite_strings(value: Any, rewrite: Callable[[str], str]) -> Any:
+    if isinstance(value, str):
+        return rewrite(value)
+    if isinstance(value, dict):
+        return {key: _rewrite_strings(child, rewrite) for key, child in value.items()}
+    if isinstance(value, list):
+        return [_rewrite_strings(child, rewrite) for child in value]
+    return value
@@ -2,11 +2,23 @@ import re
 from typing import Dict, List, Any
 from pathlib import Path
 
+from .tracing import traced
+
+# Patterns are compiled once at import rather than on every call
+_SECTION_PATTERN = re.compile(r'(V\d+\.\d+(?:\.\d+)?)\s+([A-Z\s]+)\n\n(.*?)(?=\n\nV\d+\.\d+|$)', re.DOTALL)
+_REQUIREMENT_PATTERN = re.compile(r'\(([a-z]+|[ivx]+)\)\s+(.*?)(?=\n\([a-z]+|[ivx]+\)|$)', re.DOTALL)
+_CURRENCY_PATTERN = re.compile(r'NZD\s*\$\s*([\d,]+)')
+_TIME_PATTERN = re.compile(r'(\d+)\s+(months?|years?|days?)')
+_AGE_PATTERN = re.compile(r'(?:under|over|age)\s+(\d+)', re.IGNORECASE)
+_MUST_PATTERN = re.compile(r'(.*?must\s+.*?)(?:\.|;|\n)', re.IGNORECASE)
+_MAY_PATTERN = re.compile(r'(.*?may\s+.*?)(?:\.|;|\n)', re.IGNORECASE)
+
 
 class DocumentParser:
     """Utility class for parsing policy documents."""
     
     @staticmethod
+    @traced('parser.load_document')
     def load_document(file_path: str) -> str:
         """Load a document from file."""
         path = Path(file_path)
@@ -17,6 +29,7 @@ class DocumentParser:
             return f.read()
     
     @staticmethod
+    @traced('parser.extract_sections')
     def extract_sections(document: str) -> Dict[str, str]:
         """
         Extract sections from a policy document.
@@ -29,10 +42,8 @@ class DocumentParser:
         """
         sections = {}
         
-        # Pattern to match section headers like "V4.1 OBJECTIVE"
-        pattern = r'(V\d+\.\d+(?:\.\d+)?)\s+([A-Z\s]+)\n\n(.*?)(?=\n\nV\d+\.\d+|$)'
-        
-        matches = re.finditer(pattern, document, re.DOTALL)
+        # Section headers like "V4.1 OBJECTIVE"
+        matches = _SECTION_PATTERN.finditer(document)
         
         for match in matches:
             section_code = match.group(1)
@@ -59,10 +70,8 @@ class DocumentParser:
         """
         requirements = []
         
-        # Pattern to match numbered/lettered requirements
-        pattern = r'\(([a-z]+|[ivx]+)\)\s+(.*?)(?=\n\([a-z]+|[ivx]+\)|$)'
-        
-        matches = re.finditer(pattern, section_content, re.DOTALL)
+        # Numbered/lettered requirements
+        matches = _REQUIREMENT_PATTERN.finditer(section_content)
         
         for match in matches:
             requirement = match.group(2).strip()
@@ -84,16 +93,13 @@ class DocumentParser:
         thresholds = {}
         
         # Extract currency amounts
-        currency_pattern = r'NZD\s*\$\s*([\d,]+)'
-        amounts = re.findall(currency_pattern, document)
+        amounts = _CURRENCY_PATTERN.findall(document)
         
         # Extract time periods
-        time_pattern = r'(\d+)\s+(months?|years?|days?)'
-        periods = re.findall(time_pattern, document)
+        periods = _TIME_PATTERN.findall(document)
         
         # Extract age limits
-        age_pattern = r'(?:under|over|age)\s+(\d+)'
-        ages = re.findall(age_pattern, document, re.IGNORECASE)
+        ages = _AGE_PATTERN.findall(document)
         
         thresholds['currency_amounts'] = [int(a.replace(',', '')) for a in amounts]
         thresholds['time_periods'] = periods
@@ -115,8 +121,7 @@ class DocumentParser:
         conditions = []
         
         # Pattern for "must" statements
-        must_pattern = r'(.*?must\s+.*?)(?:\.|;|\n)'
-        must_matches = re.finditer(must_pattern, document, re.IGNORECASE)
+        must_matches = _MUST_PATTERN.finditer(document)
         
         for match in must_matches:
             conditions.append({
@@ -125,8 +130,7 @@ class DocumentParser:
             })
         
         # Pattern for "may" statements
-        may_pattern = r'(.*?may\s+.*?)(?:\.|;|\n)'
-        may_matches = re.finditer(may_pattern, document, re.IGNORECASE)
+        may_matches = _MAY_PATTERN.finditer(document)
         
         for match in may_matches:
             conditions.append({
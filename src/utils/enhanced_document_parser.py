@@ -1,9 +1,19 @@
-import re
 import io
-from typing import Dict, List, Any, Optional
+import os
+import math
+import atexit
+import threading
+import multiprocessing
+from typing import Dict, List, Any, Iterator, Optional
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import logging
 
+from .policy_analyzer import PolicyAnalyzer
+from .parse_cache import get_parse_cache
+from .tracing import current_span, traced
+
 # PDF parsing
 try:
     import PyPDF2
@@ -26,12 +36,37 @@ try:
 except ImportError:
     EXCEL_AVAILABLE = False
 
+# Part of the parse cache key: bump whenever loading or extraction output changes
+PARSER_VERSION = '2'
+
 
 class EnhancedDocumentParser:
     """Enhanced document parser supporting multiple file formats."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        pdf_workers: Optional[int] = None,
+        parallel_min_pages: int = 32,
+        cache_config: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Initialize the parser.
+        
+        Args:
+            pdf_workers: Worker processes for large PDFs (opt-in). Defaults to
+                the VISA_AGENT_PDF_WORKERS environment variable, then 1, which
+                extracts every PDF in-process.
+            parallel_min_pages: Smallest PDF (in pages) extracted in parallel
+            cache_config: Parsed document cache settings (see
+                DEFAULT_PARSE_CACHE_CONFIG); {'enabled': False} disables it
+        """
         self.logger = logging.getLogger(__name__)
+        if pdf_workers is None:
+            pdf_workers = int(os.getenv('VISA_AGENT_PDF_WORKERS', 1))
+        self.pdf_workers = max(1, pdf_workers)
+        self.parallel_min_pages = parallel_min_pages
+        self.analyzer = PolicyAnalyzer()
+        self.cache = get_parse_cache(cache_config)
         self.supported_formats = ['.txt', '.md']
         
         if PDF_AVAILABLE:
@@ -45,10 +80,15 @@ class EnhancedDocumentParser:
         """Get list of supported file formats."""
         return self.supported_formats
     
+    @traced('parser.load_document')
     def load_document(self, file_path: str) -> Dict[str, Any]:
         """
         Load a document from file with format detection.
         
+        Documents already parsed (same bytes, extension and parser version)
+        come from the parse cache without being parsed again. Freshly parsed
+        documents are cached together with their structured content.
+        
         Args:
             file_path: Path to the document file
             
@@ -60,7 +100,26 @@ class EnhancedDocumentParser:
             raise FileNotFoundError(f"Document not found: {file_path}")
         
         file_extension = path.suffix.lower()
-        
+        span = current_span()
+        span.set_attributes(format=file_extension, size_bytes=path.stat().st_size)
+        if self.cache is None:
+            return self._parse_document(path, file_extension)
+        
+        cache_key = self.cache.make_key(path.read_bytes(), file_extension, PARSER_VERSION)
+        document_data = self.cache.get(cache_key)
+        span.set_attribute('parse_cache_hit', document_data is not None)
+        if document_data is not None:
+            self.logger.info(f"Parse cache hit for {path.name}")
+            document_data['metadata']['filename'] = path.name
+            return document_data
+        
+        document_data = self._parse_document(path, file_extension)
+        document_data['structured_content'] = self.extract_structured_content(document_data)
+        self.cache.set(cache_key, document_data)
+        return document_data
+    
+    def _parse_document(self, path: Path, file_extension: str) -> Dict[str, Any]:
+        """Parse a document with the loader for its format."""
         if file_extension in ['.txt', '.md']:
             return self._load_text_document(path)
         elif file_extension == '.pdf' and PDF_AVAILABLE:
@@ -87,9 +146,64 @@ class EnhancedDocumentParser:
             }
         }
     
+    def iter_pages(self, file_path: str, workers: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the pages of a PDF document in order.
+        
+        Each page is opened once for both its text and its tables and released
+        before the next one is read. With more than one worker, PDFs with at
+        least ``parallel_min_pages`` pages are split into contiguous page
+        ranges that the shared worker pool (see get_pdf_pool) extracts in
+        parallel; pages are still yielded in document order.
+        
+        Args:
+            file_path: Path to the PDF document
+            workers: Worker processes for large PDFs (defaults to ``pdf_workers``; 1 disables)
+            
+        Yields:
+            Dictionaries with 'page_number' (1-based), 'text', 'tables' and
+            'extraction_method'
+        """
+        path = Path(file_path)
+        if not path.exists():
+            raise FileNotFoundError(f"Document not found: {file_path}")
+        if not PDF_AVAILABLE:
+            raise ValueError("PDF support is not available (install pdfplumber and PyPDF2)")
+        
+        try:
+            pdf = pdfplumber.open(path)
+        except Exception as e:
+            self.logger.warning(f"pdfplumber failed, trying PyPDF2: {e}")
+            yield from _extract_pypdf2_pages(path)
+            return
+        
+        workers = self.pdf_workers if workers is None else max(1, int(workers))
+        with pdf:
+            page_count = len(pdf.pages)
+            if workers <= 1 or page_count < self.parallel_min_pages:
+                yield from _iter_pdfplumber_pages(pdf, 0, page_count)
+                return
+        
+        yield from self._iter_pages_parallel(path, page_count, workers)
+    
+    def _iter_pages_parallel(self, path: Path, page_count: int, workers: int) -> Iterator[Dict[str, Any]]:
+        """Extract contiguous page ranges in worker processes, yielding them in order."""
+        chunk_size = math.ceil(page_count / workers)
+        starts = list(range(0, page_count, chunk_size))
+        ends = [min(start + chunk_size, page_count) for start in starts]
+        
+        try:
+            ranges = list(get_pdf_pool(workers).map(_extract_pdfplumber_pages, [str(path)] * len(starts), starts, ends))
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory): replace the pool next time, extract here now
+            self.logger.warning(f"PDF worker pool failed, extracting in-process: {e}")
+            discard_pdf_pool(workers)
+            ranges = [_extract_pdfplumber_pages(str(path), start, end) for start, end in zip(starts, ends)]
+        for pages in ranges:
+            yield from pages
+    
     def _load_pdf_document(self, path: Path) -> Dict[str, Any]:
         """Load PDF document with enhanced text extraction."""
-        content = ""
         metadata = {
             'filename': path.name,
             'format': '.pdf',
@@ -98,44 +212,30 @@ class EnhancedDocumentParser:
         }
         
         try:
-            # Try pdfplumber first (better for structured documents)
-            with pdfplumber.open(path) as pdf:
-                metadata['pages'] = len(pdf.pages)
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        content += page_text + "\n\n"
-                        
-                # Extract tables if present
-                tables = []
-                for page in pdf.pages:
-                    page_tables = page.extract_tables()
-                    if page_tables:
-                        tables.extend(page_tables)
-                
-                metadata['tables_found'] = len(tables)
-                
+            pages = list(self.iter_pages(str(path)))
         except Exception as e:
             self.logger.warning(f"pdfplumber failed, trying PyPDF2: {e}")
-            # Fallback to PyPDF2
             try:
-                with open(path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    metadata['pages'] = len(pdf_reader.pages)
-                    metadata['extraction_method'] = 'PyPDF2'
-                    
-                    for page in pdf_reader.pages:
-                        content += page.extract_text() + "\n\n"
-                        
+                pages = list(_extract_pypdf2_pages(path))
             except Exception as e2:
                 raise ValueError(f"Failed to parse PDF: {e2}")
         
+        if pages and pages[0]['extraction_method'] == 'PyPDF2':
+            metadata['extraction_method'] = 'PyPDF2'
+        
+        # Join once from a list buffer; repeated += is quadratic on long documents
+        content = ''.join(page['text'] + "\n\n" for page in pages if page['text'])
+        tables = [table for page in pages for table in page['tables']]
+        
+        metadata['pages'] = len(pages)
+        metadata['tables_found'] = len(tables)
         metadata['size'] = len(content)
         
         return {
             'content': content,
             'format': 'pdf',
-            'metadata': metadata
+            'metadata': metadata,
+            'tables': tables
         }
     
     def _load_docx_document(self, path: Path) -> Dict[str, Any]:
@@ -213,190 +313,120 @@ class EnhancedDocumentParser:
         """
         Extract structured content from document data.
         
+        Sections, requirements, thresholds, conditions and policy metadata
+        all come from one PolicyAnalyzer.analyze() call over the content.
+        
         Args:
             document_data: Document data from load_document()
             
         Returns:
             Structured content with sections, requirements, etc.
         """
-        content = document_data['content']
-        doc_format = document_data['format']
-        
-        # Extract sections
-        sections = self.extract_sections(content)
-        
-        # Extract requirements from each section
-        all_requirements = []
-        for section_code, section_data in sections.items():
-            section_requirements = self.extract_requirements(section_data['content'])
-            for req in section_requirements:
-                all_requirements.append({
-                    'section': section_code,
-                    'requirement': req
-                })
+        if document_data.get('structured_content') is not None:
+            return document_data['structured_content']
         
-        # Extract thresholds and conditions
-        thresholds = self.extract_thresholds(content)
-        conditions = self.extract_conditions(content)
-        
-        # Extract metadata specific to policy documents
-        policy_metadata = self.extract_policy_metadata(content)
+        analysis = self.analyzer.analyze(document_data['content'])
         
         return {
-            'sections': sections,
-            'requirements': all_requirements,
-            'thresholds': thresholds,
-            'conditions': conditions,
-            'policy_metadata': policy_metadata,
-            'document_format': doc_format,
+            **analysis,
+            'document_format': document_data['format'],
             'original_metadata': document_data['metadata']
         }
     
     def extract_sections(self, document: str) -> Dict[str, Dict[str, str]]:
         """Extract sections from policy document."""
-        sections = {}
-        
-        # Enhanced pattern for various section formats
-        patterns = [
-            # Standard format: V4.1 OBJECTIVE
-            r'(V\d+\.\d+(?:\.\d+)?)\s+([A-Z\s&]+)\n\n(.*?)(?=\n\nV\d+\.\d+|$)',
-            # Alternative format: 4.1 Objective
-            r'(\d+\.\d+(?:\.\d+)?)\s+([A-Za-z\s&]+)\n\n(.*?)(?=\n\n\d+\.\d+|$)',
-            # Header format: ## Section Name
-            r'(##\s+)([A-Za-z\s&]+)\n\n(.*?)(?=\n\n##|$)'
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, document, re.DOTALL)
-            for match in matches:
-                section_code = match.group(1).strip()
-                section_title = match.group(2).strip()
-                section_content = match.group(3).strip()
-                
-                sections[section_code] = {
-                    'title': section_title,
-                    'content': section_content
-                }
-        
-        return sections
+        return self.analyzer.analyze(document)['sections']
     
     def extract_requirements(self, section_content: str) -> List[str]:
         """Extract requirements from section content."""
-        requirements = []
-        
-        # Multiple patterns for different requirement formats
-        patterns = [
-            # (a), (b), (c) format
-            r'\(([a-z]+)\)\s+(.*?)(?=\n\([a-z]+\)|$)',
-            # (i), (ii), (iii) format
-            r'\(([ivx]+)\)\s+(.*?)(?=\n\([ivx]+\)|$)',
-            # 1., 2., 3. format
-            r'(\d+)\.\s+(.*?)(?=\n\d+\.|$)',
-            # • bullet points
-            r'[•·]\s+(.*?)(?=\n[•·]|$)',
-            # - dash points
-            r'-\s+(.*?)(?=\n-|$)'
-        ]
-        
-        for pattern in patterns:
-            matches = re.finditer(pattern, section_content, re.DOTALL)
-            for match in matches:
-                requirement = match.group(2).strip() if len(match.groups()) > 1 else match.group(1).strip()
-                if requirement and len(requirement) > 10:  # Filter out very short matches
-                    requirements.append(requirement)
-        
-        return requirements
+        return self.analyzer.extract_requirements(section_content)
     
     def extract_thresholds(self, document: str) -> Dict[str, Any]:
         """Extract numerical thresholds from document."""
-        thresholds = {}
-        
-        # Enhanced currency extraction
-        currency_patterns = [
-            r'NZD\s*\$\s*([\d,]+)',
-            r'\$\s*([\d,]+)',
-            r'([\d,]+)\s*dollars?'
-        ]
-        
-        amounts = []
-        for pattern in currency_patterns:
-            matches = re.findall(pattern, document, re.IGNORECASE)
-            amounts.extend([int(a.replace(',', '')) for a in matches])
-        
-        # Time periods
-        time_pattern = r'(\d+)\s+(months?|years?|days?|weeks?)'
-        periods = re.findall(time_pattern, document, re.IGNORECASE)
-        
-        # Age limits
-        age_patterns = [
-            r'(?:under|over|age|aged)\s+(\d+)',
-            r'(\d+)\s+years?\s+old',
-            r'minimum\s+age\s+(\d+)'
-        ]
-        
-        ages = []
-        for pattern in age_patterns:
-            matches = re.findall(pattern, document, re.IGNORECASE)
-            ages.extend([int(a) for a in matches])
-        
-        thresholds['currency_amounts'] = sorted(set(amounts))
-        thresholds['time_periods'] = periods
-        thresholds['age_limits'] = sorted(set(ages))
-        
-        return thresholds
+        return self.analyzer.analyze(document)['thresholds']
     
     def extract_conditions(self, document: str) -> List[Dict[str, str]]:
         """Extract conditional statements."""
-        conditions = []
-        
-        # Enhanced condition patterns
-        condition_patterns = [
-            (r'(.*?must\s+.*?)(?:\.|;|\n)', 'mandatory'),
-            (r'(.*?shall\s+.*?)(?:\.|;|\n)', 'mandatory'),
-            (r'(.*?required\s+to\s+.*?)(?:\.|;|\n)', 'mandatory'),
-            (r'(.*?may\s+.*?)(?:\.|;|\n)', 'optional'),
-            (r'(.*?can\s+.*?)(?:\.|;|\n)', 'optional'),
-            (r'(.*?should\s+.*?)(?:\.|;|\n)', 'recommended'),
-            (r'(.*?if\s+.*?)(?:\.|;|\n)', 'conditional')
-        ]
-        
-        for pattern, condition_type in condition_patterns:
-            matches = re.finditer(pattern, document, re.IGNORECASE)
-            for match in matches:
-                statement = match.group(1).strip()
-                if len(statement) > 15:  # Filter short matches
-                    conditions.append({
-                        'type': condition_type,
-                        'statement': statement
-                    })
-        
-        return conditions
+        return self.analyzer.analyze(document)['conditions']
     
     def extract_policy_metadata(self, document: str) -> Dict[str, Any]:
         """Extract policy-specific metadata."""
-        metadata = {}
-        
-        # Extract visa codes
-        visa_codes = re.findall(r'\b[A-Z]\d+\b', document)
-        metadata['visa_codes'] = list(set(visa_codes))
-        
-        # Extract dates
-        date_patterns = [
-            r'\d{1,2}/\d{1,2}/\d{4}',
-            r'\d{1,2}-\d{1,2}-\d{4}',
-            r'\d{4}-\d{1,2}-\d{1,2}'
-        ]
-        
-        dates = []
-        for pattern in date_patterns:
-            dates.extend(re.findall(pattern, document))
-        metadata['dates_mentioned'] = dates
-        
-        # Extract policy references
-        policy_refs = re.findall(r'V\d+\.\d+(?:\.\d+)?(?:\([a-z]+\))?', document)
-        metadata['policy_references'] = list(set(policy_refs))
-        
-        return metadata
+        return self.analyzer.analyze(document)['policy_metadata']
+
+
+_pdf_pools: Dict[int, ProcessPoolExecutor] = {}
+_pdf_pools_lock = threading.Lock()
+
+
+def get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Get the process-wide PDF extraction pool with the given number of workers.
+
+    The pool is created on first use and reused for every later document.
+    Workers are spawned rather than forked, so they never inherit the
+    threads, locks or open clients of the server process.
+    """
+    with _pdf_pools_lock:
+        pool = _pdf_pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pdf_pools[workers] = pool
+        return pool
+
+
+def discard_pdf_pool(workers: int):
+    """Shut down a PDF extraction pool, e.g. after one of its workers died."""
+    with _pdf_pools_lock:
+        pool = _pdf_pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pdf_pools():
+    """Stop every PDF extraction pool (registered to run at exit)."""
+    with _pdf_pools_lock:
+        pools = list(_pdf_pools.values())
+        _pdf_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_pdf_pools)
+
+
+def _iter_pdfplumber_pages(pdf, start: int, end: int) -> Iterator[Dict[str, Any]]:
+    """Yield the text and tables of pages [start, end) of an open pdfplumber PDF."""
+    for index in range(start, end):
+        page = pdf.pages[index]
+        try:
+            yield {
+                'page_number': index + 1,
+                'text': page.extract_text() or '',
+                'tables': page.extract_tables() or [],
+                'extraction_method': 'pdfplumber'
+            }
+        finally:
+            # Drop the page's parsed layout objects before moving on
+            page.close()
+
+
+def _extract_pdfplumber_pages(path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Extract a page range in a worker process."""
+    with pdfplumber.open(path) as pdf:
+        return list(_iter_pdfplumber_pages(pdf, start, end))
+
+
+def _extract_pypdf2_pages(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield page text with PyPDF2 (no table extraction)."""
+    with open(path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for index, page in enumerate(pdf_reader.pages):
+            yield {
+                'page_number': index + 1,
+                'text': page.extract_text() or '',
+                'tables': [],
+                'extraction_method': 'PyPDF2'
+            }
 
 
 # Utility function for easy import
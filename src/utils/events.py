@@ -0,0 +1,163 @@
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Workflow event types
+RUN_START = 'run_start'
+RUN_END = 'run_end'
+STAGE_START = 'stage_start'
+STAGE_END = 'stage_end'
+LLM_CALL = 'llm_call'
+JOB_START = 'job_start'
+JOB_END = 'job_end'
+
+Event = Dict[str, Any]
+Callback = Callable[[Event], None]
+
+# Fields added to every event published in the current context (e.g. a job id)
+_event_tags: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar('event_tags', default={})
+
+
+@contextmanager
+def event_tags(**tags: Any) -> Iterator[None]:
+    """
+    Tag the events published in the enclosed code.
+
+    Tags follow the context into stage threads and asyncio tasks, so
+    subscribers can pick out the events of one job or UI session.
+    """
+    token = _event_tags.set({**_event_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _event_tags.reset(token)
+
+
+class EventBus:
+    """
+    Process-wide publish/subscribe of workflow events.
+
+    Events are flat dicts with a 'type', a 'time' and the context's tags.
+    Callbacks run synchronously in the publishing thread, so they must be
+    quick; publishing with no subscribers costs one check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[Tuple[Callback, Dict[str, Any]]] = []
+
+    def subscribe(self, callback: Callback, **filters: Any) -> Callable[[], None]:
+        """
+        Call a function with every event whose fields match the filters.
+
+        Args:
+            callback: Called with each matching event
+            **filters: Field values an event must have (e.g. job_id=...)
+
+        Returns:
+            Function that unsubscribes the callback
+        """
+        entry = (callback, filters)
+        with self._lock:
+            self._subscribers = self._subscribers + [entry]
+
+        def unsubscribe():
+            with self._lock:
+                self._subscribers = [s for s in self._subscribers if s is not entry]
+        return unsubscribe
+
+    def publish(self, event_type: str, **fields: Any):
+        """Publish an event to the matching subscribers."""
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+
+        event = {'type': event_type, 'time': time.time(), **_event_tags.get(), **fields}
+        for callback, filters in subscribers:
+            if all(event.get(key) == value for key, value in filters.items()):
+                try:
+                    callback(event)
+                except Exception as e:
+                    logger.warning("Event subscriber failed on %s: %s", event_type, e)
+
+    def stream(self, max_pending: int = 1000, **filters: Any) -> 'EventStream':
+        """
+        Subscribe an asyncio consumer (call on its event loop).
+
+        Args:
+            max_pending: Events buffered for a slow consumer before the oldest are dropped
+            **filters: Field values an event must have
+
+        Returns:
+            EventStream to iterate with ``async for`` and close when done
+        """
+        return EventStream(self, max_pending, filters)
+
+
+class EventStream:
+    """Async iterator over the events of one subscription."""
+
+    def __init__(self, bus: EventBus, max_pending: int, filters: Dict[str, Any]):
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, max_pending))
+        self._unsubscribe = bus.subscribe(self._deliver, **filters)
+
+    def _deliver(self, event: Event):
+        # Publishers may run in other threads; hand over on the consumer's loop
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # Consumer loop closed
+            self.close()
+
+    def _put(self, event: Event):
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Wait for the next event; None on timeout."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def get_nowait(self) -> Optional[Event]:
+        """Get the next event already received; None if there is none."""
+        try:
+            return self._queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    def empty(self) -> bool:
+        """Whether no received event is waiting."""
+        return self._queue.empty()
+
+    def __aiter__(self) -> 'EventStream':
+        return self
+
+    async def __anext__(self) -> Event:
+        return await self._queue.get()
+
+    def close(self):
+        """Stop receiving events."""
+        self._unsubscribe()
+
+
+_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    """Get the process-wide event bus."""
+    return _bus
+
+
+def publish_event(event_type: str, **fields: Any):
+    """Publish an event on the process-wide bus."""
+    _bus.publish(event_type, **fields)
@@ -0,0 +1,149 @@
+import json
+import hashlib
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from .llm_cache import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_CONFIG = {
+    'capacity': 100,
+    'spill_dir': None
+}
+
+
+def _serialize(value: Any) -> bytes:
+    try:
+        text = json.dumps(value, sort_keys=True, default=str, ensure_ascii=False)
+    except (TypeError, ValueError):
+        # e.g. circular references; the digest then only identifies the repr
+        text = json.dumps(repr(value))
+    return text.encode('utf-8')
+
+
+def payload_summary(value: Any) -> Tuple[Dict[str, Any], bytes]:
+    """
+    Describe a payload by its digest and size instead of keeping it.
+
+    Args:
+        value: Agent inputs or outputs
+
+    Returns:
+        The summary ('sha256', 'bytes' and, for dicts, 'keys') and the
+        serialized payload it was computed from
+    """
+    data = _serialize(value)
+    summary = {'sha256': hashlib.sha256(data).hexdigest(), 'bytes': len(data)}
+    if isinstance(value, dict):
+        summary['keys'] = sorted(str(key) for key in value)
+    return summary, data
+
+
+class ExecutionHistory:
+    """
+    Bounded history of an agent's executions.
+
+    Keeps the most recent ``capacity`` records in a ring buffer, each holding
+    only timings, status and a digest and size of the inputs and outputs, so
+    memory stays flat however long the agent lives. With a spill directory,
+    the full payloads are appended to <spill_dir>/<agent>.jsonl, where they
+    can be found by the digests in the records.
+    """
+
+    def __init__(self, agent: str, capacity: int = 100, spill_dir: Optional[str] = None):
+        self.agent = agent
+        self.capacity = max(1, capacity)
+        self.spill_path = Path(spill_dir) / f"{agent}.jsonl" if spill_dir else None
+        self._records: deque = deque(maxlen=self.capacity)
+        self._lock = threading.Lock()
+
+    def record(self, inputs: Dict[str, Any], outputs: Optional[Dict[str, Any]], duration: float,
+               success: bool, error: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Add one execution, evicting the oldest record when the buffer is full.
+
+        Args:
+            inputs: Agent inputs
+            outputs: Agent outputs (ignored unless the execution succeeded)
+            duration: Execution time in seconds
+            success: Whether the execution succeeded
+            error: Error message of a failed execution
+
+        Returns:
+            The compact record that was stored
+        """
+        outputs = outputs if success else None
+        input_summary, input_data = payload_summary(inputs)
+        output_summary, output_data = payload_summary(outputs) if outputs is not None else (None, b'null')
+
+        record = {
+            'timestamp': datetime.now().isoformat(),
+            'agent': self.agent,
+            'duration_seconds': duration,
+            'success': success,
+            'error': error,
+            'inputs': input_summary,
+            'outputs': output_summary
+        }
+
+        with self._lock:
+            if self.spill_path is not None:
+                self._spill(record, input_data, output_data)
+            self._records.append(record)
+        return record
+
+    def _spill(self, record: Dict[str, Any], input_data: bytes, output_data: bytes):
+        # Reuses the bytes the digests were computed from instead of serializing again
+        header = json.dumps({
+            'timestamp': record['timestamp'],
+            'agent': record['agent'],
+            'success': record['success'],
+            'inputs_sha256': record['inputs']['sha256'],
+            'outputs_sha256': record['outputs']['sha256'] if record['outputs'] else None
+        })
+        line = header[:-1].encode('utf-8') + b', "inputs": ' + input_data + b', "outputs": ' + output_data + b'}\n'
+        try:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, 'ab') as f:
+                f.write(line)
+            record['spill_file'] = str(self.spill_path)
+        except OSError as e:
+            logger.warning("Could not spill execution payloads to %s: %s", self.spill_path, e)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Get the retained records, oldest first."""
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self.records())
+
+
+def create_execution_history(agent: str, history_config: Optional[Dict[str, Any]] = None) -> ExecutionHistory:
+    """
+    Create an agent's execution history from configuration.
+
+    Args:
+        agent: Agent name, used for the spill file name
+        history_config: The ``execution_history`` section of agent_config.yaml
+
+    Returns:
+        ExecutionHistory; relative spill directories resolve against the project root
+    """
+    config = {**DEFAULT_HISTORY_CONFIG, **(history_config or {})}
+    spill_dir = config.get('spill_dir')
+    if spill_dir and not Path(spill_dir).is_absolute():
+        spill_dir = str(PROJECT_ROOT / spill_dir)
+    return ExecutionHistory(agent, config['capacity'], spill_dir)
@@ -0,0 +1,188 @@
+import re
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Any, Callable, Iterable, List, Mapping, Optional, Tuple
+
+# A compiled rule: returns the error message for a value, or None when it passes
+Check = Callable[[Any], Optional[str]]
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_PATTERN = re.compile(r'^[\+]?[1-9][\d]{0,15}$')
+_NUMBER = re.compile(r'\d+')
+
+REQUIRED_ERROR = "This field is required"
+
+
+def _check_email(value: Any) -> Optional[str]:
+    if not EMAIL_PATTERN.match(str(value)):
+        return "Please enter a valid email address"
+    return None
+
+
+def _check_phone(value: Any) -> Optional[str]:
+    if not PHONE_PATTERN.match(str(value).replace(' ', '').replace('-', '')):
+        return "Please enter a valid phone number"
+    return None
+
+
+def _check_numeric(value: Any) -> Optional[str]:
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return "Please enter a numeric value"
+    return None
+
+
+def _check_future(value: Any) -> Optional[str]:
+    if isinstance(value, date) and value <= date.today():
+        return "Date must be in the future"
+    return None
+
+
+def _check_past(value: Any) -> Optional[str]:
+    if isinstance(value, date) and value >= date.today():
+        return "Date must be in the past"
+    return None
+
+
+def _length_check(rule: str, minimum: bool) -> Optional[Check]:
+    match = _NUMBER.search(rule)
+    if match is None:
+        return None
+    limit = int(match.group())
+
+    if minimum:
+        def check(value: Any) -> Optional[str]:
+            return f"Minimum length is {limit} characters" if len(str(value)) < limit else None
+    else:
+        def check(value: Any) -> Optional[str]:
+            return f"Maximum length is {limit} characters" if len(str(value)) > limit else None
+    return check
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(rule: str) -> Optional[Check]:
+    """
+    Compile a free-text validation rule into a check.
+
+    Recognised rules mention an email, a phone number, a minimum or maximum
+    length ("minimum length 5"), a numeric value, or a future or past date,
+    matched in that order. Compiled checks are cached by rule text, so each
+    distinct rule is parsed once per process.
+
+    Args:
+        rule: Validation rule text
+
+    Returns:
+        The check, or None for rules that constrain nothing
+    """
+    rule_lower = rule.lower()
+    if 'email' in rule_lower:
+        return _check_email
+    if 'phone' in rule_lower:
+        return _check_phone
+    if 'minimum length' in rule_lower:
+        return _length_check(rule, minimum=True)
+    if 'maximum length' in rule_lower:
+        return _length_check(rule, minimum=False)
+    if 'numeric' in rule_lower:
+        return _check_numeric
+    if 'date' in rule_lower and 'future' in rule_lower:
+        return _check_future
+    if 'date' in rule_lower and 'past' in rule_lower:
+        return _check_past
+    return None
+
+
+@lru_cache(maxsize=1024)
+def compile_rules(rules: Tuple[str, ...]) -> Tuple[Check, ...]:
+    """Compile a field's validation rules, dropping those that constrain nothing."""
+    checks = (compile_rule(rule) for rule in rules if isinstance(rule, str))
+    return tuple(check for check in checks if check is not None)
+
+
+def check_value(value: Any, checks: Tuple[Check, ...], is_required: bool) -> List[str]:
+    """
+    Run a field's compiled checks on a value.
+
+    Empty values fail only the required check; rules apply to non-empty
+    values alone.
+
+    Returns:
+        Error messages, empty when the value is valid
+    """
+    if is_required and (value is None or value == '' or (isinstance(value, list) and len(value) == 0)):
+        return [REQUIRED_ERROR]
+    if not value:
+        return []
+
+    errors = []
+    for check in checks:
+        error = check(value)
+        if error is not None:
+            errors.append(error)
+    return errors
+
+
+def rule_texts(rules: Any) -> Tuple[str, ...]:
+    """Get a question's validation rules as a hashable tuple of rule texts."""
+    if isinstance(rules, str):
+        return (rules,)
+    return tuple(rule for rule in rules or () if isinstance(rule, str))
+
+
+def field_id(question: Mapping[str, Any], position: int) -> str:
+    """Get the form field id of a question (its 'id', else q_<position>)."""
+    return str(question.get('id') or question.get('question_id') or f"q_{position}")
+
+
+class FormValidator:
+    """
+    Validates submissions of one form.
+
+    Each question's ``validation_rules`` are compiled into checks when the
+    validator is created, so validating a field is a lookup and a few
+    function calls, and a whole submission is checked in one pass.
+    """
+
+    def __init__(self, questions: Iterable[Mapping[str, Any]]):
+        """
+        Initialize the validator.
+
+        Args:
+            questions: Form questions with 'id', 'required' (or 'mandatory',
+                default True) and 'validation_rules'
+        """
+        self.fields: Dict[str, Tuple[Tuple[Check, ...], bool]] = {}
+        for position, question in enumerate(questions):
+            is_required = question.get('required', question.get('mandatory', True))
+            checks = compile_rules(rule_texts(question.get('validation_rules')))
+            self.fields[field_id(question, position)] = (checks, bool(is_required))
+
+    def validate_field(self, field: str, value: Any) -> Dict[str, Any]:
+        """
+        Validate one field of the form.
+
+        Returns:
+            Dictionary with 'is_valid', 'errors' and the 'value'
+        """
+        checks, is_required = self.fields.get(field, ((), False))
+        errors = check_value(value, checks, is_required)
+        return {'is_valid': not errors, 'errors': errors, 'value': value}
+
+    def validate_form(self, values: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Validate a whole submission.
+
+        Args:
+            values: Field id -> submitted value; missing fields are empty
+
+        Returns:
+            Dictionary with 'is_valid' and the 'errors' of each failing field
+        """
+        errors = {}
+        for field, (checks, is_required) in self.fields.items():
+            field_errors = check_value(values.get(field), checks, is_required)
+            if field_errors:
+                errors[field] = field_errors
+        return {'is_valid': not errors, 'errors': errors}
@@ -0,0 +1,194 @@
+import re
+import json
+import logging
+from typing import Any, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_CLOSERS = {'{': '}', '[': ']'}
+_WHITESPACE = ' \t\r\n'
+
+# Structural characters; everything between them is skipped in C
+_STRUCTURAL = re.compile(r'[{}\[\],"]')
+# Rest of a string literal after its opening quote (unrolled to avoid backtracking)
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+
+
+def extract_json(text: str) -> Optional[Any]:
+    """
+    Find and decode the first JSON object or array in an LLM response.
+
+    Fenced code blocks (```json ... ```) are searched first, then the whole
+    response. Each candidate is found with a single bracket-balancing scan
+    that understands strings and escapes, so the work is linear in the
+    response length. Trailing commas are dropped, and a response cut off
+    mid-value (e.g. by max_tokens) is closed off where possible.
+
+    Args:
+        text: Raw LLM response
+
+    Returns:
+        The decoded dict or list, or None if the response holds no usable JSON
+    """
+    if not text:
+        return None
+
+    for start, end in _fenced_blocks(text):
+        result = _scan(text, start, end)
+        if result is not None:
+            return result
+
+    return _scan(text, 0, len(text))
+
+
+def _fenced_blocks(text: str) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) spans of the contents of ``` fenced blocks."""
+    position = 0
+    while True:
+        opening = text.find('```', position)
+        if opening == -1:
+            return
+        # Skip the language tag on the opening fence line
+        content_start = opening + 3
+        line_end = text.find('\n', content_start)
+        if line_end != -1 and text[content_start:line_end].strip().isalnum():
+            content_start = line_end + 1
+
+        closing = text.find('```', content_start)
+        if closing == -1:
+            yield content_start, len(text)
+            return
+        yield content_start, closing
+        position = closing + 3
+
+
+def _scan(text: str, start: int, end: int) -> Optional[Any]:
+    """Decode the first balanced JSON object or array in text[start:end]."""
+    position = start
+    while position < end:
+        opening = _next_opening(text, position, end)
+        if opening == -1:
+            return None
+
+        result, resume_at = _decode_from(text, opening, end)
+        if result is not None:
+            return result
+        # The span was not JSON; keep scanning after it, never re-reading it
+        position = max(resume_at, opening + 1)
+
+    return None
+
+
+def _next_opening(text: str, position: int, end: int) -> int:
+    """Find the next '{' or '[' in text[position:end], or -1."""
+    brace = text.find('{', position, end)
+    bracket = text.find('[', position, end)
+    if brace == -1:
+        return bracket
+    if bracket == -1:
+        return brace
+    return min(brace, bracket)
+
+
+def _decode_from(text: str, start: int, end: int) -> Tuple[Optional[Any], int]:
+    """
+    Balance brackets from text[start] and decode the value they enclose.
+
+    Returns:
+        The decoded value (or None) and the index where scanning should resume
+    """
+    stack: List[str] = []
+    trailing_commas: List[int] = []
+    pending_comma: Optional[int] = None
+    last_comma: Optional[Tuple[int, int]] = None
+    in_string = False
+
+    position = start
+    while True:
+        match = _STRUCTURAL.search(text, position, end)
+        if match is None:
+            break
+        position = match.start()
+        char = text[position]
+
+        if char == '"':
+            string_end = _STRING_TAIL.match(text, position + 1, end)
+            if string_end is None:
+                in_string = True
+                break
+            position = string_end.end()
+            continue
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in '}]':
+            if char != stack[-1]:
+                return None, position
+            stack.pop()
+            if pending_comma is not None and _only_whitespace(text, pending_comma + 1, position):
+                trailing_commas.append(pending_comma)
+            pending_comma = None
+            if not stack:
+                return _loads(text[start:position + 1], start, trailing_commas), position + 1
+        elif char == ',':
+            pending_comma = position
+            last_comma = (position, len(stack))
+
+        position += 1
+
+    # Ran out of text inside the value: try to close it off
+    return _repair_truncated(text, start, end, stack, in_string, last_comma, trailing_commas), end
+
+
+def _only_whitespace(text: str, start: int, end: int) -> bool:
+    return all(char in _WHITESPACE for char in text[start:end])
+
+
+def _loads(candidate: str, offset: int, trailing_commas: List[int]) -> Optional[Any]:
+    """Decode a candidate, dropping trailing commas if the plain decode fails."""
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+
+    if not trailing_commas:
+        return None
+
+    pieces = []
+    previous = 0
+    for comma in trailing_commas:
+        pieces.append(candidate[previous:comma - offset])
+        previous = comma - offset + 1
+    pieces.append(candidate[previous:])
+
+    try:
+        return json.loads(''.join(pieces))
+    except ValueError:
+        return None
+
+
+def _repair_truncated(
+    text: str,
+    start: int,
+    end: int,
+    stack: List[str],
+    in_string: bool,
+    last_comma: Optional[Tuple[int, int]],
+    trailing_commas: List[int]
+) -> Optional[Any]:
+    """Close a value cut off mid-stream, first as is, then back at its last comma."""
+    body = text[start:end].rstrip()
+    if in_string:
+        body += '"'
+    result = _loads(body.rstrip(',') + ''.join(reversed(stack)), start, trailing_commas)
+    if result is not None:
+        logger.info("Recovered JSON from a truncated response")
+        return result
+
+    if last_comma is not None and last_comma[1] <= len(stack):
+        comma, depth = last_comma
+        result = _loads(text[start:comma] + ''.join(reversed(stack[:depth])), start, trailing_commas)
+        if result is not None:
+            logger.info("Recovered JSON from a truncated response")
+        return result
+
+    return None
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+
+
+class MemoryLRUCache:
+    """Thread-safe in-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: Optional[float] = None):
+        """
+        Initialize the memory tier.
+
+        Args:
+            max_entries: Maximum number of entries kept in memory
+            ttl_seconds: Entry lifetime in seconds (None for no expiry)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a value, refreshing its recency; returns None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, created_at = entry
+            if self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, created_at: Optional[float] = None):
+        """Store a value, evicting the least recently used entries beyond capacity."""
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (value, created_at if created_at is not None else time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResponseStore:
+    """On-disk response store with TTL and entry/byte-size eviction."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10000,
+        max_bytes: int = 100 * 1024 * 1024,
+        ttl_seconds: Optional[float] = None,
+        table: str = 'responses'
+    ):
+        """
+        Open (or create) the SQLite store.
+
+        Values may be str or bytes; sizes count encoded bytes.
+
+        Args:
+            path: Database file path
+            max_entries: Maximum number of stored responses
+            max_bytes: Maximum total size of stored responses in bytes
+            ttl_seconds: Entry lifetime in seconds (None for no expiry)
+            table: Table holding the entries
+        """
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.table = table
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_accessed ON {table} (accessed_at)')
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Union[str, bytes], float]]:
+        """Get a (value, created_at) pair, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, created_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(f'UPDATE {self.table} SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            return value, created_at
+
+    def set(self, key: str, value: Union[str, bytes]):
+        """Store a value and evict expired or least recently used entries."""
+        now = time.time()
+        size = len(value) if isinstance(value, bytes) else len(value.encode('utf-8'))
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, value, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used until within limits."""
+        if self.ttl_seconds is not None:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE created_at < ?', (now - self.ttl_seconds,))
+
+        count, total_bytes = self._conn.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}'
+        ).fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        excess_entries = max(0, count - self.max_entries)
+        excess_bytes = max(0, total_bytes - self.max_bytes)
+        doomed = []
+        freed = 0
+        for key, size in self._conn.execute(f'SELECT key, size FROM {self.table} ORDER BY accessed_at ASC'):
+            if len(doomed) >= excess_entries and freed >= excess_bytes:
+                break
+            doomed.append((key,))
+            freed += size
+
+        self._conn.executemany(f'DELETE FROM {self.table} WHERE key = ?', doomed)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table}')
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+
+class LLMResponseCache:
+    """Content-addressed LLM response cache: in-process LRU tier over an optional disk tier."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_entries: int = 256,
+        max_entries: int = 10000,
+        max_bytes: int = 100 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite file for the disk tier (None for memory only)
+            memory_entries: Capacity of the in-process LRU tier
+            max_entries: Capacity of the disk tier
+            max_bytes: Maximum total response bytes in the disk tier
+            ttl_seconds: Entry lifetime in seconds (None for no expiry)
+        """
+        self.memory = MemoryLRUCache(memory_entries, ttl_seconds)
+        self.store = SQLiteResponseStore(path, max_entries, max_bytes, ttl_seconds) if path else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, temperature: float, max_tokens: int, prompt: str) -> str:
+        """Build the cache key for one completion request."""
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        material = json.dumps([model, float(temperature), int(max_tokens), prompt_hash])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached response, promoting disk hits into memory."""
+        value = self.memory.get(key)
+        if value is None and self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                value, created_at = entry
+                self.memory.set(key, value, created_at)
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        """Cache a response in both tiers."""
+        self.memory.set(key, value)
+        if self.store is not None:
+            self.store.set(key, value)
+
+    def clear(self):
+        """Remove all cached responses."""
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tier sizes."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups * 100) if lookups else 0,
+            'memory_entries': len(self.memory),
+            'disk_entries': len(self.store) if self.store is not None else 0
+        }
+
+
+_caches: Dict[str, LLMResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(cache_config: Optional[Dict[str, Any]]) -> Optional[LLMResponseCache]:
+    """
+    Get the process-wide response cache for a configuration.
+
+    Agents sharing the same cache path share one cache instance. Caching is
+    disabled when the config is missing, ``enabled`` is false, or the
+    VISA_AGENT_LLM_CACHE environment variable is set to 'false'.
+
+    Args:
+        cache_config: The ``cache`` section of agent_config.yaml
+
+    Returns:
+        Shared LLMResponseCache, or None when caching is disabled
+    """
+    if not cache_config or not cache_config.get('enabled', True):
+        return None
+    if os.getenv('VISA_AGENT_LLM_CACHE', 'true').lower() == 'false':
+        return None
+
+    path = cache_config.get('path')
+    if path and not Path(path).is_absolute():
+        path = str(PROJECT_ROOT / path)
+
+    cache_id = path or ':memory:'
+    with _caches_lock:
+        if cache_id not in _caches:
+            _caches[cache_id] = LLMResponseCache(
+                path=path,
+                memory_entries=cache_config.get('memory_entries', 256),
+                max_entries=cache_config.get('max_entries', 10000),
+                max_bytes=cache_config.get('max_bytes', 100 * 1024 * 1024),
+                ttl_seconds=cache_config.get('ttl_seconds', 7 * 24 * 3600)
+            )
+            logger.info(f"LLM response cache enabled ({cache_id})")
+        return _caches[cache_id]
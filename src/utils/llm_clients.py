@@ -0,0 +1,157 @@
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Dict, Any, Optional, Tuple
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from langchain_openai import ChatOpenAI
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CLIENT_CONFIG = {
+    'max_connections': 20,
+    'max_keepalive_connections': 10,
+    'keepalive_expiry': 30.0,
+    'timeout': 60.0,
+    'connect_timeout': 10.0,
+    'max_retries': 2
+}
+
+_lock = threading.Lock()
+_sync_clients: Dict[Tuple, OpenAI] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_chat_models: Dict[Tuple, ChatOpenAI] = {}
+
+
+def _settings(client_config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge a ``client`` config section over the defaults."""
+    return {**DEFAULT_CLIENT_CONFIG, **(client_config or {})}
+
+
+def _get_api_key() -> str:
+    """Get the OpenAI API key from the environment."""
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
+    return api_key
+
+
+def _client_key(api_key: str, settings: Dict[str, Any]) -> Tuple:
+    """Build the registry key for a client configuration."""
+    return (api_key,) + tuple(sorted(settings.items()))
+
+
+def _http_options(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Build httpx connection-pool limits and timeouts from client settings."""
+    return {
+        'limits': httpx.Limits(
+            max_connections=settings['max_connections'],
+            max_keepalive_connections=settings['max_keepalive_connections'],
+            keepalive_expiry=settings['keepalive_expiry']
+        ),
+        'timeout': httpx.Timeout(settings['timeout'], connect=settings['connect_timeout'])
+    }
+
+
+def get_openai_client(client_config: Optional[Dict[str, Any]] = None) -> OpenAI:
+    """
+    Get the process-wide OpenAI client for a configuration.
+
+    The client keeps a pool of keep-alive connections, so repeated calls reuse
+    established TLS connections instead of opening a new one per request.
+
+    Args:
+        client_config: The ``client`` section of agent_config.yaml
+
+    Returns:
+        Shared OpenAI client
+    """
+    api_key = _get_api_key()
+    settings = _settings(client_config)
+    key = _client_key(api_key, settings)
+
+    with _lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, max_retries=settings['max_retries'], http_client=httpx.Client(**_http_options(settings)))
+            _sync_clients[key] = client
+            logger.info(f"Created pooled OpenAI client (max_connections={settings['max_connections']})")
+        return client
+
+
+def get_async_openai_client(client_config: Optional[Dict[str, Any]] = None) -> AsyncOpenAI:
+    """
+    Get the AsyncOpenAI client for a configuration on the running event loop.
+
+    Async connection pools are bound to the loop they were first used on, so
+    one client is kept per event loop and shared by everything running on it.
+
+    Args:
+        client_config: The ``client`` section of agent_config.yaml
+
+    Returns:
+        Shared AsyncOpenAI client for the current event loop
+    """
+    api_key = _get_api_key()
+    settings = _settings(client_config)
+    key = _client_key(api_key, settings)
+    loop = asyncio.get_running_loop()
+
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(api_key=api_key, max_retries=settings['max_retries'], http_client=httpx.AsyncClient(**_http_options(settings)))
+            clients[key] = client
+        return client
+
+
+def get_chat_model(
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    client_config: Optional[Dict[str, Any]] = None
+) -> ChatOpenAI:
+    """
+    Get a shared ChatOpenAI model backed by the pooled OpenAI client.
+
+    Agents with the same model settings share one instance.
+
+    Args:
+        model: Model name
+        temperature: Sampling temperature
+        max_tokens: Maximum tokens in the completion
+        client_config: The ``client`` section of agent_config.yaml
+
+    Returns:
+        Shared ChatOpenAI instance
+    """
+    api_key = _get_api_key()
+    client = get_openai_client(client_config)
+    key = (model, float(temperature), int(max_tokens)) + _client_key(api_key, _settings(client_config))
+
+    with _lock:
+        chat_model = _chat_models.get(key)
+        if chat_model is None:
+            chat_model = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                api_key=api_key,
+                client=client.chat.completions
+            )
+            _chat_models[key] = chat_model
+        return chat_model
+
+
+def close_clients():
+    """Close all pooled sync clients and forget every registered client."""
+    with _lock:
+        for client in _sync_clients.values():
+            client.close()
+        _sync_clients.clear()
+        _async_clients.clear()
+        _chat_models.clear()
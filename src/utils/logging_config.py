@@ -0,0 +1,139 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, Optional
+
+DEFAULT_LOGGING_CONFIG = {
+    'level': 'INFO',
+    'format': '%(asctime)s %(levelname)s %(name)s: %(message)s',
+    'async': True,
+    'queue_size': 10000,
+    'modules': {}
+}
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands log records to a bounded queue without formatting them.
+
+    The listener thread formats and writes them, so a logging call on a hot
+    path costs one queue put. When the queue is full the record is dropped
+    and counted rather than blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves the process, so records need not be made picklable
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _BlockingSentinelListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue instead of raising."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class _LoggingState:
+    """Handlers and module levels installed by the last configure_logging call."""
+
+    def __init__(self):
+        self.key: Optional[str] = None
+        self.handler: Optional[logging.Handler] = None
+        self.listener: Optional[QueueListener] = None
+        self.modules: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+
+
+_state = _LoggingState()
+
+
+def configure_logging(logging_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Configure process-wide logging: levels, format and the background writer.
+
+    Records go through a bounded queue to a listener thread that formats and
+    writes them to stderr (``async: false`` writes them in the calling
+    thread). ``modules`` sets per-logger levels, e.g.
+    ``{'src.agents.policy_evaluator': 'DEBUG', 'httpx': 'WARNING'}``. The
+    VISA_AGENT_LOG_LEVEL environment variable overrides ``level``. Calling
+    again with the same configuration is a no-op; a new one replaces the
+    handler installed before.
+
+    Args:
+        logging_config: The ``logging`` section of agent_config.yaml
+
+    Returns:
+        The effective configuration
+    """
+    config = {**DEFAULT_LOGGING_CONFIG, **(logging_config or {})}
+    config['level'] = os.getenv('VISA_AGENT_LOG_LEVEL', config['level']).upper()
+    config['modules'] = {name: str(level).upper() for name, level in (config.get('modules') or {}).items()}
+
+    key = repr(sorted(config.items()))
+    with _state.lock:
+        if _state.key == key:
+            return config
+        _uninstall()
+
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(logging.Formatter(config['format']))
+        if config['async']:
+            handler = DroppingQueueHandler(queue.Queue(maxsize=config['queue_size']))
+            _state.listener = _BlockingSentinelListener(handler.queue, stream_handler)
+            _state.listener.start()
+        else:
+            handler = stream_handler
+
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(config['level'])
+        for name, level in config['modules'].items():
+            logging.getLogger(name).setLevel(level)
+
+        _state.handler = handler
+        _state.modules = config['modules']
+        _state.key = key
+    return config
+
+
+def shutdown_logging():
+    """Flush queued records and remove the installed handler."""
+    with _state.lock:
+        _uninstall()
+        _state.key = None
+
+
+def dropped_records() -> int:
+    """Get how many records were dropped because the log queue was full."""
+    handler = _state.handler
+    return handler.dropped if isinstance(handler, DroppingQueueHandler) else 0
+
+
+def _uninstall():
+    if _state.handler is not None:
+        logging.getLogger().removeHandler(_state.handler)
+        _state.handler = None
+    if _state.listener is not None:
+        # Writes out everything still queued before the thread exits
+        _state.listener.stop()
+        _state.listener = None
+    for name in _state.modules:
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    _state.modules = {}
+
+
+atexit.register(shutdown_logging)
@@ -161,4 +161,19 @@ class OutputFormatter:
         
         output.append("")
         
+        # LLM usage
+        telemetry = workflow_results.get('telemetry')
+        if telemetry:
+            totals = telemetry['totals']
+            output.append("LLM USAGE")
+            output.append("-" * 80)
+            output.append(f"Calls: {totals['calls']} ({totals['cache_hits']} from cache)")
+            output.append(f"Tokens: {totals['prompt_tokens']} prompt ({totals['cached_tokens']} cached), "
+                          f"{totals['completion_tokens']} completion")
+            output.append(f"Estimated Cost: ${totals['cost_usd']:.4f}")
+            for stage_name, stage_totals in telemetry.get('by_stage', {}).items():
+                output.append(f"  {stage_name}: {stage_totals['calls']} calls, "
+                              f"{stage_totals['total_tokens']} tokens, ${stage_totals['cost_usd']:.4f}")
+            output.append("")
+        
         return "\n".join(output)
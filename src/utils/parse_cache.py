@@ -0,0 +1,152 @@
+import os
+import zlib
+import pickle
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .llm_cache import MemoryLRUCache, SQLiteResponseStore, PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARSE_CACHE_CONFIG = {
+    'enabled': True,
+    'path': 'data/cache/parsed_documents.sqlite',
+    'memory_entries': 32,
+    'max_entries': 500,
+    'max_bytes': 256 * 1024 * 1024
+}
+
+
+class ParsedDocumentCache:
+    """
+    Persistent cache of parsed documents, keyed by file content.
+
+    Entries are keyed by the SHA-256 of the file bytes, the file extension and
+    the parser version, so renaming or re-uploading a file still hits while
+    editing it (or changing the parser) misses. Values are pickled and
+    zlib-compressed, kept in a small in-process LRU tier over an SQLite tier
+    with least-recently-used eviction.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        memory_entries: int = 32,
+        max_entries: int = 500,
+        max_bytes: int = 256 * 1024 * 1024
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite file for the disk tier (None for memory only)
+            memory_entries: Capacity of the in-process LRU tier
+            max_entries: Capacity of the disk tier
+            max_bytes: Maximum total compressed bytes in the disk tier
+        """
+        self.memory = MemoryLRUCache(memory_entries)
+        self.store = SQLiteResponseStore(path, max_entries, max_bytes, table='parsed_documents') if path else None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(file_bytes: bytes, extension: str, parser_version: str) -> str:
+        """Build the cache key for one document file."""
+        content_hash = hashlib.sha256(file_bytes).hexdigest()
+        return f"{content_hash}:{extension.lower()}:{parser_version}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a parsed document, promoting disk hits into memory."""
+        blob = self.memory.get(key)
+        if blob is None and self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                blob, created_at = entry
+                self.memory.set(key, blob, created_at)
+
+        if blob is None:
+            self.misses += 1
+            return None
+
+        try:
+            document_data = pickle.loads(zlib.decompress(blob))
+        except Exception as e:
+            logger.warning(f"Discarding unreadable parse cache entry {key}: {e}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return document_data
+
+    def set(self, key: str, document_data: Dict[str, Any]):
+        """Cache a parsed document in both tiers."""
+        try:
+            blob = zlib.compress(pickle.dumps(document_data, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.warning(f"Could not cache parsed document {key}: {e}")
+            return
+
+        self.memory.set(key, blob)
+        if self.store is not None:
+            self.store.set(key, blob)
+
+    def clear(self):
+        """Remove all cached documents."""
+        self.memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and tier sizes."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups * 100) if lookups else 0,
+            'memory_entries': len(self.memory),
+            'disk_entries': len(self.store) if self.store is not None else 0
+        }
+
+
+_caches: Dict[str, ParsedDocumentCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_parse_cache(cache_config: Optional[Dict[str, Any]] = None) -> Optional[ParsedDocumentCache]:
+    """
+    Get the process-wide parse cache for a configuration.
+
+    Parsers sharing the same cache path share one cache instance. Caching is
+    disabled when ``enabled`` is false or the VISA_AGENT_PARSE_CACHE
+    environment variable is set to 'false'.
+
+    Args:
+        cache_config: Cache settings (DEFAULT_PARSE_CACHE_CONFIG when omitted)
+
+    Returns:
+        Shared ParsedDocumentCache, or None when caching is disabled
+    """
+    cache_config = {**DEFAULT_PARSE_CACHE_CONFIG, **(cache_config or {})}
+    if not cache_config.get('enabled', True):
+        return None
+    if os.getenv('VISA_AGENT_PARSE_CACHE', 'true').lower() == 'false':
+        return None
+
+    path = cache_config.get('path')
+    if path and not Path(path).is_absolute():
+        path = str(PROJECT_ROOT / path)
+
+    cache_id = path or ':memory:'
+    with _caches_lock:
+        if cache_id not in _caches:
+            _caches[cache_id] = ParsedDocumentCache(
+                path=path,
+                memory_entries=cache_config['memory_entries'],
+                max_entries=cache_config['max_entries'],
+                max_bytes=cache_config['max_bytes']
+            )
+            logger.info(f"Parsed document cache enabled ({cache_id})")
+        return _caches[cache_id]
@@ -0,0 +1,285 @@
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from .tracing import traced
+
+# Section header on a line of its own: "V4.1 OBJECTIVE", "4.1 Objective" or "## Objective"
+_HEADER = re.compile(r'(V\d+\.\d+(?:\.\d+)?|\d+\.\d+(?:\.\d+)?|##)[ \t]+([A-Za-z][A-Za-z \t&]*?)[ \t]*$')
+_HEADER_START = frozenset('V#0123456789')
+
+# Requirement item marker at the start of a line: (a), (iv), V4.15(b), 1., bullets and dashes
+_ITEM = re.compile(r'(?:V\d+\.\d+(?:\.\d+)?)?\([a-z]+\)\s+|\d+\.\s+|[•·]\s+|-\s+')
+
+# Every policy reference, date, visa code and number contains a digit, so tokens
+# are anchored on digit runs. A leading \d (rather than an alternation of
+# differently-led patterns) lets the regex engine skip ahead to candidates in C.
+_TOKEN = re.compile(
+    r'\d+(?:(?P<dotted>(?:\.\d+){1,2}(?:\([a-z]+\))?)'
+    r'|(?P<date>[/-]\d{1,2}[/-]\d{1,4})'
+    r'|(?P<number>(?:,\d+)*))'
+)
+_DATE = re.compile(r'\d{4}-\d{1,2}-\d{1,2}|\d{1,2}/\d{1,2}/\d{4}|\d{1,2}-\d{1,2}-\d{4}')
+
+# Context around a number that makes it a threshold
+_AGE_BEFORE = re.compile(r'\b(?:under|over|aged?)\s+$', re.IGNORECASE)
+_NUMBER_AFTER = re.compile(r'\s*(dollars?)\b|\s+(months?|years?|days?|weeks?)\b(\s+old\b)?', re.IGNORECASE)
+_CONTEXT_WINDOW = 16
+
+# Condition keywords, in the order their statements are reported
+_CONDITION_KEYWORDS = [
+    ('must', 'mandatory'),
+    ('shall', 'mandatory'),
+    ('required to', 'mandatory'),
+    ('may', 'optional'),
+    ('can', 'optional'),
+    ('should', 'recommended'),
+    ('if', 'conditional')
+]
+# Matched against the lower-cased document: literal-led branches keep the prefix skip
+_CONDITION = re.compile(r'(must|shall|required\s+to|may|can|should|if)\s')
+_CONDITION_ANY_CASE = re.compile(r'(must|shall|required\s+to|may|can|should|if)\s', re.IGNORECASE)
+_KEYWORD_INDEX = {keyword: index for index, (keyword, _) in enumerate(_CONDITION_KEYWORDS)}
+# Sentence or clause end; dots inside references and decimals do not count
+_CLAUSE_END = re.compile(r'\.(?=\s|$)|;')
+
+MIN_REQUIREMENT_LENGTH = 10
+MIN_CONDITION_LENGTH = 15
+
+
+class _RequirementCollector:
+    """Groups item lines and their continuation lines into requirement strings."""
+
+    def __init__(self):
+        self.items: List[str] = []
+        self._current: Optional[List[str]] = None
+
+    def feed(self, stripped: str):
+        """Add a line, already stripped of surrounding whitespace."""
+        if not stripped:
+            self.flush()
+            return
+
+        marker = _ITEM.match(stripped)
+        if marker:
+            self.flush()
+            self._current = [stripped[marker.end():]]
+        elif self._current is not None:
+            self._current.append(stripped)
+
+    def flush(self):
+        if self._current is not None:
+            requirement = '\n'.join(self._current).strip()
+            if len(requirement) > MIN_REQUIREMENT_LENGTH:
+                self.items.append(requirement)
+            self._current = None
+
+
+class PolicyAnalyzer:
+    """
+    Single-pass analyzer for policy documents.
+
+    All patterns are compiled once at import, and the document is read once
+    per concern instead of once per pattern: a line walk tracks sections and
+    requirement items, one digit-anchored token scan picks out policy
+    references, visa codes, dates and thresholds (a number becomes a
+    threshold from the few characters around it), and one keyword scan finds
+    the clauses that state conditions.
+    """
+
+    @traced('parser.analyze_policy')
+    def analyze(self, document: str) -> Dict[str, Any]:
+        """
+        Extract sections, requirements, thresholds, conditions and policy metadata.
+
+        Args:
+            document: Full document text
+
+        Returns:
+            Dictionary with 'sections', 'requirements', 'thresholds',
+            'conditions' and 'policy_metadata'
+        """
+        sections, requirements = self._scan_structure(document)
+        tokens = _TokenScan(document)
+
+        return {
+            'sections': sections,
+            'requirements': requirements,
+            'thresholds': tokens.thresholds(),
+            'conditions': self._scan_conditions(document),
+            'policy_metadata': tokens.metadata()
+        }
+
+    def extract_requirements(self, section_content: str) -> List[str]:
+        """
+        Extract requirement items from section content.
+
+        Args:
+            section_content: Content of a policy section
+
+        Returns:
+            List of requirement strings
+        """
+        collector = _RequirementCollector()
+        for line in section_content.split('\n'):
+            collector.feed(line.strip())
+        collector.flush()
+        return collector.items
+
+    @staticmethod
+    def _scan_structure(document: str) -> Tuple[Dict[str, Dict[str, str]], List[Dict[str, str]]]:
+        """Walk the lines once, splitting sections at headers and collecting their requirement items."""
+        lines = document.split('\n')
+        sections: Dict[str, Dict[str, str]] = {}
+        requirements: List[Dict[str, str]] = []
+
+        section_code: Optional[str] = None
+        section_title = ''
+        content_start = 0
+        collector = _RequirementCollector()
+
+        def close_section(content_end: int):
+            if section_code is None:
+                return
+            sections[section_code] = {
+                'title': section_title,
+                'content': document[content_start:content_end].strip()
+            }
+            collector.flush()
+            requirements.extend({'section': section_code, 'requirement': item} for item in collector.items)
+
+        offset = 0
+        previous_blank = True
+        last_line = len(lines) - 1
+        for index, line in enumerate(lines):
+            line_end = offset + len(line)
+            stripped = line.strip()
+
+            header = None
+            if (previous_blank and stripped and stripped[0] in _HEADER_START
+                    and index < last_line and not lines[index + 1].strip()):
+                header = _HEADER.match(stripped)
+
+            if header:
+                close_section(offset)
+                section_title = header.group(2).strip()
+                section_code = section_title if header.group(1) == '##' else header.group(1)
+                content_start = line_end + 1
+                collector = _RequirementCollector()
+            elif section_code is not None:
+                collector.feed(stripped)
+
+            previous_blank = not stripped
+            offset = line_end + 1
+
+        close_section(len(document))
+        return sections, requirements
+
+    @staticmethod
+    def _scan_conditions(document: str) -> List[Dict[str, str]]:
+        """Report each clause once per condition keyword it contains, grouped by keyword."""
+        lowered = document.lower()
+        if len(lowered) == len(document):
+            keywords = _CONDITION.finditer(lowered)
+        else:
+            # Lower-casing changed some character's length; offsets would not line up
+            keywords = _CONDITION_ANY_CASE.finditer(document)
+
+        buckets: List[List[Dict[str, str]]] = [[] for _ in _CONDITION_KEYWORDS]
+        clause_start = -1
+        seen = set()
+
+        for keyword in keywords:
+            start = keyword.start()
+            if start and (document[start - 1].isalnum() or document[start - 1] == '_'):
+                continue
+
+            line_start = document.rfind('\n', 0, start) + 1
+            line_end = document.find('\n', start)
+            if line_end == -1:
+                line_end = len(document)
+            start_of_clause = max(line_start, document.rfind(';', line_start, start) + 1,
+                                  document.rfind('. ', line_start, start) + 1)
+            if start_of_clause != clause_start:
+                clause_start = start_of_clause
+                seen = set()
+
+            index = _KEYWORD_INDEX[' '.join(keyword.group(1).lower().split())]
+            if index in seen:
+                continue
+            seen.add(index)
+
+            clause_end = _CLAUSE_END.search(document, keyword.end(), line_end)
+            statement = document[clause_start:clause_end.start() if clause_end else line_end].strip()
+            if len(statement) > MIN_CONDITION_LENGTH:
+                buckets[index].append({'type': _CONDITION_KEYWORDS[index][1], 'statement': statement})
+
+        return [condition for bucket in buckets for condition in bucket]
+
+
+class _TokenScan:
+    """Policy references, visa codes, dates and thresholds from one scan of the document."""
+
+    def __init__(self, document: str):
+        self.amounts: List[int] = []
+        self.periods: List[Tuple[str, str]] = []
+        self.ages: List[int] = []
+        self.visa_codes = set()
+        self.dates: List[str] = []
+        # Policy references without their leading 'V'
+        self.references = set()
+
+        for token in _TOKEN.finditer(document):
+            start = token.start()
+            prefix = document[start - 1] if start else ''
+            kind = token.lastgroup
+
+            if kind == 'dotted':
+                # "V4.25.10(a)"; other dotted numbers are section numbers or decimals
+                if prefix == 'V':
+                    self.references.add(token.group())
+            elif kind == 'date' and _DATE.fullmatch(token.group()):
+                self.dates.append(token.group())
+            else:
+                digits = token.group() if kind == 'number' else token.group()[:token.start(kind) - start]
+                if (prefix.isupper() and prefix.isascii() and ',' not in digits
+                        and not _is_word_char(document, start - 2) and not _is_word_char(document, token.end())):
+                    self.visa_codes.add(prefix + digits)
+                self._number(document, start, start + len(digits), digits)
+
+    def _number(self, document: str, start: int, end: int, value: str):
+        digits = value.replace(',', '')
+        before = document[max(0, start - _CONTEXT_WINDOW):start]
+
+        if before.rstrip().endswith('$'):
+            self.amounts.append(int(digits))
+        elif _AGE_BEFORE.search(before):
+            self.ages.append(int(digits))
+
+        after = _NUMBER_AFTER.match(document, end)
+        if after is None:
+            return
+        if after.group(1):
+            self.amounts.append(int(digits))
+        else:
+            self.periods.append((digits, after.group(2)))
+            if after.group(3) and after.group(2).lower().startswith('year'):
+                self.ages.append(int(digits))
+
+    def thresholds(self) -> Dict[str, Any]:
+        return {
+            'currency_amounts': sorted(set(self.amounts)),
+            'time_periods': self.periods,
+            'age_limits': sorted(set(self.ages))
+        }
+
+    def metadata(self) -> Dict[str, Any]:
+        visa_codes = self.visa_codes | {'V' + reference[:reference.index('.')] for reference in self.references}
+        return {
+            'visa_codes': sorted(visa_codes),
+            'dates_mentioned': self.dates,
+            'policy_references': sorted('V' + reference for reference in self.references)
+        }
+
+
+def _is_word_char(text: str, index: int) -> bool:
+    return 0 <= index < len(text) and (text[index].isalnum() or text[index] == '_')
@@ -0,0 +1,394 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable, TypeVar
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Lower value = served first
+PRIORITY_LANES = {
+    'interactive': 0,
+    'normal': 1,
+    'batch': 2
+}
+
+_current_lane: ContextVar[str] = ContextVar('llm_priority_lane', default='normal')
+
+# How often async waiters re-check the limiter while queued
+ASYNC_POLL_SECONDS = 0.05
+
+
+@contextmanager
+def llm_priority(lane: str):
+    """
+    Run the enclosed LLM calls in a priority lane.
+
+    The lane is stored in a context variable, so it follows the work into
+    asyncio tasks and into threads started with a copied context.
+
+    Args:
+        lane: One of 'interactive', 'normal' or 'batch'
+    """
+    if lane not in PRIORITY_LANES:
+        raise ValueError(f"Unknown priority lane '{lane}'. Expected one of: {', '.join(PRIORITY_LANES)}")
+
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+def current_priority_lane() -> str:
+    """Get the priority lane of the current context."""
+    return _current_lane.get()
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate. Not thread-safe."""
+
+    def __init__(self, per_minute: float):
+        """
+        Initialize a full bucket.
+
+        Args:
+            per_minute: Bucket capacity and refill rate per minute
+        """
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if available now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float, now: float):
+        """Take ``amount`` tokens; callers check wait_time first."""
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMRateLimiter:
+    """
+    Process-wide governor for LLM traffic.
+
+    Calls queue per model: within a model the highest-priority,
+    longest-waiting call goes first once a concurrency slot is free and the
+    model's requests/min and tokens/min budgets allow it. Across models,
+    free slots go to the best-placed call that can start now, so a model out
+    of budget never holds up calls to the others. A 429 pauses the whole
+    model for the Retry-After period (or an exponential backoff), so
+    concurrent callers back off together instead of retrying into the limit.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 90000,
+        model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        max_concurrent_requests: int = 8,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 30.0
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute: Default request budget per model
+            tokens_per_minute: Default token budget per model
+            model_limits: Per-model overrides of the two budgets
+            max_concurrent_requests: Maximum LLM calls in flight
+            backoff_base_seconds: First retry delay; doubles per attempt
+            backoff_max_seconds: Upper bound on a retry delay
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.model_limits = model_limits or {}
+        self.max_concurrent_requests = max_concurrent_requests
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+
+        self._cond = threading.Condition()
+        self._buckets: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._paused_until: Dict[str, float] = {}
+        # Model -> heap of (lane priority, sequence, tokens) tickets
+        self._queues: Dict[str, list] = {}
+        self._sequence = itertools.count()
+        self._active = 0
+        self.stats = {'requests': 0, 'throttled': 0, 'rate_limited': 0, 'retries': 0}
+
+    @staticmethod
+    def estimate_tokens(prompt: str, max_tokens: int) -> int:
+        """Estimate a request's token cost: ~4 characters per prompt token plus the completion budget."""
+        return len(prompt) // 4 + int(max_tokens)
+
+    def _model_buckets(self, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        buckets = self._buckets.get(model)
+        if buckets is None:
+            limits = self.model_limits.get(model, {})
+            buckets = (
+                TokenBucket(limits.get('requests_per_minute', self.requests_per_minute)),
+                TokenBucket(limits.get('tokens_per_minute', self.tokens_per_minute))
+            )
+            self._buckets[model] = buckets
+        return buckets
+
+    def _enqueue(self, model: str, tokens: int) -> Tuple[int, int, int]:
+        ticket = (PRIORITY_LANES[current_priority_lane()], next(self._sequence), tokens)
+        heapq.heappush(self._queues.setdefault(model, []), ticket)
+        return ticket
+
+    def _dequeue(self, model: str, ticket: Tuple[int, int, int]):
+        """Drop an abandoned ticket (e.g. a cancelled task) from its model's queue."""
+        queue = self._queues.get(model, [])
+        if ticket in queue:
+            queue.remove(ticket)
+            heapq.heapify(queue)
+            self._cond.notify_all()
+
+    def _model_wait(self, model: str, tokens: int, now: float) -> float:
+        """Seconds until a call to ``model`` costing ``tokens`` fits its pause and budgets."""
+        requests, token_budget = self._model_buckets(model)
+        return max(
+            self._paused_until.get(model, 0.0) - now,
+            requests.wait_time(1, now),
+            token_budget.wait_time(tokens, now)
+        )
+
+    def _try_admit(self, ticket: Tuple[int, int, int], model: str) -> Optional[float]:
+        """
+        Admit a queued ticket if it is its turn. Caller holds the lock.
+
+        Returns:
+            0 when admitted, seconds to wait for the model budget, or None
+            when waiting on another caller (queue position or a free slot)
+        """
+        queue = self._queues[model]
+        if queue[0] != ticket or self._active >= self.max_concurrent_requests:
+            return None
+
+        now = time.monotonic()
+        tokens = ticket[2]
+        wait = self._model_wait(model, tokens, now)
+        if wait > 0:
+            return wait
+
+        # A better-placed call to another model that can start now takes the slot first
+        for other, other_queue in self._queues.items():
+            if (other != model and other_queue and other_queue[0] < ticket
+                    and self._model_wait(other, other_queue[0][2], now) <= 0):
+                return None
+
+        requests, token_budget = self._model_buckets(model)
+        requests.consume(1, now)
+        token_budget.consume(tokens, now)
+        heapq.heappop(queue)
+        self._active += 1
+        self.stats['requests'] += 1
+        self._cond.notify_all()
+        return 0.0
+
+    def acquire(self, model: str, tokens: int):
+        """Block until a call to ``model`` costing ``tokens`` may start."""
+        with self._cond:
+            ticket = self._enqueue(model, tokens)
+            waited = False
+            try:
+                while True:
+                    wait = self._try_admit(ticket, model)
+                    if wait == 0:
+                        break
+                    waited = True
+                    self._cond.wait(timeout=wait)
+            except BaseException:
+                self._dequeue(model, ticket)
+                raise
+            if waited:
+                self.stats['throttled'] += 1
+
+    async def aacquire(self, model: str, tokens: int):
+        """Async variant of acquire; waits without blocking the event loop."""
+        with self._cond:
+            ticket = self._enqueue(model, tokens)
+        waited = False
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_admit(ticket, model)
+                if wait == 0:
+                    break
+                waited = True
+                await asyncio.sleep(min(wait, ASYNC_POLL_SECONDS) if wait else ASYNC_POLL_SECONDS)
+        except BaseException:
+            with self._cond:
+                self._dequeue(model, ticket)
+            raise
+        if waited:
+            with self._cond:
+                self.stats['throttled'] += 1
+
+    def release(self):
+        """Free the concurrency slot taken by acquire."""
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _retry_delay(self, model: str, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Decide whether a failed call is retried and how long to wait.
+
+        Rate-limit errors pause the model for every caller; transient network
+        and server errors only delay the failing call.
+
+        Returns:
+            Delay in seconds, or None if the error is not retryable
+        """
+        status = getattr(error, 'status_code', None)
+        rate_limited = isinstance(error, openai.RateLimitError) or status == 429
+        transient = isinstance(error, (openai.APIConnectionError, openai.InternalServerError))
+        if not (rate_limited or transient):
+            return None
+
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempt))
+        delay *= 1 + random.uniform(0, 0.25)
+
+        if rate_limited:
+            retry_after = self._retry_after(error)
+            if retry_after is not None:
+                delay = min(self.backoff_max_seconds, retry_after)
+            with self._cond:
+                self.stats['rate_limited'] += 1
+                self._paused_until[model] = max(self._paused_until.get(model, 0.0), time.monotonic() + delay)
+                self._cond.notify_all()
+            logger.warning(f"Rate limited on {model}; pausing for {delay:.1f}s")
+            # The pause is enforced at admission, so the retry itself need not sleep
+            return 0.0
+
+        return delay
+
+    @staticmethod
+    def _retry_after(error: Exception) -> Optional[float]:
+        response = getattr(error, 'response', None)
+        value = response.headers.get('retry-after') if response is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def call(self, model: str, prompt: str, max_tokens: int, fn: Callable[[], T], max_retries: int = 3) -> T:
+        """
+        Run one LLM call under the limiter, retrying rate-limit and transient errors.
+
+        Args:
+            model: Model the call is billed against
+            prompt: Prompt text, used to estimate the token cost
+            max_tokens: Completion budget of the call
+            fn: Performs the call
+            max_retries: Retries after the first attempt
+
+        Returns:
+            The result of ``fn``
+        """
+        tokens = self.estimate_tokens(prompt, max_tokens)
+        for attempt in range(max_retries + 1):
+            self.acquire(model, tokens)
+            try:
+                return fn()
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None or attempt == max_retries:
+                    raise
+            finally:
+                self.release()
+
+            self._count_retry()
+            time.sleep(delay)
+
+    async def acall(self, model: str, prompt: str, max_tokens: int, fn: Callable[[], Awaitable[T]],
+                    max_retries: int = 3) -> T:
+        """Async variant of call."""
+        tokens = self.estimate_tokens(prompt, max_tokens)
+        for attempt in range(max_retries + 1):
+            await self.aacquire(model, tokens)
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self._retry_delay(model, e, attempt)
+                if delay is None or attempt == max_retries:
+                    raise
+            finally:
+                self.release()
+
+            self._count_retry()
+            await asyncio.sleep(delay)
+
+    def _count_retry(self):
+        with self._cond:
+            self.stats['retries'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get call counters and the current queue state."""
+        with self._cond:
+            return {
+                **self.stats,
+                'active': self._active,
+                'queued': sum(len(queue) for queue in self._queues.values())
+            }
+
+
+_limiters: Dict[str, LLMRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(rate_limit_config: Optional[Dict[str, Any]]) -> Optional[LLMRateLimiter]:
+    """
+    Get the process-wide rate limiter for a configuration.
+
+    All agents share one limiter, so the budgets cover the whole process.
+    Limiting is disabled when the config is missing, ``enabled`` is false, or
+    the VISA_AGENT_RATE_LIMIT environment variable is set to 'false'.
+
+    Args:
+        rate_limit_config: The ``rate_limits`` section of agent_config.yaml
+
+    Returns:
+        Shared LLMRateLimiter, or None when limiting is disabled
+    """
+    if not rate_limit_config or not rate_limit_config.get('enabled', True):
+        return None
+    if os.getenv('VISA_AGENT_RATE_LIMIT', 'true').lower() == 'false':
+        return None
+
+    key = repr(sorted(rate_limit_config.items()))
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = LLMRateLimiter(
+                requests_per_minute=rate_limit_config.get('requests_per_minute', 500),
+                tokens_per_minute=rate_limit_config.get('tokens_per_minute', 90000),
+                model_limits=rate_limit_config.get('models'),
+                max_concurrent_requests=rate_limit_config.get('max_concurrent_requests', 8),
+                backoff_base_seconds=rate_limit_config.get('backoff_base_seconds', 0.5),
+                backoff_max_seconds=rate_limit_config.get('backoff_max_seconds', 30.0)
+            )
+            logger.info(f"LLM rate limiter enabled (max {rate_limit_config.get('max_concurrent_requests', 8)} concurrent)")
+        return _limiters[key]
@@ -0,0 +1,153 @@
+import re
+from collections import defaultdict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# A reference as its hierarchy, e.g. V4.10(a)(i) -> ('V4', '10', '(a)', '(i)')
+Reference = Tuple[str, ...]
+
+# Visa code, numbered levels and bracketed sub-paragraphs, e.g. "V4.10 (a)(i)"
+_REFERENCE = re.compile(r'([A-Za-z]+\d+)((?:\.\d+)*)((?:\s*\([A-Za-z0-9]+\))*)')
+_PARAGRAPH = re.compile(r'\(([A-Za-z0-9]+)\)')
+
+# Ancestors shallower than a section (V4.10) are the visa as a whole, which
+# would relate every item to every other
+SECTION_DEPTH = 2
+
+
+def normalize_reference(reference: Any) -> Optional[Reference]:
+    """
+    Parse a policy reference into its hierarchy.
+
+    Case, spacing and surrounding text are ignored ("see v4.10 (a)" and
+    "V4.10(a)" are the same reference). Text holding no V4.10-style
+    reference is kept whole as a single level.
+
+    Args:
+        reference: Policy reference text
+
+    Returns:
+        The reference levels, or None for an empty reference
+    """
+    if not isinstance(reference, str) or not reference.strip():
+        return None
+
+    match = _REFERENCE.search(reference)
+    if match is None:
+        return (' '.join(reference.upper().split()),)
+
+    code, numbers, paragraphs = match.groups()
+    return (
+        (code.upper(),)
+        + tuple(str(int(number)) for number in numbers.split('.')[1:])
+        + tuple(f'({paragraph.lower()})' for paragraph in _PARAGRAPH.findall(paragraphs))
+    )
+
+
+def format_reference(reference: Reference) -> str:
+    """Render a parsed reference in the canonical V4.10(a)(i) form."""
+    numbered = [level for level in reference[1:] if not level.startswith('(')]
+    paragraphs = reference[1 + len(numbered):]
+    return '.'.join((reference[0],) + tuple(numbered)) + ''.join(paragraphs)
+
+
+def item_references(item: Dict[str, Any]) -> List[Reference]:
+    """Get the parsed policy references of a requirement or question (one, or a list of them)."""
+    value = item.get('policy_reference')
+    values = value if isinstance(value, (list, tuple)) else [value]
+    references = []
+    for reference in values:
+        parsed = normalize_reference(reference)
+        if parsed is not None and parsed not in references:
+            references.append(parsed)
+    return references
+
+
+class ReferenceIndex:
+    """
+    Requirements and questions indexed by normalised policy reference.
+
+    Built in one pass over both lists. Each item is filed under its own
+    references and under every ancestor down to section level, so the items
+    related to a reference (at it, inside it, or in a section containing it)
+    are a few dictionary lookups away rather than a scan of the other list.
+    Build it once and share it between the checks of one run.
+    """
+
+    def __init__(self, requirements: Iterable[Dict[str, Any]], questions: Iterable[Dict[str, Any]]):
+        self.requirements = list(requirements)
+        self.questions = list(questions)
+        self._requirement_refs = [item_references(item) for item in self.requirements]
+        self._question_refs = [item_references(item) for item in self.questions]
+
+        # Positions of the items at or inside each reference
+        self._requirements_within = self._subtree_index(self._requirement_refs)
+        self._questions_within = self._subtree_index(self._question_refs)
+        # Positions of the items exactly at each reference
+        self._requirements_at = self._exact_index(self._requirement_refs)
+        self._questions_at = self._exact_index(self._question_refs)
+
+    @staticmethod
+    def _subtree_index(item_refs: List[List[Reference]]) -> Dict[Reference, List[int]]:
+        index: Dict[Reference, List[int]] = defaultdict(list)
+        for position, references in enumerate(item_refs):
+            prefixes = {reference[:depth] for reference in references
+                        for depth in range(min(SECTION_DEPTH, len(reference)), len(reference) + 1)}
+            for prefix in prefixes:
+                index[prefix].append(position)
+        return index
+
+    @staticmethod
+    def _exact_index(item_refs: List[List[Reference]]) -> Dict[Reference, List[int]]:
+        index: Dict[Reference, List[int]] = defaultdict(list)
+        for position, references in enumerate(item_refs):
+            for reference in references:
+                index[reference].append(position)
+        return index
+
+    @staticmethod
+    def _related(reference: Reference, within: Dict[Reference, List[int]],
+                 at: Dict[Reference, List[int]]) -> List[int]:
+        positions = set(within.get(reference, ()))
+        for depth in range(min(SECTION_DEPTH, len(reference)), len(reference)):
+            positions.update(at.get(reference[:depth], ()))
+        return sorted(positions)
+
+    def questions_for(self, reference: Any) -> List[Dict[str, Any]]:
+        """
+        Get the questions related to a policy reference, in their original order.
+
+        Related questions reference the same provision, one inside it
+        (V4.10(a) for V4.10), or a containing one down to section level
+        (V4.10 for V4.10(a)).
+        """
+        parsed = reference if isinstance(reference, tuple) else normalize_reference(reference)
+        if parsed is None:
+            return []
+        return [self.questions[position]
+                for position in self._related(parsed, self._questions_within, self._questions_at)]
+
+    def requirements_for(self, reference: Any) -> List[Dict[str, Any]]:
+        """Get the requirements related to a policy reference; see questions_for."""
+        parsed = reference if isinstance(reference, tuple) else normalize_reference(reference)
+        if parsed is None:
+            return []
+        return [self.requirements[position]
+                for position in self._related(parsed, self._requirements_within, self._requirements_at)]
+
+    def requirement_questions(self, requirement_position: int) -> List[Dict[str, Any]]:
+        """Get the questions related to any reference of the requirement at a position."""
+        positions = set()
+        for reference in self._requirement_refs[requirement_position]:
+            positions.update(self._related(reference, self._questions_within, self._questions_at))
+        return [self.questions[position] for position in sorted(positions)]
+
+    def question_references(self) -> List[Reference]:
+        """Get the distinct references of the questions, in first-seen order."""
+        return list(dict.fromkeys(reference for references in self._question_refs for reference in references))
+
+    def has_requirements_for(self, reference: Reference) -> bool:
+        """Whether any requirement is related to a parsed reference."""
+        if self._requirements_within.get(reference):
+            return True
+        return any(self._requirements_at.get(reference[:depth])
+                   for depth in range(min(SECTION_DEPTH, len(reference)), len(reference)))
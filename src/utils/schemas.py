@@ -0,0 +1,339 @@
+import logging
+from typing import Dict, Any, AsyncIterable, ClassVar, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
+
+from .telemetry import openai_usage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STRUCTURED_OUTPUT_CONFIG = {
+    'enabled': True,
+    'json_mode_models': ['gpt-4o', 'gpt-4-turbo', 'gpt-3.5-turbo'],
+    'stream': True,
+    'repair_attempts': 1
+}
+
+JSON_OBJECT_FORMAT = {'type': 'json_object'}
+
+
+class StructuredOutput(BaseModel):
+    """Base of the LLM response schemas; fields beyond the schema are kept."""
+
+    model_config = ConfigDict(extra='allow')
+
+    # Set on schemas describing a JSON array: the name of their one list
+    # field. A bare array response is read as that field, and validated
+    # results are unwrapped back to the list.
+    ITEMS: ClassVar[Optional[str]] = None
+
+
+class PolicyStructure(StructuredOutput):
+    visa_type: str
+    visa_code: str
+    objective: Dict[str, Any] = Field(default_factory=dict)
+    key_requirements: List[Any] = Field(default_factory=list)
+    stakeholders: List[Any] = Field(default_factory=list)
+
+
+class FunctionalRequirement(StructuredOutput):
+    requirement_id: str
+    description: str
+    category: Optional[str] = None
+    priority: Optional[str] = None
+    policy_reference: Optional[Any] = None
+    acceptance_criteria: List[Any] = Field(default_factory=list)
+
+
+class DataRequirement(StructuredOutput):
+    requirement_id: str
+    field_name: str
+    data_type: Optional[str] = None
+    description: Optional[str] = None
+    required: bool = False
+    validation: Optional[Any] = None
+    policy_reference: Optional[Any] = None
+
+
+class BusinessRule(StructuredOutput):
+    rule_id: str
+    description: str
+    rule_type: Optional[str] = None
+    logic: Optional[Any] = None
+    policy_reference: Optional[Any] = None
+    parameters: Dict[str, Any] = Field(default_factory=dict)
+
+
+class ValidationRule(StructuredOutput):
+    validation_id: str
+    field: str
+    rule: str
+    validation_type: Optional[str] = None
+    error_message: Optional[str] = None
+    policy_reference: Optional[Any] = None
+
+
+class FunctionalRequirementList(StructuredOutput):
+    ITEMS: ClassVar[Optional[str]] = 'requirements'
+    requirements: List[FunctionalRequirement]
+
+
+class DataRequirementList(StructuredOutput):
+    ITEMS: ClassVar[Optional[str]] = 'requirements'
+    requirements: List[DataRequirement]
+
+
+class BusinessRuleList(StructuredOutput):
+    ITEMS: ClassVar[Optional[str]] = 'rules'
+    rules: List[BusinessRule]
+
+
+class ValidationRuleList(StructuredOutput):
+    ITEMS: ClassVar[Optional[str]] = 'validations'
+    validations: List[ValidationRule]
+
+
+class Question(StructuredOutput):
+    question_id: str
+    question_text: str
+    input_type: str
+    section: Optional[str] = None
+    required: bool = False
+    validation: Optional[Any] = None
+    help_text: Optional[str] = None
+    policy_reference: Optional[Any] = None
+
+
+class QuestionList(StructuredOutput):
+    ITEMS: ClassVar[Optional[str]] = 'questions'
+    questions: List[Question]
+
+
+class RequirementValidationReport(StructuredOutput):
+    total_requirements: int
+    valid_requirements: int
+    invalid_requirements: int = 0
+    validation_rate: float
+    errors: List[Any] = Field(default_factory=list)
+    quality_score: Optional[float] = None
+    recommendations: List[Any] = Field(default_factory=list)
+
+
+class QuestionValidationReport(StructuredOutput):
+    total_questions: int
+    valid_questions: int
+    invalid_questions: int = 0
+    validation_rate: float
+    errors: List[Any] = Field(default_factory=list)
+    usability_score: Optional[float] = None
+    recommendations: List[Any] = Field(default_factory=list)
+
+
+class CoverageReport(StructuredOutput):
+    coverage_percentage: float
+    covered_requirements: int = 0
+    uncovered_requirements: int = 0
+    question_coverage: Dict[str, Any] = Field(default_factory=dict)
+    gaps: List[Any] = Field(default_factory=list)
+    recommendations: List[Any] = Field(default_factory=list)
+
+
+class ConsistencyReport(StructuredOutput):
+    consistency_score: float
+    policy_alignment: Optional[float] = None
+    requirement_alignment: Optional[float] = None
+    inconsistencies: List[Any] = Field(default_factory=list)
+    recommendations: List[Any] = Field(default_factory=list)
+
+
+class GapReport(StructuredOutput):
+    overall_completeness: float
+    missing_questions: List[Any] = Field(default_factory=list)
+    missing_requirements: List[Any] = Field(default_factory=list)
+    improvement_opportunities: List[Any] = Field(default_factory=list)
+
+
+def supports_json_mode(model: str, structured_config: Dict[str, Any]) -> bool:
+    """Whether a model is listed (by name prefix) as supporting the provider's JSON mode."""
+    return any(model.startswith(prefix) for prefix in structured_config.get('json_mode_models') or [])
+
+
+def structured_prompt(prompt: str, schema: Type[StructuredOutput], json_mode: bool) -> str:
+    """
+    Adapt a request prompt to its schema.
+
+    JSON mode only returns objects, so prompts asking for an array are told
+    to wrap it in the schema's list field.
+    """
+    if json_mode and schema.ITEMS:
+        return f'{prompt.rstrip()}\n\nWrap the array in a JSON object: {{"{schema.ITEMS}": [...]}}'
+    return prompt
+
+
+def validate_output(schema: Type[StructuredOutput], data: Any) -> Tuple[Any, List[Tuple[str, str]]]:
+    """
+    Validate decoded LLM output against a schema.
+
+    Args:
+        schema: Response schema
+        data: Decoded JSON (wrapped with wrap_items for array schemas)
+
+    Returns:
+        The validated result (the item list for array schemas) and an empty
+        list, or None and the (field path, problem) pairs that failed
+    """
+    if not isinstance(data, dict):
+        return None, [('', 'expected a JSON object')]
+    try:
+        model = schema.model_validate(data)
+    except ValidationError as e:
+        return None, [('.'.join(str(part) for part in error['loc']), error['msg']) for error in e.errors()]
+
+    result = model.model_dump()
+    return (result[schema.ITEMS] if schema.ITEMS else result), []
+
+
+def wrap_items(schema: Type[StructuredOutput], data: Any) -> Any:
+    """Read a bare array response as the list field of an array schema."""
+    if schema.ITEMS and isinstance(data, list):
+        return {schema.ITEMS: data}
+    return data
+
+
+def repair_prompt(problems: List[Tuple[str, str]]) -> str:
+    """Build the follow-up message asking only for the fields that failed validation."""
+    fields = '\n'.join(f"- {path}: {message}" for path, message in problems)
+    return f"""Your JSON response is missing or has invalid values for these fields:
+{fields}
+
+Return ONLY a JSON object whose keys are exactly the field paths listed above and whose values are the corrected values. Do not repeat any other field."""
+
+
+def apply_patch(data: Dict[str, Any], patch: Any) -> Dict[str, Any]:
+    """
+    Set the values of a repair reply ({"path.to.field": value}) in the original output.
+
+    Paths that do not lead anywhere in the output (e.g. an item index out of
+    range) are ignored; validation reports them again.
+    """
+    if not isinstance(patch, dict):
+        return data
+
+    for path, value in patch.items():
+        parts = str(path).split('.')
+        target: Any = data
+        for part in parts[:-1]:
+            target = _child(target, part, create=True)
+            if target is None:
+                break
+        else:
+            last = parts[-1]
+            if isinstance(target, dict):
+                target[last] = value
+            elif isinstance(target, list) and last.isdigit() and int(last) < len(target):
+                target[int(last)] = value
+    return data
+
+
+def _child(container: Any, key: str, create: bool) -> Any:
+    if isinstance(container, list):
+        return container[int(key)] if key.isdigit() and int(key) < len(container) else None
+    if isinstance(container, dict):
+        if not isinstance(container.get(key), (dict, list)) and create:
+            container[key] = {}
+        return container[key]
+    return None
+
+
+class StreamingJsonValidator:
+    """
+    Follows a streamed response until its first JSON value is complete.
+
+    Tracks bracket depth and string state across chunks, so completeness is
+    known as soon as the closing bracket arrives, without re-parsing the text
+    received so far. Anything the model streams after that (JSON mode can pad
+    with whitespace up to max_tokens) need not be read.
+    """
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.complete = False
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.parts)
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Add a chunk of the response.
+
+        Returns:
+            True once the first JSON object or array has been closed
+        """
+        self.parts.append(chunk)
+        for char in chunk:
+            if self.complete:
+                break
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = self._started
+            elif char in '{[':
+                self._started = True
+                self._depth += 1
+            elif char in '}]' and self._started:
+                self._depth -= 1
+                self.complete = self._depth == 0
+        return self.complete
+
+
+def _stream_delta(chunk: Any) -> Optional[str]:
+    return chunk.choices[0].delta.content if chunk.choices else None
+
+
+def read_json_stream(chunks: Iterable[Any]) -> Tuple[str, Optional[Tuple[int, int, int]]]:
+    """
+    Read a streamed JSON-mode chat completion, stopping once the value is complete.
+
+    Args:
+        chunks: Stream of chat completion chunks (requested with include_usage)
+
+    Returns:
+        The response text and its (prompt, completion, cached) token usage,
+        or None for the usage when the stream was cut short before it
+    """
+    validator = StreamingJsonValidator()
+    usage = None
+    for chunk in chunks:
+        if getattr(chunk, 'usage', None) is not None:
+            usage = openai_usage(chunk)
+        delta = _stream_delta(chunk)
+        if delta:
+            if validator.complete:
+                break
+            validator.feed(delta)
+    return validator.text.strip(), usage
+
+
+async def aread_json_stream(chunks: AsyncIterable[Any]) -> Tuple[str, Optional[Tuple[int, int, int]]]:
+    """Async variant of read_json_stream."""
+    validator = StreamingJsonValidator()
+    usage = None
+    async for chunk in chunks:
+        if getattr(chunk, 'usage', None) is not None:
+            usage = openai_usage(chunk)
+        delta = _stream_delta(chunk)
+        if delta:
+            if validator.complete:
+                break
+            validator.feed(delta)
+    return validator.text.strip(), usage
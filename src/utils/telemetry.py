@@ -0,0 +1,218 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from .events import LLM_CALL, publish_event
+
+# Run and stage the current LLM calls are attributed to; like the rate limiter's
+# priority lane, they follow work into asyncio tasks and copied-context threads
+_current_run: ContextVar[Optional['RunTelemetry']] = ContextVar('telemetry_run', default=None)
+_current_stage: ContextVar[Optional[str]] = ContextVar('telemetry_stage', default=None)
+
+UNSTAGED = 'unstaged'
+
+
+class CostModel:
+    """
+    Prices LLM calls from a per-model price table.
+
+    Prices are USD per 1K tokens, with keys 'input_per_1k', 'output_per_1k'
+    and optionally 'cached_input_per_1k' (defaults to the input price).
+    A model without an exact entry uses the longest configured prefix of its
+    name (e.g. 'gpt-4-0613' is priced as 'gpt-4'); unknown models cost 0.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, Dict[str, float]]] = None):
+        self.prices = dict(prices or {})
+
+    def price(self, model: str) -> Optional[Dict[str, float]]:
+        """Get the price entry of a model, if any."""
+        if model in self.prices:
+            return self.prices[model]
+        prefixes = [name for name in self.prices if model.startswith(name)]
+        return self.prices[max(prefixes, key=len)] if prefixes else None
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+        """Get the USD cost of one call."""
+        price = self.price(model)
+        if price is None:
+            return 0.0
+        input_price = price.get('input_per_1k', 0.0)
+        cached_price = price.get('cached_input_per_1k', input_price)
+        uncached = max(0, prompt_tokens - cached_tokens)
+        return (uncached * input_price + cached_tokens * cached_price
+                + completion_tokens * price.get('output_per_1k', 0.0)) / 1000
+
+
+class UsageTotals:
+    """Token, latency and cost counters for a group of LLM calls. Not thread-safe."""
+
+    FIELDS = ('calls', 'cache_hits', 'prompt_tokens', 'completion_tokens', 'cached_tokens',
+              'latency_seconds', 'cost_usd')
+
+    def __init__(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cached_tokens: int,
+            latency_seconds: float, cache_hit: bool, cost_usd: float):
+        self.calls += 1
+        self.cache_hits += int(cache_hit)
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.cached_tokens += cached_tokens
+        self.latency_seconds += latency_seconds
+        self.cost_usd += cost_usd
+
+    def to_dict(self) -> Dict[str, Any]:
+        totals = {field: getattr(self, field) for field in self.FIELDS}
+        totals['total_tokens'] = self.prompt_tokens + self.completion_tokens
+        totals['latency_seconds'] = round(self.latency_seconds, 3)
+        totals['cost_usd'] = round(self.cost_usd, 6)
+        return totals
+
+
+class RunTelemetry:
+    """LLM usage of one workflow run, rolled up per agent, stage and model."""
+
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.totals = UsageTotals()
+        self.by_agent: Dict[str, UsageTotals] = {}
+        self.by_stage: Dict[str, UsageTotals] = {}
+        self.by_model: Dict[str, UsageTotals] = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, stage: Optional[str], model: str, *usage):
+        """Add one call; usage is (prompt, completion, cached tokens, latency, cache hit, cost)."""
+        with self._lock:
+            self.totals.add(*usage)
+            for groups, key in ((self.by_agent, agent), (self.by_stage, stage or UNSTAGED), (self.by_model, model)):
+                groups.setdefault(key, UsageTotals()).add(*usage)
+
+    def summary(self) -> Dict[str, Any]:
+        """Get the run's usage as plain dicts, for results['telemetry']."""
+        with self._lock:
+            return {
+                'run_id': self.run_id,
+                'totals': self.totals.to_dict(),
+                'by_agent': {name: totals.to_dict() for name, totals in self.by_agent.items()},
+                'by_stage': {name: totals.to_dict() for name, totals in self.by_stage.items()},
+                'by_model': {name: totals.to_dict() for name, totals in self.by_model.items()}
+            }
+
+
+class TelemetryRegistry:
+    """Process-wide LLM usage counters per (agent, stage, model), exported for Prometheus."""
+
+    _METRICS = [
+        ('calls', 'visa_agent_llm_calls_total', 'LLM calls, including response cache hits'),
+        ('cache_hits', 'visa_agent_llm_cache_hits_total', 'LLM calls served from the response cache'),
+        ('prompt_tokens', 'visa_agent_llm_prompt_tokens_total', 'Prompt tokens sent to the LLM'),
+        ('completion_tokens', 'visa_agent_llm_completion_tokens_total', 'Completion tokens returned by the LLM'),
+        ('cached_tokens', 'visa_agent_llm_cached_prompt_tokens_total', 'Prompt tokens served from the provider prompt cache'),
+        ('latency_seconds', 'visa_agent_llm_latency_seconds_total', 'Wall time spent in LLM calls'),
+        ('cost_usd', 'visa_agent_llm_cost_usd_total', 'Estimated LLM cost in USD')
+    ]
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str, str], UsageTotals] = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent: str, stage: Optional[str], model: str, *usage):
+        with self._lock:
+            self._series.setdefault((agent, stage or UNSTAGED, model), UsageTotals()).add(*usage)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render_prometheus(self) -> str:
+        """Render the counters in the Prometheus text exposition format."""
+        with self._lock:
+            series = sorted((key, totals.to_dict()) for key, totals in self._series.items())
+
+        lines = []
+        for field, name, help_text in self._METRICS:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for (agent, stage, model), totals in series:
+                labels = f'agent="{_escape(agent)}",stage="{_escape(stage)}",model="{_escape(model)}"'
+                lines.append(f"{name}{{{labels}}} {totals[field]}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_registry = TelemetryRegistry()
+
+
+def get_telemetry_registry() -> TelemetryRegistry:
+    """Get the process-wide telemetry registry."""
+    return _registry
+
+
+@contextmanager
+def telemetry_scope(run: Optional[RunTelemetry] = None, stage: Optional[str] = None) -> Iterator[None]:
+    """
+    Attribute the enclosed LLM calls to a workflow run and stage.
+
+    Args:
+        run: Run telemetry to record into (the current one when omitted)
+        stage: Stage name (the current one when omitted)
+    """
+    run_token = _current_run.set(run or _current_run.get())
+    stage_token = _current_stage.set(stage or _current_stage.get())
+    try:
+        yield
+    finally:
+        _current_stage.reset(stage_token)
+        _current_run.reset(run_token)
+
+
+def record_llm_call(
+    agent: str,
+    model: str,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    cached_tokens: int = 0,
+    latency_seconds: float = 0.0,
+    cache_hit: bool = False,
+    cost_usd: float = 0.0
+):
+    """Record one LLM call against the current run and stage, and the process-wide counters."""
+    usage = (prompt_tokens, completion_tokens, cached_tokens, latency_seconds, cache_hit, cost_usd)
+    stage = _current_stage.get()
+    run = _current_run.get()
+    if run is not None:
+        run.record(agent, stage, model, *usage)
+    _registry.record(agent, stage, model, *usage)
+    publish_event(LLM_CALL, run_id=run.run_id if run is not None else None, stage=stage, agent=agent,
+                  model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                  cached_tokens=cached_tokens, latency_seconds=latency_seconds, cache_hit=cache_hit,
+                  cost_usd=cost_usd)
+
+
+def openai_usage(response: Any) -> Tuple[int, int, int]:
+    """Get (prompt, completion, cached) tokens from an OpenAI chat completion."""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return 0, 0, 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached = getattr(details, 'cached_tokens', 0) if details is not None else 0
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0, cached or 0
+
+
+def langchain_usage(message: Any) -> Tuple[int, int, int]:
+    """Get (prompt, completion, cached) tokens from a LangChain chat model message."""
+    usage = getattr(message, 'usage_metadata', None)
+    if usage:
+        cached = (usage.get('input_token_details') or {}).get('cache_read', 0)
+        return usage.get('input_tokens', 0), usage.get('output_tokens', 0), cached or 0
+
+    token_usage = (getattr(message, 'response_metadata', None) or {}).get('token_usage') or {}
+    cached = (token_usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0)
+    return token_usage.get('prompt_tokens', 0), token_usage.get('completion_tokens', 0), cached or 0
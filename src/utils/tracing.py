@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# The open span; children inherit its trace and sink, and like the telemetry
+# scope it follows work into asyncio tasks and copied-context threads
+_current_span: ContextVar[Optional['Span']] = ContextVar('trace_span', default=None)
+
+SERVICE_NAME = 'visa-requirements-workflow'
+
+# Spans are written in batches; the root span of a trace always flushes
+FLUSH_EVERY = 64
+
+
+class Span:
+    """A timed operation with attributes, nested under the span that was open when it started."""
+
+    def __init__(self, name: str, sink: 'JsonlSpanSink', parent: Optional['Span'] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.sink = sink
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes: Dict[str, Any] = {}
+        self.status = 'ok'
+        self.status_message: Optional[str] = None
+        self.thread = threading.current_thread().name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._started = time.perf_counter_ns()
+        self.set_attributes(**(attributes or {}))
+
+    def set_attribute(self, key: str, value: Any):
+        """Set one attribute; values other than scalars and lists of scalars are stored as text."""
+        self.attributes[key] = _attribute_value(value)
+
+    def set_attributes(self, **attributes: Any):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def set_error(self, message: str):
+        """Mark the span as failed."""
+        self.status = 'error'
+        self.status_message = message
+
+    def end(self):
+        """Stop the clock and hand the span to its sink."""
+        # Monotonic duration, so wall clock adjustments cannot make spans negative
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._started)
+        self.sink.export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_id,
+            'name': self.name,
+            'start_time_unix_nano': self.start_ns,
+            'end_time_unix_nano': self.end_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            'thread': self.thread,
+            'status': self.status,
+            'status_message': self.status_message,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when nothing is being traced."""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes: Any):
+        pass
+
+    def set_error(self, message: str):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class JsonlSpanSink:
+    """
+    Appends finished spans to a file, one JSON document per line.
+
+    With format 'jsonl' each line is one span. With format 'otlp' each line
+    is an OTLP/JSON ExportTraceServiceRequest holding a batch of spans, the
+    layout of the OpenTelemetry collector's file exporter, so the file can be
+    replayed into any OTLP backend.
+    """
+
+    FORMATS = ('jsonl', 'otlp')
+
+    def __init__(self, path: Union[str, Path], format: str = 'jsonl'):
+        if format not in self.FORMATS:
+            raise ValueError(f"Unknown trace format: {format} (expected one of {self.FORMATS})")
+        self.path = Path(path)
+        self.format = format
+        self._pending: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._pending.append(span)
+            if span.parent_id is None or len(self._pending) >= FLUSH_EVERY:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        spans, self._pending = self._pending, []
+        if self.format == 'otlp':
+            lines = [json.dumps(_otlp_request(spans))]
+        else:
+            lines = [json.dumps(span.to_dict()) for span in spans]
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            logger.warning(f"Could not write spans to {self.path}: {e}")
+
+
+def _attribute_value(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple, set)):
+        return [item if isinstance(item, (bool, int, float, str)) else str(item) for item in value]
+    return str(value)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, list):
+        return {'arrayValue': {'values': [_otlp_value(item) for item in value]}}
+    return {'stringValue': '' if value is None else str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items()]
+
+
+def _otlp_request(spans: List[Span]) -> Dict[str, Any]:
+    otlp_spans = []
+    for span in spans:
+        otlp_span = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': _otlp_attributes({**span.attributes, 'thread.name': span.thread}),
+            # STATUS_CODE_OK / STATUS_CODE_ERROR
+            'status': {'code': 2, 'message': span.status_message or ''} if span.status == 'error' else {'code': 1}
+        }
+        if span.parent_id:
+            otlp_span['parentSpanId'] = span.parent_id
+        otlp_spans.append(otlp_span)
+
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': SERVICE_NAME})},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': otlp_spans}]
+        }]
+    }
+
+
+def create_span_sink(tracing_config: Optional[Dict[str, Any]], run_dir: Union[str, Path]) -> Optional[JsonlSpanSink]:
+    """
+    Create the span sink for one workflow run.
+
+    Spans go to <run_dir>/<filename>, so they are swept with the rest of the
+    run's outputs. Tracing is disabled when ``enabled`` is false or the
+    VISA_AGENT_TRACING environment variable is set to 'false'.
+
+    Args:
+        tracing_config: The ``execution.tracing`` section of workflow_config.yaml
+        run_dir: Output directory of the run
+
+    Returns:
+        JsonlSpanSink, or None when tracing is disabled
+    """
+    tracing_config = tracing_config or {}
+    if not tracing_config.get('enabled', True):
+        return None
+    if os.getenv('VISA_AGENT_TRACING', 'true').lower() == 'false':
+        return None
+
+    return JsonlSpanSink(Path(run_dir) / tracing_config.get('filename', 'trace.jsonl'),
+                         tracing_config.get('format', 'jsonl'))
+
+
+def current_span() -> Union[Span, _NoopSpan]:
+    """Get the open span, or a no-op span when nothing is being traced."""
+    span = _current_span.get()
+    return span if span is not None else NOOP_SPAN
+
+
+@contextmanager
+def trace_span(name: str, sink: Optional[JsonlSpanSink] = None,
+               **attributes: Any) -> Iterator[Union[Span, _NoopSpan]]:
+    """
+    Time the enclosed block as a span.
+
+    The span nests under the open span and writes to its sink. Given a sink
+    that is not the open span's, it starts a new trace there instead. With
+    neither, nothing is recorded and a no-op span is yielded, so callers
+    outside a traced run pay next to nothing.
+
+    Args:
+        name: Span name, e.g. 'workflow.stage'
+        sink: Sink that starts a trace (the open span's when omitted)
+        **attributes: Initial span attributes
+
+    Yields:
+        The span, for setting attributes once results are known
+    """
+    parent = _current_span.get()
+    if sink is None:
+        if parent is None:
+            yield NOOP_SPAN
+            return
+        sink = parent.sink
+    elif parent is not None and parent.sink is not sink:
+        parent = None
+
+    span = Span(name, sink, parent, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    """Decorate a function so each call is a span, when a trace is open."""
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return function(*args, **kwargs)
+            with trace_span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
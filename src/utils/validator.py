@@ -1,49 +1,42 @@
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import re
 
+from .reference_index import ReferenceIndex, format_reference
+
 
 class Validator:
     """Utility class for validating requirements and questions."""
     
+    # Rules as (error message, fields): an item fails a rule when none of the
+    # fields holds a value. Shared with the batch engine (batch_validator.py).
+    REQUIREMENT_RULES = (
+        ('Missing requirement ID', ('requirement_id', 'id', 'rule_id')),
+        ('Missing description', ('description', 'requirement', 'rule', 'text'))
+    )
+    QUESTION_RULES = (
+        ('Missing question ID', ('question_id', 'id', 'q_id')),
+        ('Missing question text', ('question_text', 'question', 'text', 'prompt'))
+    )
+    
+    @staticmethod
+    def _check_rules(item: Dict[str, Any], rules: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> List[str]:
+        return [message for message, fields in rules if not any(item.get(field) for field in fields)]
+    
     @staticmethod
     def validate_requirement(requirement: Dict[str, Any]) -> Tuple[bool, List[str]]:
         """
         Validate a requirement dictionary.
         
+        Unknown types and priorities are accepted. To validate many
+        requirements at once, use batch_validator.validate_requirements.
+        
         Args:
             requirement: Requirement dictionary to validate
             
         Returns:
             Tuple of (is_valid, list_of_errors)
         """
-        errors = []
-        
-        # Check for any reasonable ID field
-        id_fields = ['requirement_id', 'id', 'rule_id']
-        has_id = any(field in requirement and requirement[field] for field in id_fields)
-        if not has_id:
-            errors.append("Missing requirement ID")
-        
-        # Check for description field (various names)
-        desc_fields = ['description', 'requirement', 'rule', 'text']
-        has_description = any(field in requirement and requirement[field] for field in desc_fields)
-        if not has_description:
-            errors.append("Missing description")
-        
-        # Type validation - be more lenient
-        type_field = requirement.get('type', requirement.get('category', ''))
-        valid_types = ['functional', 'data', 'business_rule', 'validation', 'business', 'technical', 'policy']
-        if type_field and type_field not in valid_types:
-            # Don't fail validation for unknown types, just note it
-            pass
-        
-        # Priority validation - be more lenient  
-        priority_field = requirement.get('priority', '')
-        valid_priorities = ['must_have', 'should_have', 'could_have', 'high', 'medium', 'low', 'mandatory', 'optional']
-        if priority_field and priority_field not in valid_priorities:
-            # Don't fail validation for unknown priorities, just note it
-            pass
-        
+        errors = Validator._check_rules(requirement, Validator.REQUIREMENT_RULES)
         return len(errors) == 0, errors
     
     @staticmethod
@@ -51,39 +44,17 @@ class Validator:
         """
         Validate a question dictionary.
         
+        Unknown input types, and select questions without options, are
+        accepted. To validate many questions at once, use
+        batch_validator.validate_questions.
+        
         Args:
             question: Question dictionary to validate
             
         Returns:
             Tuple of (is_valid, list_of_errors)
         """
-        errors = []
-        
-        # Check for any reasonable ID field
-        id_fields = ['question_id', 'id', 'q_id']
-        has_id = any(field in question and question[field] for field in id_fields)
-        if not has_id:
-            errors.append("Missing question ID")
-        
-        # Check for question text (various names)
-        text_fields = ['question_text', 'question', 'text', 'prompt']
-        has_text = any(field in question and question[field] for field in text_fields)
-        if not has_text:
-            errors.append("Missing question text")
-        
-        # Input type validation - be more lenient
-        input_type = question.get('input_type', '')
-        valid_input_types = ['text', 'number', 'boolean', 'date', 'select', 'multiselect', 'file', 'textarea', 'email', 'phone']
-        if input_type and input_type not in valid_input_types:
-            # Don't fail validation for unknown input types, just note it
-            pass
-        
-        # If select/multiselect, check for options (but don't fail if missing)
-        if question.get('input_type') in ['select', 'multiselect']:
-            if not question.get('options'):
-                # Don't fail validation, just note it
-                pass
-        
+        errors = Validator._check_rules(question, Validator.QUESTION_RULES)
         return len(errors) == 0, errors
     
     @staticmethod
@@ -140,27 +111,34 @@ class Validator:
     @staticmethod
     def check_question_requirement_mapping(
         questions: List[Dict[str, Any]], 
-        requirements: List[Dict[str, Any]]
+        requirements: List[Dict[str, Any]],
+        index: Optional[ReferenceIndex] = None
     ) -> Dict[str, Any]:
         """
         Check if questions map to requirements.
         
+        A question reference maps when a requirement references the same
+        provision, one inside it, or its containing section (V4.10(a) maps
+        to a V4.10 requirement and vice versa).
+        
         Args:
             questions: List of questions
             requirements: List of requirements
+            index: Reference index over the same requirements and questions,
+                to reuse one built for other checks of the run
             
         Returns:
             Mapping analysis
         """
-        requirement_refs = {req.get('policy_reference') for req in requirements if req.get('policy_reference')}
-        question_refs = {q.get('policy_reference') for q in questions if q.get('policy_reference')}
+        if index is None:
+            index = ReferenceIndex(requirements, questions)
         
-        mapped = question_refs & requirement_refs
-        unmapped_questions = question_refs - requirement_refs
+        question_refs = index.question_references()
+        unmapped_questions = [ref for ref in question_refs if not index.has_requirements_for(ref)]
         
         return {
             'total_questions': len(questions),
             'questions_with_policy_refs': len(question_refs),
-            'mapped_to_requirements': len(mapped),
-            'unmapped_questions': list(unmapped_questions)
+            'mapped_to_requirements': len(question_refs) - len(unmapped_questions),
+            'unmapped_questions': [format_reference(ref) for ref in unmapped_questions]
         }
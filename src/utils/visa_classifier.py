@@ -0,0 +1,247 @@
+import os
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+import yaml
+
+from .llm_cache import PROJECT_ROOT
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VISA_TYPES_PATH = PROJECT_ROOT / 'config' / 'visa_types.yaml'
+
+DEFAULT_CLASSIFIER_CONFIG = {
+    'min_score': 2.0,
+    'max_hits_per_keyword': 3,
+    'visa_types': []
+}
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton finding every occurrence of a set of keywords.
+
+    The trie and its failure links are compiled into one transition table per
+    state, upper and lower case alike, so a scan is a single dict lookup per
+    character of the text: no case-folded copy of the document is made, and
+    the cost does not grow with the number of keywords.
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = list(keywords)
+        self.lengths = [len(keyword) for keyword in self.keywords]
+
+        # Trie over the lowercased keywords
+        goto: List[Dict[str, int]] = [{}]
+        outputs: List[Tuple[int, ...]] = [()]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword.lower():
+                if char not in goto[state]:
+                    goto[state][char] = len(goto)
+                    goto.append({})
+                    outputs.append(())
+                state = goto[state][char]
+            outputs[state] += (index,)
+
+        # Breadth first, so a state's failure target is complete before the state
+        fail = [0] * len(goto)
+        delta: List[Dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            outputs[state] += outputs[fail[state]]
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for char, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(char, 0)
+                pending.append(child)
+
+        for transitions in delta:
+            for char, target in list(transitions.items()):
+                upper = char.upper()
+                if len(upper) == 1:
+                    transitions.setdefault(upper, target)
+
+        self._delta = delta
+        self._outputs = outputs
+
+    def count(self, text: str, word_start: bool = True) -> List[int]:
+        """
+        Count the occurrences of each keyword in one pass over the text.
+
+        Args:
+            text: Text to scan
+            word_start: Only count occurrences that start a word
+
+        Returns:
+            Occurrence counts, indexed like ``keywords``
+        """
+        counts = [0] * len(self.keywords)
+        delta = self._delta
+        outputs = self._outputs
+        lengths = self.lengths
+        state = 0
+        for position, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                for index in outputs[state]:
+                    start = position - lengths[index] + 1
+                    if word_start and start > 0 and text[start - 1].isalnum():
+                        continue
+                    counts[index] += 1
+        return counts
+
+
+class VisaTypeClassifier:
+    """
+    Detects the visa type of a policy document from a weighted keyword table.
+
+    Every keyword of every visa type is matched in a single pass by one
+    KeywordAutomaton. Each occurrence adds the keyword's weight to its visa
+    type's score (at most ``max_hits_per_keyword`` occurrences count), the
+    highest score wins, ties going to the type listed first, and confidence
+    is the winner's share of all scores. Documents scoring below
+    ``min_score`` are left unclassified.
+    """
+
+    def __init__(self, visa_types: List[Dict[str, Any]], min_score: float = 2.0,
+                 max_hits_per_keyword: int = 3):
+        """
+        Initialize the classifier.
+
+        Args:
+            visa_types: Entries with 'code', 'name' and 'keywords' (keyword -> weight), in priority order
+            min_score: Minimum winning score for a document to be classified
+            max_hits_per_keyword: Occurrences of one keyword that count towards a score
+        """
+        if not visa_types:
+            raise ValueError("The visa type table is empty")
+
+        self.visa_types = [{'code': entry['code'], 'name': entry['name']} for entry in visa_types]
+        self.min_score = min_score
+        self.max_hits_per_keyword = max(1, max_hits_per_keyword)
+
+        # One entry per (visa type, keyword), so types may share a keyword
+        keywords = []
+        self._entries: List[Tuple[int, str, float]] = []
+        for type_index, entry in enumerate(visa_types):
+            for keyword, weight in (entry.get('keywords') or {}).items():
+                keywords.append(str(keyword))
+                self._entries.append((type_index, str(keyword), float(weight)))
+        self.automaton = KeywordAutomaton(keywords)
+
+    @classmethod
+    def from_config(cls, classifier_config: Dict[str, Any]) -> 'VisaTypeClassifier':
+        """Create a classifier from the contents of visa_types.yaml."""
+        config = {**DEFAULT_CLASSIFIER_CONFIG, **(classifier_config or {})}
+        return cls(config['visa_types'], config['min_score'], config['max_hits_per_keyword'])
+
+    @classmethod
+    def from_yaml(cls, path: Optional[str] = None) -> 'VisaTypeClassifier':
+        """Create a classifier from a keyword table file (config/visa_types.yaml by default)."""
+        with open(path or DEFAULT_VISA_TYPES_PATH, 'r') as f:
+            return cls.from_config(yaml.safe_load(f))
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """
+        Classify one document.
+
+        Args:
+            text: Document content
+
+        Returns:
+            Dictionary with the detected 'visa_type' and 'visa_code' (None when
+            no type reaches min_score), its 'score' and 'confidence' (0-1), the
+            'scores' of every visa code and the keyword 'matches' found
+        """
+        counts = self.automaton.count(text or '')
+        scores = [0.0] * len(self.visa_types)
+        matches: Dict[str, int] = {}
+        for (type_index, keyword, weight), count in zip(self._entries, counts):
+            if count:
+                scores[type_index] += weight * min(count, self.max_hits_per_keyword)
+                matches[keyword] = matches.get(keyword, 0) + count
+
+        best = max(range(len(scores)), key=lambda index: (scores[index], -index))
+        total = sum(scores)
+        detected = scores[best] >= self.min_score and scores[best] > 0
+        return {
+            'visa_type': self.visa_types[best]['name'] if detected else None,
+            'visa_code': self.visa_types[best]['code'] if detected else None,
+            'score': scores[best] if detected else 0.0,
+            'confidence': round(scores[best] / total, 3) if detected else 0.0,
+            'scores': {visa_type['code']: score for visa_type, score in zip(self.visa_types, scores)},
+            'matches': matches
+        }
+
+    def classify_batch(self, documents: Iterable[str], workers: Optional[int] = None,
+                       chunksize: int = 64) -> List[Dict[str, Any]]:
+        """
+        Classify many documents, in worker processes when asked to.
+
+        Scanning is pure Python and holds the GIL, so threads would not help;
+        with ``workers`` > 1 the documents are shipped to a process pool in
+        chunks, each worker compiling the automaton once.
+
+        Args:
+            documents: Document contents
+            workers: Worker processes (VISA_AGENT_CLASSIFIER_WORKERS, default 1, runs inline)
+            chunksize: Documents sent to a worker at a time
+
+        Returns:
+            One classify() result per document, in order
+        """
+        documents = list(documents)
+        if workers is None:
+            workers = int(os.getenv('VISA_AGENT_CLASSIFIER_WORKERS', '1'))
+        workers = min(max(1, workers), os.cpu_count() or 1)
+        if workers <= 1 or len(documents) <= chunksize:
+            return [self.classify(document) for document in documents]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as pool:
+            return list(pool.map(_classify_in_worker, documents, chunksize=chunksize))
+
+
+_worker_classifier: Optional[VisaTypeClassifier] = None
+
+
+def _init_worker(classifier: VisaTypeClassifier):
+    global _worker_classifier
+    _worker_classifier = classifier
+
+
+def _classify_in_worker(document: str) -> Dict[str, Any]:
+    return _worker_classifier.classify(document)
+
+
+_classifiers: Dict[str, VisaTypeClassifier] = {}
+_classifiers_lock = threading.Lock()
+
+
+def get_visa_classifier(path: Optional[str] = None) -> VisaTypeClassifier:
+    """
+    Get the process-wide classifier for a keyword table.
+
+    The table is read and compiled once per path, so every entry point
+    (FastAPI, Streamlit, the policy evaluator) shares the same automaton.
+
+    Args:
+        path: Keyword table file; relative paths resolve against the project
+            root (config/visa_types.yaml when omitted)
+
+    Returns:
+        Shared VisaTypeClassifier
+    """
+    path = Path(path) if path else DEFAULT_VISA_TYPES_PATH
+    if not path.is_absolute():
+        path = PROJECT_ROOT / path
+
+    with _classifiers_lock:
+        if str(path) not in _classifiers:
+            _classifiers[str(path)] = VisaTypeClassifier.from_yaml(str(path))
+            logger.debug("Compiled visa type classifier from %s", path)
+        return _classifiers[str(path)]
@@ -1,5 +1,8 @@
 import pytest
 import sys
+import time
+import json
+import asyncio
 from pathlib import Path
 
 # Add project root to path
@@ -13,6 +16,7 @@ from src.agents import (
     ValidationAgent,
     ConsolidationAgent
 )
+from src.utils.schemas import validate_output
 
 
 @pytest.fixture
@@ -120,6 +124,278 @@ class TestPolicyEvaluatorAgent:
         assert 'eligibility_rules' in outputs
         assert 'conditions' in outputs
         assert 'metadata' in outputs
+    
+    def test_forced_hint_without_code_never_reports_none(self, sample_config):
+        """Test a forced visa type with no code never yields a None visa code."""
+        agent = PolicyEvaluatorAgent('PolicyEvaluator', sample_config)
+        
+        def failing_invoke_llm(prompt):
+            raise RuntimeError("LLM unavailable")
+        
+        def empty_invoke_llm(prompt):
+            return "not json"
+        
+        for fake_invoke_llm in (failing_invoke_llm, empty_invoke_llm):
+            agent._invoke_llm = fake_invoke_llm
+            structure = agent._analyze_policy_structure(
+                "Parent Boost Visa policy text", {}, 'Parent Boost Visitor Visa', None, True
+            )
+            assert structure['visa_code'] is not None
+
+
+class TestLLMResponseCaching:
+    """Tests for the response cache shared by all agents."""
+    
+    def test_repeated_prompt_served_from_cache(self, sample_config, tmp_path):
+        """Test a repeated prompt does not call the LLM again."""
+        config = {**sample_config, 'cache': {'path': str(tmp_path / 'cache.sqlite')}}
+        agent = RequirementsCaptureAgent('RequirementsCapture', config)
+        calls = []
+        
+        def call():
+            calls.append(1)
+            return '[{"requirement_id": "FR-001"}]'
+        
+        first = agent._cached_completion('prompt', 'gpt-4', 0.1, 1500, call)
+        second = agent._cached_completion('prompt', 'gpt-4', 0.1, 1500, call)
+        
+        assert first == second
+        assert len(calls) == 1
+    
+    def test_responses_failing_validation_are_not_cached(self, sample_config, tmp_path):
+        """Test a response that falls back is asked for again, and a valid one is then cached."""
+        config = {**sample_config, 'cache': {'path': str(tmp_path / 'cache.sqlite')},
+                  'structured_output': {'repair_attempts': 0}}
+        agent = ValidationAgent('ValidationAgent', config)
+        agent.rate_limiter = None
+        replies = ['{"valid_requirements": "some"}',
+                   '{"total_requirements": 1, "valid_requirements": 1, "validation_rate": 100, "errors": []}']
+        calls = []
+        
+        def cached_chat_completion(prompt, **params):
+            def call():
+                calls.append(1)
+                return replies[len(calls) - 1]
+            return agent._cached_completion(str(prompt), 'gpt-4', 0.2, 1500, call)
+        
+        agent._chat_completion = cached_chat_completion
+        requirements = [{'requirement_id': 'FR-001', 'description': 'x'}]
+        results = [agent._validate_requirements_llm(requirements) for _ in range(3)]
+        
+        assert len(calls) == 2
+        assert results[1]['valid_requirements'] == results[2]['valid_requirements'] == 1
+
+
+class TestTokenAccounting:
+    """Tests for per-call token usage recording."""
+    
+    def test_chat_completion_records_usage(self, sample_config, monkeypatch):
+        """Test a chat completion records its tokens and cost against the current run and stage."""
+        from types import SimpleNamespace
+        from src.utils.telemetry import RunTelemetry, telemetry_scope
+        
+        config = {**sample_config, 'pricing': {'gpt-4': {'input_per_1k': 0.03, 'output_per_1k': 0.06}}}
+        agent = RequirementsCaptureAgent('RequirementsCapture', config)
+        response = SimpleNamespace(
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=500,
+                                  prompt_tokens_details=SimpleNamespace(cached_tokens=0)),
+            choices=[SimpleNamespace(message=SimpleNamespace(content='{"ok": true}'))]
+        )
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **kwargs: response)))
+        monkeypatch.setattr(agent, '_get_openai_client', lambda: client)
+        agent.response_cache = None
+        agent.rate_limiter = None
+        
+        run = RunTelemetry('run-1')
+        with telemetry_scope(run, 'requirements_capture'):
+            agent._chat_completion('prompt', model='gpt-4')
+        
+        stage = run.summary()['by_stage']['requirements_capture']
+        assert (stage['calls'], stage['prompt_tokens'], stage['completion_tokens']) == (1, 1000, 500)
+        assert stage['cost_usd'] == pytest.approx(0.06)
+
+
+class TestStructuredOutput:
+    """Tests for schema-validated LLM requests."""
+    
+    def test_invalid_fields_are_reasked_on_their_own(self, sample_config):
+        """Test only the fields failing validation are re-asked for and patched in."""
+        agent = ValidationAgent('ValidationAgent', sample_config)
+        agent.response_cache = None
+        replies = [
+            '{"total_requirements": 4, "valid_requirements": 3, "errors": []}',
+            '{"validation_rate": 75}'
+        ]
+        prompts = []
+        
+        def fake_chat_completion(prompt, **params):
+            prompts.append(prompt)
+            return replies[len(prompts) - 1]
+        
+        agent._chat_completion = fake_chat_completion
+        result = agent._validate_requirements_llm([{'requirement_id': 'FR-001'}] * 4)
+        
+        assert len(prompts) == 2
+        assert prompts[1][-1]['role'] == 'user' and '- validation_rate: Field required' in prompts[1][-1]['content']
+        assert (result['valid_requirements'], result['validation_rate']) == (3, 75.0)
+    
+    def test_unrepaired_response_falls_back(self, sample_config):
+        """Test a response still invalid after the re-asks uses the request's fallback."""
+        agent = ValidationAgent('ValidationAgent', {**sample_config, 'structured_output': {'repair_attempts': 0}})
+        agent._chat_completion = lambda prompt, **params: '{"valid_requirements": "some"}'
+        
+        result = agent._validate_requirements_llm([{'requirement_id': 'FR-001', 'description': 'x'}])
+        
+        assert result['total_requirements'] == 1
+    
+    def test_json_mode_streams_until_the_value_is_complete(self, sample_config, monkeypatch):
+        """Test JSON-mode models get response_format and the stream is read only up to the closing brace."""
+        from types import SimpleNamespace
+        
+        def chunk(content=None, usage=None):
+            choices = [SimpleNamespace(delta=SimpleNamespace(content=content))] if content is not None else []
+            return SimpleNamespace(choices=choices, usage=usage)
+        
+        class FakeStream:
+            def __init__(self):
+                self.read = 0
+            
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *exc):
+                return False
+            
+            def __iter__(self):
+                for part in ['{"visa_type": "Parent', ' Boost Visitor Visa", "visa_code": "V4"}', '\n', '  ', '  ']:
+                    self.read += 1
+                    yield chunk(part)
+        
+        stream = FakeStream()
+        calls = []
+        
+        def create(**kwargs):
+            calls.append(kwargs)
+            return stream
+        
+        agent = PolicyEvaluatorAgent('PolicyEvaluator', sample_config)
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(agent, '_get_openai_client', lambda: client)
+        agent.response_cache = None
+        agent.rate_limiter = None
+        
+        request = {**agent._analyze_policy_structure_llm_request('Policy text', {}), 'model': 'gpt-4o-mini'}
+        result = agent._complete_json(request)
+        
+        assert calls[0]['response_format'] == {'type': 'json_object'} and calls[0]['stream'] is True
+        assert stream.read == 3
+        assert (result['visa_type'], result['visa_code']) == ('Parent Boost Visitor Visa', 'V4')
+
+
+class TestExecutionHistory:
+    """Tests for the bounded, compact agent execution history."""
+    
+    def test_history_is_bounded_and_compact(self, sample_config, tmp_path):
+        """Test only the latest executions are kept, as digests and sizes, with payloads spilled to disk."""
+        config = {**sample_config, 'execution_history': {'capacity': 2, 'spill_dir': str(tmp_path)}}
+        agent = RequirementsCaptureAgent('RequirementsCapture', config)
+        document = 'Parent Boost Visitor Visa policy. ' * 5000
+        
+        for run in range(3):
+            agent._log_execution({'policy_document': document, 'run': run}, {'functional_requirements': [run]}, 0.5, True)
+        agent._log_execution({'policy_document': document, 'run': 3}, {'partial': True}, 0.1, False, 'boom')
+        
+        history = agent.get_execution_history()
+        assert len(history) == 2
+        assert [record['success'] for record in history] == [True, False]
+        assert history[0]['inputs']['keys'] == ['policy_document', 'run']
+        assert history[0]['inputs']['bytes'] > len(document)
+        assert history[1]['outputs'] is None and history[1]['error'] == 'boom'
+        assert document not in json.dumps(history)
+        
+        spilled = [json.loads(line) for line in (tmp_path / 'RequirementsCapture.jsonl').read_text().splitlines()]
+        assert len(spilled) == 4
+        assert spilled[2]['inputs_sha256'] == history[0]['inputs']['sha256']
+        assert spilled[2]['inputs']['run'] == 2
+        assert spilled[2]['outputs'] == {'functional_requirements': [2]}
+
+
+class TestAsyncExecution:
+    """Tests for the asyncio agent execution path."""
+    
+    def test_independent_llm_calls_run_concurrently(self, sample_config, sample_policy_structure, monkeypatch):
+        """Test aexecute issues the four extraction calls together."""
+        agent = RequirementsCaptureAgent('RequirementsCapture', sample_config)
+        
+        prompts = []
+        
+        async def fake_ainvoke_llm(prompt):
+            prompts.append(prompt)
+            await asyncio.sleep(0.2)
+            return '[]'
+        
+        monkeypatch.setattr(agent, '_ainvoke_llm', fake_ainvoke_llm)
+        
+        start = time.time()
+        outputs = asyncio.run(agent.aexecute({
+            'policy_structure': sample_policy_structure,
+            'eligibility_rules': {},
+            'conditions': {}
+        }))
+        elapsed = time.time() - start
+        
+        assert len(set(prompts)) == 4
+        assert 'functional_requirements' in outputs
+        assert 'validation_rules' in outputs
+        assert elapsed < 0.6
+
+
+class TestChunkedExtraction:
+    """Tests for map-reduce extraction over long policies."""
+    
+    def test_long_policy_is_extracted_chunk_by_chunk(self, sample_config):
+        """Test every section of a long policy reaches the LLM and the results are merged."""
+        config = {**sample_config, 'chunking': {'max_chunk_tokens': 200}}
+        agent = PolicyEvaluatorAgent('PolicyEvaluator', config)
+        document = 'Parent Boost Visitor Visa\n\n' + '\n\n'.join(
+            f'V4.{i} CONDITIONS\n\n(a) Applicants must satisfy condition number {i} of this visa.' * 3
+            for i in range(1, 31)
+        )
+        sections = agent._load_policy({'policy_document': document})[1]
+        prompts = []
+        
+        def fake_invoke_llm(prompt):
+            prompts.append(prompt)
+            codes = sorted({line.split()[0] for line in prompt.split('\n') if line.startswith('V4.')})
+            return json.dumps({'visa_conditions': [
+                {'description': f'Condition {code}', 'policy_reference': code} for code in codes
+            ]})
+        
+        agent._invoke_llm = fake_invoke_llm
+        conditions = agent._extract_conditions(document, sections)
+        
+        assert len(prompts) > 1
+        references = [condition['policy_reference'] for condition in conditions['visa_conditions']]
+        assert sorted(references) == sorted(f'V4.{i}' for i in range(1, 31))
+    
+    def test_failed_chunk_does_not_fail_extraction(self, sample_config):
+        """Test a chunk whose call fails is dropped instead of discarding the others."""
+        agent = RequirementsCaptureAgent('RequirementsCapture', {**sample_config, 'chunking': {'max_chunk_tokens': 50}})
+        calls = []
+        
+        def fake_invoke_llm(prompt):
+            calls.append(prompt)
+            if len(calls) == 1:
+                raise RuntimeError('rate limited')
+            return json.dumps([{'requirement_id': 'FR-001', 'description': f'Requirement {len(calls)}'}])
+        
+        agent._invoke_llm = fake_invoke_llm
+        conditions = {f'category_{i}': [{'description': f'Condition {i} ' * 20}] for i in range(5)}
+        requirements = agent._extract_functional_requirements({}, {}, conditions)
+        
+        assert len(calls) > 2
+        assert len(requirements) == len(calls) - 1
+        assert len({r['requirement_id'] for r in requirements}) == len(requirements)
 
 
 class TestRequirementsCaptureAgent:
@@ -214,6 +490,44 @@ class TestValidationAgent:
         assert 'total_questions' in q_validation
         assert 'valid_questions' in q_validation
         assert 'validation_rate' in q_validation
+    
+    def test_execute_builds_the_report(self, sample_config, sample_requirements):
+        """Test V1 validation returns the full report rather than the fallback outputs."""
+        agent = ValidationAgent('ValidationAgent', sample_config)
+        
+        outputs = agent.execute({**sample_requirements, 'sections': {'V4.5': {'title': 'Eligibility'}}})
+        
+        assert 'validation_score' not in outputs
+        assert 0 <= outputs['validation_report']['overall_score'] <= 100
+        assert 'total_gaps' in outputs['gap_analysis']
+        assert isinstance(outputs['recommendations'], list)
+    
+    def test_aexecute_builds_the_report_from_llm_checks(self, sample_config, sample_requirements, monkeypatch):
+        """Test V2 validation assembles the five concurrent LLM reports rather than falling back."""
+        reports = {
+            'requirements validation': {'total_requirements': 3, 'valid_requirements': 2, 'validation_rate': 66.7},
+            'questions validation': {'total_questions': 2, 'valid_questions': 2, 'validation_rate': 100.0},
+            'coverage analysis': {'coverage_percentage': 50.0},
+            'consistency check': {'consistency_score': 90.0},
+            'gap analysis': {'overall_completeness': 70.0, 'missing_questions': ['Sponsor income']}
+        }
+        agent = ValidationAgent('ValidationAgent', sample_config)
+        
+        async def fake_complete_request(request):
+            # As validated against the request's schema, defaults filled in
+            result, problems = validate_output(request['schema'], reports[request['label']])
+            assert not problems
+            return result
+        
+        monkeypatch.setenv('VISA_AGENT_FORCE_LLM', 'true')
+        monkeypatch.setattr(agent, '_acomplete_request', fake_complete_request)
+        outputs = asyncio.run(agent.aexecute(sample_requirements))
+        
+        report = outputs['validation_report']
+        assert 'validation_score' not in outputs
+        assert report['coverage_analysis']['coverage_percentage'] == 50.0
+        assert report['overall_score'] == 70.01
+        assert {r['type'] for r in outputs['recommendations']} == {'requirement_quality', 'coverage'}
 
 
 class TestConsolidationAgent:
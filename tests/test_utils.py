@@ -0,0 +1,1022 @@
+import pytest
+import sys
+import json
+import time
+import queue
+import asyncio
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+import openai
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.llm_cache import LLMResponseCache, MemoryLRUCache, get_llm_cache
+from src.utils.llm_clients import get_openai_client, get_async_openai_client, get_chat_model
+from src.utils.json_extractor import extract_json
+from src.utils.policy_analyzer import PolicyAnalyzer
+from src.utils.enhanced_document_parser import EnhancedDocumentParser, PDF_AVAILABLE, get_pdf_pool
+from src.utils.parse_cache import ParsedDocumentCache, get_parse_cache
+from src.utils.chunking import (
+    chunk_document, head_chunk, section_blocks, merge_chunk_results, estimate_tokens, DocumentTooLargeError
+)
+from src.utils.document_parser import DocumentParser
+from src.utils.logging_config import configure_logging, shutdown_logging, DroppingQueueHandler
+from src.utils.tracing import JsonlSpanSink, create_span_sink, current_span, trace_span, traced, NOOP_SPAN
+from src.utils.telemetry import (
+    CostModel, RunTelemetry, TelemetryRegistry, telemetry_scope, record_llm_call, get_telemetry_registry
+)
+from src.utils.rate_limiter import LLMRateLimiter, TokenBucket, llm_priority, current_priority_lane, get_rate_limiter
+from src.utils.visa_classifier import KeywordAutomaton, VisaTypeClassifier, get_visa_classifier
+from src.utils.reference_index import ReferenceIndex, normalize_reference, format_reference
+from src.utils.validator import Validator
+from src.utils.batch_validator import validate_questions, validate_requirements
+from src.utils.form_rules import FormValidator, compile_rule, compile_rules
+from src.utils.events import EventBus, event_tags
+from src.utils.schemas import (
+    PolicyStructure, QuestionList, StreamingJsonValidator, apply_patch, validate_output, wrap_items
+)
+
+
+class TestLLMResponseCache:
+    """Tests for the LLM response cache."""
+
+    def test_key_depends_on_all_request_parameters(self):
+        """Test cache keys change with model, temperature, max_tokens and prompt."""
+        base = LLMResponseCache.make_key('gpt-4', 0.1, 1500, 'prompt')
+
+        assert base == LLMResponseCache.make_key('gpt-4', 0.1, 1500, 'prompt')
+        assert base != LLMResponseCache.make_key('gpt-3.5-turbo', 0.1, 1500, 'prompt')
+        assert base != LLMResponseCache.make_key('gpt-4', 0.2, 1500, 'prompt')
+        assert base != LLMResponseCache.make_key('gpt-4', 0.1, 2000, 'prompt')
+        assert base != LLMResponseCache.make_key('gpt-4', 0.1, 1500, 'prompt 2')
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """Test responses persist across cache instances."""
+        path = str(tmp_path / 'cache.sqlite')
+        LLMResponseCache(path=path).set('key', '{"visa_code": "V4"}')
+
+        cache = LLMResponseCache(path=path)
+        assert cache.get('key') == '{"visa_code": "V4"}'
+        assert cache.get('missing') is None
+        assert cache.get_stats()['hits'] == 1
+
+    def test_memory_tier_evicts_least_recently_used(self):
+        """Test LRU eviction in the memory tier."""
+        cache = MemoryLRUCache(max_entries=2)
+        cache.set('a', '1')
+        cache.set('b', '2')
+        cache.get('a')
+        cache.set('c', '3')
+
+        assert cache.get('a') == '1'
+        assert cache.get('b') is None
+        assert cache.get('c') == '3'
+
+    def test_expired_entries_are_dropped(self, tmp_path):
+        """Test TTL expiry in both tiers."""
+        cache = LLMResponseCache(path=str(tmp_path / 'cache.sqlite'), ttl_seconds=0.05)
+        cache.set('key', 'value')
+        time.sleep(0.1)
+
+        assert cache.get('key') is None
+
+    def test_disk_tier_enforces_size_limit(self, tmp_path):
+        """Test byte-size eviction in the disk tier."""
+        cache = LLMResponseCache(path=str(tmp_path / 'cache.sqlite'), memory_entries=0, max_bytes=250)
+        for i in range(5):
+            cache.set(f'key{i}', 'x' * 100)
+
+        assert len(cache.store) == 2
+        assert cache.get('key4') == 'x' * 100
+        assert cache.get('key0') is None
+
+    def test_disabled_cache(self):
+        """Test caching is off without configuration."""
+        assert get_llm_cache(None) is None
+        assert get_llm_cache({'enabled': False}) is None
+
+
+
+class TestLLMClients:
+    """Tests for the shared LLM client registry."""
+
+    def test_sync_clients_are_shared_per_config(self, monkeypatch):
+        """Test one pooled client per configuration."""
+        monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+
+        assert get_openai_client({'max_connections': 5}) is get_openai_client({'max_connections': 5})
+        assert get_openai_client({'max_connections': 5}) is not get_openai_client({'max_connections': 6})
+
+    def test_chat_models_share_the_pooled_client(self, monkeypatch):
+        """Test chat models with the same settings are shared and use the pooled client."""
+        monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+
+        model = get_chat_model('gpt-4', 0.1, 1500)
+        assert model is get_chat_model('gpt-4', 0.1, 1500)
+        assert model is not get_chat_model('gpt-4', 0.2, 1500)
+        assert model.client is get_openai_client().chat.completions
+
+    def test_async_clients_are_shared_per_event_loop(self, monkeypatch):
+        """Test one async client per event loop."""
+        monkeypatch.setenv('OPENAI_API_KEY', 'sk-test')
+
+        async def get_pair():
+            return get_async_openai_client(), get_async_openai_client()
+
+        first, second = asyncio.run(get_pair())
+        other, _ = asyncio.run(get_pair())
+
+        assert first is second
+        assert first is not other
+
+
+class TestLLMRateLimiter:
+    """Tests for the shared LLM rate limiter."""
+
+    @staticmethod
+    def _rate_limit_error(retry_after: str = '0.05') -> openai.RateLimitError:
+        response = httpx.Response(429, headers={'retry-after': retry_after},
+                                  request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+        return openai.RateLimitError('Rate limit reached', response=response, body=None)
+
+    def test_token_bucket_wait_time(self):
+        """Test buckets report the wait until enough tokens refill."""
+        bucket = TokenBucket(per_minute=60)
+        now = bucket.updated
+        assert bucket.wait_time(60, now) == 0
+        bucket.consume(60, now)
+        assert bucket.wait_time(1, now) == pytest.approx(1.0)
+        assert bucket.wait_time(1, now + 1) == 0
+
+    def test_interactive_calls_jump_the_queue(self):
+        """Test a waiting interactive call is admitted before earlier batch calls."""
+        limiter = LLMRateLimiter(max_concurrent_requests=1)
+        limiter.acquire('gpt-4', 10)
+        order = []
+
+        def worker(lane):
+            with llm_priority(lane):
+                limiter.acquire('gpt-4', 10)
+            order.append(lane)
+            limiter.release()
+
+        threads = []
+        for lane in ['batch', 'batch', 'interactive']:
+            thread = threading.Thread(target=worker, args=(lane,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.05)
+
+        limiter.release()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert order == ['interactive', 'batch', 'batch']
+
+    def test_paused_model_does_not_block_other_models(self):
+        """Test a call to a paused or exhausted model never holds up calls to another model."""
+        limiter = LLMRateLimiter(model_limits={'gpt-3.5-turbo': {'requests_per_minute': 1}})
+        limiter.acquire('gpt-3.5-turbo', 10)
+        limiter.release()
+        limiter._paused_until['gpt-4'] = time.monotonic() + 60
+        admitted = []
+
+        def worker(model):
+            limiter.acquire(model, 10)
+            admitted.append(model)
+            limiter.release()
+
+        threads = [threading.Thread(target=worker, args=(model,), daemon=True)
+                   for model in ['gpt-4', 'gpt-3.5-turbo', 'gpt-4o']]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        threads[2].join(timeout=1)
+
+        assert admitted == ['gpt-4o']
+        assert limiter.get_stats()['queued'] == 2
+
+    def test_rate_limit_errors_are_retried_after_pause(self):
+        """Test a 429 pauses the model for Retry-After, then the call is retried."""
+        limiter = LLMRateLimiter()
+        attempts = []
+
+        def call():
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise self._rate_limit_error('0.2')
+            return 'ok'
+
+        assert limiter.call('gpt-4', 'prompt', 100, call, max_retries=2) == 'ok'
+        assert attempts[1] - attempts[0] >= 0.2
+        assert limiter.get_stats()['rate_limited'] == 1
+        assert limiter.get_stats()['active'] == 0
+
+    def test_retries_stop_at_max_retries(self):
+        """Test the error surfaces once retries are exhausted, and other errors are not retried."""
+        limiter = LLMRateLimiter()
+        attempts = []
+
+        def rate_limited():
+            attempts.append(1)
+            raise self._rate_limit_error('0.01')
+
+        with pytest.raises(openai.RateLimitError):
+            limiter.call('gpt-4', 'prompt', 100, rate_limited, max_retries=2)
+        assert len(attempts) == 3
+
+        def broken():
+            attempts.append(1)
+            raise ValueError('bad request')
+
+        with pytest.raises(ValueError):
+            limiter.call('gpt-4', 'prompt', 100, broken, max_retries=2)
+        assert len(attempts) == 4
+
+    def test_async_calls_respect_concurrency_limit(self):
+        """Test async callers never exceed the concurrency limit."""
+        limiter = LLMRateLimiter(max_concurrent_requests=2)
+        in_flight = []
+        peak = []
+
+        async def call():
+            in_flight.append(1)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.05)
+            in_flight.pop()
+            return 'ok'
+
+        async def run_all():
+            return await asyncio.gather(*[limiter.acall('gpt-4', 'prompt', 100, call) for _ in range(6)])
+
+        assert asyncio.run(run_all()) == ['ok'] * 6
+        assert max(peak) == 2
+
+    def test_priority_lane_context(self):
+        """Test lanes are scoped to the context manager and validated."""
+        assert current_priority_lane() == 'normal'
+        with llm_priority('interactive'):
+            assert current_priority_lane() == 'interactive'
+        assert current_priority_lane() == 'normal'
+
+        with pytest.raises(ValueError):
+            with llm_priority('urgent'):
+                pass
+
+    def test_disabled_rate_limiter(self, monkeypatch):
+        """Test rate limiting is off without configuration or when disabled."""
+        assert get_rate_limiter(None) is None
+        assert get_rate_limiter({'enabled': False}) is None
+        assert get_rate_limiter({'max_concurrent_requests': 4}) is get_rate_limiter({'max_concurrent_requests': 4})
+
+        monkeypatch.setenv('VISA_AGENT_RATE_LIMIT', 'false')
+        assert get_rate_limiter({'max_concurrent_requests': 4}) is None
+
+
+class TestJSONExtractor:
+    """Tests for the single-pass LLM response JSON extractor."""
+
+    def test_fenced_block_preferred_over_prose_brackets(self):
+        """Test JSON in a fenced block wins over bracketed prose before it."""
+        response = 'See [1] below:\n```json\n{"visa_code": "PB", "rules": ["a", "b"]}\n```'
+        assert extract_json(response) == {'visa_code': 'PB', 'rules': ['a', 'b']}
+
+    def test_brackets_and_quotes_inside_strings(self):
+        """Test brackets and escaped quotes inside strings do not end the value."""
+        response = 'Result: {"question_text": "Is the \\"sponsor\\" {or [guarantor]}?"} done'
+        assert extract_json(response) == {'question_text': 'Is the "sponsor" {or [guarantor]}?'}
+
+    def test_trailing_commas_are_dropped(self):
+        """Test trailing commas before closing brackets are tolerated."""
+        assert extract_json('{"items": [1, 2, ], "ok": true, }') == {'items': [1, 2], 'ok': True}
+
+    def test_invalid_candidates_are_skipped(self):
+        """Test scanning continues past bracketed text that is not JSON."""
+        assert extract_json('Use {placeholders} like this: [{"id": 1}]') == [{'id': 1}]
+
+    def test_truncated_response_is_closed_off(self):
+        """Test a response cut off mid-value keeps its complete items."""
+        assert extract_json('{"questions": [{"id": 1}, {"id": 2, "text": "Wha') == \
+            {'questions': [{'id': 1}, {'id': 2, 'text': 'Wha'}]}
+        assert extract_json('{"a": 1, "b":') == {'a': 1}
+
+    def test_no_json(self):
+        """Test responses without JSON return None."""
+        assert extract_json('') is None
+        assert extract_json('I could not analyse this policy.') is None
+
+
+class TestPolicyAnalyzer:
+    """Tests for the single-pass policy document analyzer."""
+
+    DOCUMENT = (
+        "PARENT BOOST VISITOR VISA (V4)\n\n"
+        "V4.1 OBJECTIVE\n\n"
+        "(a) Enable family reunification for skilled migrants\n"
+        "(b) Support the labour force\n\n"
+        "V4.10(f) Sponsor Limitations\n"
+        "(i) A sponsor may sponsor a maximum of six parents\n\n"
+        "V4.25 FINANCIAL REQUIREMENTS\n\n"
+        "The sponsor must earn NZD $65,000 per year over the last 3 years.\n"
+        "Applicants aged 18 years old or over 65 can apply if sponsored; issued 01/02/2024.\n"
+    )
+
+    def test_sections_run_to_the_next_header(self):
+        """Test subsection paragraphs stay inside their section."""
+        sections = PolicyAnalyzer().analyze(self.DOCUMENT)['sections']
+        assert list(sections) == ['V4.1', 'V4.25']
+        assert sections['V4.1']['title'] == 'OBJECTIVE'
+        assert 'V4.10(f) Sponsor Limitations' in sections['V4.1']['content']
+        assert sections['V4.25']['content'].startswith('The sponsor must earn')
+
+    def test_requirements_are_tagged_with_their_section(self):
+        """Test requirement items keep their continuation text and drop short items."""
+        requirements = PolicyAnalyzer().analyze(self.DOCUMENT)['requirements']
+        assert {'section': 'V4.1', 'requirement': 'Enable family reunification for skilled migrants'} in requirements
+        assert {'section': 'V4.1', 'requirement': 'Sponsor Limitations'} in requirements
+        assert all(len(item['requirement']) > 10 for item in requirements)
+
+    def test_thresholds_and_metadata(self):
+        """Test numbers are classified by their context and references are collected."""
+        analysis = PolicyAnalyzer().analyze(self.DOCUMENT)
+        assert analysis['thresholds']['currency_amounts'] == [65000]
+        assert analysis['thresholds']['age_limits'] == [18, 65]
+        assert ('3', 'years') in analysis['thresholds']['time_periods']
+        assert analysis['policy_metadata']['dates_mentioned'] == ['01/02/2024']
+        assert 'V4.10(f)' in analysis['policy_metadata']['policy_references']
+        assert 'V4' in analysis['policy_metadata']['visa_codes']
+
+    def test_conditions_are_grouped_by_keyword(self):
+        """Test each clause is reported once per condition keyword it contains."""
+        conditions = PolicyAnalyzer().analyze(self.DOCUMENT)['conditions']
+        types = [condition['type'] for condition in conditions]
+        assert types == ['mandatory', 'optional', 'optional', 'conditional']
+        assert conditions[0]['statement'] == 'The sponsor must earn NZD $65,000 per year over the last 3 years'
+
+
+def _write_pdf(path, page_texts):
+    """Write a minimal PDF with one line of Helvetica text per page."""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for text in page_texts:
+        stream = f'BT /F1 12 Tf 72 720 Td ({text}) Tj ET'
+        objects.append(f'<< /Length {len(stream)} >>\nstream\n{stream}\nendstream')
+        objects.append(f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+                       f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>')
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'
+
+    body = b'%PDF-1.4\n'
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(body))
+        body += f'{number} 0 obj\n{obj}\nendobj\n'.encode('latin-1')
+    xref = len(body)
+    body += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode('latin-1')
+    body += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode('latin-1')
+    body += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode('latin-1')
+    path.write_bytes(body)
+
+
+@pytest.mark.skipif(not PDF_AVAILABLE, reason="pdfplumber/PyPDF2 not installed")
+class TestPDFPageStreaming:
+    """Tests for streaming and parallel PDF page extraction."""
+
+    PAGES = [f'V4.{number} Applicants need NZD ${number},000' for number in range(1, 7)]
+
+    def test_iter_pages_streams_pages_in_order(self, tmp_path):
+        """Test pages are yielded one at a time with their text and tables."""
+        pdf_path = tmp_path / 'policy.pdf'
+        _write_pdf(pdf_path, self.PAGES)
+
+        pages = EnhancedDocumentParser(pdf_workers=1).iter_pages(str(pdf_path))
+        first = next(pages)
+        assert first['page_number'] == 1
+        assert first['text'] == self.PAGES[0]
+        assert first['tables'] == []
+        assert [page['page_number'] for page in pages] == [2, 3, 4, 5, 6]
+
+    def test_parallel_extraction_matches_serial(self, tmp_path):
+        """Test process-pool extraction returns the same pages in the same order."""
+        pdf_path = tmp_path / 'policy.pdf'
+        _write_pdf(pdf_path, self.PAGES)
+
+        serial = list(EnhancedDocumentParser(pdf_workers=1).iter_pages(str(pdf_path)))
+        parser = EnhancedDocumentParser(pdf_workers=3, parallel_min_pages=2)
+        parallel = list(parser.iter_pages(str(pdf_path)))
+        assert parallel == serial
+
+        # The spawned pool is kept for later documents
+        assert list(parser.iter_pages(str(pdf_path))) == serial
+        assert get_pdf_pool(3) is get_pdf_pool(3)
+
+    def test_load_document_joins_pages(self, tmp_path):
+        """Test the loaded content joins every page and reports the page count."""
+        pdf_path = tmp_path / 'policy.pdf'
+        _write_pdf(pdf_path, self.PAGES)
+
+        document = EnhancedDocumentParser(pdf_workers=1, cache_config={'enabled': False}).load_document(str(pdf_path))
+        assert document['content'] == ''.join(f'{text}\n\n' for text in self.PAGES)
+        assert document['metadata']['pages'] == 6
+        assert document['metadata']['extraction_method'] == 'pdfplumber'
+        assert document['tables'] == []
+
+
+class TestParsedDocumentCache:
+    """Tests for the content-addressed parsed document cache."""
+
+    def _parser(self, tmp_path):
+        cache_config = {'path': str(tmp_path / 'parsed.sqlite')}
+        return EnhancedDocumentParser(pdf_workers=1, cache_config=cache_config)
+
+    def test_known_document_skips_parsing(self, tmp_path, monkeypatch):
+        """Test re-loading the same bytes under another name is served from the cache."""
+        parser = self._parser(tmp_path)
+        first = tmp_path / 'upload_1.txt'
+        second = tmp_path / 'upload_2.txt'
+        first.write_text('V4.1 OBJECTIVE\n\n(a) Enable family reunification\n', encoding='utf-8')
+        second.write_bytes(first.read_bytes())
+
+        parsed = parser.load_document(str(first))
+        assert parsed['structured_content']['sections']['V4.1']['title'] == 'OBJECTIVE'
+
+        monkeypatch.setattr(parser, '_parse_document', lambda *args: pytest.fail("document was parsed again"))
+        cached = parser.load_document(str(second))
+        assert cached['content'] == parsed['content']
+        assert cached['metadata']['filename'] == 'upload_2.txt'
+        assert parser.extract_structured_content(cached) == cached['structured_content']
+
+    def test_changed_bytes_miss(self, tmp_path):
+        """Test an edited document is parsed again."""
+        parser = self._parser(tmp_path)
+        document = tmp_path / 'policy.txt'
+        document.write_text('first version', encoding='utf-8')
+        parser.load_document(str(document))
+        document.write_text('second version', encoding='utf-8')
+
+        assert parser.load_document(str(document))['content'] == 'second version'
+        assert parser.cache.get_stats()['misses'] == 2
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """Test entries persist in the SQLite tier and evict least recently used first."""
+        path = str(tmp_path / 'parsed.sqlite')
+        cache = ParsedDocumentCache(path=path, max_entries=2)
+        for name in ('a', 'b', 'c'):
+            cache.set(name, {'content': name * 100, 'metadata': {}})
+
+        reopened = ParsedDocumentCache(path=path)
+        assert reopened.get('a') is None
+        assert reopened.get('c') == {'content': 'c' * 100, 'metadata': {}}
+
+    def test_disabled_by_environment(self, monkeypatch):
+        """Test VISA_AGENT_PARSE_CACHE=false turns the cache off."""
+        monkeypatch.setenv('VISA_AGENT_PARSE_CACHE', 'false')
+        assert get_parse_cache({'path': None}) is None
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
+
+
+class TestPolicyChunking:
+    """Tests for section-aware chunking and chunk result merging."""
+    
+    @staticmethod
+    def _policy(section_count, paragraph='Applicants must meet this requirement. ' * 10):
+        body = '\n\n'.join(f'V4.{i} SECTION TITLE\n\n{paragraph}' for i in range(1, section_count + 1))
+        return f'Parent Boost Visitor Visa\n\n{body}'
+    
+    def test_chunks_keep_every_section_within_budget(self):
+        """Test chunks split at section boundaries, stay under budget and drop nothing."""
+        document = self._policy(20)
+        sections = DocumentParser.extract_sections(document)
+        
+        chunks = chunk_document(document, sections, max_tokens=300)
+        
+        assert len(chunks) > 1
+        assert all(estimate_tokens(chunk) <= 300 for chunk in chunks)
+        assert chunks[0].startswith('Parent Boost Visitor Visa')
+        for code in sections:
+            assert sum(f'{code} SECTION TITLE' in chunk for chunk in chunks) == 1
+    
+    def test_oversized_section_is_split_with_heading(self):
+        """Test a section larger than the budget is split and its heading repeated."""
+        document = self._policy(1, paragraph='\n\n'.join(['Sponsors must hold NZD $65,000 income.'] * 100))
+        sections = DocumentParser.extract_sections(document)
+        
+        chunks = chunk_document(document, sections, max_tokens=200)
+        
+        assert len(chunks) > 2
+        assert all(chunk.count('V4.1 SECTION TITLE') == 1 for chunk in chunks)
+        assert sum(chunk.count('Sponsors must hold') for chunk in chunks) == 100
+    
+    def test_head_chunk_matches_first_chunk(self):
+        """Test the head chunk is the first chunk, without max_chunks applying."""
+        document = self._policy(40)
+        sections = DocumentParser.extract_sections(document)
+        blocks = section_blocks(document, sections)
+        
+        head = head_chunk(blocks, max_tokens=100)
+        
+        assert head == chunk_document(document, sections, max_tokens=100)[0]
+        assert estimate_tokens(head) <= 100
+        assert head_chunk([], max_tokens=100) == ''
+    
+    def test_long_documents_get_more_chunks_not_bigger_ones(self):
+        """Test the token budget stays a hard limit and max_chunks fails loudly."""
+        document = self._policy(40)
+        sections = DocumentParser.extract_sections(document)
+        chunks = chunk_document(document, sections, max_tokens=100, max_chunks=200)
+        
+        assert len(chunks) > 4
+        assert all(estimate_tokens(chunk) <= 100 for chunk in chunks)
+        assert all(f'V4.{i} ' in ''.join(chunks) for i in range(1, 41))
+        
+        with pytest.raises(DocumentTooLargeError):
+            chunk_document(document, sections, max_tokens=100, max_chunks=4)
+    
+    def test_merge_deduplicates_and_renumbers(self):
+        """Test chunk results merge, drop repeats and failed chunks, and get unique IDs."""
+        results = [
+            {'applicant_requirements': [{'description': 'Must hold a passport', 'policy_reference': 'V4.1'}]},
+            {'fallback': True, 'items': []},
+            None,
+            {'applicant_requirements': [
+                {'description': 'must hold a  passport', 'policy_reference': 'V4.1'},
+                {'description': 'Must be outside New Zealand', 'policy_reference': 'V4.2'}
+            ], 'exclusions': []}
+        ]
+        merged = merge_chunk_results(results)
+        
+        assert [r['policy_reference'] for r in merged['applicant_requirements']] == ['V4.1', 'V4.2']
+        assert merged['exclusions'] == []
+        
+        requirements = merge_chunk_results([
+            [{'requirement_id': 'FR-001', 'description': 'A'}, {'requirement_id': 'FR-002', 'description': 'B'}],
+            [{'requirement_id': 'FR-001', 'description': 'C'}]
+        ])
+        assert [r['requirement_id'] for r in requirements] == ['FR-001', 'FR-002', 'FR-003']
+        assert merge_chunk_results([None, {'fallback': True}]) is None
+    
+    def test_merge_renames_only_differing_ids_and_their_references(self):
+        """Test repeated items keep their first ID and renamed IDs are followed by references."""
+        merged = merge_chunk_results([
+            {'rules': [{'rule_id': 'R-1', 'rule': 'Age over 18'}, {'rule_id': 'R-2', 'rule': 'Holds passport'}]},
+            {'rules': [
+                {'rule_id': 'R-1', 'rule': 'Holds  passport'},
+                {'rule_id': 'R-2', 'rule': 'Has funds', 'depends_on': 'R-1'},
+                {'rule_id': 'R-3', 'rule': 'Has insurance', 'depends_on': 'R-2, R-1'}
+            ]}
+        ])
+        
+        assert [(r['rule_id'], r['rule']) for r in merged['rules']] == [
+            ('R-1', 'Age over 18'), ('R-2', 'Holds passport'), ('R-4', 'Has funds'), ('R-3', 'Has insurance')
+        ]
+        assert merged['rules'][2]['depends_on'] == 'R-2'
+        assert merged['rules'][3]['depends_on'] == 'R-4, R-2'
+
+
+class TestTelemetry:
+    """Tests for LLM token accounting and cost telemetry."""
+    
+    def test_cost_model_uses_longest_prefix_and_cached_price(self):
+        """Test models are priced by exact name or longest prefix, with cached prompt tokens discounted."""
+        model = CostModel({
+            'gpt-4': {'input_per_1k': 0.03, 'output_per_1k': 0.06},
+            'gpt-4o': {'input_per_1k': 0.0025, 'cached_input_per_1k': 0.00125, 'output_per_1k': 0.01}
+        })
+        
+        assert model.cost('gpt-4-0613', 1000, 500) == pytest.approx(0.03 + 0.03)
+        assert model.cost('gpt-4o-2024-08-06', 2000, 1000, cached_tokens=1000) == pytest.approx(0.0025 + 0.00125 + 0.01)
+        assert model.cost('claude-x', 1000, 1000) == 0.0
+    
+    def test_calls_roll_up_per_agent_stage_and_model(self):
+        """Test calls in a telemetry scope are attributed to its run and stage."""
+        run = RunTelemetry('run-1')
+        
+        with telemetry_scope(run, 'policy_analysis'):
+            record_llm_call('PolicyEvaluator', 'gpt-4', 100, 20, latency_seconds=0.5, cost_usd=0.01)
+            record_llm_call('PolicyEvaluator', 'gpt-4', cache_hit=True)
+        with telemetry_scope(run, 'validation'):
+            record_llm_call('Validator', 'gpt-3.5-turbo', 50, 10, cached_tokens=25)
+        record_llm_call('Outside', 'gpt-4', 999, 999)
+        
+        summary = run.summary()
+        assert summary['totals']['calls'] == 3
+        assert summary['totals']['total_tokens'] == 180
+        assert summary['by_stage']['policy_analysis']['cache_hits'] == 1
+        assert summary['by_stage']['validation']['cached_tokens'] == 25
+        assert summary['by_agent']['PolicyEvaluator']['cost_usd'] == pytest.approx(0.01)
+        assert set(summary['by_model']) == {'gpt-4', 'gpt-3.5-turbo'}
+    
+    def test_prometheus_export(self):
+        """Test the registry renders labelled counters in the Prometheus text format."""
+        registry = TelemetryRegistry()
+        registry.record('Policy "Evaluator"', 'policy_analysis', 'gpt-4', 100, 20, 0, 0.5, False, 0.0042)
+        
+        text = registry.render_prometheus()
+        
+        assert '# TYPE visa_agent_llm_prompt_tokens_total counter' in text
+        assert 'visa_agent_llm_prompt_tokens_total{agent="Policy \\"Evaluator\\"",stage="policy_analysis",model="gpt-4"} 100' in text
+        assert 'visa_agent_llm_cost_usd_total{' in text
+        assert isinstance(get_telemetry_registry(), TelemetryRegistry)
+
+
+class TestTracing:
+    """Tests for run tracing spans and the JSONL / OTLP file sinks."""
+    
+    def test_spans_nest_and_export_on_root_end(self, tmp_path):
+        """Test child spans join the open span's trace and are written when the root span ends."""
+        sink = JsonlSpanSink(tmp_path / 'trace.jsonl')
+        
+        with trace_span('workflow.run', sink, run_id='run-1'):
+            with trace_span('workflow.stage', stage='policy_analysis') as stage:
+                DocumentParser.extract_sections('V4.1 OBJECTIVE\n\nText')
+                stage.set_attributes(output_keys=('sections',), config={'a': 1})
+            assert not (tmp_path / 'trace.jsonl').exists()
+        
+        spans = {span['name']: span for span in map(json.loads, (tmp_path / 'trace.jsonl').read_text().splitlines())}
+        assert set(spans) == {'workflow.run', 'workflow.stage', 'parser.extract_sections'}
+        assert len({span['trace_id'] for span in spans.values()}) == 1
+        assert spans['workflow.run']['parent_span_id'] is None
+        assert spans['workflow.stage']['parent_span_id'] == spans['workflow.run']['span_id']
+        assert spans['parser.extract_sections']['parent_span_id'] == spans['workflow.stage']['span_id']
+        assert spans['workflow.stage']['attributes'] == {
+            'stage': 'policy_analysis', 'output_keys': ['sections'], 'config': "{'a': 1}"
+        }
+        assert spans['workflow.run']['duration_ms'] >= spans['workflow.stage']['duration_ms']
+    
+    def test_untraced_calls_are_noops(self):
+        """Test spans outside a trace record nothing and traced functions run unchanged."""
+        @traced('parser.double')
+        def double(value):
+            return value * 2
+        
+        with trace_span('orphan') as span:
+            assert span is NOOP_SPAN
+            assert current_span() is NOOP_SPAN
+        assert double(2) == 4
+    
+    def test_errors_mark_span_and_propagate_to_threads(self, tmp_path):
+        """Test an exception marks its span failed, and copied contexts nest spans from worker threads."""
+        sink = JsonlSpanSink(tmp_path / 'trace.jsonl')
+        
+        def execute_agent():
+            with trace_span('agent.execute'):
+                pass
+        
+        with pytest.raises(RuntimeError):
+            with trace_span('workflow.run', sink):
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    pool.submit(contextvars.copy_context().run, execute_agent).result()
+                with trace_span('llm.call'):
+                    raise RuntimeError('rate limited')
+        
+        spans = {span['name']: span for span in map(json.loads, (tmp_path / 'trace.jsonl').read_text().splitlines())}
+        assert spans['llm.call']['status'] == 'error'
+        assert spans['llm.call']['status_message'] == 'RuntimeError: rate limited'
+        assert spans['workflow.run']['status'] == 'error'
+        assert spans['agent.execute']['parent_span_id'] == spans['workflow.run']['span_id']
+        assert spans['agent.execute']['thread'] != spans['workflow.run']['thread']
+    
+    def test_otlp_format_and_disable_switch(self, tmp_path, monkeypatch):
+        """Test the OTLP sink writes ExportTraceServiceRequest batches and tracing can be switched off."""
+        sink = create_span_sink({'format': 'otlp', 'filename': 'spans.otlp.jsonl'}, tmp_path)
+        
+        with trace_span('workflow.run', sink, run_id='run-1', cache_hit=False, tokens=12):
+            with trace_span('llm.call'):
+                pass
+        
+        request = json.loads((tmp_path / 'spans.otlp.jsonl').read_text())
+        resource_spans = request['resourceSpans'][0]
+        spans = resource_spans['scopeSpans'][0]['spans']
+        assert [span['name'] for span in spans] == ['llm.call', 'workflow.run']
+        assert spans[0]['parentSpanId'] == spans[1]['spanId']
+        attributes = {item['key']: item['value'] for item in spans[1]['attributes']}
+        assert attributes['run_id'] == {'stringValue': 'run-1'}
+        assert attributes['cache_hit'] == {'boolValue': False}
+        assert attributes['tokens'] == {'intValue': '12'}
+        
+        monkeypatch.setenv('VISA_AGENT_TRACING', 'false')
+        assert create_span_sink({}, tmp_path) is None
+        assert create_span_sink({'enabled': False}, tmp_path) is None
+        with pytest.raises(ValueError):
+            JsonlSpanSink(tmp_path / 'x', format='zipkin')
+
+
+class TestLoggingConfig:
+    """Tests for the leveled, queue-based logging setup."""
+    
+    @pytest.fixture(autouse=True)
+    def restore_logging(self):
+        yield
+        shutdown_logging()
+        configure_logging()
+    
+    def test_module_levels_and_env_override(self, monkeypatch):
+        """Test per-module levels apply, are reset on reconfiguration, and the env var sets the root level."""
+        monkeypatch.setenv('VISA_AGENT_LOG_LEVEL', 'warning')
+        config = configure_logging({'modules': {'src.test_module': 'debug'}})
+        
+        assert config['level'] == 'WARNING'
+        assert logging.getLogger().level == logging.WARNING
+        assert logging.getLogger('src.test_module').isEnabledFor(logging.DEBUG)
+        assert not logging.getLogger('src.other_module').isEnabledFor(logging.INFO)
+        
+        configure_logging({'modules': {}})
+        assert logging.getLogger('src.test_module').level == logging.NOTSET
+    
+    def test_records_are_written_by_the_listener(self, capsys):
+        """Test enabled records are written by the listener and disabled ones are never formatted."""
+        configure_logging({'level': 'INFO', 'format': '%(levelname)s %(name)s %(message)s'})
+        
+        class Expensive:
+            def __str__(self):
+                raise AssertionError('disabled record was formatted')
+        
+        logger = logging.getLogger('src.test_module')
+        logger.debug("skipped %s", Expensive())
+        logger.info("kept %s", 'cheap')
+        shutdown_logging()
+        
+        assert 'INFO src.test_module kept cheap' in capsys.readouterr().err
+    
+    def test_full_queue_drops_instead_of_blocking(self):
+        """Test records beyond the queue size are dropped and counted."""
+        handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+        logger = logging.getLogger('src.test_dropping')
+        logger.addHandler(handler)
+        try:
+            for _ in range(3):
+                logger.warning("message")
+        finally:
+            logger.removeHandler(handler)
+        
+        assert handler.queue.qsize() == 1
+        assert handler.dropped == 2
+
+
+class TestVisaTypeClassifier:
+    """Test cases for the keyword automaton and visa type classifier."""
+    
+    def test_automaton_finds_overlapping_keywords(self):
+        """Test every occurrence is found in one pass, case-insensitively and at word starts."""
+        automaton = KeywordAutomaton(['he', 'she', 'his', 'hers'])
+        
+        assert automaton.count('USHERS', word_start=False) == [1, 1, 0, 1]
+        assert automaton.count('ushers he His') == [1, 0, 1, 0]
+    
+    def test_shipped_table_classifies_each_visa_type(self):
+        """Test the configured table detects the visa types the entry points used to hard-code."""
+        classifier = get_visa_classifier()
+        
+        assert classifier is get_visa_classifier()
+        assert classifier.classify('Parent Boost Visitor Visa\nV4.1 Objective')['visa_code'] == 'V4'
+        assert classifier.classify('SR1.5 Skilled Migrant Category')['visa_code'] == 'SR1'
+        assert classifier.classify('Working Holiday schemes for youth')['visa_code'] == 'WHV'
+        assert classifier.classify('Student visa requirements')['visa_code'] == 'STU'
+        
+        unknown = classifier.classify('General immigration instructions')
+        assert unknown['visa_type'] is None
+        assert unknown['confidence'] == 0.0
+    
+    def test_weighted_scores_and_confidence(self):
+        """Test specific phrases outweigh repeated generic words, which are capped."""
+        classifier = VisaTypeClassifier([
+            {'code': 'A', 'name': 'Alpha Visa', 'keywords': {'alpha visa': 5, 'family': 1}},
+            {'code': 'B', 'name': 'Beta Visa', 'keywords': {'beta visa': 5, 'work': 1}}
+        ], min_score=2, max_hits_per_keyword=2)
+        
+        result = classifier.classify('Beta Visa. ' + 'family ' * 10)
+        
+        assert result['visa_code'] == 'B'
+        assert result['scores'] == {'A': 2.0, 'B': 5.0}
+        assert result['confidence'] == round(5 / 7, 3)
+        assert result['matches'] == {'beta visa': 1, 'family': 10}
+        assert classifier.classify('work')['visa_code'] is None
+    
+    def test_batch_matches_single_classification(self):
+        """Test the batch API returns one result per document, in order, inline or in processes."""
+        classifier = get_visa_classifier()
+        documents = ['Parent Boost', 'Working Holiday Visa', 'nothing here'] * 30
+        expected = [classifier.classify(document) for document in documents]
+        
+        assert classifier.classify_batch(documents) == expected
+        assert classifier.classify_batch(documents, workers=2, chunksize=16) == expected
+
+
+class TestStructuredOutputSchemas:
+    """Test cases for the LLM response schemas and their repair helpers."""
+    
+    def test_validation_reports_field_paths(self):
+        """Test failures are reported per field path, items included."""
+        data = wrap_items(QuestionList, [
+            {'question_id': 'Q1', 'question_text': 'Name?', 'input_type': 'text', 'hint': 'kept'},
+            {'question_id': 'Q2', 'input_type': 'date'}
+        ])
+        
+        result, problems = validate_output(QuestionList, data)
+        
+        assert result is None
+        assert problems == [('questions.1.question_text', 'Field required')]
+        
+        patched = apply_patch(data, {'questions.1.question_text': 'Date of birth?'})
+        result, problems = validate_output(QuestionList, patched)
+        assert problems == []
+        assert [question['question_id'] for question in result] == ['Q1', 'Q2']
+        assert result[0]['hint'] == 'kept'
+    
+    def test_non_object_output_is_not_patchable(self):
+        """Test output that is not a JSON object is reported as a whole-response problem."""
+        assert validate_output(PolicyStructure, None) == (None, [('', 'expected a JSON object')])
+        assert apply_patch({'visa_type': 'X'}, ['not', 'a', 'patch']) == {'visa_type': 'X'}
+    
+    def test_stream_validator_detects_completion_across_chunks(self):
+        """Test the closing bracket completes the value, ignoring brackets inside strings."""
+        validator = StreamingJsonValidator()
+        
+        assert not validator.feed('{"text": "a } and \\" ]')
+        assert not validator.feed('", "items": [1, {"b": 2}')
+        assert validator.feed(']}\n')
+        assert validator.text.strip().endswith(']}')
+
+
+class TestReferenceIndex:
+    """Test cases for the policy reference index."""
+    
+    def test_references_are_normalized(self):
+        """Test case, spacing and surrounding text do not change a reference."""
+        assert normalize_reference('see v4.10 (a)(II)') == ('V4', '10', '(a)', '(ii)')
+        assert format_reference(normalize_reference('V4.10(a)')) == 'V4.10(a)'
+        assert normalize_reference('') is None
+        assert normalize_reference(None) is None
+    
+    def test_hierarchical_matching(self):
+        """Test parents and children relate, siblings and visa-level references do not."""
+        requirements = [
+            {'requirement_id': 'R1', 'policy_reference': 'V4.10'},
+            {'requirement_id': 'R2', 'policy_reference': 'V4.10(b)'},
+            {'requirement_id': 'R3', 'policy_reference': 'V4.1'}
+        ]
+        questions = [
+            {'question_id': 'Q1', 'policy_reference': 'V4.10(a)'},
+            {'question_id': 'Q2', 'policy_reference': 'V4.10'},
+            {'question_id': 'Q3', 'policy_reference': 'V4'}
+        ]
+        index = ReferenceIndex(requirements, questions)
+        
+        assert [q['question_id'] for q in index.requirement_questions(0)] == ['Q1', 'Q2']
+        assert [q['question_id'] for q in index.requirement_questions(1)] == ['Q2']
+        assert index.requirement_questions(2) == []
+        assert [r['requirement_id'] for r in index.requirements_for('V4.10(a)')] == ['R1']
+    
+    def test_question_requirement_mapping(self):
+        """Test the mapping check matches references hierarchically."""
+        requirements = [{'requirement_id': 'R1', 'policy_reference': 'V4.10'}]
+        questions = [
+            {'question_id': 'Q1', 'policy_reference': 'V4.10(a)'},
+            {'question_id': 'Q2', 'policy_reference': 'v4.10 (a)'},
+            {'question_id': 'Q3', 'policy_reference': 'V4.11'},
+            {'question_id': 'Q4'}
+        ]
+        
+        mapping = Validator.check_question_requirement_mapping(questions, requirements)
+        
+        assert mapping == {
+            'total_questions': 4,
+            'questions_with_policy_refs': 2,
+            'mapped_to_requirements': 1,
+            'unmapped_questions': ['V4.11']
+        }
+
+
+class TestBatchValidator:
+    """Test cases for the vectorized batch validation engine."""
+    
+    def test_codes_match_item_validation(self):
+        """Test each item gets the errors Validator reports for it alone."""
+        questions = [
+            {'question_id': 'Q1', 'question_text': 'Name?'},
+            {'question_id': '', 'question_text': 'Age?'},
+            {'id': 7, 'prompt': 'Email?'},
+            {'question_id': None},
+            {}
+        ]
+        
+        result = validate_questions(questions)
+        
+        assert result.codes.tolist() == [0, 1, 0, 3, 3]
+        assert result.invalid_positions().tolist() == [1, 3, 4]
+        assert result.valid_count == 2
+        for position, question in enumerate(questions):
+            assert result.errors(position) == Validator.validate_question(question)[1]
+    
+    def test_empty_batch(self):
+        """Test an empty batch validates to no codes."""
+        result = validate_requirements([])
+        
+        assert len(result) == 0
+        assert result.valid_count == 0
+    
+    def test_large_batch(self):
+        """Test a large batch is validated well under a second."""
+        questions = [
+            {'question_id': f'Q{i}', 'question_text': 'Question?' if i % 10 else '', 'input_type': 'text'}
+            for i in range(50000)
+        ]
+        
+        start = time.perf_counter()
+        result = validate_questions(questions)
+        
+        assert time.perf_counter() - start < 1.0
+        assert len(result.invalid_positions()) == 5000
+
+
+class TestFormRules:
+    """Test cases for the compiled form-validation rules."""
+    
+    def test_rules_compile_once(self):
+        """Test each distinct rule text is parsed once and unconstraining rules are dropped."""
+        assert compile_rule('Minimum length 5') is compile_rule('Minimum length 5')
+        assert compile_rule('Answer honestly') is None
+        assert compile_rule('minimum length') is None
+        assert len(compile_rules(('Valid email format required', 'Answer honestly'))) == 1
+    
+    def test_validate_form(self):
+        """Test a whole submission is checked in one call."""
+        validator = FormValidator([
+            {'id': 'email', 'validation_rules': ['Valid email format required']},
+            {'id': 'name', 'validation_rules': ['Minimum length 3', 'Maximum length 5']},
+            {'id': 'age', 'required': False, 'validation_rules': ['Must be numeric']},
+            {'id': 'notes', 'mandatory': False}
+        ])
+        
+        result = validator.validate_form({'email': 'someone@example', 'name': 'Al', 'age': ''})
+        
+        assert result == {
+            'is_valid': False,
+            'errors': {
+                'email': ['Please enter a valid email address'],
+                'name': ['Minimum length is 3 characters']
+            }
+        }
+        assert validator.validate_form({'email': 'a@b.co', 'name': 'Alex', 'age': '42'}) == {'is_valid': True, 'errors': {}}
+        assert validator.validate_field('age', 'forty')['errors'] == ['Please enter a numeric value']
+        assert validator.validate_field('email', None)['errors'] == ['This field is required']
+
+
+class TestEventBus:
+    """Test cases for the workflow event bus."""
+    
+    def test_subscribers_get_matching_tagged_events(self):
+        """Test filters match event fields, including context tags."""
+        bus = EventBus()
+        received = []
+        unsubscribe = bus.subscribe(received.append, job_id='a')
+        
+        with event_tags(job_id='a'):
+            bus.publish('stage_start', stage='policy_analysis')
+        with event_tags(job_id='b'):
+            bus.publish('stage_start', stage='policy_analysis')
+        unsubscribe()
+        with event_tags(job_id='a'):
+            bus.publish('stage_end', stage='policy_analysis')
+        
+        assert [(event['type'], event['job_id']) for event in received] == [('stage_start', 'a')]
+    
+    def test_stream_receives_events_from_threads(self):
+        """Test an async stream gets events published by other threads, dropping the oldest when full."""
+        async def scenario():
+            bus = EventBus()
+            events = bus.stream(max_pending=2)
+            publisher = threading.Thread(target=lambda: [bus.publish('llm_call', n=n) for n in range(3)])
+            publisher.start()
+            publisher.join()
+            received = [await events.get(timeout=1), await events.get(timeout=1), await events.get(timeout=0.05)]
+            events.close()
+            return received
+        
+        first, second, third = asyncio.run(scenario())
+        
+        assert (first['n'], second['n'], third) == (1, 2, None)
+    
+    def test_stream_drains_without_waiting(self):
+        """Test get_nowait returns events already received, then None."""
+        async def scenario():
+            bus = EventBus()
+            events = bus.stream()
+            bus.publish('job_end', job_id='a')
+            await asyncio.sleep(0)
+            drained = (events.empty(), events.get_nowait(), events.get_nowait(), events.empty())
+            events.close()
+            return drained
+        
+        was_empty, event, after, now_empty = asyncio.run(scenario())
+        
+        assert (was_empty, event['type'], after, now_empty) == (False, 'job_end', None, True)
@@ -1,11 +1,26 @@
 import pytest
+import json
 import sys
 from pathlib import Path
 
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+import os
+import time
+import asyncio
+import threading
+
 from src.orchestrator.workflow_orchestrator import WorkflowOrchestrator
+from src.orchestrator.stage_scheduler import StageGraph, StageScheduler
+from src.orchestrator.checkpoint_store import CheckpointStore
+from src.orchestrator.output_retention import RunDirectorySweeper
+from src.orchestrator.batch_runner import BatchRunner, find_documents, percentile
+from src.orchestrator.job_queue import JobQueue, JobQueueFull
+from src.utils.rate_limiter import current_priority_lane
+from src.utils.telemetry import record_llm_call
+from src.utils.events import event_tags, get_event_bus
+from src.utils.document_parser import DocumentParser
 
 
 class TestWorkflowOrchestrator:
@@ -32,6 +47,796 @@ class TestWorkflowOrchestrator:
         for agent_name in expected_agents:
             assert agent_name in orchestrator.agents
 
+    
+    def test_orchestrator_builds_stage_graph(self):
+        """Test stage graph follows workflow_config dependencies."""
+        orchestrator = WorkflowOrchestrator()
+        
+        order = orchestrator.stage_graph.topological_order()
+        assert order[0] == 'policy_analysis'
+        assert order[-1] == 'consolidation'
+    
+    @staticmethod
+    def _checkpointed_orchestrator(tmp_path, failing_agents):
+        """Orchestrator with stub agents; agents in failing_agents raise."""
+        orchestrator = WorkflowOrchestrator()
+        orchestrator.checkpoints = CheckpointStore(str(tmp_path / 'checkpoints'))
+        orchestrator.runs_dir = tmp_path / 'runs'
+        calls = []
+        
+        def execute_agent(agent_name, stage_inputs):
+            calls.append(agent_name)
+            if agent_name in failing_agents:
+                raise RuntimeError(f'{agent_name} failed')
+            return {f'{agent_name}_output': agent_name, f'{agent_name}_document': stage_inputs.get('policy_document')}
+        
+        orchestrator._execute_agent = execute_agent
+        return orchestrator, calls
+    
+    def test_resume_runs_only_pending_stages(self, tmp_path):
+        """Test resume_workflow restores finished stages and reruns the rest."""
+        policy = tmp_path / 'policy.txt'
+        policy.write_text('Parent Boost Visitor Visa policy')
+        
+        failing = {'consolidation_agent'}
+        orchestrator, calls = self._checkpointed_orchestrator(tmp_path, failing)
+        first = orchestrator.run_workflow(str(policy))
+        
+        assert first['status'] == 'failed'
+        assert calls[-1] == 'consolidation_agent'
+        
+        failing.clear()
+        calls.clear()
+        resumed = orchestrator.resume_workflow(first['run_id'])
+        
+        assert resumed['status'] == 'success'
+        assert resumed['run_id'] == first['run_id']
+        assert calls == ['consolidation_agent']
+        assert resumed['outputs']['policy_evaluator_output'] == 'policy_evaluator'
+        assert orchestrator.checkpoints.load(first['run_id'])['status'] == 'success'
+    
+    def test_resume_rejects_changed_inputs(self, tmp_path):
+        """Test a run cannot be resumed after its policy document changed."""
+        policy = tmp_path / 'policy.txt'
+        policy.write_text('Parent Boost Visitor Visa policy')
+        
+        orchestrator, _ = self._checkpointed_orchestrator(tmp_path, {'consolidation_agent'})
+        run_id = orchestrator.run_workflow(str(policy))['run_id']
+        policy.write_text('Skilled Migrant Category policy')
+        
+        with pytest.raises(ValueError):
+            orchestrator.resume_workflow(run_id)
+    
+    def test_results_report_llm_usage_per_stage(self, tmp_path):
+        """Test LLM calls made inside stages roll up into results['telemetry']."""
+        orchestrator, _ = self._checkpointed_orchestrator(tmp_path, set())
+        stub = orchestrator._execute_agent
+        
+        def execute_agent(agent_name, stage_inputs):
+            record_llm_call(agent_name, 'gpt-4', 100, 20)
+            return stub(agent_name, stage_inputs)
+        
+        orchestrator._execute_agent = execute_agent
+        results = orchestrator.run_workflow(str(tmp_path / 'policy.txt'), 'Parent Boost Visitor Visa policy')
+        
+        telemetry = results['telemetry']
+        assert telemetry['totals']['calls'] == 5
+        assert telemetry['by_stage']['policy_analysis']['prompt_tokens'] == 100
+        assert telemetry['by_agent']['consolidation_agent']['completion_tokens'] == 20
+        assert 'LLM USAGE' in Path(results['output_dir'], 'workflow_summary.txt').read_text()
+    
+    def test_run_publishes_progress_events(self, tmp_path):
+        """Test a run publishes run, stage and LLM call events tagged with the caller's tags."""
+        orchestrator, _ = self._checkpointed_orchestrator(tmp_path, set())
+        stub = orchestrator._execute_agent
+        
+        def execute_agent(agent_name, stage_inputs):
+            record_llm_call(agent_name, 'gpt-4', 100, 20)
+            return stub(agent_name, stage_inputs)
+        
+        orchestrator._execute_agent = execute_agent
+        events = []
+        unsubscribe = get_event_bus().subscribe(events.append, session='progress-test')
+        try:
+            with event_tags(session='progress-test'):
+                results = orchestrator.run_workflow(str(tmp_path / 'policy.txt'), 'Parent Boost Visitor Visa policy')
+        finally:
+            unsubscribe()
+        
+        types = [event['type'] for event in events]
+        assert types[0] == 'run_start' and types[-1] == 'run_end'
+        assert events[0]['stages'] == orchestrator.stage_graph.order
+        assert types.count('stage_start') == types.count('stage_end') == len(results['stages'])
+        assert types.count('llm_call') == 5
+        assert all(event['run_id'] == results['run_id'] for event in events)
+        
+        policy_events = [event['type'] for event in events if event.get('stage') == 'policy_analysis']
+        assert policy_events == ['stage_start', 'llm_call', 'stage_end']
+        assert events[-1]['total_tokens'] == 600
+    
+    def test_run_writes_span_trace(self, tmp_path):
+        """Test a run writes nested run, stage, agent and parser spans to its trace file."""
+        orchestrator = WorkflowOrchestrator()
+        orchestrator.checkpoints = None
+        orchestrator.runs_dir = tmp_path / 'runs'
+        
+        for agent in orchestrator.agents.values():
+            def execute(inputs, agent=agent):
+                DocumentParser.extract_sections(inputs.get('policy_document') or '')
+                return {f'{agent.name}_output': True}
+            agent.execute = execute
+        
+        results = orchestrator.run_workflow(str(tmp_path / 'policy.txt'), 'V4.1 OBJECTIVE\n\nParent Boost Visitor Visa')
+        
+        trace = Path(results['output_dir'], 'trace.jsonl').read_text().splitlines()
+        spans = [json.loads(line) for line in trace]
+        by_id = {span['span_id']: span for span in spans}
+        names = [span['name'] for span in spans]
+        
+        assert names.count('workflow.run') == 1
+        assert names.count('workflow.stage') == names.count('agent.execute') == names.count('parser.extract_sections') == 5
+        run_span = next(span for span in spans if span['name'] == 'workflow.run')
+        assert run_span['attributes']['run_id'] == results['run_id']
+        assert run_span['attributes']['status'] == 'success'
+        for span in spans:
+            if span['name'] == 'parser.extract_sections':
+                agent_span = by_id[span['parent_span_id']]
+                stage_span = by_id[agent_span['parent_span_id']]
+                assert agent_span['name'] == 'agent.execute'
+                assert stage_span['name'] == 'workflow.stage'
+                assert stage_span['parent_span_id'] == run_span['span_id']
+                assert stage_span['attributes']['status'] == 'success'
+    
+    def test_concurrent_runs_are_isolated(self, tmp_path):
+        """Test concurrent runs on one orchestrator keep separate state and output directories."""
+        orchestrator, _ = self._checkpointed_orchestrator(tmp_path, set())
+        results = {}
+        
+        def run(document):
+            results[document] = orchestrator.run_workflow(str(tmp_path / 'policy.txt'), document)
+        
+        threads = [threading.Thread(target=run, args=(document,)) for document in ['policy A', 'policy B']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        
+        assert results['policy A']['output_dir'] != results['policy B']['output_dir']
+        for document, result in results.items():
+            assert result['status'] == 'success'
+            assert result['outputs']['consolidation_agent_document'] == document
+            assert os.path.exists(os.path.join(result['output_dir'], 'workflow_summary.txt'))
+
+
+class TestIncrementalWorkflow:
+    """Tests for section-level incremental re-analysis."""
+    
+    SECTIONS = {
+        'V4.1': 'Applicants must hold a valid passport.',
+        'V4.2': 'Applicants must be aged 18 or over.',
+        'V4.3': 'Applicants must hold health insurance.'
+    }
+    
+    @staticmethod
+    def _write_policy(path, sections):
+        body = '\n\n'.join(f'{code} ELIGIBILITY RULES\n\n(a) {text}' for code, text in sections.items())
+        path.write_text(f'Parent Boost Visitor Visa\n\n{body}\n')
+    
+    @staticmethod
+    def _orchestrator(tmp_path):
+        """Orchestrator whose stub agents emit one rule per section they are given."""
+        orchestrator = WorkflowOrchestrator()
+        orchestrator.checkpoints = CheckpointStore(str(tmp_path / 'checkpoints'))
+        orchestrator.runs_dir = tmp_path / 'runs'
+        calls = []
+        
+        def execute_agent(agent_name, stage_inputs):
+            calls.append(agent_name)
+            if agent_name == 'policy_evaluator':
+                document = stage_inputs.get('policy_document') or Path(stage_inputs['policy_document_path']).read_text()
+                rules = [
+                    {'policy_reference': f'{line.split()[0]}(a)', 'rule': next_line.strip()}
+                    for line, next_line in zip(document.split('\n'), document.split('\n')[2:])
+                    if line.startswith('V4.')
+                ]
+                return {'eligibility_rules': rules, 'visa_type': 'Parent Boost Visitor Visa'}
+            return {f'{agent_name}_rules': len(stage_inputs.get('eligibility_rules', []))}
+        
+        orchestrator._execute_agent = execute_agent
+        return orchestrator, calls
+    
+    def test_incremental_run_rederives_changed_sections(self, tmp_path):
+        """Test only changed sections are re-extracted and merged with the previous outputs."""
+        policy = tmp_path / 'policy.txt'
+        self._write_policy(policy, self.SECTIONS)
+        orchestrator, calls = self._orchestrator(tmp_path)
+        base = orchestrator.run_workflow(str(policy))
+        assert base['status'] == 'success'
+        
+        documents = []
+        original = orchestrator._execute_agent
+        orchestrator._execute_agent = lambda name, inputs: documents.append(inputs.get('policy_document')) or original(name, inputs)
+        self._write_policy(policy, {**self.SECTIONS, 'V4.2': 'Applicants must be aged 21 or over.'})
+        calls.clear()
+        result = orchestrator.run_incremental(str(policy))
+        
+        assert result['status'] == 'success'
+        assert result['incremental']['base_run_id'] == base['run_id']
+        assert result['incremental']['changed'] == ['V4.2']
+        assert 'V4.1' not in documents[0] and 'V4.2' in documents[0] and 'Parent Boost' in documents[0]
+        rules = {rule['policy_reference']: rule['rule'] for rule in result['outputs']['eligibility_rules']}
+        assert rules == {
+            'V4.1(a)': '(a) Applicants must hold a valid passport.',
+            'V4.2(a)': '(a) Applicants must be aged 21 or over.',
+            'V4.3(a)': '(a) Applicants must hold health insurance.'
+        }
+        # Validation and consolidation see the merged state, not the delta
+        assert result['outputs']['validation_agent_rules'] == 3
+        assert calls[-2:] == ['validation_agent', 'consolidation_agent']
+        assert orchestrator.checkpoints.load(result['run_id'])['base_run_id'] == base['run_id']
+    
+    def test_incremental_run_keeps_item_ids_unique(self, tmp_path):
+        """Test re-derived items get IDs that do not clash with the kept ones, and references follow."""
+        policy = tmp_path / 'policy.txt'
+        self._write_policy(policy, self.SECTIONS)
+        orchestrator, calls = self._orchestrator(tmp_path)
+        stub = orchestrator._execute_agent
+        
+        def execute_agent(agent_name, stage_inputs):
+            # Like the real agents, number items from 1 on whatever document they see
+            if agent_name == 'policy_evaluator':
+                outputs = stub(agent_name, stage_inputs)
+                for number, rule in enumerate(outputs['eligibility_rules'], 1):
+                    rule['rule_id'] = f'R-{number:03d}'
+                return outputs
+            if agent_name == 'requirements_capture':
+                return {'requirements': [
+                    {'requirement_id': f'FR-{number:03d}', 'description': f"Meet {rule['rule']}",
+                     'policy_reference': rule['policy_reference'], 'source_rule': rule['rule_id']}
+                    for number, rule in enumerate(stage_inputs['eligibility_rules'], 1)
+                ]}
+            if agent_name == 'question_generator':
+                return {'questions': [
+                    {'question_id': f'Q-{number:03d}', 'question_text': f"Do you {requirement['description']}?",
+                     'policy_reference': requirement['policy_reference'], 'requirement': requirement['requirement_id']}
+                    for number, requirement in enumerate(stage_inputs['requirements'], 1)
+                ]}
+            return stub(agent_name, stage_inputs)
+        
+        orchestrator._execute_agent = execute_agent
+        orchestrator.run_workflow(str(policy))
+        self._write_policy(policy, {**self.SECTIONS, 'V4.2': 'Applicants must be aged 21 or over.',
+                                    'V4.4': 'Applicants must have a sponsor.'})
+        outputs = orchestrator.run_incremental(str(policy))['outputs']
+        
+        rules = {rule['policy_reference']: rule['rule_id'] for rule in outputs['eligibility_rules']}
+        requirements = {r['policy_reference']: r for r in outputs['requirements']}
+        questions = outputs['questions']
+        assert (rules['V4.1(a)'], rules['V4.3(a)']) == ('R-001', 'R-003')
+        for ids in (list(rules.values()), [r['requirement_id'] for r in requirements.values()],
+                    [q['question_id'] for q in questions]):
+            assert len(ids) == len(set(ids)) == 4
+        assert all(r['source_rule'] == rules[reference] for reference, r in requirements.items())
+        assert all(q['requirement'] == requirements[q['policy_reference']]['requirement_id'] for q in questions)
+    
+    def test_incremental_run_drops_removed_sections(self, tmp_path):
+        """Test removing a section drops its outputs without re-running extraction."""
+        policy = tmp_path / 'policy.txt'
+        self._write_policy(policy, self.SECTIONS)
+        orchestrator, calls = self._orchestrator(tmp_path)
+        orchestrator.run_workflow(str(policy))
+        
+        self._write_policy(policy, {code: text for code, text in self.SECTIONS.items() if code != 'V4.3'})
+        calls.clear()
+        result = orchestrator.run_incremental(str(policy))
+        
+        assert result['incremental']['removed'] == ['V4.3']
+        assert 'policy_evaluator' not in calls
+        assert [rule['policy_reference'] for rule in result['outputs']['eligibility_rules']] == ['V4.1(a)', 'V4.2(a)']
+    
+    def test_incremental_run_reuses_unchanged_document(self, tmp_path):
+        """Test an unchanged document reuses every stage, and a first run falls back to a full run."""
+        policy = tmp_path / 'policy.txt'
+        self._write_policy(policy, self.SECTIONS)
+        orchestrator, calls = self._orchestrator(tmp_path)
+        
+        first = orchestrator.run_incremental(str(policy))
+        assert 'incremental' not in first
+        assert len(calls) == 5
+        
+        calls.clear()
+        second = orchestrator.run_incremental(str(policy))
+        assert second['status'] == 'success'
+        assert calls == []
+        assert second['incremental']['unchanged'] == ['V4.1', 'V4.2', 'V4.3']
+        assert second['outputs']['eligibility_rules'] == first['outputs']['eligibility_rules']
+
+
+class TestRunDirectorySweeper:
+    """Tests for per-run output retention."""
+    
+    @staticmethod
+    def _make_run(runs_dir, run_id, size, age_seconds=0):
+        run_dir = runs_dir / run_id
+        run_dir.mkdir(parents=True)
+        output_file = run_dir / 'output.json'
+        output_file.write_text('x' * size)
+        modified = time.time() - age_seconds
+        os.utime(output_file, (modified, modified))
+        os.utime(run_dir, (modified, modified))
+    
+    def test_sweep_removes_expired_runs(self, tmp_path):
+        """Test runs older than the maximum age are deleted."""
+        self._make_run(tmp_path, 'old', 10, age_seconds=3600)
+        self._make_run(tmp_path, 'new', 10)
+        
+        result = RunDirectorySweeper(str(tmp_path), max_age_seconds=60, max_total_bytes=None).sweep()
+        
+        assert result['deleted_runs'] == ['old']
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['new']
+    
+    def test_sweep_enforces_size_limit_oldest_first(self, tmp_path):
+        """Test the oldest runs go first when over the size limit."""
+        for i, run_id in enumerate(['run1', 'run2', 'run3']):
+            self._make_run(tmp_path, run_id, 100, age_seconds=300 - i * 100)
+        
+        result = RunDirectorySweeper(str(tmp_path), max_age_seconds=None, max_total_bytes=250).sweep()
+        
+        assert result['deleted_runs'] == ['run1']
+        assert result['bytes_freed'] == 100
+    
+    def test_active_runs_are_never_swept(self, tmp_path):
+        """Test a run in progress survives sweeps."""
+        self._make_run(tmp_path, 'running', 10, age_seconds=3600)
+        sweeper = RunDirectorySweeper(str(tmp_path), max_age_seconds=60)
+        
+        sweeper.mark_active('running')
+        assert sweeper.sweep()['deleted_runs'] == []
+        
+        sweeper.mark_finished('running')
+        assert sweeper.sweep()['deleted_runs'] == ['running']
+    
+    def test_sweep_prunes_finished_checkpoints(self, tmp_path):
+        """Test tracked checkpoint stores lose expired finished runs, never running ones."""
+        store = CheckpointStore(str(tmp_path / 'checkpoints'), max_age_seconds=60)
+        for run_id, status in [('old_done', 'success'), ('old_running', 'running'), ('new_done', 'failed')]:
+            store.create(run_id, {'policy_document_path': 'policy.txt'})
+            store.set_status(run_id, status)
+        for run_id in ('old_done', 'old_running'):
+            modified = time.time() - 3600
+            os.utime(tmp_path / 'checkpoints' / f'{run_id}.json', (modified, modified))
+        sweeper = RunDirectorySweeper(str(tmp_path / 'runs'), max_age_seconds=60)
+        sweeper.track_checkpoints(store)
+        sweeper.track_checkpoints(store)
+        
+        assert sweeper.sweep()['pruned_checkpoints'] == ['old_done']
+        assert sorted(p.stem for p in (tmp_path / 'checkpoints').glob('*.json')) == ['new_done', 'old_running']
+    
+    def test_latest_run_uses_the_index(self, tmp_path):
+        """Test latest_run reads the indexed checkpoint and recovers when it is gone."""
+        store = CheckpointStore(str(tmp_path))
+        for run_id, created_at in [('run1', '2024-01-01'), ('run2', '2024-02-01')]:
+            store.create(run_id, {'policy_document_path': 'policy.txt'}, {'section_hashes': {'V4.1': 'h'}})
+            checkpoint = store.load(run_id)
+            checkpoint['created_at'] = created_at
+            store._write(checkpoint)
+            store.set_status(run_id, 'success')
+        store.create('other', {'policy_document_path': 'other.txt'})
+        (tmp_path / 'other.json').write_text('not json')
+        
+        assert store.latest_run('policy.txt')['run_id'] == 'run2'
+        assert store.latest_run('other.txt') is None
+        
+        (tmp_path / 'run2.json').unlink()
+        assert store.latest_run('policy.txt')['run_id'] == 'run1'
+    
+    def test_checkpoint_prune_enforces_size_limit_oldest_first(self, tmp_path):
+        """Test the oldest finished checkpoints go first when over the size limit."""
+        store = CheckpointStore(str(tmp_path), max_total_bytes=1)
+        for i, run_id in enumerate(['run1', 'run2']):
+            store.create(run_id, {})
+            store.set_status(run_id, 'success')
+            modified = time.time() - 300 + i * 100
+            os.utime(tmp_path / f'{run_id}.json', (modified, modified))
+        store.max_total_bytes = (tmp_path / 'run2.json').stat().st_size
+        
+        result = store.prune()
+        
+        assert result['deleted_runs'] == ['run1']
+        assert result['bytes_freed'] > 0
+
+
+class TestBatchRunner:
+    """Tests for the batch workflow runner."""
+    
+    class _StubOrchestrator:
+        def __init__(self):
+            self.lanes = []
+        
+        def run_workflow(self, policy_document_path, policy_document_content=None):
+            self.lanes.append(current_priority_lane())
+            status = 'failed' if 'bad' in policy_document_path else 'success'
+            stage = {'name': 'policy_analysis', 'status': status}
+            if status == 'failed':
+                stage['error'] = 'boom'
+            return {'status': status, 'run_id': Path(policy_document_path).stem, 'stages': [stage]}
+    
+    def test_find_documents_expands_directories_and_globs(self, tmp_path):
+        """Test sources expand to supported documents only, without duplicates."""
+        (tmp_path / 'nested').mkdir()
+        for name in ['a.txt', 'b.pdf', 'nested/c.docx', 'notes.csv']:
+            (tmp_path / name).write_text('policy')
+        
+        documents = find_documents([str(tmp_path), str(tmp_path / '*.txt')])
+        
+        assert [p.name for p in documents] == ['a.txt', 'b.pdf', 'c.docx']
+    
+    def test_batch_streams_records_and_summarizes(self, tmp_path):
+        """Test one JSONL record per document and a summary with failures."""
+        for name in ['one.txt', 'two.txt', 'bad.txt']:
+            (tmp_path / name).write_text('policy')
+        orchestrator = self._StubOrchestrator()
+        output_path = tmp_path / 'results.jsonl'
+        
+        summary = BatchRunner(workers=2, orchestrator=orchestrator).run(
+            find_documents([str(tmp_path)]), str(output_path)
+        )
+        
+        lines = output_path.read_text().splitlines()
+        assert len(lines) == 3
+        assert summary['total_documents'] == 3
+        assert summary['succeeded'] == 2
+        assert summary['failures'][0]['error'] == 'policy_analysis: boom'
+        assert summary['throughput_docs_per_minute'] > 0
+        assert orchestrator.lanes == ['batch'] * 3
+    
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = [float(v) for v in range(1, 21)]
+        assert percentile(values, 50) == 10.0
+        assert percentile(values, 95) == 19.0
+        assert percentile([], 95) == 0.0
+
+
+class TestJobQueue:
+    """Tests for the bounded asyncio job queue."""
+    
+    def test_jobs_run_on_bounded_workers(self):
+        """Test at most `workers` jobs run at once and results are kept."""
+        async def scenario():
+            queue = JobQueue(workers=2, max_queued=10)
+            await queue.start()
+            running = []
+            peak = []
+            
+            async def work(value):
+                running.append(value)
+                peak.append(len(running))
+                await asyncio.sleep(0.05)
+                running.remove(value)
+                if value == 3:
+                    raise ValueError('boom')
+                return value * 2
+            
+            jobs = [queue.submit(lambda value=value: work(value), name=f'job-{value}') for value in range(5)]
+            for job in jobs:
+                await job.wait()
+            await queue.stop()
+            return jobs, max(peak)
+        
+        jobs, peak = asyncio.run(scenario())
+        
+        assert peak == 2
+        assert [job.status for job in jobs] == ['succeeded'] * 3 + ['failed', 'succeeded']
+        assert jobs[1].to_dict()['result'] == 2
+        assert jobs[1].to_dict()['name'] == 'job-1'
+        assert jobs[3].error == 'boom'
+    
+    def test_full_queue_refuses_jobs(self):
+        """Test submissions past max_queued waiting jobs raise JobQueueFull."""
+        async def scenario():
+            queue = JobQueue(workers=1, max_queued=2)
+            await queue.start()
+            release = asyncio.Event()
+            jobs = [queue.submit(release.wait)]
+            await asyncio.sleep(0)
+            jobs += [queue.submit(release.wait), queue.submit(release.wait)]
+            with pytest.raises(JobQueueFull):
+                queue.submit(release.wait)
+            release.set()
+            await asyncio.gather(*(job.wait() for job in jobs))
+            await queue.stop()
+            return jobs
+        
+        assert [job.status for job in asyncio.run(scenario())] == ['succeeded'] * 3
+    
+    def test_cancelled_queued_jobs_free_their_slots(self):
+        """Test a cancelled queued job stops counting against max_queued."""
+        async def scenario():
+            queue = JobQueue(workers=1, max_queued=1)
+            await queue.start()
+            release = asyncio.Event()
+            running = queue.submit(release.wait)
+            await asyncio.sleep(0)
+            cancelled = queue.submit(release.wait)
+            with pytest.raises(JobQueueFull):
+                queue.submit(release.wait)
+            
+            queue.cancel(cancelled.job_id)
+            replacement = queue.submit(release.wait)
+            release.set()
+            await asyncio.gather(running.wait(), replacement.wait())
+            await queue.stop()
+            return running, cancelled, replacement
+        
+        assert [job.status for job in asyncio.run(scenario())] == ['succeeded', 'cancelled', 'succeeded']
+    
+    def test_cancel_queued_and_running_jobs(self):
+        """Test cancelled jobs finish as cancelled and still clean up."""
+        async def scenario():
+            queue = JobQueue(workers=1, max_queued=5)
+            await queue.start()
+            cleaned = []
+            running = queue.submit(lambda: asyncio.sleep(10), lambda: cleaned.append('running'))
+            queued = queue.submit(lambda: asyncio.sleep(10), lambda: cleaned.append('queued'))
+            await asyncio.sleep(0.01)
+            
+            assert queue.cancel(queued.job_id)
+            assert queue.cancel(running.job_id)
+            await running.wait()
+            assert not queue.cancel(running.job_id)
+            stats = queue.stats()
+            await queue.stop()
+            return running, queued, cleaned, stats
+        
+        running, queued, cleaned, stats = asyncio.run(scenario())
+        
+        assert running.status == 'cancelled'
+        assert queued.status == 'cancelled'
+        assert sorted(cleaned) == ['queued', 'running']
+        assert stats['cancelled'] == 2
+    
+    def test_finished_jobs_are_retained_up_to_limit(self):
+        """Test the oldest finished jobs are forgotten past retention."""
+        async def scenario():
+            queue = JobQueue(workers=1, max_queued=5, retention=2)
+            await queue.start()
+            jobs = [queue.submit(lambda: asyncio.sleep(0)) for _ in range(3)]
+            for job in jobs:
+                await job.wait()
+            await queue.stop()
+            return queue, jobs
+        
+        queue, jobs = asyncio.run(scenario())
+        
+        assert queue.get(jobs[0].job_id) is None
+        assert queue.get(jobs[2].job_id) is jobs[2]
+
+
+class TestJobEndpoints:
+    """Tests for the job endpoints of the FastAPI demo."""
+    
+    @pytest.fixture
+    def client(self, monkeypatch):
+        from fastapi.testclient import TestClient
+        import fastapi_demo
+        
+        release = threading.Event()
+        
+        async def fake_process_document(tmp_path, filename):
+            # The app runs on the test client's event loop thread; poll the release
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+            return {'success': True, 'filename': filename, 'size': os.path.getsize(tmp_path)}
+        
+        monkeypatch.setattr(fastapi_demo, 'process_document', fake_process_document)
+        with TestClient(fastapi_demo.app) as client:
+            client.release = release
+            yield client
+            release.set()
+    
+    @staticmethod
+    def _submit(client):
+        return client.post('/jobs', files={'file': ('policy.txt', b'x' * 2048, 'text/plain')})
+    
+    @staticmethod
+    def _wait_for_status(client, job_id, statuses):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            job = client.get(f'/jobs/{job_id}').json()
+            if job['status'] in statuses:
+                return job
+            time.sleep(0.01)
+        raise AssertionError(f"job {job_id} never reached {statuses}")
+    
+    def test_submit_backpressure_and_cancel(self, client):
+        """Test 202 on submit, 429 when the queue is full and 404/409 on cancel."""
+        import fastapi_demo
+        fastapi_demo.job_queue.max_queued = 1
+        
+        running = [self._submit(client) for _ in range(fastapi_demo.job_queue.workers)]
+        assert all(response.status_code == 202 for response in running)
+        for response in running:
+            self._wait_for_status(client, response.json()['job_id'], ('running',))
+        
+        queued = self._submit(client)
+        assert queued.status_code == 202
+        refused = self._submit(client)
+        assert refused.status_code == 429
+        assert refused.headers['Retry-After'] == '30'
+        
+        job_id = queued.json()['job_id']
+        assert client.delete(f'/jobs/{job_id}').json()['status'] == 'cancelled'
+        assert client.delete(f'/jobs/{job_id}').status_code == 409
+        assert client.delete('/jobs/unknown').status_code == 404
+        assert self._submit(client).status_code == 202
+        
+        client.release.set()
+        job = self._wait_for_status(client, running[0].json()['job_id'], ('succeeded',))
+        assert job['result'] == {'success': True, 'filename': 'policy.txt', 'size': 2048}
+    
+    def test_event_stream_ends_with_job_end(self, client):
+        """Test the SSE stream of a running job and of a finished one both end on job_end."""
+        job_id = self._submit(client).json()['job_id']
+        self._wait_for_status(client, job_id, ('running',))
+        
+        # The test client returns once the stream ends, so finish the job meanwhile
+        threading.Timer(0.1, client.release.set).start()
+        live = client.get(f'/jobs/{job_id}/events').text
+        replay = client.get(f'/jobs/{job_id}/events').text
+        
+        for body in (live, replay):
+            events = [line.split(': ', 1)[1] for line in body.splitlines() if line.startswith('event: ')]
+            assert events[-1] == 'job_end'
+            assert json.loads(body.strip().splitlines()[-1][len('data: '):])['status'] == 'succeeded'
+    
+    def test_process_document_keeps_keyword_detection_results(self, tmp_path, monkeypatch):
+        """Test detection_results stays a keyword to bool map, with the classifier output beside it."""
+        import fastapi_demo
+        
+        class FakeOrchestrator:
+            async def arun_workflow(self, *args, **kwargs):
+                return {'status': 'completed', 'duration_seconds': 0.1, 'stages': [], 'outputs': {}}
+        
+        policy_path = tmp_path / 'policy.txt'
+        policy_path.write_text("Parent Boost Visitor Visa (V4) policy for parents of New Zealand residents.")
+        monkeypatch.setattr(fastapi_demo, 'orchestrator', FakeOrchestrator())
+        
+        result = asyncio.run(fastapi_demo.process_document(str(policy_path), 'policy.txt'))
+        
+        assert set(result['detection_results']) == set(fastapi_demo.DETECTION_KEYWORDS)
+        assert result['detection_results']['PARENT BOOST'] is True
+        assert result['detection_results']['WORKING HOLIDAY'] is False
+        assert set(result['classification']) == {'matches', 'scores', 'confidence'}
+
+
+class TestStageScheduler:
+    """Tests for the dependency-graph stage scheduler."""
+    
+    @staticmethod
+    def _branching_stages():
+        return [
+            {'name': 'a', 'agents': ['x']},
+            {'name': 'b', 'agents': ['x'], 'depends_on': ['a']},
+            {'name': 'c', 'agents': ['x'], 'depends_on': ['a']},
+            {'name': 'd', 'agents': ['x'], 'depends_on': ['a']},
+            {'name': 'e', 'agents': ['x'], 'depends_on': ['b', 'c', 'd']}
+        ]
+    
+    def test_rejects_cycles_and_unknown_dependencies(self):
+        """Test invalid dependency graphs are rejected."""
+        with pytest.raises(ValueError):
+            StageGraph([
+                {'name': 'a', 'agents': [], 'depends_on': ['b']},
+                {'name': 'b', 'agents': [], 'depends_on': ['a']}
+            ])
+        
+        with pytest.raises(ValueError):
+            StageGraph([{'name': 'a', 'agents': [], 'depends_on': ['missing']}])
+    
+    def test_independent_branches_run_concurrently(self):
+        """Test run time follows the critical path, not the sum of stages."""
+        scheduler = StageScheduler(StageGraph(self._branching_stages()), max_workers=4)
+        
+        def execute_stage(stage):
+            time.sleep(0.2)
+            return {'name': stage['name'], 'status': 'success', 'outputs': {}}
+        
+        start = time.time()
+        results = scheduler.run(execute_stage)
+        elapsed = time.time() - start
+        
+        assert [r['name'] for r in results] == ['a', 'b', 'c', 'd', 'e']
+        assert elapsed < 0.8
+    
+    def test_cancelling_arun_cancels_running_stages(self):
+        """Test cancelling the scheduler cancels the stage tasks it started."""
+        scheduler = StageScheduler(StageGraph(self._branching_stages()), max_workers=4)
+        log = []
+        
+        async def execute_stage(stage):
+            log.append(('start', stage['name']))
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                log.append(('cancelled', stage['name']))
+                raise
+            log.append(('end', stage['name']))
+            return {'name': stage['name'], 'status': 'success', 'outputs': {}}
+        
+        async def scenario():
+            task = asyncio.create_task(scheduler.arun(execute_stage))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        
+        asyncio.run(scenario())
+        
+        assert log == [('start', 'a'), ('cancelled', 'a')]
+    
+    def test_barrier_stages_run_alone(self):
+        """Test stages marked parallel: false never overlap other stages."""
+        stages = self._branching_stages()
+        stages[2]['parallel'] = False
+        scheduler = StageScheduler(StageGraph(stages), max_workers=4)
+        running = []
+        overlaps = []
+        
+        def execute_stage(stage):
+            running.append(stage['name'])
+            overlaps.append(list(running))
+            time.sleep(0.05)
+            running.remove(stage['name'])
+            return {'name': stage['name'], 'status': 'success', 'outputs': {}}
+        
+        scheduler.run(execute_stage)
+        
+        assert ['c'] in overlaps
+        assert all(len(snapshot) == 1 for snapshot in overlaps if 'c' in snapshot)
+    
+    def test_failed_stage_skips_dependents(self):
+        """Test dependents of a failed stage are skipped when continuing on error."""
+        scheduler = StageScheduler(StageGraph(self._branching_stages()), continue_on_error=True)
+        
+        def execute_stage(stage):
+            status = 'failed' if stage['name'] == 'b' else 'success'
+            return {'name': stage['name'], 'status': status, 'outputs': {}}
+        
+        results = {r['name']: r['status'] for r in scheduler.run(execute_stage)}
+        
+        assert results == {'a': 'success', 'b': 'failed', 'c': 'success', 'd': 'success', 'e': 'skipped'}
+    
+    def test_completed_stages_are_not_rerun(self):
+        """Test stages passed as completed are reported but not executed."""
+        scheduler = StageScheduler(StageGraph(self._branching_stages()))
+        executed = []
+        
+        def execute_stage(stage):
+            executed.append(stage['name'])
+            return {'name': stage['name'], 'status': 'success', 'outputs': {}}
+        
+        completed = {name: {'name': name, 'status': 'success', 'outputs': {}} for name in ['a', 'b']}
+        results = scheduler.run(execute_stage, completed=completed)
+        
+        assert sorted(executed) == ['c', 'd', 'e']
+        assert [r['name'] for r in results] == ['a', 'b', 'c', 'd', 'e']
+    
+    def test_async_run_overlaps_independent_stages(self):
+        """Test the asyncio scheduler also follows the critical path."""
+        scheduler = StageScheduler(StageGraph(self._branching_stages()), max_workers=4)
+        
+        async def execute_stage(stage):
+            await asyncio.sleep(0.2)
+            return {'name': stage['name'], 'status': 'success', 'outputs': {}}
+        
+        start = time.time()
+        results = asyncio.run(scheduler.arun(execute_stage))
+        elapsed = time.time() - start
+        
+        assert [r['name'] for r in results] == ['a', 'b', 'c', 'd', 'e']
+        assert elapsed < 0.8
+
 
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])